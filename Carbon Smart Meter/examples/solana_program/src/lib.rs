@@ -20,6 +20,8 @@ const HALVING_INTERVAL: u64 = 126_144_000;      // ~4 years in seconds
 const MIN_MARKET_CAP_THRESHOLD: u64 = 1_000_000_000_000;   // $1M in smallest unit
 const MIN_REWARD_FACTOR: u64 = 50;              // 0.5x
 const MAX_REWARD_FACTOR: u64 = 200;             // 2.0x
+const BATCH_TAG: &[u8; 4] = b"CSMB";            // Multi-record instruction marker
+const BATCH_RECORD_LEN: usize = 104;            // device_id(32) + kwh(8) + sig(64)
 
 // === DATA STRUCTURES ===
 #[derive(BorshSerialize, BorshDeserialize, Debug)]
@@ -37,6 +39,7 @@ pub struct ProgramState {
     pub base_reward: u64,
     pub last_halving_block: u64,
     pub current_market_cap: u64,
+    pub operator: Pubkey,        // Relayer allowed to submit batches for any device
 }
 
 // === ENTRYPOINT ===
@@ -47,6 +50,10 @@ pub fn process_instruction(
     accounts: &[AccountInfo],
     instruction_data: &[u8],
 ) -> ProgramResult {
+    if instruction_data.starts_with(BATCH_TAG) {
+        return process_batch(program_id, accounts, instruction_data);
+    }
+
     let accounts_iter = &mut accounts.iter();
     let mining_acc = next_account_info(accounts_iter)?;
     let state_acc = next_account_info(accounts_iter)?;
@@ -125,6 +132,94 @@ if expected_epoch > state.current_epoch {
     Ok(())
 }
 
+// === BATCH ENTRYPOINT ===
+// Parse: [tag "CSMB"(4), count(u16), count × [device_id(32), kwh_milli(8), sig(64)], market_cap(8)?]
+// Accounts: [operator (signer), state, token, system_program,
+//            mining_1, wallet_1, .. mining_count, wallet_count]
+// The operator relays readings for many owners; each record is still bound to its
+// owner by the device signature over device_id || mining.wallet, and each owner's
+// wallet is paid its own reward.
+fn process_batch(
+    _program_id: &Pubkey,
+    accounts: &[AccountInfo],
+    instruction_data: &[u8],
+) -> ProgramResult {
+    let accounts_iter = &mut accounts.iter();
+    let operator = next_account_info(accounts_iter)?;
+    let state_acc = next_account_info(accounts_iter)?;
+    let token_acc = next_account_info(accounts_iter)?;
+    let _system_program = next_account_info(accounts_iter)?;
+    let clock = Clock::get()?;
+
+    let state = ProgramState::try_from_slice(&state_acc.data.borrow())?;
+    if !operator.is_signer || *operator.key != state.operator {
+        return Err(ProgramError::MissingRequiredSignature);
+    }
+    if instruction_data.len() < 6 {
+        return Err(ProgramError::InvalidInstructionData);
+    }
+
+    let count = u16::from_le_bytes(instruction_data[4..6].try_into().unwrap()) as usize;
+    let records_end = 6 + count * BATCH_RECORD_LEN;
+    if instruction_data.len() < records_end {
+        return Err(ProgramError::InvalidInstructionData);
+    }
+
+    let market_cap = if instruction_data.len() >= records_end + 8 {
+        u64::from_le_bytes(instruction_data[records_end..records_end + 8].try_into().unwrap())
+    } else {
+        state.current_market_cap
+    };
+    let reward_rate = calculate_reward_rate(&state, market_cap);
+    let current_day = (clock.unix_timestamp / 86_400) as u64;
+
+    let mut total_milli: u64 = 0;
+    let mut total_reward: u64 = 0;
+
+    for record in instruction_data[6..records_end].chunks_exact(BATCH_RECORD_LEN) {
+        let mining_acc = next_account_info(accounts_iter)?;
+        let wallet_acc = next_account_info(accounts_iter)?;
+        let mut mining = MiningAccount::try_from_slice(&mining_acc.data.borrow())?;
+
+        let device_id = &record[0..32];
+        let kwh_milli = u64::from_le_bytes(record[32..40].try_into().unwrap());
+        let signature = &record[40..104];
+
+        if mining.device_id != *device_id || mining.wallet != *wallet_acc.key {
+            return Err(ProgramError::InvalidAccountData);
+        }
+        if !verify_signature(device_id, &mining.wallet, signature) {
+            return Err(ProgramError::InvalidInstructionData);
+        }
+
+        if mining.last_mined_day < current_day {
+            mining.daily_kwh = 0;
+            mining.last_mined_day = current_day;
+        }
+
+        // Capped records are skipped so one full device doesn't fail the whole batch
+        let allowed_milli = DAILY_KWH_CAP.saturating_sub(mining.daily_kwh).min(kwh_milli);
+        if allowed_milli == 0 {
+            continue;
+        }
+
+        mining.daily_kwh = mining.daily_kwh.saturating_add(allowed_milli);
+        mining.cumulative_kwh = mining.cumulative_kwh.saturating_add(allowed_milli);
+        mining.last_reward_block = clock.slot;
+        mining.serialize(&mut &mut mining_acc.data.borrow_mut()[..])?;
+
+        let reward = allowed_milli * reward_rate / 1_000;
+        if reward > 0 {
+            transfer_tokens(token_acc, wallet_acc, reward)?;
+        }
+        total_milli = total_milli.saturating_add(allowed_milli);
+        total_reward = total_reward.saturating_add(reward);
+    }
+
+    msg!("Batch of {} records mined {} milli-kWh → {} $CARBON", count, total_milli, total_reward);
+    Ok(())
+}
+
 // === REWARD CALCULATION ===
 fn calculate_reward_rate(state: &ProgramState, market_cap: u64) -> u64 {
     let scaling = if market_cap > 0 {
@@ -0,0 +1,82 @@
+# benchmarks/bench_adapter.py
+"""
+Concurrent kWh submission throughput through the async SolanaAdapter.
+
+A LocalRpcServer (JSON-RPC over HTTP, fixed per-request latency) runs in a
+separate process; the adapter submits the same signed records under several
+settings: one record per transaction sent one at a time (the old submit_kwh
+flow), then packed transactions with more and more sends in flight, then the
+default per-chain rate limit.
+
+Usage: python benchmarks/bench_adapter.py [records] [latency_ms]
+"""
+
+import asyncio
+import multiprocessing
+import sys
+import time
+
+from nacl.signing import SigningKey
+from solders.keypair import Keypair
+
+from carbon_smart_meter.blockchain.batching import KwhRecord, device_message
+from carbon_smart_meter.core.blockchain.adapter import RateLimiter, RpcSession
+from carbon_smart_meter.core.blockchain.solana import SolanaAdapter
+from carbon_smart_meter.core.local import LocalRpcServer
+
+
+def serve(latency: float, conn):
+    async def main():
+        server = await LocalRpcServer(latency=latency).start()
+        conn.send(server.url)
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def make_records(n: int):
+    owners = [bytes(Keypair().pubkey()) for _ in range(16)]
+    records = []
+    for i in range(n):
+        key, device_id, wallet = SigningKey.generate(), i.to_bytes(32, "big"), owners[i % len(owners)]
+        signature = key.sign(device_message(device_id, wallet)).signature
+        records.append(KwhRecord(device_id, key.verify_key.encode(), 1 + i % 1500, signature, wallet))
+    return records
+
+
+async def run(url: str, records, label: str, max_inflight: int, single: bool = False, limiter=None):
+    session = RpcSession(url)
+    adapter = SolanaAdapter(
+        Keypair(), session=session, max_inflight=max_inflight,
+        rate_limiter=limiter if limiter is not None else RateLimiter(None),
+    )
+    started = time.perf_counter()
+    if single:
+        results = [await adapter.submit_kwh(record) for record in records]
+    else:
+        results = await adapter.submit_batch(records)
+    elapsed = time.perf_counter() - started
+    await adapter.close()
+    sent = sum(1 for r in results if r is not None)
+    print(f"{label:<32} {len(records) / elapsed:>9,.0f} records/s {len(set(results)) / elapsed:>8,.1f} tx/s "
+          f"{elapsed:>7.2f} s  ({sent:,} sent)")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20.0) / 1000
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve, args=(latency, child), daemon=True)
+    server.start()
+    url = parent.recv()
+    records = make_records(count)
+    print(f"{count:,} records, {latency * 1000:.0f} ms per RPC request")
+
+    async def main():
+        await run(url, records[:200], "1 record/tx, sequential (200)", 1, single=True)
+        for inflight in (1, 4, 16, 64):
+            await run(url, records, f"packed, {inflight} in flight", inflight)
+        await run(url, records, "packed, 16 in flight, 40 req/s", 16, limiter=RateLimiter(40.0, 40))
+
+    asyncio.run(main())
+    server.terminate()
@@ -0,0 +1,39 @@
+# benchmarks/bench_aggregation.py
+"""
+Downstream write volume and fold cost of the windowed aggregation stage.
+
+Usage: python benchmarks/bench_aggregation.py [devices] [seconds] [window_seconds]
+"""
+
+import os
+import sys
+import time
+
+from carbon_smart_meter.core.aggregation import WindowAggregator
+from carbon_smart_meter.core.mining import EnergyReading
+
+
+def main(devices: int, seconds: int, window: int):
+    aggregator = WindowAggregator(window_seconds=window)
+    ids = [os.urandom(32) for _ in range(devices)]
+    frame = os.urandom(116)
+    start = time.perf_counter()
+    emitted = 0
+    for ts in range(seconds):
+        for device_id in ids:
+            reading = EnergyReading(
+                device_id=device_id, kwh=1e-6, timestamp=ts,
+                verified=True, cable_type="type-c", user_region="EU"
+            )
+            emitted += len(aggregator.add(reading, frame))
+    emitted += len(aggregator.flush())
+    elapsed = time.perf_counter() - start
+
+    samples = devices * seconds
+    print(f"{samples:,} samples → {emitted:,} aggregates ({samples / emitted:,.0f}x fewer S3 + Azure + offset writes)")
+    print(f"fold cost: {elapsed / samples * 1e6:.2f} µs/sample (incl. EnergyReading construction)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [1000, 600, 60][len(args):]))
@@ -0,0 +1,69 @@
+# benchmarks/bench_archive.py
+"""
+A month of fleet energy history: archive size and full / per-device scan times,
+vs. the JSON-object-per-reading layout.
+
+Usage: python benchmarks/bench_archive.py [devices] [samples_per_day] [codec]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import NamedTuple
+
+from carbon_smart_meter.core.archive import ArchiveReader, ArchiveWriter
+
+T0 = 1_700_006_400
+DAYS = 30
+
+
+class Row(NamedTuple):
+    device_id: bytes
+    kwh: float
+    timestamp: int
+    verified: bool
+    cable_type: str
+    user_region: str
+
+
+def main(devices: int, per_day: int, codec: str):
+    ids = [os.urandom(32) for _ in range(devices)]
+    step = 86400 // per_day
+    rows = devices * per_day * DAYS
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        with ArchiveWriter(root, "energy", codec=codec) as writer:
+            for day in range(DAYS):
+                for i in range(per_day):
+                    ts = T0 + day * 86400 + i * step
+                    for device_id in ids:
+                        writer.add(Row(device_id, 0.0001, ts, True, "type-c", "EU"))
+        write_s = time.perf_counter() - start
+
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+        json_size = rows * len(json.dumps({
+            "device_id": "x" * 32, "kwh": 0.0001, "timestamp": T0, "verified": True,
+            "cable_type": "type-c", "user_region": "EU"
+        }))
+
+        reader = ArchiveReader(root, "energy")
+        start = time.perf_counter()
+        total = reader.total("kwh", region="EU", start=T0, end=T0 + DAYS * 86400)
+        scan_s = time.perf_counter() - start
+
+        reader = ArchiveReader(root, "energy")
+        start = time.perf_counter()
+        device_total = reader.total("kwh", device_id=ids[0])
+        device_s = time.perf_counter() - start
+
+    print(f"{rows:,} readings, {devices:,} devices x {DAYS} days ({codec})")
+    print(f"write {write_s:.1f} s; archive {size / 1e6:.1f} MB vs ~{json_size / 1e6:.0f} MB of JSON objects")
+    print(f"month scan {scan_s:.2f} s ({rows / scan_s / 1e6:.1f} M rows/s), total {total:.2f} kWh")
+    print(f"one device {device_s * 1e3:.0f} ms ({reader.stats['segments_scanned']} of {reader.stats['segments_listed']} listed segments read), {device_total:.4f} kWh")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 1000, int(args[1]) if len(args) > 1 else 96, args[2] if len(args) > 2 else "zlib")
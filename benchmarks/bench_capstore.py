@@ -0,0 +1,53 @@
+# benchmarks/bench_capstore.py
+"""
+Cap-state throughput with a large fleet: lookups and check-and-add per second.
+
+Usage: python benchmarks/bench_capstore.py [devices] [ops] [sqlite_path]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from carbon_smart_meter.core.capstore import MemoryCapStore, SQLiteCapStore
+
+DAY = 1_700_000_000 // 86400
+
+
+def populate(store, devices: int, chunk: int = 100_000) -> float:
+    start = time.perf_counter()
+    for first in range(0, devices, chunk):
+        ids = [n.to_bytes(32, "little") for n in range(first, min(first + chunk, devices))]
+        store.apply_batch(ids, np.full(len(ids), DAY * 86400), np.full(len(ids), 0.001))
+    return time.perf_counter() - start
+
+
+def run(label: str, store, devices: int, ops: int) -> None:
+    load = populate(store, devices)
+    sample = [random.randrange(devices).to_bytes(32, "little") for _ in range(ops)]
+
+    start = time.perf_counter()
+    for device_id in sample:
+        store.get((device_id, DAY))
+    lookups = ops / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for device_id in sample:
+        store.check_and_add(device_id, DAY, 0.0001)
+    adds = ops / (time.perf_counter() - start)
+
+    print(f"{label:<8} load {devices / load:>10,.0f} dev/s  get {lookups:>10,.0f}/s  check_and_add {adds:>10,.0f}/s")
+
+
+if __name__ == "__main__":
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    path = sys.argv[3] if len(sys.argv) > 3 else os.path.join(tempfile.mkdtemp(), "caps.db")
+
+    print(f"{devices:,} devices, {ops:,} random operations")
+    run("memory", MemoryCapStore(), devices, ops)
+    run("sqlite", SQLiteCapStore(path), devices, ops)
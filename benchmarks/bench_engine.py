@@ -0,0 +1,62 @@
+# benchmarks/bench_engine.py
+"""
+Sharded ingestion scaling: packets/s with 1..N worker processes.
+
+Usage: python benchmarks/bench_engine.py [frames] [max_workers] [devices]
+"""
+
+import os
+import struct
+import sys
+import time
+
+from nacl.signing import SigningKey
+
+from carbon_smart_meter.core.clients import ClientRegistry
+from carbon_smart_meter.core.engine import ShardedIngestEngine
+from carbon_smart_meter.core.mining import EnergyProcessor
+from carbon_smart_meter.core.wire import pack_frame
+
+SIGNING_KEY = SigningKey.generate()
+PUBLIC_KEY = SIGNING_KEY.verify_key.encode()
+
+
+def lookup(device_id: bytes) -> bytes:
+    return PUBLIC_KEY
+
+
+def local_processor() -> EnergyProcessor:
+    return EnergyProcessor(user_region="EU", clients=ClientRegistry.local())
+
+
+def make_frames(count: int, devices: int):
+    frames = []
+    for n in range(count):
+        device_id = (n % devices).to_bytes(32, "little")
+        timestamp = 1_700_000_000 + n // devices
+        payload = device_id + struct.pack("<fffq", 18.0, 2.5, 7.2, timestamp)
+        frames.append(pack_frame(device_id, 18.0, 2.5, 7.2, timestamp, SIGNING_KEY.sign(payload).signature))
+    return frames
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    devices = int(sys.argv[3]) if len(sys.argv) > 3 else 1_000
+
+    frames = make_frames(count, devices)
+    print(f"{count:,} frames, {devices:,} devices, {os.cpu_count()} CPUs")
+
+    baseline = None
+    workers = 1
+    while workers <= max_workers:
+        with ShardedIngestEngine(lookup, workers=workers, processor_factory=local_processor) as engine:
+            start = time.perf_counter()
+            for frame in frames:
+                engine.submit(frame)
+            accepted = sum(result.accepted for result in engine.results())
+            elapsed = time.perf_counter() - start
+        rate = count / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>3} workers  {rate:>10,.0f} packets/s  x{rate / baseline:4.2f}  accepted {accepted:,}")
+        workers *= 2
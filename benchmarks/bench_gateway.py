@@ -0,0 +1,67 @@
+# benchmarks/bench_gateway.py
+"""
+Gateway intake: 100+ per-panel signatures vs one attested Merkle root per batch.
+
+Usage: python benchmarks/bench_gateway.py [panels] [batches]
+"""
+
+import struct
+import sys
+import time
+
+from nacl.signing import SigningKey
+
+from carbon_smart_meter.core.gateway import (
+    GatewayBatch, GatewayRegistry, build_gateway_batch, pack_sample, verify_gateway_batch, verify_inclusion_proof,
+)
+from carbon_smart_meter.core.mining import VerifyKeyCache
+from carbon_smart_meter.core.wire import FrameBatch, pack_frame, verify_frames
+
+T0 = 1_700_000_000
+
+
+def timed(label: str, samples: int, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed / samples * 1e6:8.2f} us/sample")
+
+
+if __name__ == "__main__":
+    panels = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    batches = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    panel_keys = [SigningKey.generate() for _ in range(panels)]
+    panel_ids = [bytes([i % 256, i // 256]) * 16 for i in range(panels)]
+    gateway_key, gateway_id = SigningKey.generate(), b"G" * 32
+
+    frame_batches, gateway_batches = [], []
+    for b in range(batches):
+        frames = []
+        for device_id, key in zip(panel_ids, panel_keys):
+            payload = device_id + struct.pack("<fffq", 18.0, 2.5, 7.2, T0 + b)
+            frames.append(pack_frame(device_id, 18.0, 2.5, 7.2, T0 + b, key.sign(payload).signature))
+        frame_batches.append(FrameBatch(b"".join(frames)))
+        samples = [pack_sample(device_id, 18.0, 2.5, 7.2, T0 + b) for device_id in panel_ids]
+        gateway_batches.append(build_gateway_batch(gateway_key, gateway_id, b, samples))
+
+    keys = {device_id: key.verify_key.encode() for device_id, key in zip(panel_ids, panel_keys)}
+    registry = GatewayRegistry()
+    registry.register(gateway_id, gateway_key.verify_key.encode(), panel_ids)
+    cache = VerifyKeyCache()
+    total = panels * batches
+
+    print(f"{batches} batches x {panels} panels")
+    timed("per-panel signatures (verify_frames)", total,
+          lambda: [verify_frames(batch, keys.get, cache) for batch in frame_batches])
+    timed("gateway attestation (parse + verify)", total,
+          lambda: [verify_gateway_batch(GatewayBatch(data), registry, cache) for data in gateway_batches])
+
+    batch = GatewayBatch(gateway_batches[0])
+    start = time.perf_counter()
+    proofs = [batch.proof(i) for i in range(panels)]
+    built = (time.perf_counter() - start) / panels
+    start = time.perf_counter()
+    assert all(verify_inclusion_proof(proof, gateway_key.verify_key.encode()) for proof in proofs)
+    checked = (time.perf_counter() - start) / panels
+    print(f"inclusion proof: {len(proofs[0].path)} hashes, build {built * 1e6:.1f} us, check {checked * 1e6:.1f} us")
+    print(f"wire size: {len(gateway_batches[0]) / panels:.1f} B/sample vs {len(frame_batches[0].view) / panels:.0f} B/frame")
@@ -0,0 +1,62 @@
+# benchmarks/bench_grid.py
+"""
+Grid-intensity lookup cost: static dict, hourly series (scalar) and the vectorised batch form.
+
+Usage: python benchmarks/bench_grid.py [samples]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from carbon_smart_meter.core.grid import GridIntensityTable
+from carbon_smart_meter.core.offset import GLOBAL_AVG_CO2_PER_KWH, GRID_INTENSITY
+
+T0 = 1_704_067_200
+HOURS = 24 * 365
+
+
+def main(n: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "grid.csv")
+        rng = np.random.default_rng(0)
+        with open(path, "w") as f:
+            f.write("region,start,intensity\n")
+            for region in ("EU", "SG", "IN"):
+                for h, value in enumerate(rng.uniform(0.1, 0.8, HOURS)):
+                    f.write(f"{region},{T0 + h * 3600},{value:.4f}\n")
+
+        start = time.perf_counter()
+        GridIntensityTable.from_csv(path)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        table = GridIntensityTable.from_csv(path)
+        mapped = time.perf_counter() - start
+
+        timestamps = rng.integers(T0, T0 + HOURS * 3600, n)
+        kwh = rng.uniform(0, 0.001, n)
+        ts_list = timestamps.tolist()
+
+        start = time.perf_counter()
+        for k in kwh.tolist():
+            round(k * GRID_INTENSITY.get("eu".upper(), GLOBAL_AVG_CO2_PER_KWH), 6)
+        static_us = (time.perf_counter() - start) / n * 1e6
+
+        start = time.perf_counter()
+        for k, t in zip(kwh.tolist(), ts_list):
+            round(k * table.intensity("eu", t), 6)
+        scalar_us = (time.perf_counter() - start) / n * 1e6
+
+        start = time.perf_counter()
+        table.co2_avoided(kwh, timestamps, "eu")
+        vector_us = (time.perf_counter() - start) / n * 1e6
+
+    print(f"cache build {build * 1e3:.0f} ms, mmap open {mapped * 1e3:.1f} ms ({3 * HOURS:,} hourly rows)")
+    print(f"static dict {static_us:.3f} µs   hourly scalar {scalar_us:.3f} µs   hourly batch {vector_us:.3f} µs per record")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
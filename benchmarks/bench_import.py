@@ -0,0 +1,39 @@
+# benchmarks/bench_import.py
+"""
+Cold-start cost: importing the core modules with lazy clients vs building them eagerly.
+
+"eager" reproduces the old import-time behaviour (Azure credential discovery,
+BlobServiceClient, S3 clients) by warming the shared registry right after import.
+
+Usage: python benchmarks/bench_import.py [runs]
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT = (
+    "import carbon_smart_meter.core.mining, carbon_smart_meter.core.offset, "
+    "carbon_smart_meter.core.registration"
+)
+EAGER = IMPORT + "; from carbon_smart_meter.core.clients import get_clients; get_clients().warm()"
+
+
+def cold_start(code: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    lazy = cold_start(IMPORT, runs)
+    eager = cold_start(EAGER, runs)
+    print(f"lazy import   {lazy * 1e3:8.1f} ms (median of {runs})")
+    print(f"eager clients {eager * 1e3:8.1f} ms (median of {runs})")
+    print(f"saved         {(eager - lazy) * 1e3:8.1f} ms per process start")
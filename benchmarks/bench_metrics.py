@@ -0,0 +1,70 @@
+# benchmarks/bench_metrics.py
+"""
+Instrumentation overhead: the ingest hot path with metrics disabled vs. enabled.
+
+Runs signed frames through EnergyProcessor.process_frames (verify, kWh conversion,
+cap accounting, storage into an in-memory DB) and times vir_to_kwh alone, with
+the registry off and on, then prints the exported Prometheus text.
+
+Usage: python benchmarks/bench_metrics.py [frames] [rounds]
+"""
+
+import struct
+import sys
+import time
+
+from nacl.signing import SigningKey
+
+from carbon_smart_meter.core.metrics import metrics
+from carbon_smart_meter.core.mining import EnergyProcessor, vir_to_kwh
+from carbon_smart_meter.core.wire import pack_frame
+
+
+class MemoryDB:
+    def insert(self, reading):
+        pass
+
+
+def make_frames(n):
+    keys = {}
+    frames = []
+    for i in range(n):
+        device_id = (i % 500).to_bytes(32, "big")
+        signing_key = keys.setdefault(device_id, SigningKey.generate())
+        payload = device_id + struct.pack("<fffq", 12.0, 1.0, 12.0, 1_700_000_000 + i)
+        frames.append(pack_frame(device_id, 12.0, 1.0, 12.0, 1_700_000_000 + i, signing_key.sign(payload).signature))
+    lookup = {device_id: key.verify_key.encode() for device_id, key in keys.items()}
+    return b"".join(frames), lookup.get
+
+
+def time_ingest(buffer, key_lookup, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        processor = EnergyProcessor(user_region="EU")
+        processor.db = MemoryDB()
+        start = time.perf_counter()
+        processor.process_frames(buffer, key_lookup)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_convert(n):
+    start = time.perf_counter()
+    for _ in range(n):
+        vir_to_kwh(12.0, 1.0, 1.0)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    buffer, key_lookup = make_frames(n)
+
+    for label, enabled in (("disabled", False), ("enabled", True)):
+        metrics.enabled = enabled
+        ingest = time_ingest(buffer, key_lookup, rounds)
+        convert = time_convert(1_000_000)
+        print(f"metrics {label:<9} ingest {ingest / n * 1e6:6.2f} µs/frame   vir_to_kwh {convert * 1e3:6.1f} ns/call")
+
+    print()
+    print("\n".join(line for line in metrics.render().splitlines() if not line.startswith("#") and "_bucket" not in line))
@@ -0,0 +1,59 @@
+# benchmarks/bench_offset_index.py
+"""
+OffsetIndex update and range-query cost vs. scanning every stored record.
+
+Usage: python benchmarks/bench_offset_index.py [records] [wallets]
+"""
+
+import random
+import sys
+import time
+
+from carbon_smart_meter.core.offset import OffsetRecord
+from carbon_smart_meter.core.offset_index import OffsetIndex, day_of
+
+DAY = 86400
+T0 = 20_000 * DAY
+
+
+def main(n: int, wallets: int):
+    rng = random.Random(1)
+    records = [
+        OffsetRecord(
+            device_id=rng.randrange(wallets * 4).to_bytes(32, "big"),
+            wallet_address=f"w{rng.randrange(wallets)}",
+            kwh=0.01, co2_kg=0.003, region="EU",
+            timestamp=T0 + rng.randrange(365 * DAY),
+        )
+        for _ in range(n)
+    ]
+
+    index = OffsetIndex()
+    start = time.perf_counter()
+    index.add_many(records)
+    add_us = (time.perf_counter() - start) / n * 1e6
+
+    now = T0 + 364 * DAY
+    queries = [f"w{i}" for i in range(min(wallets, 1000))]
+    start = time.perf_counter()
+    for wallet in queries:
+        index.last_days("wallet", wallet, 30, now=now)
+    query_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+    first = day_of(now) - 29
+    start = time.perf_counter()
+    sum(r.co2_kg for r in records if r.wallet_address == "w0" and day_of(r.timestamp) >= first)
+    scan_us = (time.perf_counter() - start) * 1e6
+
+    start = time.perf_counter()
+    index.top("wallet", 10, first, day_of(now))
+    top_ms = (time.perf_counter() - start) * 1e3
+
+    print(f"{n:,} records, {wallets:,} wallets")
+    print(f"add: {add_us:.2f} µs/record   wallet 30-day query: {query_us:.1f} µs   full scan: {scan_us:,.0f} µs")
+    print(f"30-day top-10 wallets: {top_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [200_000, 10_000][len(args):]))
@@ -0,0 +1,186 @@
+# benchmarks/bench_pipeline.py
+"""
+End-to-end pipeline benchmark over a synthetic fleet (see fleet.py).
+
+Drives registration → mining → offset → submission against the in-process
+stand-ins for S3, Azure Blob and Solana RPC (ClientRegistry.local()), and reports
+per stage: operations, ops/s, p50/p99 latency and memory (peak RSS growth; with
+--trace-memory also tracemalloc retained/peak, which slows every stage down).
+
+Packets are generated and signed before timing starts. Everything is seeded,
+so two runs with the same arguments replay the same fleet and packets.
+
+Usage: python benchmarks/bench_pipeline.py [--devices N] [--seconds N] [--batch N]
+                                           [--submit-batch N] [--write-behind]
+                                           [--trace-memory] [--json PATH]
+"""
+
+import argparse
+import hashlib
+import json
+import resource
+import time
+import tracemalloc
+from collections import defaultdict
+
+from fleet import daytime_start, make_fleet, packet_stream, registration_request
+
+from carbon_smart_meter.blockchain.batching import BatchSubmitter, KwhRecord, device_message
+from carbon_smart_meter.core.clients import ClientRegistry
+from carbon_smart_meter.core.keys import DeviceKeyResolver
+from carbon_smart_meter.core.mining import EnergyProcessor, SecureEnergyDB
+from carbon_smart_meter.core.offset import OffsetEngine, SecureOffsetDB
+from carbon_smart_meter.core.registration import RegistrationManager, SecureRegistrationDB
+
+
+class LocalBatchSubmitter(BatchSubmitter):
+    """BatchSubmitter whose 'transaction' is the instruction data, for the local RPC stand-in."""
+
+    def build_transaction(self, batch, data, blockhash):
+        return blockhash, data
+
+
+# === MEASUREMENT ===
+def max_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Stage:
+    def __init__(self, name: str, trace_memory: bool):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.latencies = []
+        self.ops = 0
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self.rss = max_rss_kb()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        self.rss_kb = max_rss_kb() - self.rss
+        if self.trace_memory:
+            self.traced, self.traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    def timed(self, fn, *args, ops: int = 1):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.latencies.append(time.perf_counter() - start)
+        self.ops += ops
+        return result
+
+    def report(self) -> dict:
+        lat = sorted(self.latencies)
+        pick = lambda q: lat[min(len(lat) - 1, int(len(lat) * q))] if lat else 0.0
+        row = {
+            "stage": self.name,
+            "ops": self.ops,
+            "ops_per_sec": self.ops / self.seconds if self.seconds else 0.0,
+            "p50_ms": pick(0.50) * 1e3,
+            "p99_ms": pick(0.99) * 1e3,
+            "peak_rss_growth_kb": self.rss_kb,
+        }
+        if self.trace_memory:
+            row["traced_retained_kb"] = self.traced / 1024
+            row["traced_peak_kb"] = self.traced_peak / 1024
+        return row
+
+
+# === PIPELINE ===
+def run(args) -> list:
+    fleet = make_fleet(args.devices, seed=args.seed)
+    start_ts = daytime_start(fleet)
+    stream = list(packet_stream(fleet, start_ts, args.seconds, seed=args.seed))
+    by_device = {device.device_id: device for device in fleet}
+
+    clients = ClientRegistry.local()
+    reg_db = SecureRegistrationDB("EU", clients=clients, write_behind=args.write_behind)
+    resolver = DeviceKeyResolver(reg_db)
+    manager = RegistrationManager(reg_db, resolver)
+    processor = EnergyProcessor(user_region="EU", clients=clients, resolver=resolver)
+    processor.db = SecureEnergyDB("EU", clients=clients, write_behind=args.write_behind)
+    engine = OffsetEngine(SecureOffsetDB("EU", clients=clients, write_behind=args.write_behind), resolver=resolver)
+    submitter = LocalBatchSubmitter(clients=clients, resolver=resolver)
+    results = []
+
+    with Stage("register", args.trace_memory) as stage:
+        requests = [registration_request(device) for device in fleet]
+        for request in requests:
+            stage.timed(manager.register_device, request)
+        reg_db.flush()
+    results.append(stage.report())
+
+    readings = []
+    with Stage("mine", args.trace_memory) as stage:
+        packets = [packet for _, packet in stream]
+        if args.batch > 1:
+            for i in range(0, len(packets), args.batch):
+                chunk = packets[i:i + args.batch]
+                readings += stage.timed(processor.process_batch, chunk, ops=len(chunk))
+        else:
+            for packet in packets:
+                readings.append(stage.timed(processor.process_packet, packet))
+        processor.db.flush()
+    results.append(stage.report())
+    accepted = [reading for reading in readings if reading is not None]
+
+    with Stage("offset", args.trace_memory) as stage:
+        for reading in accepted:
+            stage.timed(
+                engine.process_verified_reading,
+                reading.device_id, None, reading.kwh, reading.timestamp, by_device[reading.device_id].region,
+            )
+        engine.db.flush()
+    results.append(stage.report())
+
+    milli_kwh = defaultdict(float)
+    for reading in accepted:
+        milli_kwh[reading.device_id] += reading.kwh * 1000
+    records = []
+    for device_id, total in milli_kwh.items():
+        device = by_device[device_id]
+        wallet = hashlib.sha256(device.wallet.encode()).digest()    # stand-in 32-byte owner pubkey
+        signature = device.signing_key.sign(device_message(device_id, wallet)).signature
+        records.append(KwhRecord(device_id, device.public_key, max(1, round(total)), signature, wallet))
+    with Stage("submit", args.trace_memory) as stage:
+        for i in range(0, len(records), args.submit_batch):
+            chunk = records[i:i + args.submit_batch]
+            stage.timed(submitter.submit_batch, chunk, ops=len(chunk))
+    submitter.close()
+    results.append(stage.report())
+
+    for db in (reg_db, processor.db, engine.db):
+        db.close()
+    print(f"{len(fleet):,} devices, {len(stream):,} packets over {args.seconds} s from {start_ts}, "
+          f"{len(accepted):,} accepted, {len(clients.rpc.transactions):,} transactions")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--seconds", type=int, default=10, help="Seconds of 1 Hz samples per device")
+    parser.add_argument("--batch", type=int, default=1, help=">1 = EnergyProcessor.process_batch in chunks")
+    parser.add_argument("--submit-batch", type=int, default=256, help="Records per submit_batch call")
+    parser.add_argument("--write-behind", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--seed", default="ccm-fleet")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    rows = run(args)
+    print(f"{'stage':<10} {'ops':>9} {'ops/s':>11} {'p50 ms':>9} {'p99 ms':>9} {'ΔRSS KiB':>10}"
+          + (f" {'kept KiB':>10} {'peak KiB':>10}" if args.trace_memory else ""))
+    for row in rows:
+        line = (f"{row['stage']:<10} {row['ops']:>9,} {row['ops_per_sec']:>11,.0f} "
+                f"{row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['peak_rss_growth_kb']:>10,}")
+        if args.trace_memory:
+            line += f" {row['traced_retained_kb']:>10,.0f} {row['traced_peak_kb']:>10,.0f}"
+        print(line)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "stages": rows}, f, indent=2)
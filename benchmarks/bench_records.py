@@ -0,0 +1,70 @@
+# benchmarks/bench_records.py
+"""
+Per-sample memory and allocations: pydantic models vs. interior records.
+
+Holds N readings + offset records (as a window/batch would) from D devices and
+reports retained bytes and live allocated blocks per sample (tracemalloc), plus
+construction time.
+
+Usage: python benchmarks/bench_records.py [samples] [devices]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from carbon_smart_meter.core.mining import EnergyReading
+from carbon_smart_meter.core.offset import OffsetRecord
+from carbon_smart_meter.core.records import Offset, Reading, intern_device_id
+
+
+def pydantic_path(wire_ids, n):
+    out = []
+    for i in range(n):
+        device_id = bytes(wire_ids[i % len(wire_ids)])      # fresh bytes per frame, as parsed off the wire
+        reading = EnergyReading(
+            device_id=device_id, kwh=0.0001, timestamp=1_700_000_000 + i,
+            verified=True, cable_type="type-c", user_region="EU"
+        )
+        offset = OffsetRecord(
+            device_id=device_id, wallet_address="wallet", kwh=reading.kwh,
+            co2_kg=0.00003, region="EU", timestamp=reading.timestamp
+        )
+        out.append((reading, offset))
+    return out
+
+
+def record_path(wire_ids, n):
+    out = []
+    for i in range(n):
+        device_id = intern_device_id(bytes(wire_ids[i % len(wire_ids)]))
+        reading = Reading(device_id, 0.0001, 1_700_000_000 + i, True, "type-c", "EU")
+        offset = Offset(device_id, "wallet", reading.kwh, 0.00003, "EU", reading.timestamp)
+        out.append((reading, offset))
+    return out
+
+
+def measure(label, build, wire_ids, n):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    held = build(wire_ids, n)
+    elapsed = time.perf_counter() - start
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    size = sum(s.size_diff for s in stats)
+    blocks = sum(s.count_diff for s in stats)
+    print(f"{label:<22} {size / n:7.0f} B/sample  {blocks / n:5.1f} live blocks/sample  {elapsed / n * 1e6:6.2f} µs/sample")
+    return held
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    devices = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    wire_ids = [i.to_bytes(32, "big") for i in range(devices)]
+    measure("pydantic models", pydantic_path, wire_ids, n)
+    measure("interior records", record_path, wire_ids, n)
@@ -0,0 +1,62 @@
+# benchmarks/bench_registration.py
+"""
+Registration latency vs fleet size: indexed BindingIndex vs the old linear scan.
+
+Usage: python benchmarks/bench_registration.py [max_devices]
+
+Signature checks are excluded: only the uniqueness checks + insert are timed.
+"""
+
+import sys
+import time
+
+from carbon_smart_meter.core.registration import BindingIndex, DeviceBinding
+
+
+def _binding(i: int) -> DeviceBinding:
+    return DeviceBinding(
+        device_id=i.to_bytes(32, "big"),
+        public_key=(i + 1 << 8).to_bytes(32, "big"),
+        wallet_address=f"wallet-{i}",
+        registered_at=0,
+    )
+
+
+def _linear_insert(bindings: dict, binding: DeviceBinding) -> bool:
+    """The previous MockRegistrationDB checks."""
+    if binding.device_id in bindings:
+        return False
+    if any(b.public_key == binding.public_key for b in bindings.values()):
+        return False
+    bindings[binding.device_id] = binding
+    return True
+
+
+def bench(size: int, probes: int = 1000):
+    index, plain = BindingIndex(), {}
+    for i in range(size):
+        index.put(_binding(i))
+        if size <= 100_000:
+            plain[_binding(i).device_id] = _binding(i)
+
+    new = [_binding(size + i) for i in range(probes)]
+    start = time.perf_counter()
+    for binding in new:
+        index.add_if_absent(binding)
+    indexed_us = (time.perf_counter() - start) / probes * 1e6
+
+    linear_us = float("nan")
+    if plain:
+        start = time.perf_counter()
+        for binding in new[:20]:
+            _linear_insert(plain, binding)
+        linear_us = (time.perf_counter() - start) / 20 * 1e6
+    print(f"{size:>10,} devices: indexed {indexed_us:7.2f} µs/insert   linear {linear_us:10.1f} µs/insert")
+
+
+if __name__ == "__main__":
+    max_devices = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    size = 1_000
+    while size <= max_devices:
+        bench(size)
+        size *= 10
@@ -0,0 +1,49 @@
+# benchmarks/bench_replay.py
+"""
+Replay throughput against an S3 stand-in with simulated GET latency,
+sequential GETs vs. the concurrent bounded window.
+
+Usage: python benchmarks/bench_replay.py [objects] [get_latency_ms]
+"""
+
+import sys
+import time
+
+from carbon_smart_meter.core.clients import ClientRegistry
+from carbon_smart_meter.core.local import LocalS3
+from carbon_smart_meter.core.mining import EnergyReading, SecureEnergyDB
+from carbon_smart_meter.core.offset import OffsetEngine, SecureOffsetDB
+from carbon_smart_meter.core.replay import ReplayJob
+
+
+class SlowS3(LocalS3):
+    latency = 0.005
+
+    def get_object(self, **kwargs):
+        time.sleep(self.latency)
+        return super().get_object(**kwargs)
+
+
+def main(objects: int, latency_ms: float):
+    s3 = SlowS3()
+    SlowS3.latency = latency_ms / 1000
+    clients = ClientRegistry.local()
+    clients._s3_factory = lambda region: s3
+    source = SecureEnergyDB("EU", clients=clients)
+    for i in range(objects):
+        source.insert(EnergyReading(
+            device_id=(b"%04d" % (i % 500)) * 8, kwh=0.001, timestamp=1_700_000_000 + i,
+            verified=True, cable_type="type-c", user_region="EU"
+        ))
+
+    for workers in (1, 16, 64):
+        engine = OffsetEngine(SecureOffsetDB("EU", clients=ClientRegistry.local()))
+        stats = ReplayJob(source, engine, "EU", workers=workers, max_inflight=workers * 4,
+                          wallet_lookup=lambda d: "w").run()
+        print(f"workers={workers:>3}: {stats['records_per_sec']:>9,.0f} records/s ({stats['seconds']:.2f} s)")
+
+
+if __name__ == "__main__":
+    args = [float(a) for a in sys.argv[1:]]
+    objects, latency = (args + [2000, 5.0][len(args):])
+    main(int(objects), latency)
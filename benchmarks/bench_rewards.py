@@ -0,0 +1,47 @@
+# benchmarks/bench_rewards.py
+"""
+Reward projection: NumPy batch mode vs the exact scalar engine.
+
+Projects one record per device-day for a fleet over several years (crossing
+halving epochs) under a few market-cap scenarios.
+
+Usage: python benchmarks/bench_rewards.py [devices] [days]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from carbon_smart_meter.blockchain.rewards import HALVING_INTERVAL, RewardEngine, project_rewards
+
+GENESIS = 1_717_200_000
+SCENARIOS = np.array([[0], [400_000_000_000], [1_000_000_000_000], [5_000_000_000_000]], dtype=np.uint64)
+
+
+if __name__ == "__main__":
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    rng = np.random.default_rng(7)
+
+    rows = devices * days
+    timestamps = GENESIS + np.repeat(np.arange(days, dtype=np.int64) * 86_400, devices) + 43_200
+    kwh = rng.integers(0, 2_000, rows, dtype=np.uint64)       # milli-kWh per device-day; some over the cap
+    print(f"{rows:,} device-days x {len(SCENARIOS)} market-cap scenarios, "
+          f"{(timestamps[-1] - GENESIS) // HALVING_INTERVAL + 1} halving epochs")
+
+    start = time.perf_counter()
+    rewards = project_rewards(kwh, timestamps, SCENARIOS, GENESIS)
+    vector = time.perf_counter() - start
+    print(f"numpy      {vector:7.2f} s   {rows * len(SCENARIOS) / vector / 1e6:7.1f} M device-days/s")
+
+    sample = 100_000
+    engine = RewardEngine(genesis_timestamp=GENESIS)
+    start = time.perf_counter()
+    for i in range(sample):
+        engine.apply_batch([(i, int(kwh[i]))], int(timestamps[i]), int(SCENARIOS[1, 0]))
+    scalar = time.perf_counter() - start
+    print(f"scalar     {scalar / sample * rows * len(SCENARIOS):7.1f} s   {sample / scalar / 1e6:7.2f} M device-days/s (extrapolated)")
+
+    for scenario, total in zip(SCENARIOS[:, 0], rewards.sum(axis=1, dtype=np.uint64)):
+        print(f"market cap {int(scenario):>16,}: {int(total) / 1e8:,.0f} CARBON")
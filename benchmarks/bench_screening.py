@@ -0,0 +1,64 @@
+# benchmarks/bench_screening.py
+"""
+Plausibility screen cost and accuracy on the simulated fleet: µs per sample
+screened as a batch (one tick of the fleet) vs one by one, false quarantines on
+clean solar data, and how many injected night / over-rated samples are caught.
+
+Usage: python benchmarks/bench_screening.py [devices] [hours]
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+
+from fleet import START_TS, make_fleet, solar_vi
+
+from carbon_smart_meter.core.screening import NIGHT, OVER_RATED, QUARANTINE, PlausibilityScreen
+
+INTERVAL = 60
+
+
+if __name__ == "__main__":
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    hours = int(sys.argv[2]) if len(sys.argv) > 2 else 48
+    fleet = make_fleet(devices)
+    ids = [device.device_id for device in fleet]
+    rng = random.Random(1)
+
+    ticks = []
+    for ts in range(START_TS, START_TS + hours * 3600, INTERVAL):
+        vir = np.array([solar_vi(device, ts, rng) for device in fleet]).T
+        ticks.append((ts, vir))
+    samples = len(ticks) * devices
+
+    screen = PlausibilityScreen(clock=lambda: START_TS + hours * 3600)
+    quarantined = 0
+    start = time.perf_counter()
+    for ts, (v, i, r) in ticks:
+        quarantined += np.count_nonzero(screen.screen(ids, v, i, r, np.full(devices, ts)) & QUARANTINE)
+    batched = (time.perf_counter() - start) / samples
+
+    single = PlausibilityScreen(clock=lambda: START_TS + hours * 3600)
+    subset = ticks[:max(1, 20_000 // devices)]
+    start = time.perf_counter()
+    for ts, (v, i, r) in subset:
+        for n, device_id in enumerate(ids):
+            single.screen_one(device_id, v[n], i[n], r[n], ts)
+    one_by_one = (time.perf_counter() - start) / (len(subset) * devices)
+
+    # Attacks after the diurnal warm-up: 60 W at local midnight, or 150 W at local noon
+    night_hits = over_hits = 0
+    end = START_TS + hours * 3600
+    for device in fleet:
+        midnight = end + int(((0 - device.utc_offset) % 24) * 3600)
+        night_hits += bool(screen.screen_one(device.device_id, 15.0, 4.0, 3.75, midnight) & NIGHT)
+        over_hits += bool(screen.screen_one(device.device_id, 30.0, 5.0, 6.0, midnight + 43_200) & OVER_RATED)
+
+    print(f"{devices:,} devices x {hours} h at {INTERVAL} s  ({samples:,} samples)")
+    print(f"batch screen          {batched * 1e6:7.2f} µs/sample")
+    print(f"one-by-one screen     {one_by_one * 1e6:7.2f} µs/sample")
+    print(f"false quarantines     {quarantined:,} of {samples:,} clean samples")
+    print(f"night injections      {night_hits:,} / {devices:,} caught")
+    print(f"over-rated injections {over_hits:,} / {devices:,} caught")
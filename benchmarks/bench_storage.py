@@ -0,0 +1,69 @@
+# benchmarks/bench_storage.py
+"""
+Insert latency: synchronous AWS + Azure writes vs the write-behind pipeline.
+
+Both legs are local stand-ins with an artificial round-trip delay.
+
+Usage: python benchmarks/bench_storage.py [readings] [round_trip_ms]
+"""
+
+import sys
+import time
+
+from carbon_smart_meter.core.local import LocalBlobServiceClient, LocalS3
+from carbon_smart_meter.core.mining import EnergyReading, SecureEnergyDB
+
+
+class SlowS3(LocalS3):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def put_object(self, **kwargs):
+        time.sleep(self.delay)
+        return super().put_object(**kwargs)
+
+
+class SlowBlobService(LocalBlobServiceClient):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def get_blob_client(self, container: str, blob: str):
+        time.sleep(self.delay)
+        return super().get_blob_client(container, blob)
+
+
+def run(readings: int, delay: float, write_behind: bool) -> None:
+    db = SecureEnergyDB(user_region="EU", write_behind=write_behind)
+    db.s3 = SlowS3(delay)
+    db.blob_service = SlowBlobService(delay)
+
+    latencies = []
+    start = time.perf_counter()
+    for n in range(readings):
+        reading = EnergyReading(
+            device_id=(n % 100).to_bytes(32, "little"), kwh=0.0000125,
+            timestamp=1_700_000_000 + n // 100, verified=True,
+            cable_type="type-c", user_region="EU"
+        )
+        t0 = time.perf_counter()
+        db.insert(reading)
+        latencies.append(time.perf_counter() - t0)
+    db.close()
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e3
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e3
+    objects = len(db.s3.objects.get(db.aws_bucket, {}))
+    label = "write-behind" if write_behind else "synchronous"
+    print(f"{label:<13} p50 {p50:8.3f} ms  p99 {p99:8.3f} ms  total {total:6.2f} s  objects {objects}")
+
+
+if __name__ == "__main__":
+    readings = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 5.0) / 1e3
+
+    run(readings, delay, write_behind=False)
+    run(readings, delay, write_behind=True)
@@ -0,0 +1,84 @@
+# benchmarks/bench_submission.py
+"""
+Submission queue under an RPC brownout: confirmed device-days per second and
+queue memory while a share of sends fail and the rest are slow.
+
+The local Solana stand-in is wrapped so each send sleeps `latency` seconds and
+fails with probability `failure_rate`; the queue's clock is real time.
+
+Usage: python benchmarks/bench_submission.py [devices] [failure_rate] [latency_ms]
+"""
+
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from nacl.signing import SigningKey
+
+from carbon_smart_meter.blockchain.batching import BatchSubmitter, decode_batch
+from carbon_smart_meter.blockchain.submission import SubmissionQueue
+from carbon_smart_meter.core.clients import ClientRegistry
+from carbon_smart_meter.core.local import LocalSolanaClient
+
+
+class RawSubmitter(BatchSubmitter):
+    def build_transaction(self, batch, data, blockhash):
+        return blockhash, data
+
+
+class BrownoutRPC(LocalSolanaClient):
+    def __init__(self, failure_rate: float, latency: float):
+        super().__init__()
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.rng = random.Random(7)
+        self.failures = 0
+
+    def send_transaction(self, tx, *signers, **kwargs):
+        time.sleep(self.latency)
+        if self.rng.random() < self.failure_rate:
+            self.failures += 1
+            raise ConnectionError("503 Service Unavailable")
+        return super().send_transaction(tx, *signers, **kwargs)
+
+
+def main(devices: int, failure_rate: float, latency: float):
+    signing_key = SigningKey.generate()
+    public_key = signing_key.verify_key.encode()
+    ids = [i.to_bytes(32, "big") for i in range(devices)]
+    items = [(d, public_key, signing_key.sign(d).signature, int(time.time() // 86400), 750) for d in ids]
+
+    rpc = BrownoutRPC(failure_rate, latency)
+    submitter = RawSubmitter(clients=ClientRegistry(credential=object(), rpc=rpc), max_inflight=8)
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        queue = SubmissionQueue(os.path.join(tmp, "submit.log"), submitter, fsync=True)
+        start = time.perf_counter()
+        queue.enqueue_many(items)
+        drained = queue.drain(timeout=600, interval=0.05)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        log_bytes = os.path.getsize(queue.path)
+        queue.close()
+    submitter.close()
+
+    sent = sum(kwh for _, data in rpc.transactions for _, kwh, _ in decode_batch(data)[0])
+    print(f"{devices:,} devices, failure rate {failure_rate:.0%}, {latency * 1e3:.0f} ms per send")
+    print(f"drained      {drained}  in {elapsed:.2f} s  → {devices / elapsed:,.0f} device-days/s")
+    print(f"sends        {len(rpc.transactions):,} ok, {rpc.failures:,} failed; stats {queue.stats}")
+    print(f"exactly-once {sent == 750 * devices}  ({sent:,} milli-kWh sent)")
+    print(f"memory       {peak / devices:,.0f} B/device peak (traced), log {log_bytes / 1024:,.0f} KiB")
+
+
+if __name__ == "__main__":
+    logging.getLogger("carbon_smart_meter").setLevel(logging.ERROR)     # one warning per failed send otherwise
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5_000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.3,
+        (float(sys.argv[3]) if len(sys.argv) > 3 else 50) / 1000,
+    )
@@ -0,0 +1,56 @@
+# benchmarks/bench_verify.py
+"""
+Ed25519 verification throughput: per-packet verify_packet vs EnergyProcessor batch path.
+
+Usage: python benchmarks/bench_verify.py [devices] [samples_per_device] [workers]
+"""
+
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nacl.signing import SigningKey
+
+from carbon_smart_meter.core.mining import VIRPacket, VerifyKeyCache, verify_batch, verify_packet
+
+
+def make_packets(devices: int, samples: int):
+    keys = {}
+    packets = []
+    for n in range(devices):
+        signing_key = SigningKey.generate()
+        device_id = n.to_bytes(32, "little")
+        keys[device_id] = signing_key.verify_key.encode()
+        for t in range(samples):
+            timestamp = 1_700_000_000 + t
+            payload = device_id + struct.pack("<fffq", 18.0, 2.5, 7.2, timestamp)
+            packets.append(VIRPacket(
+                device_id=device_id, voltage=18.0, current=2.5, resistance=7.2,
+                timestamp=timestamp, signature=signing_key.sign(payload).signature
+            ))
+    return packets, keys
+
+
+def rate(label: str, count: int, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {count / elapsed:>12,.0f} packets/s")
+
+
+if __name__ == "__main__":
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    packets, keys = make_packets(devices, samples)
+    print(f"{len(packets)} packets from {devices} devices")
+
+    rate("verify_packet (per call)", len(packets),
+         lambda: [verify_packet(p, keys[p.device_id]) for p in packets])
+    rate("verify_batch (key cache)", len(packets),
+         lambda: verify_batch(packets, keys.get, VerifyKeyCache()))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rate(f"verify_batch ({workers} threads)", len(packets),
+             lambda: verify_batch(packets, keys.get, VerifyKeyCache(), pool))
@@ -0,0 +1,45 @@
+# benchmarks/bench_wire.py
+"""
+Per-sample ingest cost: VIRPacket model + repack + verify vs binary frames.
+
+Usage: python benchmarks/bench_wire.py [frames]
+"""
+
+import struct
+import sys
+import time
+
+from nacl.signing import SigningKey
+
+from carbon_smart_meter.core.mining import VIRPacket, VerifyKeyCache, verify_batch
+from carbon_smart_meter.core.wire import FrameBatch, pack_frame, verify_frames
+
+
+def make_frames(count: int) -> bytes:
+    signing_key = SigningKey.generate()
+    device_id = b"\x42" * 32
+    frames = []
+    for t in range(count):
+        payload = device_id + struct.pack("<fffq", 18.0, 2.5, 7.2, 1_700_000_000 + t)
+        frames.append(pack_frame(device_id, 18.0, 2.5, 7.2, 1_700_000_000 + t, signing_key.sign(payload).signature))
+    return b"".join(frames), {device_id: signing_key.verify_key.encode()}
+
+
+def timed(label: str, count: int, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / count * 1e6:8.2f} us/frame")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    buffer, keys = make_frames(count)
+
+    timed("parse only: pydantic VIRPacket", count, lambda: FrameBatch(buffer).packets())
+    timed("parse only: struct.iter_unpack", count, lambda: list(FrameBatch(buffer)))
+    timed("parse only: numpy structured view", count, lambda: FrameBatch(buffer).columns())
+    timed("models + repack + verify", count,
+          lambda: verify_batch(FrameBatch(buffer).packets(), keys.get, VerifyKeyCache()))
+    timed("frames + verify (no repack)", count,
+          lambda: verify_frames(FrameBatch(buffer), keys.get, VerifyKeyCache()))
@@ -0,0 +1,140 @@
+# benchmarks/fleet.py
+"""
+Synthetic device fleet for benchmarks.
+
+- N devices with real Ed25519 keys derived from a seed (same seed → same fleet)
+- Each device is a 20–100 W panel in one of the offset regions, with its own
+  solar-noon offset, nominal voltage and cloud pattern
+- V/I follow a clear-sky sine over the local day, scaled by slowly varying
+  cloud cover and per-sample jitter; night samples are dropped
+- Packets are signed exactly as the meter firmware does (see mining.signed_message)
+
+Import from a benchmark script run as `python benchmarks/<script>.py`.
+"""
+
+import hashlib
+import math
+import random
+import struct
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from nacl.signing import SigningKey
+
+from carbon_smart_meter.core.mining import VIRPacket
+from carbon_smart_meter.core.registration import DeviceRegistrationRequest
+
+# === CONFIG ===
+PANEL_WATTS = (20.0, 100.0)
+PANEL_VMP = (17.0, 19.5)        # Voltage at maximum power for 12 V-class panels
+CLOUD_BLOCK = 300               # Seconds of constant cloud cover
+START_TS = 1_717_200_000        # 2024-06-01 00:00 UTC
+
+REGION_UTC_OFFSET = {           # Hours, roughly the region's population centre
+    "EU": 1, "US": -6, "NZ": 12, "AU": 10, "SG": 8, "CN": 8,
+    "LATAM": -4, "MENA": 3, "SSA": 2, "WA": 0, "IN": 5.5,
+}
+
+
+class FleetDevice(NamedTuple):
+    index: int
+    device_id: bytes
+    signing_key: SigningKey
+    public_key: bytes
+    wallet: str
+    region: str
+    peak_watts: float
+    vmp: float
+    utc_offset: float
+
+
+# === FLEET ===
+def make_fleet(n: int, seed: str = "ccm-fleet", regions: Optional[Sequence[str]] = None) -> List[FleetDevice]:
+    regions = list(regions or REGION_UTC_OFFSET)
+    rng = random.Random(seed)
+    fleet = []
+    for i in range(n):
+        digest = hashlib.sha256(f"{seed}:{i}".encode()).digest()
+        signing_key = SigningKey(digest)
+        region = regions[i % len(regions)]
+        fleet.append(FleetDevice(
+            index=i,
+            device_id=hashlib.sha256(b"device:" + digest).hexdigest()[:32].encode(),
+            signing_key=signing_key,
+            public_key=signing_key.verify_key.encode(),
+            wallet=f"wallet-{seed}-{i:07d}",
+            region=region,
+            peak_watts=rng.uniform(*PANEL_WATTS),
+            vmp=rng.uniform(*PANEL_VMP),
+            utc_offset=REGION_UTC_OFFSET.get(region, 0) + rng.uniform(-1.0, 1.0),
+        ))
+    return fleet
+
+
+def registration_request(device: FleetDevice) -> DeviceRegistrationRequest:
+    return DeviceRegistrationRequest(
+        device_id=device.device_id,
+        public_key=device.public_key,
+        signature=device.signing_key.sign(device.device_id).signature,
+        wallet_address=device.wallet,
+    )
+
+
+# === SOLAR CURVE ===
+def irradiance(device: FleetDevice, timestamp: int) -> float:
+    """Clear-sky fraction (0..1) of peak output at the device's local solar time."""
+    hour = (timestamp / 3600.0 + device.utc_offset) % 24.0
+    if not 6.0 < hour < 18.0:
+        return 0.0
+    return math.sin(math.pi * (hour - 6.0) / 12.0)
+
+
+def cloud_cover(device: FleetDevice, timestamp: int) -> float:
+    """Deterministic 0.35..1.0 transmission, constant over each CLOUD_BLOCK."""
+    block = timestamp // CLOUD_BLOCK
+    digest = hashlib.blake2b(device.device_id + block.to_bytes(8, "little"), digest_size=2).digest()
+    return 0.35 + 0.65 * (int.from_bytes(digest, "little") / 65535.0) ** 0.5
+
+
+def solar_vi(device: FleetDevice, timestamp: int, rng: random.Random) -> Tuple[float, float, float]:
+    """(voltage, current, load resistance) for one sample; zeros at night."""
+    sun = irradiance(device, timestamp)
+    if sun <= 0.0:
+        return 0.0, 0.0, 0.0
+    power = device.peak_watts * sun * cloud_cover(device, timestamp) * rng.uniform(0.97, 1.03)
+    voltage = device.vmp * (0.85 + 0.15 * sun) * rng.uniform(0.99, 1.01)
+    current = power / voltage
+    return voltage, current, voltage / current
+
+
+def signed_packet(device: FleetDevice, timestamp: int, voltage: float, current: float, resistance: float) -> VIRPacket:
+    payload = device.device_id + struct.pack("<fffq", voltage, current, resistance, timestamp)
+    return VIRPacket(
+        device_id=device.device_id,
+        voltage=voltage, current=current, resistance=resistance,
+        timestamp=timestamp,
+        signature=device.signing_key.sign(payload).signature,
+    )
+
+
+def packet_stream(
+    fleet: Sequence[FleetDevice],
+    start_ts: int = START_TS,
+    seconds: int = 60,
+    interval: int = 1,
+    seed: str = "ccm-fleet",
+) -> Iterator[Tuple[FleetDevice, VIRPacket]]:
+    """Time-ordered packets, every device interleaved at each tick; night samples skipped."""
+    rng = random.Random(f"{seed}:{start_ts}")
+    for timestamp in range(start_ts, start_ts + seconds, interval):
+        for device in fleet:
+            voltage, current, resistance = solar_vi(device, timestamp, rng)
+            if current > 0.0:
+                yield device, signed_packet(device, timestamp, voltage, current, resistance)
+
+
+def daytime_start(fleet: Sequence[FleetDevice], day_ts: int = START_TS) -> int:
+    """A UTC second in the given day when most of the fleet is producing."""
+    return max(
+        range(day_ts, day_ts + 86400, 900),
+        key=lambda ts: sum(irradiance(device, ts) for device in fleet),
+    )
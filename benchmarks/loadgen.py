@@ -0,0 +1,97 @@
+# benchmarks/loadgen.py
+"""
+Gateway load generator for the asyncio ingestion server.
+
+Each simulated gateway holds one connection and sends batches of VIR frames signed
+with nacl.signing.SigningKey. Device keys derive from a seed, so a server started
+with the same --devices/--seed can resolve them. By default the server runs
+in-process against local storage stand-ins (write-behind enabled).
+
+Usage: python benchmarks/loadgen.py [--connections N] [--batches N] [--frames N]
+                                    [--devices N] [--host H --port P]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import struct
+import time
+
+from nacl.signing import SigningKey
+
+from carbon_smart_meter.core.clients import ClientRegistry
+from carbon_smart_meter.core.mining import EnergyProcessor, SecureEnergyDB
+from carbon_smart_meter.core.server import ACK_ACCEPTED, IngestClient, IngestServer
+from carbon_smart_meter.core.wire import pack_frame
+
+
+def device_key(seed: str, index: int) -> SigningKey:
+    return SigningKey(hashlib.sha256(f"{seed}:{index}".encode()).digest())
+
+
+def device_id(index: int) -> bytes:
+    return index.to_bytes(32, "little")
+
+
+def signed_frames(signing_key: SigningKey, dev: bytes, start_ts: int, count: int):
+    frames = []
+    for t in range(count):
+        timestamp = start_ts + t
+        payload = dev + struct.pack("<fffq", 18.0, 2.5, 7.2, timestamp)
+        frames.append(pack_frame(dev, 18.0, 2.5, 7.2, timestamp, signing_key.sign(payload).signature))
+    return frames
+
+
+async def gateway(n: int, args, keys, latencies, counts):
+    client = await IngestClient.connect(args.host, args.port)
+    dev = device_id(n % args.devices)
+    batches = [
+        signed_frames(keys[n % args.devices], dev, 1_700_000_000 + b * args.frames, args.frames)
+        for b in range(args.batches)
+    ]
+    for frames in batches:
+        start = time.perf_counter()
+        acks = await client.send(frames)
+        latencies.append(time.perf_counter() - start)
+        counts["frames"] += len(acks)
+        counts["accepted"] += acks.count(ACK_ACCEPTED)
+    await client.close()
+
+
+async def main(args):
+    keys = [device_key(args.seed, i) for i in range(args.devices)]
+    server = None
+    if args.port == 0:
+        registry = ClientRegistry.local()
+        processor = EnergyProcessor(user_region="EU", clients=registry)
+        processor.db = SecureEnergyDB(user_region="EU", clients=registry, write_behind=True)
+        public_keys = {device_id(i): k.verify_key.encode() for i, k in enumerate(keys)}
+        server = IngestServer(processor, public_keys.get)
+        await server.start(args.host, 0)
+        args.port = server.port
+
+    latencies, counts = [], {"frames": 0, "accepted": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(gateway(n, args, keys, latencies, counts) for n in range(args.connections)))
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        await server.close()
+
+    latencies.sort()
+    print(f"{args.connections} gateways x {args.batches} batches x {args.frames} frames")
+    print(f"throughput  {counts['frames'] / elapsed:>10,.0f} frames/s  (accepted {counts['accepted']:,})")
+    print(f"batch p50   {latencies[len(latencies) // 2] * 1e3:>10.2f} ms")
+    print(f"batch p99   {latencies[int(len(latencies) * 0.99)] * 1e3:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--batches", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--seed", default="ccm-loadgen")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 = start an in-process server")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,247 @@
+# src/carbon_smart_meter/blockchain/batching.py
+"""
+Multi-Record kWh Instructions (Packing Readings into Few Transactions)
+
+Instruction data understood by process_batch in examples/solana_program/src/lib.rs:
+
+    [tag b"CSMB"(4)][count u16][count × [device_id(32), kwh_milli u64, sig(64)]][market_cap u64]?
+
+Accounts: operator (signer), program state, token account, system program,
+then a mining account and its owner's wallet per record, in record order. The
+operator is a relayer registered in the program state, so one transaction can
+carry devices of many owners; each record's device signature covers
+device_id || wallet and each wallet is paid its own reward.
+
+A legacy Solana transaction is capped at 1232 bytes; plan_batches packs as many
+records per transaction as that limit allows.
+"""
+
+import logging
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+from nacl.exceptions import BadSignatureError
+
+from ..core.clients import ClientRegistry, get_clients
+from ..core.keys import DeviceKeyResolver
+from ..core.metrics import QUEUE_DEPTH, SUBMIT_FAILURES, SUBMIT_SECONDS, clock, metrics
+from ..core.mining import VerifyKeyCache
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+BATCH_TAG = b"CSMB"
+RECORD_SIZE = 32 + 8 + 64
+PACKET_DATA_SIZE = 1232         # Max serialized transaction size
+FIXED_ACCOUNTS = 4              # operator, state, token, system program
+RECORD_ACCOUNTS = 2             # mining account + owner wallet per record
+MAX_INFLIGHT_SENDS = 4
+BLOCKHASH_TTL = 30.0            # Seconds to reuse a blockhash (valid on-chain for ~60-90 s)
+
+
+class KwhRecord(NamedTuple):
+    device_id: bytes
+    public_key: bytes
+    kwh: int                    # milli-kWh, as enforced on-chain against DAILY_KWH_CAP
+    signature: bytes
+    wallet: Optional[bytes] = None      # 32-byte wallet of the device's mining account (required on chain)
+
+
+# === ENCODING ===
+def encode_batch(records: Sequence[KwhRecord], market_cap: Optional[int] = None) -> bytes:
+    data = BATCH_TAG + struct.pack("<H", len(records))
+    for record in records:
+        data += record.device_id + struct.pack("<Q", record.kwh) + record.signature
+    if market_cap is not None:
+        data += struct.pack("<Q", market_cap)
+    return data
+
+
+def decode_batch(data: bytes):
+    """(records as (device_id, kwh, signature), market_cap or None) — mirrors the on-chain parser."""
+    if data[:4] != BATCH_TAG:
+        raise ValueError("not a batch instruction")
+    (count,) = struct.unpack_from("<H", data, 4)
+    end = 6 + count * RECORD_SIZE
+    records = []
+    for offset in range(6, end, RECORD_SIZE):
+        (kwh,) = struct.unpack_from("<Q", data, offset + 32)
+        records.append((data[offset:offset + 32], kwh, data[offset + 40:offset + RECORD_SIZE]))
+    market_cap = struct.unpack_from("<Q", data, end)[0] if len(data) >= end + 8 else None
+    return records, market_cap
+
+
+# === SIZE PLANNING ===
+def _compact_len(value: int) -> int:
+    """Bytes used by Solana's compact-u16 length prefix."""
+    return 1 if value < 0x80 else 2 if value < 0x4000 else 3
+
+
+def transaction_size(records: int, market_cap: bool = False) -> int:
+    """
+    Serialized size of a one-signer legacy transaction carrying one batch
+    instruction, assuming every record has a distinct owner wallet (the worst
+    case: repeated wallets share a key slot and only shrink the message).
+    """
+    accounts = FIXED_ACCOUNTS + RECORD_ACCOUNTS * records
+    keys = accounts + 1                                 # + program id
+    data = len(BATCH_TAG) + 2 + records * RECORD_SIZE + (8 if market_cap else 0)
+    signatures = _compact_len(1) + 64
+    message = (
+        3                                               # header
+        + _compact_len(keys) + 32 * keys
+        + 32                                            # recent blockhash
+        + _compact_len(1)                               # one instruction
+        + 1 + _compact_len(accounts) + accounts         # program index + account indexes
+        + _compact_len(data) + data
+    )
+    return signatures + message
+
+
+def max_records_per_tx(market_cap: bool = False, limit: int = PACKET_DATA_SIZE) -> int:
+    records = 0
+    while transaction_size(records + 1, market_cap) <= limit:
+        records += 1
+    return records
+
+
+def plan_batches(
+    records: Sequence[KwhRecord],
+    market_cap: bool = False,
+    limit: int = PACKET_DATA_SIZE,
+) -> List[List[KwhRecord]]:
+    """Split records into as few transactions as the size limit allows, keeping order."""
+    per_tx = max_records_per_tx(market_cap, limit)
+    if per_tx == 0:
+        raise ValueError("transaction size limit too small for a single record")
+    return [list(records[i:i + per_tx]) for i in range(0, len(records), per_tx)]
+
+
+# === SUBMITTER ===
+def device_message(device_id: bytes, wallet: Optional[bytes] = None) -> bytes:
+    """
+    Bytes a device signs. verify_signature in lib.rs checks device_id || wallet
+    (the mining account's wallet); without a wallet this is device_id alone,
+    the registration signature.
+    """
+    return device_id if wallet is None else device_id + wallet
+
+
+def device_signature_ok(record: KwhRecord, resolver: Optional[DeviceKeyResolver], key_cache: VerifyKeyCache) -> bool:
+    """
+    Off-chain device signature check: exactly what the program verifies, the
+    signature over device_id || wallet. Records without a wallet are rejected,
+    since the program cannot pay or verify them.
+    """
+    if record.wallet is None:
+        return False
+    try:
+        if resolver is not None:
+            verify_key = resolver.verify_key_for(record.device_id, record.public_key)
+            if verify_key is None:
+                return False
+        else:
+            verify_key = key_cache.get(record.public_key)
+        verify_key.verify(device_message(record.device_id, record.wallet), record.signature)
+        return True
+    except (BadSignatureError, ValueError, TypeError):
+        return False
+
+
+class BatchSubmitter(ABC):
+    """
+    Chain-agnostic batching loop: off-chain signature check, packing, bounded
+    concurrent sends and blockhash reuse. Subclasses build the transaction.
+    """
+
+    def __init__(
+        self,
+        clients: Optional[ClientRegistry] = None,
+        max_inflight: int = MAX_INFLIGHT_SENDS,
+        blockhash_ttl: float = BLOCKHASH_TTL,
+        size_limit: int = PACKET_DATA_SIZE,
+        resolver: Optional[DeviceKeyResolver] = None,
+    ):
+        self.clients = clients or get_clients()
+        self.resolver = resolver
+        self.blockhash_ttl = blockhash_ttl
+        self.size_limit = size_limit
+        self.pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="submit")
+        self.key_cache = VerifyKeyCache()
+        self._blockhash: Optional[str] = None
+        self._blockhash_at = 0.0
+        self._lock = threading.Lock()
+        self.inflight = 0
+        QUEUE_DEPTH.labels(queue="submit").track(self, lambda submitter: submitter.inflight)
+
+    def submit_batch(self, records: Sequence[KwhRecord], market_cap: Optional[int] = None) -> List[Optional[str]]:
+        """
+        Submit many readings; returns, per record, the signature of the transaction
+        that carried it, or None (bad device signature or failed send).
+        """
+        valid = [i for i, record in enumerate(records) if self._verify_device_sig(record)]
+        if metrics.enabled and len(valid) < len(records):
+            SUBMIT_FAILURES.labels(reason="signature").inc(len(records) - len(valid))
+        batches = plan_batches([records[i] for i in valid], market_cap is not None, self.size_limit)
+        tx_sigs = list(self.pool.map(lambda batch: self._send(batch, market_cap), batches))
+
+        results: List[Optional[str]] = [None] * len(records)
+        position = 0
+        for batch, tx_sig in zip(batches, tx_sigs):
+            for i in valid[position:position + len(batch)]:
+                results[i] = tx_sig
+            position += len(batch)
+        return results
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def recent_blockhash(self) -> str:
+        with self._lock:
+            if self._blockhash is None or time.monotonic() - self._blockhash_at > self.blockhash_ttl:
+                resp = self.clients.rpc.get_latest_blockhash()
+                value = resp["result"]["value"] if isinstance(resp, dict) else resp.value
+                self._blockhash = value["blockhash"] if isinstance(value, dict) else str(value.blockhash)
+                self._blockhash_at = time.monotonic()
+            return self._blockhash
+
+    @abstractmethod
+    def build_transaction(self, batch: List[KwhRecord], data: bytes, blockhash: str) -> Any:
+        """The chain's transaction for one batch (data = encode_batch(batch, market_cap))."""
+
+    def _send(self, batch: List[KwhRecord], market_cap: Optional[int]) -> Optional[str]:
+        data = encode_batch(batch, market_cap)
+        started = clock() if metrics.enabled else None
+        with self._lock:
+            self.inflight += 1
+        try:
+            tx = self.build_transaction(batch, data, self.recent_blockhash())
+            resp = self.clients.rpc.send_transaction(tx, *self.signers())
+            return resp.get("result") if isinstance(resp, dict) else str(resp.value)
+        except Exception as e:
+            logger.warning("batch of %d kWh records failed to submit: %s", len(batch), e)
+            if started is not None:
+                SUBMIT_FAILURES.labels(reason="rpc").inc(len(batch))
+            # Most often an expired blockhash: fetch a fresh one next time
+            with self._lock:
+                self._blockhash = None
+            return None
+        finally:
+            with self._lock:
+                self.inflight -= 1
+            if started is not None:
+                SUBMIT_SECONDS.labels(mode="batch").observe(clock() - started)
+
+    def signers(self) -> list:
+        return []
+
+    def verify_record(self, record: KwhRecord) -> bool:
+        """The off-chain device signature check submit_batch applies to each record."""
+        return self._verify_device_sig(record)
+
+    def _verify_device_sig(self, record: KwhRecord) -> bool:
+        return device_signature_ok(record, self.resolver, self.key_cache)
@@ -0,0 +1,206 @@
+# src/carbon_smart_meter/blockchain/rewards.py
+"""
+$CARBON Reward Arithmetic (Offline Mirror of examples/solana_program/src/lib.rs)
+
+Integer-exact copies of the program's reward rules, for predicting payouts and
+checking submissions without a validator:
+- reward_rate(): calculate_reward_rate, including the u128 → u64 truncation
+- RewardEngine.apply_batch(): process_batch — per-device daily cap in milli-kWh
+  (capped records are skipped, not failed), reward = allowed_milli * rate / 1000
+- base_reward_at(): base reward halved every 4 × 365 days since genesis
+- NumPy batch mode (project_rewards) for millions of device-days at once
+
+The market-cap factor divides in integers, so it only ever lands on 0.5x, 1x or
+2x: above BASE_MARKET_CAP → 0.5x, above half of it → 1x, below → 2x.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batching import decode_batch
+
+# === CONSTANTS (lib.rs) ===
+DAILY_KWH_CAP = 1_500                   # milli-kWh per device per UTC day
+BASE_REWARD_PER_KWH = 50_000_000        # 0.5 CARBON per kWh (8 decimals)
+HALVING_INTERVAL = 126_144_000          # 4 × 365 days, in seconds
+MIN_MARKET_CAP_THRESHOLD = 1_000_000_000_000
+BASE_MARKET_CAP = MIN_MARKET_CAP_THRESHOLD  # Referenced but not defined in lib.rs; the only market-cap constant
+MIN_REWARD_FACTOR = 50                  # percent
+MAX_REWARD_FACTOR = 200                 # percent
+SECONDS_PER_DAY = 86_400
+
+U64_MASK = (1 << 64) - 1
+
+
+# === SCALAR (EXACT) ===
+def reward_rate(base_reward: int, market_cap: int) -> int:
+    """calculate_reward_rate: reward per kWh at this base reward and market cap."""
+    scaling = BASE_MARKET_CAP // market_cap if market_cap > 0 else 1
+    scaled = (base_reward * scaling) & U64_MASK           # (u128 product) as u64
+    lower = base_reward * MIN_REWARD_FACTOR // 100
+    upper = base_reward * MAX_REWARD_FACTOR // 100
+    return min(max(scaled, lower), upper)
+
+
+def halving_epoch(timestamp: int, genesis_timestamp: int) -> int:
+    return max(0, (timestamp - genesis_timestamp) // HALVING_INTERVAL)
+
+
+def base_reward_at(timestamp: int, genesis_timestamp: int, base_reward: int = BASE_REWARD_PER_KWH) -> int:
+    """Successive integer halvings compose: ⌊⌊b / 2^a⌋ / 2^c⌋ = ⌊b / 2^(a+c)⌋."""
+    return base_reward >> halving_epoch(timestamp, genesis_timestamp)
+
+
+def allowed_milli(daily_kwh: int, kwh_milli: int) -> int:
+    return min(max(0, DAILY_KWH_CAP - daily_kwh), kwh_milli)
+
+
+def record_reward(allowed: int, rate: int) -> int:
+    return allowed * rate // 1_000
+
+
+class DeviceDay(NamedTuple):
+    """The cap-relevant part of a MiningAccount."""
+    last_mined_day: int
+    daily_kwh: int
+    cumulative_kwh: int
+
+
+class BatchOutcome(NamedTuple):
+    allowed: List[int]          # milli-kWh credited per record (0 = skipped, cap reached)
+    rewards: List[int]          # per record, smallest token unit
+    total_milli: int
+    total_reward: int
+    reward_rate: int
+
+
+class RewardEngine:
+    """
+    process_batch replayed off-chain against local copies of the mining accounts.
+
+    A device appearing twice in one batch sees its own earlier record, as on-chain
+    (each account is re-read after the previous record serialised it).
+    """
+
+    def __init__(
+        self,
+        base_reward: int = BASE_REWARD_PER_KWH,
+        market_cap: int = 0,
+        genesis_timestamp: Optional[int] = None,
+    ):
+        self.base_reward = base_reward
+        self.market_cap = market_cap
+        self.genesis_timestamp = genesis_timestamp
+        self.accounts: Dict[bytes, DeviceDay] = {}
+
+    def rate(self, timestamp: int, market_cap: Optional[int] = None) -> int:
+        """With a genesis timestamp the base reward follows the halving schedule."""
+        base = self.base_reward
+        if self.genesis_timestamp is not None:
+            base = base_reward_at(timestamp, self.genesis_timestamp, base)
+        return reward_rate(base, self.market_cap if market_cap is None else market_cap)
+
+    def apply_batch(
+        self,
+        records: Sequence[Tuple[bytes, int]],
+        timestamp: int,
+        market_cap: Optional[int] = None,
+    ) -> BatchOutcome:
+        """records as (device_id, kwh_milli); market_cap None = the state's current one."""
+        rate = self.rate(timestamp, market_cap)
+        current_day = timestamp // SECONDS_PER_DAY
+        allowed, rewards = [], []
+        total_milli = total_reward = 0
+
+        for device_id, kwh_milli in records:
+            account = self.accounts.get(device_id)
+            if account is None:
+                account = DeviceDay(current_day, 0, 0)
+            elif account.last_mined_day < current_day:
+                account = DeviceDay(current_day, 0, account.cumulative_kwh)
+
+            credited = allowed_milli(account.daily_kwh, kwh_milli)
+            reward = record_reward(credited, rate) if credited else 0
+            if credited:
+                self.accounts[device_id] = DeviceDay(
+                    account.last_mined_day,
+                    min(account.daily_kwh + credited, U64_MASK),
+                    min(account.cumulative_kwh + credited, U64_MASK),
+                )
+                total_milli = min(total_milli + credited, U64_MASK)
+                total_reward = min(total_reward + reward, U64_MASK)
+            allowed.append(credited)
+            rewards.append(reward)
+
+        return BatchOutcome(allowed, rewards, total_milli, total_reward, rate)
+
+    def apply_instruction(self, data: bytes, timestamp: int) -> BatchOutcome:
+        """Same as apply_batch, from the encoded CSMB instruction data (see batching.encode_batch)."""
+        records, market_cap = decode_batch(data)
+        return self.apply_batch([(device_id, kwh) for device_id, kwh, _ in records], timestamp, market_cap)
+
+
+# === NUMPY BATCH MODE ===
+def reward_rates(base_reward, market_cap) -> np.ndarray:
+    """Vectorised reward_rate; arguments broadcast (e.g. epochs × market-cap scenarios)."""
+    base = np.asarray(base_reward, dtype=np.uint64)
+    cap = np.asarray(market_cap, dtype=np.uint64)
+    scaling = np.where(cap > 0, np.uint64(BASE_MARKET_CAP) // np.maximum(cap, np.uint64(1)), np.uint64(1))
+    with np.errstate(over="ignore"):
+        scaled = base * scaling                            # uint64 wraps exactly like `as u64`
+    lower = base * np.uint64(MIN_REWARD_FACTOR) // np.uint64(100)
+    upper = base * np.uint64(MAX_REWARD_FACTOR) // np.uint64(100)
+    return np.minimum(np.maximum(scaled, lower), upper)
+
+
+def base_rewards_at(timestamps, genesis_timestamp: int, base_reward: int = BASE_REWARD_PER_KWH) -> np.ndarray:
+    epochs = np.maximum(np.asarray(timestamps, dtype=np.int64) - genesis_timestamp, 0) // HALVING_INTERVAL
+    return np.uint64(base_reward) >> np.minimum(epochs, 63).astype(np.uint64)
+
+
+def capped_milli(kwh_milli, device_days=None) -> np.ndarray:
+    """
+    Milli-kWh credited per record. Without device_days every row is its own
+    device-day; with them (one key per device and day, rows in submission order)
+    later records of a day only get what the cap has left.
+    """
+    kwh = np.minimum(np.asarray(kwh_milli, dtype=np.uint64), np.uint64(DAILY_KWH_CAP))
+    if device_days is None or not len(kwh):
+        return kwh
+
+    keys = np.asarray(device_days)
+    order = np.argsort(keys, kind="stable")
+    grouped = kwh[order]
+    starts = np.ones(len(grouped), dtype=bool)
+    starts[1:] = keys[order][1:] != keys[order][:-1]
+
+    running = np.cumsum(grouped, dtype=np.uint64)
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(grouped)), 0))
+    used_after = np.minimum(running - running[first] + grouped[first], np.uint64(DAILY_KWH_CAP))
+    used_before = np.zeros_like(used_after)
+    used_before[1:] = used_after[:-1]
+    used_before[starts] = 0
+
+    allowed = np.empty_like(kwh)
+    allowed[order] = used_after - used_before
+    return allowed
+
+
+def project_rewards(
+    kwh_milli,
+    timestamps,
+    market_cap,
+    genesis_timestamp: int,
+    device_days=None,
+    base_reward: int = BASE_REWARD_PER_KWH,
+) -> np.ndarray:
+    """
+    Reward per record (uint64), as process_batch would pay it at each timestamp.
+
+    market_cap may be a scalar, one value per record, or shaped (scenarios, 1) to
+    get a (scenarios, records) projection in one call.
+    """
+    allowed = capped_milli(kwh_milli, device_days)
+    rates = reward_rates(base_rewards_at(timestamps, genesis_timestamp, base_reward), market_cap)
+    return allowed * rates // np.uint64(1_000)
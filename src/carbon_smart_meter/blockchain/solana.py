@@ -1,66 +1,41 @@
 # src/carbon_smart_meter/blockchain/solana.py
 """
 Solana Submission (Hard Wired, Tamper Proof)
-"""
 
-from typing import Optional
-from solana.rpc.api import Client
-from solana.transaction import Transaction
-from solana.keypair import Keypair
-from solana.publickey import PublicKey  # ← CORRECT
-from solana.system_program import SYS_PROGRAM_ID
-from nacl.signing import VerifyKey
-from nacl.exceptions import BadSignatureError
-import struct
+Blocking front end to the one Solana implementation in core/blockchain/solana.py:
+- SolanaAdapter (async, pooled, rate limited) is re-exported from here
+- BatchSolanaSubmitter runs the thread-pool BatchSubmitter loop used by
+  SubmissionQueue and sends exactly the transactions SolanaAdapter builds
+"""
 
-# === CONFIG ===
-SOLANA_RPC = "https://api.devnet.solana.com"
-PROGRAM_ID = PublicKey("11111111111111111111111111111111")
-client = Client(SOLANA_RPC)
+from typing import List, Optional
 
-class SolanaSubmitter:
-    def __init__(self, wallet: Keypair):
-        self.wallet = wallet
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+from solders.transaction import Transaction
 
-    def submit_kwh(
-        self,
-        device_id: bytes,
-        public_key: bytes,
-        kwh: int,
-        signature: bytes,
-        market_cap: Optional[int] = None
-    ) -> Optional[str]:
-        if not self._verify_device_sig(device_id, public_key, signature):
-            return None
+from ..core.blockchain.solana import PROGRAM_ID, SolanaAdapter, build_transaction, mining_account, state_account
+from ..core.clients import ClientRegistry
+from .batching import BatchSubmitter, KwhRecord
 
-        data = device_id + struct.pack("<Q", kwh) + signature
-        if market_cap is not None:
-            data += struct.pack("<Q", market_cap)
 
-        tx = Transaction()
-        tx.add_instruction(
-            {
-                "program_id": PROGRAM_ID,
-                "keys": [
-                    {"pubkey": self.wallet.public_key, "is_signer": True, "is_writable": True},
-                    {"pubkey": PublicKey(0), "is_signer": False, "is_writable": True},
-                    {"pubkey": PublicKey(0), "is_signer": False, "is_writable": True},
-                    {"pubkey": SYS_PROGRAM_ID, "is_signer": False, "is_writable": False},
-                ],
-                "data": list(data),
-            }
-        )
+class BatchSolanaSubmitter(BatchSubmitter):
+    """
+    Packs many (device_id, kwh, signature) records into each transaction
+    (see blockchain/batching.py for the instruction layout).
+    """
 
-        try:
-            resp = client.send_transaction(tx, self.wallet)
-            return resp.get("result")
-        except Exception:
-            return None
+    def __init__(
+        self,
+        wallet: Keypair,
+        clients: Optional[ClientRegistry] = None,
+        program_id: Pubkey = PROGRAM_ID,
+        **kwargs,
+    ):
+        super().__init__(clients=clients, **kwargs)
+        self.wallet = wallet
+        self.program_id = program_id
 
-    def _verify_device_sig(self, device_id: bytes, public_key: bytes, signature: bytes) -> bool:
-        try:
-            verify_key = VerifyKey(public_key)
-            verify_key.verify(device_id, signature)
-            return True
-        except BadSignatureError:
-            return False
\ No newline at end of file
+    def build_transaction(self, batch: List[KwhRecord], data: bytes, blockhash: str) -> Transaction:
+        # Signed here, so send_transaction needs no extra signers
+        return build_transaction(self.wallet, batch, data, blockhash, self.program_id)
@@ -0,0 +1,407 @@
+# src/carbon_smart_meter/blockchain/submission.py
+"""
+Durable Submission Queue (Append-Only Log, Confirmation Tracking, Retry)
+
+Keeps every device's daily kWh until the chain has confirmed it.
+- One entry per (device_id, UTC day) holding the day's target total (milli-kWh)
+  and how much of it is confirmed on-chain; enqueue() only ever raises the
+  target, so re-enqueueing the same total is a no-op (idempotent per device-day)
+- pump() sends the unconfirmed delta, capped at DAILY_KWH_CAP, through a
+  BatchSubmitter (bounded concurrent sends, blockhash refresh on failure)
+- In-flight transactions are polled in batches with get_signature_statuses;
+  confirmed → added to `confirmed` (= on-chain MiningAccount.daily_kwh),
+  failed or unseen after CONFIRM_TIMEOUT (blockhash expired) → sent again
+- Failed sends are retried on the next pump with a fresh blockhash. The
+  records sent per pump shrink while most sends fail and grow back as they
+  succeed (AIMD); only when every send fails does the queue pause, with
+  exponential backoff. A partial brownout keeps most of the throughput and a
+  full outage is probed gently instead of spun on
+- Each entry carries the owner wallet its device signature covers
+  (device_id || wallet, as the program verifies); an entry whose signature
+  fails that check is parked until re-enqueued and counted in stats["rejected"]
+- Memory is bounded by live device-days, never by the number of readings or retries
+- Every state change is appended to a JSON-lines log before it matters and the
+  log is compacted once it grows, so a restart resumes exactly where it stopped
+
+The program credits kWh to the day the transaction executes, so entries for a
+day that has ended are expired rather than sent (counted in stats["expired"]).
+A crash between a send and its "sent" record leaves the entry in doubt: with a
+chain_lookup (device_id, day → on-chain daily_kwh) it is reconciled, otherwise
+it is resent once CONFIRM_TIMEOUT has passed (at-least-once for that window).
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..core.metrics import QUEUE_DEPTH, SUBMIT_FAILURES, metrics
+from .batching import BatchSubmitter, KwhRecord
+
+# === CONFIG ===
+DAILY_KWH_CAP = 1_500               # milli-kWh, as enforced by lib.rs
+CONFIRM_TIMEOUT = 90.0              # Seconds: a blockhash is valid on-chain for ~60-90 s
+STATUS_BATCH = 256                  # Signatures per get_signature_statuses call (RPC limit)
+MAX_RECORDS_PER_PUMP = 4096
+MIN_RECORDS_PER_PUMP = 64           # Send window while the RPC is failing
+RETRY_BACKOFF = 1.0                 # Seconds of pause after a round where every send failed, doubled per round
+RETRY_BACKOFF_MAX = 60.0
+COMPACT_BYTES = 8 * 1024 * 1024     # Rewrite the log once it grows past this
+
+Key = Tuple[bytes, int]             # (device_id, UTC day)
+
+
+class Entry:
+    __slots__ = ("device_id", "day", "public_key", "signature", "wallet", "target", "confirmed",
+                 "tx", "inflight", "sent_at", "retry_at")
+
+    def __init__(self, device_id: bytes, day: int, public_key: bytes, signature: bytes,
+                 wallet: Optional[bytes] = None):
+        self.device_id = device_id
+        self.day = day
+        self.public_key = public_key
+        self.signature = signature
+        self.wallet = wallet        # Mining account's wallet, part of the signed message
+        self.target = 0             # Day total wanted on-chain (milli-kWh)
+        self.confirmed = 0          # Day total confirmed on-chain
+        self.tx: Optional[str] = None       # In-flight transaction ("" = in doubt: sent, signature unknown)
+        self.inflight = 0
+        self.sent_at = 0.0
+        self.retry_at = 0.0         # inf = device signature rejected off-chain
+
+    @property
+    def pending(self) -> int:
+        """milli-kWh still to send (0 while a transaction is in flight)."""
+        if self.tx is not None:
+            return 0
+        return max(0, min(self.target, DAILY_KWH_CAP) - self.confirmed)
+
+    def state(self) -> dict:
+        return {
+            "op": "entry", "dev": self.device_id.hex(), "day": self.day,
+            "pk": self.public_key.hex(), "sig": self.signature.hex(), "wallet": _hex(self.wallet),
+            "target": self.target, "confirmed": self.confirmed,
+            "tx": self.tx, "milli": self.inflight, "at": self.sent_at,
+        }
+
+
+# === QUEUE ===
+class SubmissionQueue:
+    def __init__(
+        self,
+        path: str,
+        submitter: BatchSubmitter,
+        market_cap: Optional[int] = None,
+        confirm_timeout: float = CONFIRM_TIMEOUT,
+        max_records: int = MAX_RECORDS_PER_PUMP,
+        chain_lookup: Optional[Callable[[bytes, int], Optional[int]]] = None,
+        fsync: bool = True,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.submitter = submitter
+        self.market_cap = market_cap
+        self.confirm_timeout = confirm_timeout
+        self.max_records = max_records
+        self.window = max_records
+        self.outages = 0                # Consecutive rounds in which every send failed
+        self.resume_at = 0.0
+        self.chain_lookup = chain_lookup
+        self.fsync = fsync
+        self.clock = clock
+        self.entries: Dict[Key, Entry] = {}
+        self.by_tx: Dict[str, List[Key]] = {}
+        self.stats = {"sent": 0, "confirmed": 0, "retried": 0, "failed_sends": 0, "expired": 0, "in_doubt": 0,
+                      "rejected": 0}
+        self._lock = threading.Lock()
+        self._load()
+        self._log = open(path, "a", encoding="utf-8")
+        QUEUE_DEPTH.labels(queue="submission").track(self, lambda q: len(q.entries))
+
+    # --- producer side ---
+    def enqueue(self, device_id: bytes, public_key: bytes, signature: bytes, day: int, daily_milli: int,
+                wallet: bytes):
+        """
+        Record that `device_id` has mined `daily_milli` milli-kWh so far on `day`.
+        signature is the device's over device_id || wallet (see batching.device_message).
+        """
+        self.enqueue_many([(device_id, public_key, signature, day, daily_milli, wallet)])
+
+    def enqueue_many(self, items):
+        """(device_id, public_key, signature, day, daily_milli, wallet) tuples, logged with one sync."""
+        with self._lock:
+            for device_id, public_key, signature, day, daily_milli, wallet in items:
+                entry = self._entry(device_id, day, public_key, signature)
+                rebound = signature != entry.signature or wallet != entry.wallet
+                if daily_milli <= entry.target and public_key == entry.public_key and not rebound:
+                    continue
+                if rebound:
+                    entry.retry_at = 0.0                # A rejected signature may have been replaced
+                entry.public_key, entry.signature, entry.wallet = public_key, signature, wallet
+                entry.target = max(entry.target, int(daily_milli))
+                self._append({
+                    "op": "want", "dev": device_id.hex(), "day": day, "milli": entry.target,
+                    "pk": public_key.hex(), "sig": signature.hex(), "wallet": _hex(wallet),
+                })
+            self._sync()
+
+    # --- sender side ---
+    def pump(self) -> Dict[str, int]:
+        """One round: expire, poll confirmations, send what is due. Call periodically."""
+        now = self.clock()
+        with self._lock:
+            self._expire(int(now // 86400))
+            self._sync()
+        self._poll(now)
+        if now >= self.resume_at:
+            self._send(now)
+        self._maybe_compact()
+        return dict(self.stats)
+
+    def drain(self, timeout: float = 60.0, interval: float = 0.5) -> bool:
+        """pump() until nothing is pending or in flight (True) or the timeout passes."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self.pump()
+            if not any(e.pending or e.tx is not None for e in self.entries.values()):
+                return True
+            time.sleep(interval)
+        return False
+
+    def confirmed(self, device_id: bytes, day: int) -> int:
+        entry = self.entries.get((device_id, day))
+        return entry.confirmed if entry is not None else 0
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            self._log.close()
+
+    # --- rounds ---
+    def _expire(self, today: int):
+        for key, entry in list(self.entries.items()):
+            if entry.day >= today or entry.tx is not None:
+                continue
+            if entry.pending:
+                self.stats["expired"] += 1
+                if metrics.enabled:
+                    SUBMIT_FAILURES.labels(reason="expired").inc()
+            del self.entries[key]
+            self._append({"op": "drop", "dev": entry.device_id.hex(), "day": entry.day})
+
+    def _poll(self, now: float):
+        with self._lock:
+            txs = list(self.by_tx)
+            doubtful = [e for e in self.entries.values() if e.tx == ""]
+        for entry in doubtful:
+            self._resolve_doubt(entry, now)
+
+        rpc = self.submitter.clients.rpc
+        for i in range(0, len(txs), STATUS_BATCH):
+            chunk = txs[i:i + STATUS_BATCH]
+            try:
+                statuses = _status_values(rpc.get_signature_statuses(chunk))
+            except Exception:
+                continue                    # Brownout: keep waiting, the timeout still applies
+            with self._lock:
+                for tx, status in zip(chunk, statuses):
+                    if status is not None and _status_err(status) is not None:
+                        self._settle(tx, ok=False)
+                    elif status is not None and _status_confirmed(status):
+                        self._settle(tx, ok=True)
+                    elif status is None and self._sent_at(tx) + self.confirm_timeout < now:
+                        self._settle(tx, ok=False)
+                self._sync()
+
+    def _send(self, now: float):
+        with self._lock:
+            due = [
+                e for e in self.entries.values()
+                if e.pending and e.retry_at <= now and e.day == int(now // 86400)
+            ][:self.window]
+            records = [KwhRecord(e.device_id, e.public_key, e.pending, e.signature, e.wallet) for e in due]
+            valid = [self.submitter.verify_record(record) for record in records]
+            for entry, record, ok in zip(due, records, valid):
+                if not ok:
+                    entry.retry_at = float("inf")       # Bad signature: wait for a fresh enqueue
+                    self.stats["rejected"] += 1
+                    if metrics.enabled:
+                        SUBMIT_FAILURES.labels(reason="signature").inc()
+                    continue
+                entry.tx, entry.inflight, entry.sent_at = "", record.kwh, now
+                self._append({"op": "sending", "dev": entry.device_id.hex(), "day": entry.day,
+                              "milli": record.kwh, "at": now})
+            self._sync()
+        due = [e for e, ok in zip(due, valid) if ok]
+        records = [r for r, ok in zip(records, valid) if ok]
+        if not records:
+            return
+
+        tx_sigs = self.submitter.submit_batch(records, self.market_cap)
+
+        with self._lock:
+            failed = tx_sigs.count(None)
+            self._adapt(failed, len(tx_sigs), now)
+            for entry, tx in zip(due, tx_sigs):
+                if tx is None:
+                    entry.tx, entry.inflight = None, 0
+                    self.stats["failed_sends"] += 1
+                    self._append({"op": "unsent", "dev": entry.device_id.hex(), "day": entry.day})
+                    continue
+                entry.tx = tx
+                self.by_tx.setdefault(tx, []).append((entry.device_id, entry.day))
+                self.stats["sent"] += 1
+                self._append({"op": "sent", "dev": entry.device_id.hex(), "day": entry.day, "tx": tx})
+            self._sync()
+
+    def _adapt(self, failed: int, sent: int, now: float):
+        """AIMD send window; exponential pause only when a whole round failed."""
+        if failed == sent:
+            self.outages += 1
+            self.window = MIN_RECORDS_PER_PUMP
+            self.resume_at = now + min(RETRY_BACKOFF * 2 ** (self.outages - 1), RETRY_BACKOFF_MAX)
+            return
+        self.outages = 0
+        if failed * 2 > sent:
+            self.window = max(MIN_RECORDS_PER_PUMP, self.window // 2)
+        elif not failed:
+            self.window = min(self.max_records, self.window * 2)
+
+    def _resolve_doubt(self, entry: Entry, now: float):
+        """Sent, but the signature was never recorded (crash mid-send)."""
+        on_chain = self.chain_lookup(entry.device_id, entry.day) if self.chain_lookup is not None else None
+        with self._lock:
+            if on_chain is not None:
+                entry.confirmed = max(entry.confirmed, int(on_chain))
+            elif entry.sent_at + self.confirm_timeout >= now:
+                return
+            self.stats["in_doubt"] += 1
+            entry.tx, entry.inflight = None, 0
+            self._append({"op": "settle", "dev": entry.device_id.hex(), "day": entry.day,
+                          "confirmed": entry.confirmed})
+
+    def _settle(self, tx: str, ok: bool):
+        for key in self.by_tx.pop(tx, []):
+            entry = self.entries.get(key)
+            if entry is None or entry.tx != tx:
+                continue
+            if ok:
+                entry.confirmed += entry.inflight
+                self.stats["confirmed"] += 1
+            else:
+                self.stats["retried"] += 1
+                if metrics.enabled:
+                    SUBMIT_FAILURES.labels(reason="unconfirmed").inc()
+            entry.tx, entry.inflight = None, 0
+        self._append({"op": "ok" if ok else "retry", "tx": tx})
+
+    def _sent_at(self, tx: str) -> float:
+        keys = self.by_tx.get(tx) or []
+        entry = self.entries.get(keys[0]) if keys else None
+        return entry.sent_at if entry is not None else 0.0
+
+    # --- log ---
+    def _entry(self, device_id: bytes, day: int, public_key: bytes = b"", signature: bytes = b"") -> Entry:
+        entry = self.entries.get((device_id, day))
+        if entry is None:
+            entry = self.entries[(device_id, day)] = Entry(device_id, day, public_key, signature)
+        return entry
+
+    def _append(self, event: dict):
+        self._log.write(json.dumps(event, separators=(",", ":")) + "\n")
+
+    def _sync(self):
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break                       # Torn final write
+                self._apply(json.loads(line))
+
+    def _apply(self, event: dict):
+        op = event["op"]
+        if op in ("ok", "retry"):
+            for key in self.by_tx.pop(event["tx"], []):
+                entry = self.entries.get(key)
+                if entry is not None and entry.tx == event["tx"]:
+                    if op == "ok":
+                        entry.confirmed += entry.inflight
+                    entry.tx, entry.inflight = None, 0
+            return
+
+        key = (bytes.fromhex(event["dev"]), event["day"])
+        if op == "drop":
+            self.entries.pop(key, None)
+            return
+        entry = self._entry(*key)
+        if op == "entry":
+            entry.public_key, entry.signature = bytes.fromhex(event["pk"]), bytes.fromhex(event["sig"])
+            entry.wallet = _unhex(event.get("wallet"))
+            entry.target, entry.confirmed = event["target"], event["confirmed"]
+            entry.tx, entry.inflight, entry.sent_at = event["tx"], event["milli"], event["at"]
+            if entry.tx:
+                self.by_tx.setdefault(entry.tx, []).append(key)
+        elif op == "want":
+            entry.public_key, entry.signature = bytes.fromhex(event["pk"]), bytes.fromhex(event["sig"])
+            entry.wallet = _unhex(event.get("wallet"))       # Absent in logs written before wallets were kept
+            entry.target = max(entry.target, event["milli"])
+        elif op == "sending":
+            entry.tx, entry.inflight, entry.sent_at = "", event["milli"], event["at"]
+        elif op == "sent":
+            entry.tx = event["tx"]
+            self.by_tx.setdefault(entry.tx, []).append(key)
+        elif op == "unsent":
+            entry.tx, entry.inflight = None, 0
+        elif op == "settle":
+            entry.confirmed = event["confirmed"]
+            entry.tx, entry.inflight = None, 0
+
+    def _maybe_compact(self):
+        with self._lock:
+            if self._log.tell() >= COMPACT_BYTES:
+                self._compact()
+
+    def compact(self):
+        """Rewrite the log as one line per live entry (atomic tmp + rename)."""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry.state(), separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._log.close()
+        os.replace(tmp, self.path)
+        self._log = open(self.path, "a", encoding="utf-8")
+
+
+def _hex(value: Optional[bytes]) -> Optional[str]:
+    return value.hex() if value is not None else None
+
+
+def _unhex(value: Optional[str]) -> Optional[bytes]:
+    return bytes.fromhex(value) if value is not None else None
+
+
+# === RPC RESPONSE SHAPES (dict from the local stand-in / JSON RPC, objects from solana-py) ===
+def _status_values(resp) -> list:
+    return resp["result"]["value"] if isinstance(resp, dict) else list(resp.value)
+
+
+def _status_err(status):
+    return status.get("err") if isinstance(status, dict) else status.err
+
+
+def _status_confirmed(status) -> bool:
+    level = status.get("confirmationStatus") if isinstance(status, dict) else status.confirmation_status
+    return str(level).lower().rsplit(".", 1)[-1] in ("confirmed", "finalized")
@@ -0,0 +1,254 @@
+# src/carbon_smart_meter/core/aggregation.py
+"""
+Windowed Energy Aggregation (1 s Samples → Minute / Hour Buckets)
+
+Folds verified samples into tumbling windows per device and emits one
+EnergyAggregate per window, instead of one stored object per second.
+- Each aggregate carries the Merkle root (core.merkle) of the raw signed frames
+  it covers, in acceptance order, and the frames themselves (stored next to it
+  by SecureEnergyDB), so an inclusion proof for any sample can be rebuilt
+- An open window therefore holds O(samples in the window) memory: every raw
+  frame (116 bytes) is kept until the window is emitted. Only the running root
+  itself (MerkleAccumulator) is O(log n)
+- A device's window closes once that device has moved allowed_lateness seconds
+  past its end (event time), or when advance(now) / flush() is called
+- Out-of-order samples inside an open window are folded in and counted
+- Samples for an already-emitted window are late: either dropped (counted) or
+  emitted as a separate amendment aggregate on the next advance() / flush(),
+  numbered 1, 2, ... per window by `sequence`
+"""
+
+import json
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from .merkle import MerkleAccumulator, audit_path, leaf_hash, verify_inclusion
+
+# === CONFIG ===
+WINDOW_SECONDS = 60
+ALLOWED_LATENESS = 5            # Seconds a window stays open after its end
+LATE_POLICIES = {"amend", "drop"}
+AMENDMENT_HISTORY = 100_000     # Windows whose amendment count is remembered
+
+
+# === MODELS ===
+class EnergyAggregate(BaseModel):
+    device_id: bytes
+    window_start: int
+    window_seconds: int
+    kwh: float
+    samples: int
+    first_ts: int
+    last_ts: int
+    out_of_order: int
+    merkle_root: str            # hex SHA-256 over the raw 116-byte frames
+    cable_type: str
+    user_region: str
+    amendment: bool = False
+    sequence: int = 0           # 0 for the window itself, n for its n-th amendment
+    leaves: List[bytes] = Field(default_factory=list, exclude=True)    # The frames under merkle_root
+
+
+class AggregateProof(NamedTuple):
+    """One frame of an aggregate plus its audit path to the aggregate's merkle_root."""
+    device_id: bytes
+    window_start: int
+    sequence: int
+    tree_size: int
+    index: int
+    frame: bytes
+    path: Tuple[bytes, ...]
+    root: bytes
+
+
+def aggregate_to_json(aggregate: EnergyAggregate) -> bytes:
+    record = aggregate.model_dump()
+    record["device_id"] = aggregate.device_id.hex()
+    return json.dumps(record, separators=(",", ":")).encode()
+
+
+def aggregate_from_record(record: dict) -> EnergyAggregate:
+    return EnergyAggregate(**{**record, "device_id": bytes.fromhex(record["device_id"])})
+
+
+def aggregate_leaves_to_json(aggregate: EnergyAggregate) -> bytes:
+    """The frames under an aggregate's merkle_root, in leaf order (hex)."""
+    return json.dumps({
+        "device_id": aggregate.device_id.hex(),
+        "window_start": aggregate.window_start,
+        "sequence": aggregate.sequence,
+        "merkle_root": aggregate.merkle_root,
+        "leaves": [leaf.hex() for leaf in aggregate.leaves],
+    }, separators=(",", ":")).encode()
+
+
+def aggregate_proof(leaves_record: dict, index: int) -> AggregateProof:
+    """Rebuild the inclusion proof of frame `index` from a stored leaves record."""
+    leaves = [bytes.fromhex(leaf) for leaf in leaves_record["leaves"]]
+    return AggregateProof(
+        device_id=bytes.fromhex(leaves_record["device_id"]),
+        window_start=leaves_record["window_start"],
+        sequence=leaves_record["sequence"],
+        tree_size=len(leaves),
+        index=index,
+        frame=leaves[index],
+        path=tuple(audit_path([leaf_hash(leaf) for leaf in leaves], index)),
+        root=bytes.fromhex(leaves_record["merkle_root"]),
+    )
+
+
+def verify_aggregate_proof(proof: AggregateProof, aggregate: EnergyAggregate) -> bool:
+    """The frame is covered by this (separately stored) aggregate."""
+    same = (proof.device_id, proof.window_start, proof.sequence, proof.tree_size) == (
+        aggregate.device_id, aggregate.window_start, aggregate.sequence, aggregate.samples
+    )
+    if not same:
+        return False
+    root = bytes.fromhex(aggregate.merkle_root)
+    return verify_inclusion(leaf_hash(proof.frame), proof.index, proof.tree_size, proof.path, root)
+
+
+class _Window:
+    __slots__ = (
+        "kwh", "samples", "first_ts", "last_ts", "max_ts", "out_of_order", "tree", "leaves", "cable_type", "user_region"
+    )
+
+    def __init__(self, cable_type: str, user_region: str):
+        self.kwh = 0.0
+        self.samples = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.max_ts = None
+        self.out_of_order = 0
+        self.tree = MerkleAccumulator()
+        self.leaves: List[bytes] = []     # Raw frames, emitted with the aggregate
+        self.cable_type = cable_type
+        self.user_region = user_region
+
+    def add(self, timestamp: int, kwh: float, raw: bytes):
+        if self.max_ts is not None and timestamp < self.max_ts:
+            self.out_of_order += 1
+        self.max_ts = timestamp if self.max_ts is None else max(self.max_ts, timestamp)
+        self.first_ts = timestamp if self.first_ts is None else min(self.first_ts, timestamp)
+        self.last_ts = timestamp if self.last_ts is None else max(self.last_ts, timestamp)
+        self.kwh += kwh
+        self.samples += 1
+        self.tree.add(raw)
+        self.leaves.append(bytes(raw))
+
+
+# === AGGREGATOR ===
+class WindowAggregator:
+    def __init__(
+        self,
+        window_seconds: int = WINDOW_SECONDS,
+        allowed_lateness: int = ALLOWED_LATENESS,
+        late_policy: str = "amend",
+    ):
+        if late_policy not in LATE_POLICIES:
+            raise ValueError(f"late_policy must be one of {sorted(LATE_POLICIES)}")
+        self.window_seconds = window_seconds
+        self.allowed_lateness = allowed_lateness
+        self.late_policy = late_policy
+        self.open: Dict[bytes, Dict[int, _Window]] = {}
+        self.closed_until: Dict[bytes, int] = {}         # device → end of its last emitted window
+        self.watermark: Dict[bytes, int] = {}
+        self.late: Dict[Tuple[bytes, int], _Window] = {}
+        self.amendments: "OrderedDict[Tuple[bytes, int], int]" = OrderedDict()     # (device, window) → last sequence
+        self.stats = {"samples": 0, "aggregates": 0, "out_of_order": 0, "late": 0, "dropped": 0}
+
+    def window_start(self, timestamp: int) -> int:
+        return timestamp - timestamp % self.window_seconds
+
+    def add(self, reading, raw: bytes) -> List[EnergyAggregate]:
+        """Fold one accepted EnergyReading (+ its raw frame); returns windows this closed."""
+        device_id, timestamp = reading.device_id, reading.timestamp
+        start = self.window_start(timestamp)
+        self.stats["samples"] += 1
+
+        if start + self.window_seconds <= self.closed_until.get(device_id, start):
+            self.stats["late"] += 1
+            if self.late_policy == "drop":
+                self.stats["dropped"] += 1
+                return []
+            window = self.late.get((device_id, start))
+            if window is None:
+                window = self.late[(device_id, start)] = _Window(reading.cable_type, reading.user_region)
+            window.add(timestamp, reading.kwh, raw)
+            return []
+
+        windows = self.open.setdefault(device_id, {})
+        window = windows.get(start)
+        if window is None:
+            window = windows[start] = _Window(reading.cable_type, reading.user_region)
+        before = window.out_of_order
+        window.add(timestamp, reading.kwh, raw)
+        self.stats["out_of_order"] += window.out_of_order - before
+
+        watermark = max(self.watermark.get(device_id, timestamp), timestamp)
+        self.watermark[device_id] = watermark
+        return self._close(device_id, watermark - self.allowed_lateness)
+
+    def advance(self, now: int) -> List[EnergyAggregate]:
+        """Close every window that ended allowed_lateness before now (idle devices included)."""
+        emitted = []
+        for device_id in list(self.open):
+            emitted += self._close(device_id, now - self.allowed_lateness)
+        return emitted + self._emit_late()
+
+    def flush(self) -> List[EnergyAggregate]:
+        """Emit everything still open (e.g. at shutdown)."""
+        emitted = []
+        for device_id in list(self.open):
+            emitted += self._close(device_id, None)
+        return emitted + self._emit_late()
+
+    def pending(self) -> int:
+        return sum(len(windows) for windows in self.open.values()) + len(self.late)
+
+    def _close(self, device_id: bytes, before: Optional[int]) -> List[EnergyAggregate]:
+        windows = self.open.get(device_id)
+        if not windows:
+            return []
+        due = sorted(s for s in windows if before is None or s + self.window_seconds <= before)
+        emitted = []
+        for start in due:
+            emitted.append(self._aggregate(device_id, start, windows.pop(start), amendment=False))
+            self.closed_until[device_id] = max(self.closed_until.get(device_id, 0), start + self.window_seconds)
+        if not windows:
+            del self.open[device_id]
+        return emitted
+
+    def _emit_late(self) -> List[EnergyAggregate]:
+        emitted = []
+        for (device_id, start), window in sorted(self.late.items()):
+            sequence = self.amendments.pop((device_id, start), 0) + 1
+            self.amendments[(device_id, start)] = sequence
+            if len(self.amendments) > AMENDMENT_HISTORY:
+                self.amendments.popitem(last=False)
+            emitted.append(self._aggregate(device_id, start, window, amendment=True, sequence=sequence))
+        self.late.clear()
+        return emitted
+
+    def _aggregate(
+        self, device_id: bytes, start: int, window: _Window, amendment: bool, sequence: int = 0
+    ) -> EnergyAggregate:
+        self.stats["aggregates"] += 1
+        return EnergyAggregate(
+            device_id=device_id,
+            window_start=start,
+            window_seconds=self.window_seconds,
+            kwh=window.kwh,
+            samples=window.samples,
+            first_ts=window.first_ts,
+            last_ts=window.last_ts,
+            out_of_order=window.out_of_order,
+            merkle_root=window.tree.root().hex(),
+            cable_type=window.cable_type,
+            user_region=window.user_region,
+            amendment=amendment,
+            sequence=sequence,
+            leaves=window.leaves,
+        )
@@ -0,0 +1,353 @@
+# src/carbon_smart_meter/core/archive.py
+"""
+Columnar Segment Archive (Energy & Offset History, Local Files)
+
+Instead of one JSON object per reading, records are written in batches to
+segment files under
+
+    {root}/{kind}/region={R}/day={D}/bucket={B:02d}/seg-*.csma
+
+where B = crc32(device_id) % buckets. A segment holds one column per field:
+
+    b"CSMA" | header length <u32> | JSON header | 64-byte aligned column blocks
+
+- device_id / wallet / cable_type are dictionary-encoded (u32 codes + sorted dictionary)
+- The header carries row count, min/max timestamp and the block layout, so
+  region/day/device-bucket pruning happens on paths and timestamp/device pruning
+  on headers, before any column is touched
+- Files are memory-mapped; "raw" columns are zero-copy NumPy views, "zlib"
+  columns cost one decompress (the writer's choice, per archive)
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# === CONFIG ===
+MAGIC = b"CSMA"
+ALIGN = 64
+ARCHIVE_BUCKETS = 16
+SEGMENT_ROWS = 1_000_000
+CODECS = {"raw", "zlib"}
+
+SCHEMAS = {
+    "energy": {
+        "device_id": "dict",
+        "kwh": "<f8",
+        "timestamp": "<i8",
+        "verified": "|u1",
+        "cable_type": "dict",
+    },
+    "offset": {
+        "device_id": "dict",
+        "wallet_address": "dict",
+        "kwh": "<f8",
+        "co2_kg": "<f8",
+        "timestamp": "<i8",
+    },
+}
+REGION_FIELD = {"energy": "user_region", "offset": "region"}
+
+
+def device_bucket(device_id: bytes, buckets: int = ARCHIVE_BUCKETS) -> int:
+    return zlib.crc32(device_id) % buckets
+
+
+def partition_dir(root: str, kind: str, region: str, day: int, bucket: int) -> str:
+    return os.path.join(root, kind, f"region={region}", f"day={day}", f"bucket={bucket:02d}")
+
+
+# === SEGMENT WRITE ===
+def _encode_dict(values: Sequence) -> Tuple[list, np.ndarray]:
+    dictionary = sorted(set(values))
+    lookup = {value: code for code, value in enumerate(dictionary)}
+    return dictionary, np.fromiter((lookup[v] for v in values), dtype="<u4", count=len(values))
+
+
+def write_segment(path: str, kind: str, columns: Dict[str, Sequence], codec: str = "zlib", extra: Optional[dict] = None):
+    """Write one segment file atomically. Dictionary columns take bytes/str values, the rest arrays."""
+    if codec not in CODECS:
+        raise ValueError(f"codec must be one of {sorted(CODECS)}")
+    schema = SCHEMAS[kind]
+    rows = len(columns["timestamp"])
+    timestamps = np.asarray(columns["timestamp"], dtype="<i8")
+
+    blocks: List[bytes] = []
+    layout = {}
+    dictionaries = {}
+    for name, dtype in schema.items():
+        if dtype == "dict":
+            values = columns[name]
+            dictionary, array = _encode_dict(values)
+            dictionaries[name] = [v.hex() if isinstance(v, bytes) else v for v in dictionary]
+            dtype = "<u4"
+        else:
+            array = np.ascontiguousarray(columns[name], dtype=dtype)
+        data = array.tobytes()
+        stored = zlib.compress(data, 1) if codec == "zlib" else data
+        layout[name] = {"dtype": dtype, "codec": codec, "size": len(stored), "raw_size": len(data)}
+        blocks.append(stored)
+
+    header = {
+        "kind": kind,
+        "rows": rows,
+        "min_ts": int(timestamps.min()) if rows else 0,
+        "max_ts": int(timestamps.max()) if rows else -1,
+        "dictionaries": dictionaries,
+        "columns": layout,
+        **(extra or {}),
+    }
+    # Offsets depend on the header length and vice versa: lay out until it settles
+    encoded = b""
+    while True:
+        offset = _align(len(MAGIC) + 4 + len(encoded))
+        for name, block in zip(schema, blocks):
+            layout[name]["offset"] = offset
+            offset = _align(offset + len(block))
+        settled = json.dumps(header, separators=(",", ":")).encode()
+        if len(settled) == len(encoded):
+            encoded = settled
+            break
+        encoded = settled
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+        for name, block in zip(schema, blocks):
+            f.write(b"\0" * (layout[name]["offset"] - f.tell()))
+            f.write(block)
+    os.replace(tmp, path)
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+# === SEGMENT READ ===
+class Segment:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:4] != MAGIC:
+            raise ValueError(f"{path} is not an archive segment")
+        (length,) = struct.unpack_from("<I", self.map, 4)
+        self.header = json.loads(self.map[8:8 + length])
+        self.rows = self.header["rows"]
+        self._dictionaries: Dict[str, np.ndarray] = {}
+
+    @property
+    def min_ts(self) -> int:
+        return self.header["min_ts"]
+
+    @property
+    def max_ts(self) -> int:
+        return self.header["max_ts"]
+
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy view for raw columns; dictionary columns come back as u32 codes."""
+        spec = self.header["columns"][name]
+        if spec["codec"] == "raw":
+            return np.frombuffer(self.map, dtype=spec["dtype"], count=self.rows, offset=spec["offset"])
+        block = self.map[spec["offset"]:spec["offset"] + spec["size"]]
+        return np.frombuffer(zlib.decompress(block), dtype=spec["dtype"])
+
+    def dictionary(self, name: str) -> np.ndarray:
+        """Sorted dictionary of a dictionary-encoded column (device ids as V32)."""
+        values = self._dictionaries.get(name)
+        if values is None:
+            raw = self.header["dictionaries"][name]
+            if name == "device_id":
+                values = np.array([bytes.fromhex(v) for v in raw], dtype="V32")
+            else:
+                values = np.array(raw, dtype=object)
+            self._dictionaries[name] = values
+        return values
+
+    def device_code(self, device_id: bytes) -> Optional[int]:
+        devices = self.dictionary("device_id")
+        needle = np.array([device_id], dtype="V32")
+        i = int(np.searchsorted(devices, needle[0]))
+        return i if i < len(devices) and devices[i] == needle[0] else None
+
+    def decoded(self, name: str) -> np.ndarray:
+        return self.dictionary(name)[self.column(name)]
+
+    def close(self):
+        try:
+            self.map.close()
+        except BufferError:
+            pass        # zero-copy columns still in use: the map closes when they are released
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# === ARCHIVE ===
+class ArchiveWriter:
+    """Buffers records per (region, day, device bucket) and writes a segment per SEGMENT_ROWS rows."""
+
+    def __init__(
+        self,
+        root: str,
+        kind: str,
+        buckets: int = ARCHIVE_BUCKETS,
+        segment_rows: int = SEGMENT_ROWS,
+        codec: str = "zlib",
+    ):
+        if kind not in SCHEMAS:
+            raise ValueError(f"kind must be one of {sorted(SCHEMAS)}")
+        self.root = root
+        self.kind = kind
+        self.buckets = buckets
+        self.segment_rows = segment_rows
+        self.codec = codec
+        self.buffers: Dict[Tuple[str, int, int], Dict[str, list]] = {}
+        self.segments_written = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        """Append one EnergyReading / OffsetRecord (anything with the schema's fields)."""
+        region = getattr(record, REGION_FIELD[self.kind])
+        partition = (region, record.timestamp // 86400, device_bucket(record.device_id, self.buckets))
+        with self._lock:
+            buffer = self.buffers.get(partition)
+            if buffer is None:
+                buffer = self.buffers[partition] = {name: [] for name in SCHEMAS[self.kind]}
+            for name, column in buffer.items():
+                column.append(getattr(record, name))
+            if len(buffer["timestamp"]) >= self.segment_rows:
+                self._write(partition, self.buffers.pop(partition))
+
+    def add_many(self, records):
+        for record in records:
+            self.add(record)
+
+    def flush(self):
+        with self._lock:
+            buffers, self.buffers = self.buffers, {}
+            for partition, buffer in buffers.items():
+                self._write(partition, buffer)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, partition: Tuple[str, int, int], buffer: Dict[str, list]):
+        region, day, bucket = partition
+        self._sequence += 1
+        name = f"seg-{os.getpid()}-{id(self):x}-{self._sequence:06d}.csma"
+        path = os.path.join(partition_dir(self.root, self.kind, region, day, bucket), name)
+        write_segment(path, self.kind, buffer, self.codec, {"region": region, "day": day, "bucket": bucket})
+        self.segments_written += 1
+
+
+class ArchiveReader:
+    def __init__(self, root: str, kind: str, buckets: int = ARCHIVE_BUCKETS):
+        self.root = root
+        self.kind = kind
+        self.buckets = buckets
+        self.stats = {"segments_listed": 0, "segments_scanned": 0}
+
+    def segment_paths(
+        self,
+        region: Optional[str] = None,
+        first_day: Optional[int] = None,
+        last_day: Optional[int] = None,
+        device_id: Optional[bytes] = None,
+    ) -> Iterator[str]:
+        """Partition pruning on the directory layout alone."""
+        base = os.path.join(self.root, self.kind)
+        regions = [f"region={region}"] if region else _listdir(base)
+        bucket = f"bucket={device_bucket(device_id, self.buckets):02d}" if device_id is not None else None
+        for region_dir in regions:
+            for day_dir in _listdir(os.path.join(base, region_dir)):
+                day = int(day_dir.split("=", 1)[1])
+                if (first_day is not None and day < first_day) or (last_day is not None and day > last_day):
+                    continue
+                day_path = os.path.join(base, region_dir, day_dir)
+                for bucket_dir in ([bucket] if bucket else _listdir(day_path)):
+                    bucket_path = os.path.join(day_path, bucket_dir)
+                    for name in _listdir(bucket_path):
+                        if name.endswith(".csma"):
+                            self.stats["segments_listed"] += 1
+                            yield os.path.join(bucket_path, name)
+
+    def scan(
+        self,
+        region: Optional[str] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        device_id: Optional[bytes] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Yield column arrays per matching segment, restricted to start <= timestamp < end
+        (and one device, if given). Dictionary columns come decoded, with their raw
+        u32 codes alongside under "<name>_code".
+        """
+        columns = list(columns or SCHEMAS[self.kind])
+        first_day = start // 86400 if start is not None else None
+        last_day = (end - 1) // 86400 if end is not None else None
+        for path in self.segment_paths(region, first_day, last_day, device_id):
+            with Segment(path) as segment:
+                if start is not None and segment.max_ts < start:
+                    continue
+                if end is not None and segment.min_ts >= end:
+                    continue
+                code = None
+                if device_id is not None:
+                    code = segment.device_code(device_id)
+                    if code is None:
+                        continue
+                self.stats["segments_scanned"] += 1
+
+                mask = None
+                if start is not None or end is not None:
+                    ts = segment.column("timestamp")
+                    mask = np.ones(segment.rows, dtype=bool)
+                    if start is not None:
+                        mask &= ts >= start
+                    if end is not None:
+                        mask &= ts < end
+                if code is not None:
+                    device_mask = segment.column("device_id") == code
+                    mask = device_mask if mask is None else mask & device_mask
+
+                out = {}
+                for name in columns:
+                    if SCHEMAS[self.kind][name] == "dict":
+                        codes = segment.column(name)
+                        codes = codes if mask is None else codes[mask]
+                        out[f"{name}_code"] = codes
+                        out[name] = segment.dictionary(name)[codes]
+                    else:
+                        values = segment.column(name)
+                        out[name] = values if mask is None else values[mask]
+                yield out
+
+    def total(self, column: str = "kwh", **filters) -> float:
+        return float(sum(chunk[column].sum() for chunk in self.scan(columns=[column], **filters)))
+
+
+def _listdir(path: str) -> List[str]:
+    try:
+        return sorted(os.listdir(path))
+    except FileNotFoundError:
+        return []
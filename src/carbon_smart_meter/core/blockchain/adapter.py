@@ -1,2 +1,242 @@
-python<br>from abc import ABC, abstractmethod<br><br>class BlockchainAdapter(ABC):<br>    @abstractmethod<br>    def submit_kwh(self, device_id: bytes, kwh: int, sig: bytes) -> str:<br>        pass<br>
+# src/carbon_smart_meter/core/blockchain/adapter.py
+"""
+Multi-Chain Submission Interface (Async, Pooled, Rate Limited)
 
+One BlockchainAdapter per chain, all driven the same way from asyncio:
+- submit_batch() checks device signatures off-chain, packs records into the
+  chain's transactions and sends them concurrently (bounded by max_inflight)
+- Every adapter talks JSON-RPC through one RpcSession: a pooled, keep-alive
+  httpx.AsyncClient instead of a connection per request
+- Every send first takes a token from the chain's RateLimiter, so all adapters
+  of one chain in a process share that node's request budget
+- Chains plug in with @register_adapter and are built by name with create_adapter()
+"""
+
+import asyncio
+import importlib
+import itertools
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from ...blockchain.batching import KwhRecord, device_signature_ok
+from ..keys import DeviceKeyResolver
+from ..metrics import QUEUE_DEPTH, SUBMIT_FAILURES, SUBMIT_SECONDS, clock, metrics
+from ..mining import VerifyKeyCache
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+MAX_INFLIGHT_SENDS = 16
+RPC_MAX_CONNECTIONS = 32
+RPC_TIMEOUT = 30.0
+
+CHAIN_RATE_LIMITS = {           # (requests per second, burst) per chain, shared in-process
+    "solana": (40.0, 40),
+}
+
+
+# === RATE LIMITING ===
+class RateLimiter:
+    """Token bucket; waiters are served in arrival order."""
+
+    _shared: Dict[str, "RateLimiter"] = {}
+
+    def __init__(self, rate: Optional[float], burst: Optional[float] = None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate or 1.0)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+        self._lock: Optional[asyncio.Lock] = None      # Per event loop: shared limiters outlive asyncio.run()
+        self._loop = None
+
+    @classmethod
+    def for_chain(cls, chain: str) -> "RateLimiter":
+        """The process-wide limiter of a chain (unlimited if CHAIN_RATE_LIMITS has no entry)."""
+        limiter = cls._shared.get(chain)
+        if limiter is None:
+            limiter = cls._shared[chain] = cls(*CHAIN_RATE_LIMITS.get(chain, (None, None)))
+        return limiter
+
+    async def acquire(self, tokens: float = 1.0):
+        if self.rate is None:
+            return
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        async with self._lock:
+            while True:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+# === JSON-RPC SESSION ===
+class RpcError(Exception):
+    def __init__(self, error: Any):
+        self.code = error.get("code") if isinstance(error, dict) else None
+        super().__init__(error.get("message", error) if isinstance(error, dict) else error)
+
+
+class RpcSession:
+    """JSON-RPC 2.0 over one pooled HTTP client, built on first call."""
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = RPC_MAX_CONNECTIONS,
+        timeout: float = RPC_TIMEOUT,
+        transport: Any = None,
+    ):
+        self.url = url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.transport = transport
+        self._client = None
+        self._ids = itertools.count(1)
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                timeout=self.timeout,
+                transport=self.transport,
+            )
+        return self._client
+
+    async def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        request = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": list(params)}
+        response = await self.client.post(self.url, json=request)
+        response.raise_for_status()
+        body = response.json()
+        if body.get("error") is not None:
+            raise RpcError(body["error"])
+        return body.get("result")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# === ADAPTER ===
+class BlockchainAdapter(ABC):
+    """
+    Chain-agnostic submission loop. Subclasses set `chain` and implement plan()
+    (records → transactions), send_batch() (one transaction → its id) and statuses().
+    """
+
+    chain = ""
+
+    def __init__(
+        self,
+        session: RpcSession,
+        rate_limiter: Optional[RateLimiter] = None,
+        resolver: Optional[DeviceKeyResolver] = None,
+        max_inflight: int = MAX_INFLIGHT_SENDS,
+    ):
+        self.session = session
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter.for_chain(self.chain)
+        self.resolver = resolver
+        self.key_cache = VerifyKeyCache()
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        QUEUE_DEPTH.labels(queue=f"submit:{self.chain}").track(self, lambda adapter: adapter.inflight)
+
+    async def submit_kwh(self, record: KwhRecord, market_cap: Optional[int] = None) -> Optional[str]:
+        return (await self.submit_batch([record], market_cap))[0]
+
+    async def submit_batch(self, records: Sequence[KwhRecord], market_cap: Optional[int] = None) -> List[Optional[str]]:
+        """
+        Submit many readings; returns, per record, the id of the transaction that
+        carried it, or None (bad device signature or failed send).
+        """
+        valid = [i for i, record in enumerate(records) if self.verify_record(record)]
+        if metrics.enabled and len(valid) < len(records):
+            SUBMIT_FAILURES.labels(reason="signature").inc(len(records) - len(valid))
+        batches = self.plan([records[i] for i in valid], market_cap)
+        tx_ids = await asyncio.gather(*(self._send(batch, market_cap) for batch in batches))
+
+        results: List[Optional[str]] = [None] * len(records)
+        position = 0
+        for batch, tx_id in zip(batches, tx_ids):
+            for i in valid[position:position + len(batch)]:
+                results[i] = tx_id
+            position += len(batch)
+        return results
+
+    def verify_record(self, record: KwhRecord) -> bool:
+        return device_signature_ok(record, self.resolver, self.key_cache)
+
+    @abstractmethod
+    def plan(self, records: Sequence[KwhRecord], market_cap: Optional[int]) -> List[List[KwhRecord]]:
+        """Split records into transactions, keeping order."""
+
+    @abstractmethod
+    async def send_batch(self, batch: List[KwhRecord], market_cap: Optional[int]) -> str:
+        """Send one transaction; raise on failure."""
+
+    @abstractmethod
+    async def statuses(self, tx_ids: Sequence[str]) -> List[Optional[bool]]:
+        """Per transaction: True = landed, False = failed on chain, None = not known yet."""
+
+    async def close(self):
+        await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _send(self, batch: List[KwhRecord], market_cap: Optional[int]) -> Optional[str]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_inflight)
+        async with self._slots:
+            await self.rate_limiter.acquire()
+            started = clock() if metrics.enabled else None
+            self.inflight += 1
+            try:
+                return await self.send_batch(batch, market_cap)
+            except Exception as e:
+                logger.warning("%s batch of %d kWh records failed to submit: %s", self.chain, len(batch), e)
+                if started is not None:
+                    SUBMIT_FAILURES.labels(reason="rpc").inc(len(batch))
+                return None
+            finally:
+                self.inflight -= 1
+                if started is not None:
+                    SUBMIT_SECONDS.labels(mode="async").observe(clock() - started)
+
+
+# === REGISTRY ===
+ADAPTERS: Dict[str, Type[BlockchainAdapter]] = {}
+
+
+def register_adapter(cls: Type[BlockchainAdapter]) -> Type[BlockchainAdapter]:
+    ADAPTERS[cls.chain] = cls
+    return cls
+
+
+def create_adapter(chain: str, **kwargs) -> BlockchainAdapter:
+    """Adapter for chain; built-in chains are imported from core.blockchain.<chain> on demand."""
+    if chain not in ADAPTERS:
+        module = f"{__package__}.{chain}"
+        try:
+            importlib.import_module(module)
+        except ModuleNotFoundError as e:
+            if e.name != module:
+                raise
+    if chain not in ADAPTERS:
+        raise ValueError(f"no blockchain adapter registered for {chain!r}")
+    return ADAPTERS[chain](**kwargs)
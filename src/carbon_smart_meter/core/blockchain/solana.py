@@ -1,68 +1,175 @@
-# src/carbon_smart_meter/blockchain/solana.py
+# src/carbon_smart_meter/core/blockchain/solana.py
 """
 Solana Submission (Hard Wired, Tamper Proof)
 
-Submits verified kWh to Solana BPF program via cable only flow.
+The one Solana implementation: multi-record CSMB instructions (see
+blockchain/batching.py) in legacy transactions signed by the operator wallet.
+- SolanaAdapter: async BlockchainAdapter over JSON-RPC (sendTransaction base64)
+- build_transaction(): shared with the blocking BatchSolanaSubmitter
+- batch_account_error(): process_batch's account/signer checks, run offline
+- The recent blockhash is reused for blockhash_ttl and dropped after a failed send
 """
 
-from typing import Optional
-from solana.rpc.api import Client
-from solana.transaction import Transaction
-from solana.system_program import SYS_PROGRAM_ID
-from solana.publickey import PublicKey
-from solana.keypair import Keypair
-from nacl.signing import VerifyKey
+import asyncio
+import base64
+import time
+from functools import lru_cache
+from typing import List, Mapping, Optional, Sequence, Tuple
+
 from nacl.exceptions import BadSignatureError
-import struct
+from nacl.signing import VerifyKey
+from solders.hash import Hash
+from solders.instruction import AccountMeta, Instruction
+from solders.keypair import Keypair
+from solders.message import Message
+from solders.pubkey import Pubkey
+from solders.system_program import ID as SYS_PROGRAM_ID
+from solders.transaction import Transaction
+
+from ...blockchain.batching import (
+    BLOCKHASH_TTL, FIXED_ACCOUNTS, PACKET_DATA_SIZE, RECORD_ACCOUNTS, KwhRecord,
+    decode_batch, device_message, encode_batch, plan_batches,
+)
+from ..clients import SOLANA_RPC
+from .adapter import BlockchainAdapter, RpcSession, register_adapter
 
 # === CONFIG ===
-SOLANA_RPC = "https://api.devnet.solana.com"
-PROGRAM_ID = PublicKey("11111111111111111111111111111111")  # Replace after deploy
-client = Client(SOLANA_RPC)
+PROGRAM_ID = Pubkey.from_string("11111111111111111111111111111111")  # Replace after deploy
+CONFIRMED = {"confirmed", "finalized"}
+STATUS_BATCH = 256              # Signatures per getSignatureStatuses call
 
-class SolanaSubmitter:
-    def __init__(self, wallet: Keypair):
-        self.wallet = wallet
 
-    def submit_kwh(
-        self,
-        device_id: bytes,
-        public_key: bytes,
-        kwh: int,
-        signature: bytes,
-        market_cap: Optional[int] = None
-    ) -> Optional[str]:
-        if not self._verify_device_sig(device_id, public_key, signature):
-            return None
-
-        data = device_id + struct.pack("<Q", kwh) + signature
-        if market_cap is not None:
-            data += struct.pack("<Q", market_cap)
-
-        tx = Transaction().add(
-            {
-                "keys": [
-                    {"pubkey": self.wallet.public_key, "is_signer": True, "is_writable": True},
-                    {"pubkey": PublicKey(0), "is_signer": False, "is_writable": True},
-                    {"pubkey": PublicKey(0), "is_signer": False, "is_writable": True},
-                    {"pubkey": SYS_PROGRAM_ID, "is_signer": False, "is_writable": False},
-                ],
-                "program_id": PROGRAM_ID,
-                "data": list(data),
-            }
-        )
+# === ACCOUNTS & TRANSACTIONS ===
+@lru_cache(maxsize=100_000)
+def mining_account(device_id: bytes, program_id: Pubkey = PROGRAM_ID) -> Pubkey:
+    return Pubkey.find_program_address([b"mining", device_id], program_id)[0]
+
+
+@lru_cache(maxsize=16)
+def state_account(program_id: Pubkey = PROGRAM_ID) -> Pubkey:
+    return Pubkey.find_program_address([b"state"], program_id)[0]
+
+
+def build_transaction(
+    wallet: Keypair,
+    batch: Sequence[KwhRecord],
+    data: bytes,
+    blockhash: str,
+    program_id: Pubkey = PROGRAM_ID,
+) -> Transaction:
+    """
+    Signed process_batch transaction: operator (wallet), state, token, system
+    program, then each record's mining account followed by its owner's wallet.
+    """
+    if any(record.wallet is None for record in batch):
+        raise ValueError("every record needs its mining account's wallet")
+    keys = [
+        AccountMeta(wallet.pubkey(), is_signer=True, is_writable=True),
+        AccountMeta(state_account(program_id), is_signer=False, is_writable=True),
+        AccountMeta(Pubkey.default(), is_signer=False, is_writable=True),
+        AccountMeta(SYS_PROGRAM_ID, is_signer=False, is_writable=False),
+    ]
+    for record in batch:
+        keys.append(AccountMeta(mining_account(record.device_id, program_id), is_signer=False, is_writable=True))
+        keys.append(AccountMeta(Pubkey.from_bytes(record.wallet), is_signer=False, is_writable=True))
+    recent = Hash.from_string(blockhash)
+    message = Message.new_with_blockhash([Instruction(program_id, data, keys)], wallet.pubkey(), recent)
+    return Transaction([wallet], message, recent)
 
+
+def batch_account_error(
+    tx: Transaction,
+    operator: Pubkey,
+    devices: Mapping[bytes, Tuple[Pubkey, bytes]],
+    program_id: Pubkey = PROGRAM_ID,
+) -> Optional[str]:
+    """
+    The ProgramError process_batch would return for tx's accounts and signers,
+    or None. devices maps device_id → (mining account wallet, device public key),
+    the on-chain state the program reads.
+    """
+    message = tx.message
+    ix = message.instructions[0]
+    accounts = [message.account_keys[i] for i in ix.accounts]
+    if not accounts or not message.is_signer(ix.accounts[0]) or accounts[0] != operator:
+        return "MissingRequiredSignature"
+    records, _ = decode_batch(bytes(ix.data))
+    if len(accounts) < FIXED_ACCOUNTS + RECORD_ACCOUNTS * len(records):
+        return "NotEnoughAccountKeys"
+    for i, (device_id, _, signature) in enumerate(records):
+        first = FIXED_ACCOUNTS + RECORD_ACCOUNTS * i
+        mining, wallet = accounts[first], accounts[first + 1]
+        owner = devices.get(device_id)
+        if owner is None or mining != mining_account(device_id, program_id) or wallet != owner[0]:
+            return "InvalidAccountData"
         try:
-            resp = client.send_transaction(tx, self.wallet)
-            return resp.get("result")
-        except Exception as e:
-            print(f"Submit failed: {e}")
-            return None
+            VerifyKey(owner[1]).verify(device_message(device_id, bytes(wallet)), signature)
+        except (BadSignatureError, ValueError):
+            return "InvalidInstructionData"
+    return None
+
+
+# === ADAPTER ===
+@register_adapter
+class SolanaAdapter(BlockchainAdapter):
+    chain = "solana"
 
-    def _verify_device_sig(self, device_id: bytes, public_key: bytes, signature: bytes) -> bool:
+    def __init__(
+        self,
+        wallet: Keypair,
+        session: Optional[RpcSession] = None,
+        url: str = SOLANA_RPC,
+        program_id: Pubkey = PROGRAM_ID,
+        blockhash_ttl: float = BLOCKHASH_TTL,
+        size_limit: int = PACKET_DATA_SIZE,
+        skip_preflight: bool = False,
+        **kwargs,
+    ):
+        super().__init__(session if session is not None else RpcSession(url), **kwargs)
+        self.wallet = wallet
+        self.program_id = program_id
+        self.blockhash_ttl = blockhash_ttl
+        self.size_limit = size_limit
+        self.skip_preflight = skip_preflight
+        self._blockhash: Optional[str] = None
+        self._blockhash_at = 0.0
+        self._blockhash_lock: Optional[asyncio.Lock] = None
+
+    def plan(self, records: Sequence[KwhRecord], market_cap: Optional[int]) -> List[List[KwhRecord]]:
+        return plan_batches(records, market_cap is not None, self.size_limit)
+
+    async def recent_blockhash(self) -> str:
+        if self._blockhash_lock is None:
+            self._blockhash_lock = asyncio.Lock()
+        async with self._blockhash_lock:
+            if self._blockhash is None or time.monotonic() - self._blockhash_at > self.blockhash_ttl:
+                await self.rate_limiter.acquire()
+                result = await self.session.call("getLatestBlockhash", [{"commitment": "confirmed"}])
+                self._blockhash = result["value"]["blockhash"]
+                self._blockhash_at = time.monotonic()
+            return self._blockhash
+
+    async def send_batch(self, batch: List[KwhRecord], market_cap: Optional[int]) -> str:
+        tx = build_transaction(self.wallet, batch, encode_batch(batch, market_cap), await self.recent_blockhash(), self.program_id)
+        options = {"encoding": "base64", "skipPreflight": self.skip_preflight, "preflightCommitment": "confirmed"}
         try:
-            verify_key = VerifyKey(public_key)
-            verify_key.verify(device_id, signature)
-            return True
-        except BadSignatureError:
-            return False
\ No newline at end of file
+            return await self.session.call("sendTransaction", [base64.b64encode(bytes(tx)).decode(), options])
+        except Exception:
+            # Most often an expired blockhash: fetch a fresh one next time
+            self._blockhash = None
+            raise
+
+    async def statuses(self, tx_ids: Sequence[str]) -> List[Optional[bool]]:
+        """One rate-limited getSignatureStatuses call per STATUS_BATCH ids (the RPC's limit)."""
+        tx_ids = list(tx_ids)
+        found = []
+        for i in range(0, len(tx_ids), STATUS_BATCH):
+            await self.rate_limiter.acquire()
+            result = await self.session.call(
+                "getSignatureStatuses", [tx_ids[i:i + STATUS_BATCH], {"searchTransactionHistory": True}]
+            )
+            found += result["value"]
+        return [
+            None if status is None or status.get("confirmationStatus") not in CONFIRMED else status.get("err") is None
+            for status in found
+        ]
@@ -0,0 +1,310 @@
+# src/carbon_smart_meter/core/capstore.py
+"""
+Daily Cap State (Bounded, Persistent, Shared Between Workers)
+
+Tracks kWh mined per (device_id, UTC day) for the 1.5 kWh/day cap.
+- MemoryCapStore: in-process, keeps only the most recent days
+- SQLiteCapStore: survives restarts; one file can be shared by several processor processes
+- check_and_add is atomic and has the exact semantics of EnergyProcessor's cap logic
+- Retention follows the latest accepted day, which can never pass the server
+  clock: samples dated after now + MAX_CLOCK_SKEW are rejected, so one device
+  with a wrong (or hostile) clock cannot evict every other device's usage
+"""
+
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .columnar import apply_daily_cap
+from .mining import DAILY_KWH_CAP
+
+# === CONFIG ===
+RETENTION_DAYS = 2          # Today + yesterday (late packets around midnight)
+MAX_CLOCK_SKEW = 300        # Seconds a sample may be dated ahead of the server clock
+
+Key = Tuple[bytes, int]
+
+
+def cap_add(used: float, kwh: float, cap: float = DAILY_KWH_CAP) -> Tuple[Optional[float], float]:
+    """(allowed kWh or None if rejected, new running total) for one sample."""
+    current_day_kwh = used + kwh
+    if current_day_kwh > cap:
+        kwh = max(0.0, cap - used)
+        if kwh <= 0:
+            return None, used
+    return kwh, current_day_kwh
+
+
+# === BASE ===
+class CapStore(ABC):
+    """
+    Mapping-style access (get / [] / snapshot) plus atomic check-and-add.
+
+    Days older than the retention window are evicted; samples for them, and for
+    days after horizon(), are rejected.
+    """
+
+    def __init__(self, retention_days: int = RETENTION_DAYS, cap: float = DAILY_KWH_CAP, clock=time.time):
+        self.retention_days = retention_days
+        self.cap = cap
+        self.clock = clock
+        self.latest_day = 0
+
+    @abstractmethod
+    def check_and_add(self, device_id: bytes, day: int, kwh: float) -> Optional[float]:
+        """kWh allowed (clipped to the cap) or None if rejected; adds it to the day's usage."""
+
+    @abstractmethod
+    def apply_batch(self, device_ids, timestamps, kwh) -> Tuple[np.ndarray, np.ndarray]:
+        """Columnar check-and-add for a whole batch (see columnar.apply_daily_cap), atomically."""
+
+    @abstractmethod
+    def release(self, device_id: bytes, day: int, kwh: float):
+        """Undo a check_and_add(device_id, day, kwh) that was allowed (e.g. the reading was never stored)."""
+
+    @abstractmethod
+    def get(self, key: Key, default: float = 0.0) -> float:
+        """Usage of (device_id, day)."""
+
+    @abstractmethod
+    def snapshot(self) -> Dict[Key, float]:
+        """All retained usage."""
+
+    def horizon(self) -> int:
+        """Latest UTC day a sample may be dated (server clock + MAX_CLOCK_SKEW)."""
+        return int((self.clock() + MAX_CLOCK_SKEW) // 86400)
+
+    def __getitem__(self, key: Key) -> float:
+        value = self.get(key, None)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: Key) -> bool:
+        return self.get(key, None) is not None
+
+    def _expired(self, day: int) -> bool:
+        return day <= self.latest_day - self.retention_days
+
+
+# === IN-MEMORY ===
+class MemoryCapStore(CapStore):
+    def __init__(self, retention_days: int = RETENTION_DAYS, cap: float = DAILY_KWH_CAP, clock=time.time):
+        super().__init__(retention_days, cap, clock)
+        self.days: Dict[int, Dict[bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def check_and_add(self, device_id: bytes, day: int, kwh: float) -> Optional[float]:
+        if day > self.horizon():
+            return None
+        with self._lock:
+            self._advance(day)
+            if self._expired(day):
+                return None
+            usage = self.days.setdefault(day, {})
+            allowed, total = cap_add(usage.get(device_id, 0.0), kwh, self.cap)
+            if allowed is not None:
+                usage[device_id] = total
+            return allowed
+
+    def release(self, device_id: bytes, day: int, kwh: float):
+        with self._lock:
+            usage = self.days.get(day)
+            if usage is not None and device_id in usage:
+                usage[device_id] = max(0.0, usage[device_id] - kwh)
+
+    def apply_batch(self, device_ids, timestamps, kwh):
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        days = timestamps // 86400
+        dated = days <= self.horizon()
+        with self._lock:
+            if dated.any():
+                self._advance(int(days[dated].max()))
+            live = dated & (days > self.latest_day - self.retention_days)
+            allowed, accepted = apply_daily_cap(
+                np.asarray(_as_ids(device_ids))[live], timestamps[live], np.asarray(kwh)[live],
+                _DayView(self.days), self.cap
+            )
+        return _expand(live, allowed, accepted)
+
+    def get(self, key: Key, default: float = 0.0) -> float:
+        device_id, day = key
+        return self.days.get(day, {}).get(device_id, default)
+
+    def __setitem__(self, key: Key, value: float):
+        device_id, day = key
+        with self._lock:
+            self._advance(day)
+            self.days.setdefault(day, {})[device_id] = value
+
+    def __len__(self) -> int:
+        return sum(len(usage) for usage in self.days.values())
+
+    def snapshot(self) -> Dict[Key, float]:
+        return {(d, day): kwh for day, usage in self.days.items() for d, kwh in usage.items()}
+
+    def _advance(self, day: int):
+        if day <= self.latest_day:
+            return
+        self.latest_day = day
+        for old in [d for d in self.days if self._expired(d)]:
+            del self.days[old]
+
+
+class _DayView:
+    """(device_id, day)-keyed mapping over MemoryCapStore.days, for apply_daily_cap."""
+
+    def __init__(self, days: Dict[int, Dict[bytes, float]]):
+        self.days = days
+
+    def get(self, key: Key, default: float = 0.0) -> float:
+        return self.days.get(key[1], {}).get(key[0], default)
+
+    def __setitem__(self, key: Key, value: float):
+        self.days.setdefault(key[1], {})[key[0]] = value
+
+
+# === DURABLE (SQLITE) ===
+class SQLiteCapStore(CapStore):
+    """
+    Cap state in a local SQLite file (WAL mode).
+
+    Each check-and-add runs in a BEGIN IMMEDIATE transaction, so processor
+    workers in other threads or processes sharing the file cannot double-spend a cap.
+    The retention watermark is read from the file in that transaction, so every
+    process sharing it evicts and rejects the same days.
+    """
+
+    def __init__(
+        self, path: str, retention_days: int = RETENTION_DAYS, cap: float = DAILY_KWH_CAP, clock=time.time
+    ):
+        super().__init__(retention_days, cap, clock)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS daily_usage ("
+            " device_id BLOB NOT NULL, day INTEGER NOT NULL, kwh REAL NOT NULL,"
+            " PRIMARY KEY (device_id, day)) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS daily_usage_day ON daily_usage (day)")
+        self._lock = threading.Lock()
+        row = self.conn.execute("SELECT MAX(day) FROM daily_usage").fetchone()
+        self.latest_day = row[0] or 0
+
+    def check_and_add(self, device_id: bytes, day: int, kwh: float) -> Optional[float]:
+        if day > self.horizon():
+            return None
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._advance(day)
+                if self._expired(day):
+                    self.conn.execute("COMMIT")
+                    return None
+                row = self.conn.execute(
+                    "SELECT kwh FROM daily_usage WHERE device_id = ? AND day = ?", (device_id, day)
+                ).fetchone()
+                allowed, total = cap_add(row[0] if row else 0.0, kwh, self.cap)
+                if allowed is not None:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO daily_usage (device_id, day, kwh) VALUES (?, ?, ?)",
+                        (device_id, day, total)
+                    )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            return allowed
+
+    def release(self, device_id: bytes, day: int, kwh: float):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE daily_usage SET kwh = MAX(0.0, kwh - ?) WHERE device_id = ? AND day = ?",
+                (kwh, device_id, day)
+            )
+
+    def apply_batch(self, device_ids, timestamps, kwh):
+        ids = _as_ids(device_ids)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        days = timestamps // 86400
+        dated = days <= self.horizon()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._advance(int(days[dated].max()) if dated.any() else 0)
+                live = dated & (days > self.latest_day - self.retention_days)
+                keys = {(ids[i], int(days[i])) for i in np.flatnonzero(live)}
+                usage = {}
+                for key in keys:
+                    row = self.conn.execute(
+                        "SELECT kwh FROM daily_usage WHERE device_id = ? AND day = ?", key
+                    ).fetchone()
+                    if row:
+                        usage[key] = row[0]
+                before = dict(usage)
+                allowed, accepted = apply_daily_cap(
+                    np.asarray(ids)[live], timestamps[live], np.asarray(kwh)[live], usage, self.cap
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO daily_usage (device_id, day, kwh) VALUES (?, ?, ?)",
+                    [(d, day, v) for (d, day), v in usage.items() if before.get((d, day)) != v]
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return _expand(live, allowed, accepted)
+
+    def get(self, key: Key, default: float = 0.0) -> float:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT kwh FROM daily_usage WHERE device_id = ? AND day = ?", key
+            ).fetchone()
+        return row[0] if row else default
+
+    def __setitem__(self, key: Key, value: float):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO daily_usage (device_id, day, kwh) VALUES (?, ?, ?)",
+                (key[0], key[1], value)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM daily_usage").fetchone()[0]
+
+    def snapshot(self) -> Dict[Key, float]:
+        with self._lock:
+            rows = self.conn.execute("SELECT device_id, day, kwh FROM daily_usage").fetchall()
+        return {(bytes(d), day): kwh for d, day, kwh in rows}
+
+    def close(self):
+        self.conn.close()
+
+    def _advance(self, day: int):
+        """Inside a transaction: the watermark is the file's latest day, shared by every process."""
+        stored = self.conn.execute("SELECT MAX(day) FROM daily_usage").fetchone()[0] or 0
+        self.latest_day = max(stored, day)
+        if day > stored:
+            self.conn.execute("DELETE FROM daily_usage WHERE day <= ?", (day - self.retention_days,))
+
+
+# === HELPERS ===
+def _as_ids(device_ids):
+    if isinstance(device_ids, np.ndarray):
+        return [bytes(d).ljust(32, b"\x00") for d in device_ids]
+    return list(device_ids)
+
+
+def _expand(live: np.ndarray, allowed: np.ndarray, accepted: np.ndarray):
+    full_allowed = np.zeros(len(live), dtype=np.float64)
+    full_accepted = np.zeros(len(live), dtype=bool)
+    full_allowed[live] = allowed
+    full_accepted[live] = accepted
+    return full_allowed, full_accepted
@@ -0,0 +1,138 @@
+# src/carbon_smart_meter/core/clients.py
+"""
+Shared Cloud & RPC Clients (Lazy, Injectable)
+
+One Azure credential, one pooled BlobServiceClient, one S3 client per AWS region
+and one Solana RPC client per process, each built on first use.
+- Importing the package does no credential discovery and needs no network
+- Tests and offline runs swap in local stand-ins via set_clients(ClientRegistry.local())
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+# === CONFIG ===
+AZURE_ACCOUNT_URL = "https://backupstorage.blob.core.windows.net"
+SOLANA_RPC = "https://api.devnet.solana.com"
+S3_MAX_POOL_CONNECTIONS = 32
+
+AWS_REGIONS = {
+    "EU": "eu-west-1",
+    "SG": "ap-southeast-1",
+}
+
+
+def aws_region_for(user_region: str) -> str:
+    return AWS_REGIONS.get(user_region, AWS_REGIONS["SG"])
+
+
+# === REGISTRY ===
+class ClientRegistry:
+    def __init__(
+        self,
+        azure_account_url: str = AZURE_ACCOUNT_URL,
+        solana_rpc: str = SOLANA_RPC,
+        credential: Any = None,
+        blob_service: Any = None,
+        s3_factory: Optional[Callable[[Optional[str]], Any]] = None,
+        rpc: Any = None,
+    ):
+        self.azure_account_url = azure_account_url
+        self.solana_rpc = solana_rpc
+        self._credential = credential
+        self._blob_service = blob_service
+        self._s3_factory = s3_factory
+        self._s3: Dict[Optional[str], Any] = {}
+        self._rpc = rpc
+        self._lock = threading.RLock()
+
+    @classmethod
+    def local(cls, root: Optional[str] = None) -> "ClientRegistry":
+        """Registry backed by in-process stand-ins (on disk under root, if given)."""
+        from .local import LocalBlobServiceClient, LocalS3, LocalSolanaClient
+
+        s3 = LocalS3(root=root)
+        return cls(
+            credential=object(),
+            blob_service=LocalBlobServiceClient(root=root),
+            s3_factory=lambda region: s3,
+            rpc=LocalSolanaClient(),
+        )
+
+    @property
+    def credential(self):
+        if self._credential is None:
+            with self._lock:
+                if self._credential is None:
+                    import azure.identity
+                    self._credential = azure.identity.DefaultAzureCredential()
+        return self._credential
+
+    @property
+    def blob_service(self):
+        if self._blob_service is None:
+            with self._lock:
+                if self._blob_service is None:
+                    import azure.storage.blob as azure_blob
+                    self._blob_service = azure_blob.BlobServiceClient(
+                        account_url=self.azure_account_url,
+                        credential=self.credential
+                    )
+        return self._blob_service
+
+    def s3(self, region: Optional[str] = None):
+        client = self._s3.get(region)
+        if client is None:
+            with self._lock:
+                client = self._s3.get(region)
+                if client is None:
+                    client = self._s3_factory(region) if self._s3_factory else self._make_s3(region)
+                    self._s3[region] = client
+        return client
+
+    @property
+    def rpc(self):
+        if self._rpc is None:
+            with self._lock:
+                if self._rpc is None:
+                    from solana.rpc.api import Client
+                    self._rpc = Client(self.solana_rpc)
+        return self._rpc
+
+    def warm(self, regions=("EU", "SG")):
+        """Build the storage clients up front (e.g. before serving traffic)."""
+        self.blob_service
+        for user_region in regions:
+            self.s3(aws_region_for(user_region))
+
+    def _make_s3(self, region: Optional[str]):
+        import boto3
+        from botocore.config import Config
+
+        return boto3.client(
+            "s3",
+            region_name=region,
+            config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS)
+        )
+
+
+# === PROCESS-WIDE DEFAULT ===
+_default: Optional[ClientRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_clients() -> ClientRegistry:
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = ClientRegistry()
+    return _default
+
+
+def set_clients(registry: Optional[ClientRegistry]) -> Optional[ClientRegistry]:
+    """Install the process-wide registry; returns the previous one."""
+    global _default
+    with _default_lock:
+        previous, _default = _default, registry
+    return previous
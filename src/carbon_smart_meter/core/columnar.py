@@ -0,0 +1,216 @@
+# src/carbon_smart_meter/core/columnar.py
+"""
+Columnar kWh Conversion & Daily Cap Accounting (Gateway Batches)
+
+A Solar Farm gateway aggregates 100+ panels per batch. This module processes
+such batches as arrays (device_id, voltage, current, timestamp) with NumPy.
+
+- Same float64 arithmetic as vir_to_kwh, element for element
+- Per-(device, day) running totals are sequential cumulative sums, so every
+  intermediate total matches the scalar loop bit for bit
+- The sample that crosses DAILY_KWH_CAP is clipped to the remainder, later ones rejected
+"""
+
+from typing import MutableMapping, Sequence, Tuple, Union
+
+import numpy as np
+
+from .mining import DAILY_KWH_CAP, POWER_SAMPLE_INTERVAL
+
+# === CONFIG ===
+DENSE_CUMSUM_LIMIT = 1 << 22   # Max cells for the padded (groups x samples) cumsum matrix
+
+DeviceIds = Union[Sequence[bytes], np.ndarray]
+UsageMap = MutableMapping[Tuple[bytes, int], float]
+
+
+# === kWh CONVERSION ===
+def vir_to_kwh_array(voltage, current, duration_sec: float = POWER_SAMPLE_INTERVAL) -> np.ndarray:
+    power_watts = np.asarray(voltage, dtype=np.float64) * np.asarray(current, dtype=np.float64)
+    energy_wh = power_watts * (duration_sec / 3600)
+    return energy_wh / 1000
+
+
+def device_id_array(device_ids: DeviceIds) -> np.ndarray:
+    """Fixed-width (V32) view of 32-byte device ids; keeps trailing zero bytes intact."""
+    if isinstance(device_ids, np.ndarray):
+        if device_ids.dtype == np.dtype("V32"):
+            return device_ids
+        return np.ascontiguousarray(device_ids, dtype="S32").view("V32")
+    return np.frombuffer(b"".join(device_ids), dtype="V32")
+
+
+# === DAILY CAP ===
+def apply_daily_cap_scalar(
+    device_ids: Sequence[bytes],
+    timestamps: Sequence[int],
+    kwh: Sequence[float],
+    daily_usage: UsageMap,
+    cap: float = DAILY_KWH_CAP,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Reference loop with EnergyProcessor's per-packet cap semantics."""
+    allowed = np.zeros(len(kwh), dtype=np.float64)
+    accepted = np.zeros(len(kwh), dtype=bool)
+    for i, (device_id, timestamp, value) in enumerate(zip(device_ids, timestamps, kwh)):
+        key = (device_id, int(timestamp) // 86400)
+        used = daily_usage.get(key, 0.0)
+        current_day_kwh = used + value
+        if current_day_kwh > cap:
+            value = max(0.0, cap - used)
+            if value <= 0:
+                continue
+        allowed[i] = value
+        accepted[i] = True
+        daily_usage[key] = current_day_kwh
+    return allowed, accepted
+
+
+def apply_daily_cap(
+    device_ids: DeviceIds,
+    timestamps,
+    kwh,
+    daily_usage: UsageMap,
+    cap: float = DAILY_KWH_CAP,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorised cap accounting. Returns (allowed_kwh, accepted) in input order and
+    updates daily_usage for every (device, day) that accepted a sample.
+
+    Results are identical to feeding the samples one by one through
+    EnergyProcessor (see apply_daily_cap_scalar), including the partial clip.
+    Groups containing negative or non-finite kWh take the scalar path.
+    """
+    kwh = np.asarray(kwh, dtype=np.float64)
+    n = len(kwh)
+    allowed = np.zeros(n, dtype=np.float64)
+    accepted = np.zeros(n, dtype=bool)
+    if n == 0:
+        return allowed, accepted
+
+    ids = device_id_array(device_ids)
+    days = np.asarray(timestamps, dtype=np.int64) // 86400
+    uniq, codes = _device_codes(ids)
+
+    # Group by (device, day), keeping arrival order inside each group
+    day0 = days.min()
+    order = np.argsort(codes * (days.max() - day0 + 1) + (days - day0), kind="stable")
+    s_codes, s_days, s_kwh = codes[order], days[order], kwh[order]
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = (s_codes[1:] != s_codes[:-1]) | (s_days[1:] != s_days[:-1])
+    starts = np.flatnonzero(new_group)
+    lengths = np.diff(np.append(starts, n))
+    group = np.cumsum(new_group) - 1
+    pos = np.arange(n) - starts[group]
+
+    keys = [(bytes(uniq[s_codes[s]]), int(s_days[s])) for s in starts]
+    initial = np.array([daily_usage.get(key, 0.0) for key in keys], dtype=np.float64)
+
+    # Negative / NaN samples break the monotonic-total shortcut: use the scalar loop there
+    bad = ~np.isfinite(s_kwh) | (s_kwh < 0)
+    scalar_groups = ~np.isfinite(initial)
+    scalar_groups[group[bad]] = True
+
+    prev, total = _segmented_cumsum(s_kwh, group, pos, lengths, initial)
+
+    # First sample per group whose running total exceeds the cap
+    crossed = total > cap
+    big = np.iinfo(np.int64).max
+    first = np.minimum.reduceat(np.where(crossed, pos, big), starts)
+    f = first[group]
+
+    before = pos < f
+    at = pos == f
+    after = pos > f
+
+    s_allowed = np.where(before, s_kwh, 0.0)
+    s_accepted = before.copy()
+
+    clip = np.maximum(0.0, cap - prev)
+    at_ok = at & (clip > 0)
+    s_allowed[at_ok] = clip[at_ok]
+    s_accepted |= at_ok
+
+    # Total carried past the crossing: unclipped total if it was accepted, else unchanged
+    crossed_group = first != big
+    carried = np.full(len(starts), np.nan)
+    at_idx = np.flatnonzero(at)
+    carried[group[at_idx]] = np.where(at_ok[at_idx], total[at_idx], prev[at_idx])
+    # Sitting exactly on the cap, a sample that does not move the float total is still accepted
+    after_ok = after & (carried[group] == cap) & (cap + s_kwh <= cap)
+    s_allowed[after_ok] = s_kwh[after_ok]
+    s_accepted |= after_ok
+
+    last = starts + lengths - 1
+    final = np.where(crossed_group, carried, total[last])
+    any_accepted = np.logical_or.reduceat(s_accepted, starts)
+
+    allowed[order] = s_allowed
+    accepted[order] = s_accepted
+
+    for g in np.flatnonzero(any_accepted & ~scalar_groups):
+        daily_usage[keys[g]] = float(final[g])
+
+    for g in np.flatnonzero(scalar_groups):
+        idx = order[starts[g]:starts[g] + lengths[g]]
+        device_id = keys[g][0]
+        g_allowed, g_accepted = apply_daily_cap_scalar(
+            [device_id] * len(idx), np.asarray(timestamps)[idx], kwh[idx], daily_usage, cap
+        )
+        allowed[idx] = g_allowed
+        accepted[idx] = g_accepted
+
+    return allowed, accepted
+
+
+def _device_codes(ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """np.unique(ids, return_inverse=True), via a 64-bit fingerprint sort when collision free."""
+    words = ids.view(np.uint64).reshape(-1, 4)
+    fingerprint = words[:, 0] ^ (words[:, 1] * np.uint64(0x9E3779B97F4A7C15)) ^ words[:, 2] ^ (words[:, 3] << np.uint64(1))
+    _, first, codes = np.unique(fingerprint, return_index=True, return_inverse=True)
+    codes = codes.reshape(-1)
+    if (words == words[first][codes]).all():
+        return ids[first], codes
+    uniq, codes = np.unique(ids, return_inverse=True)
+    return uniq, codes.reshape(-1)
+
+
+def _segmented_cumsum(values: np.ndarray, group: np.ndarray, pos: np.ndarray, lengths: np.ndarray, initial: np.ndarray):
+    """
+    Per-group running totals starting from `initial`, added strictly left to right.
+
+    Returns (total before each sample, total after each sample).
+    """
+    n_groups = len(lengths)
+    width = int(lengths.max()) + 1
+
+    if n_groups * width <= max(DENSE_CUMSUM_LIMIT, 4 * len(values)):
+        matrix = np.zeros((n_groups, width), dtype=np.float64)
+        matrix[:, 0] = initial
+        matrix[group, pos + 1] = values
+        np.cumsum(matrix, axis=1, out=matrix)
+        return matrix[group, pos], matrix[group, pos + 1]
+
+    prev = np.empty_like(values)
+    total = np.empty_like(values)
+    start = 0
+    for g, length in enumerate(lengths):
+        run = np.cumsum(np.concatenate(([initial[g]], values[start:start + length])))
+        prev[start:start + length] = run[:-1]
+        total[start:start + length] = run[1:]
+        start += length
+    return prev, total
+
+
+# === BATCH ENTRYPOINT ===
+def process_columns(
+    device_ids: DeviceIds,
+    voltage,
+    current,
+    timestamps,
+    daily_usage: UsageMap,
+    duration_sec: float = POWER_SAMPLE_INTERVAL,
+    cap: float = DAILY_KWH_CAP,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """kWh conversion + cap accounting for already-verified samples."""
+    kwh = vir_to_kwh_array(voltage, current, duration_sec)
+    return apply_daily_cap(device_ids, timestamps, kwh, daily_usage, cap)
@@ -0,0 +1,369 @@
+# src/carbon_smart_meter/core/dedup.py
+"""
+Replay Protection for Signed VIR Packets (Watermark + Window + Rotating Bloom)
+
+A valid signed packet stays valid forever, so the same (device_id, timestamp)
+must only be accepted once.
+- Per device: the highest timestamp seen plus a 64-second out-of-order bitmap,
+  exact and fixed-size (like the IPsec anti-replay window)
+- Older timestamps: one scalable Bloom filter per period of packet time (a
+  UTC day by default), the last `generations` of them kept; anything older is
+  rejected as stale. Two daily generations match the cap store's two-day retention
+- A generation starts with one filter for `capacity` keys and adds a filter with
+  BLOOM_GROWTH × the capacity and BLOOM_TIGHTENING × the error rate each time
+  the newest one fills, so it holds any number of devices × samples per period
+  (1 Hz is 86,400 keys per device-day) without its error rate drifting to 1.
+  Size `capacity` to the expected keys per period to keep it to one filter
+- Packets dated after the server clock + MAX_CLOCK_SKEW are rejected and never
+  recorded, so the newest generation (and with it what counts as stale) can
+  only follow real time, not one device's wrong or hostile clock
+- check() is a read-only pre-filter that runs before the Ed25519 verify;
+  mark() is the atomic check-and-record that runs only after the signature is
+  good, so forged packets can never advance a device's watermark
+- check_many() hashes each key once and tests it against every filter in one
+  vectorised (keys × hashes) lookup
+- fill_ratio() (and the csm_replay_bloom_fill gauge) reports how full the filter
+  taking writes is; it grows a new filter at about 0.5
+- snapshot()/load() persist the whole state (numpy .npz, atomic rename)
+
+A Bloom false positive rejects a genuinely new, late packet (older than the
+window) with probability below `error_rate`, however many filters a generation
+grew to (the tightened rates sum to at most error_rate); in-window decisions
+are exact.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import REPLAY_BLOOM_FILL, REPLAY_REJECTIONS, metrics
+
+# === CONFIG ===
+REPLAY_WINDOW = 64              # Seconds tracked exactly behind the watermark (fits one uint64)
+REPLAY_PERIOD = 86400           # Packet-time span of one Bloom generation
+REPLAY_GENERATIONS = 2          # Generations kept: today + yesterday
+BLOOM_CAPACITY = 1_000_000      # Keys in a generation's first filter
+BLOOM_ERROR_RATE = 1e-6         # Bound for a whole generation, however far it grew
+BLOOM_GROWTH = 2                # Capacity factor from one filter of a generation to the next
+BLOOM_TIGHTENING = 0.5          # Error-rate factor from one filter to the next
+MAX_CLOCK_SKEW = 300            # Seconds a packet may be dated ahead of the server clock
+
+_BLOOM = "bloom"                # Internal verdict: only the Bloom generation can tell
+
+
+def _key(device_id: bytes, timestamp: int) -> bytes:
+    return device_id + timestamp.to_bytes(8, "little", signed=True)
+
+
+def _hashes(key: bytes) -> Tuple[int, int]:
+    """The two base hashes of double hashing (h2 odd)."""
+    digest = hashlib.blake2b(key, digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+def _hashes_many(keys: Sequence[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    digests = b"".join(hashlib.blake2b(key, digest_size=16).digest() for key in keys)
+    pairs = np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1] | np.uint64(1)
+
+
+# === BLOOM FILTER ===
+class BloomFilter:
+    __slots__ = ("bits", "size", "hashes", "capacity", "count")
+
+    def __init__(self, size: int, hashes: int, bits: Optional[bytearray] = None, capacity: int = 0, count: int = 0):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+        self.capacity = capacity        # Keys it was sized for (0 = unknown)
+        self.count = count              # Keys added
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> "BloomFilter":
+        size = max(64, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hashes, capacity=capacity)
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def fill_ratio(self) -> float:
+        """Expected share of set bits, 1 - e^(-k·n/m); the false-positive rate is about fill^k."""
+        return 1.0 - math.exp(-self.hashes * self.count / self.size)
+
+    def _positions(self, h1: int, h2: int) -> List[int]:
+        # Same positions as (h1 + i·h2) mod size, with small operands
+        size = self.size
+        a, b = h1 % size, h2 % size
+        return [(a + i * b) % size for i in range(self.hashes)]
+
+    def add(self, key: bytes):
+        self.add_hashed(*_hashes(key))
+
+    def add_hashed(self, h1: int, h2: int):
+        bits = self.bits
+        for position in self._positions(h1, h2):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        return self.contains_hashed(*_hashes(key))
+
+    def contains_hashed(self, h1: int, h2: int) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(h1, h2))
+
+    def contains_many(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        """Membership of many keys by their base hashes: one (keys × hashes) position matrix."""
+        size = np.uint64(self.size)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        positions = ((h1 % size)[:, None] + steps * (h2 % size)[:, None]) % size     # < hashes·size: no wrap
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        return ((bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+
+class ScalableBloomFilter:
+    """
+    One replay-guard generation: Bloom filters added as keys arrive (scalable
+    Bloom filter). Filter i holds capacity·GROWTH^i keys at
+    error_rate·(1 - TIGHTENING)·TIGHTENING^i, so the rates sum below error_rate.
+    """
+
+    __slots__ = ("capacity", "error_rate", "filters")
+
+    def __init__(self, capacity: int, error_rate: float, filters: Optional[List[BloomFilter]] = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.filters: List[BloomFilter] = filters if filters is not None else []
+
+    def add(self, key: bytes):
+        if not self.filters or self.filters[-1].full:
+            n = len(self.filters)
+            self.filters.append(BloomFilter.for_capacity(
+                self.capacity * BLOOM_GROWTH ** n,
+                self.error_rate * (1 - BLOOM_TIGHTENING) * BLOOM_TIGHTENING ** n,
+            ))
+        self.filters[-1].add_hashed(*_hashes(key))
+
+    def __contains__(self, key: bytes) -> bool:
+        h1, h2 = _hashes(key)
+        return any(bloom.contains_hashed(h1, h2) for bloom in self.filters)
+
+    def contains_many(self, keys: Sequence[bytes]) -> np.ndarray:
+        h1, h2 = _hashes_many(keys)
+        found = np.zeros(len(keys), dtype=bool)
+        for bloom in self.filters:
+            found |= bloom.contains_many(h1, h2)
+        return found
+
+    def fill_ratio(self) -> float:
+        """Fill of the filter taking writes."""
+        return self.filters[-1].fill_ratio() if self.filters else 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+
+# === GUARD ===
+class ReplayGuard:
+    def __init__(
+        self,
+        window: int = REPLAY_WINDOW,
+        period: int = REPLAY_PERIOD,
+        generations: int = REPLAY_GENERATIONS,
+        capacity: int = BLOOM_CAPACITY,
+        error_rate: float = BLOOM_ERROR_RATE,
+        path: Optional[str] = None,
+        clock=time.time,
+    ):
+        if not 1 <= window <= 64:
+            raise ValueError("window must be 1..64 seconds")
+        self.window = window
+        self.period = period
+        self.generations = generations
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.path = path
+        self.clock = clock
+        self.devices: Dict[bytes, List[int]] = {}       # device_id → [watermark, window bitmap]
+        self.filters: Dict[int, ScalableBloomFilter] = {}       # period number → generation
+        self.latest_period: Optional[int] = None
+        self.stats = {"accepted": 0, "duplicates": 0, "stale": 0, "future": 0}
+        self._full = (1 << window) - 1
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str, **kwargs) -> "ReplayGuard":
+        """Guard persisted at path: loaded if a snapshot exists, saved there by snapshot()."""
+        if os.path.exists(path):
+            return cls.load(path, kwargs.get("clock", time.time))
+        return cls(path=path, **kwargs)
+
+    # --- decisions ---
+    def check(self, device_id: bytes, timestamp: int) -> bool:
+        """True if (device_id, timestamp) has not been accepted before. Does not record it."""
+        return self._verdict(device_id, timestamp) is None
+
+    def check_many(self, device_ids, timestamps) -> List[bool]:
+        """check() for many packets; the Bloom lookups run vectorised, per generation."""
+        horizon = self.horizon()
+        verdicts = [self._exact_verdict(d, t, horizon) for d, t in zip(device_ids, timestamps)]
+        lookups: Dict[int, List[int]] = {}
+        for i, verdict in enumerate(verdicts):
+            if verdict is _BLOOM:
+                lookups.setdefault(timestamps[i] // self.period, []).append(i)
+        for period, rows in lookups.items():
+            bloom = self.filters.get(period)            # Rotated out by a concurrent mark(): mark() decides
+            if bloom is None:
+                continue
+            hits = bloom.contains_many([_key(device_ids[i], timestamps[i]) for i in rows])
+            for i, hit in zip(rows, hits.tolist()):
+                verdicts[i] = "duplicates" if hit else None
+        return [verdict is None for verdict in verdicts]
+
+    def mark(self, device_id: bytes, timestamp: int) -> bool:
+        """Atomically check and record; False for a replay, a stale or a future-dated packet."""
+        with self._lock:
+            verdict = self._verdict(device_id, timestamp)
+            if verdict is not None:
+                self.stats[verdict] += 1
+                if metrics.enabled:
+                    REPLAY_REJECTIONS.labels(reason=verdict).inc()
+                return False
+
+            state = self.devices.get(device_id)
+            if state is None:
+                self.devices[device_id] = [timestamp, 1]
+            elif timestamp > state[0]:
+                shift = timestamp - state[0]
+                state[1] = ((state[1] << shift) | 1) & self._full if shift < self.window else 1
+                state[0] = timestamp
+            elif state[0] - timestamp < self.window:
+                state[1] |= 1 << (state[0] - timestamp)
+
+            bloom = self._filter_for(timestamp // self.period)
+            bloom.add(_key(device_id, timestamp))
+            self.stats["accepted"] += 1
+            if metrics.enabled and timestamp // self.period == self.latest_period:
+                REPLAY_BLOOM_FILL.set(bloom.fill_ratio())
+            return True
+
+    def horizon(self) -> int:
+        """Latest timestamp a packet may carry (server clock + MAX_CLOCK_SKEW)."""
+        return int(self.clock()) + MAX_CLOCK_SKEW
+
+    def fill_ratio(self) -> float:
+        """How full the newest generation's writable filter is (a new one is added near 0.5)."""
+        bloom = self.filters.get(self.latest_period) if self.latest_period is not None else None
+        return bloom.fill_ratio() if bloom is not None else 0.0
+
+    def _verdict(self, device_id: bytes, timestamp: int, horizon: Optional[int] = None) -> Optional[str]:
+        """None = fresh, else the stats key of the rejection."""
+        verdict = self._exact_verdict(device_id, timestamp, horizon)
+        if verdict is _BLOOM:
+            bloom = self.filters.get(timestamp // self.period)
+            return "duplicates" if bloom is not None and _key(device_id, timestamp) in bloom else None
+        return verdict
+
+    def _exact_verdict(self, device_id: bytes, timestamp: int, horizon: Optional[int] = None) -> Optional[str]:
+        """_verdict, or _BLOOM where only the period's Bloom generation can tell."""
+        if timestamp > (self.horizon() if horizon is None else horizon):
+            return "future"
+        period = timestamp // self.period
+        if self.latest_period is not None and period <= self.latest_period - self.generations:
+            return "stale"
+        state = self.devices.get(device_id)
+        if state is None:
+            return None
+        watermark, bitmap = state
+        if timestamp > watermark:
+            return None
+        age = watermark - timestamp
+        if age < self.window:
+            return "duplicates" if bitmap >> age & 1 else None
+        return _BLOOM if period in self.filters else None
+
+    def _generation(self, period: int) -> ScalableBloomFilter:
+        bloom = self.filters.get(period)
+        if bloom is None:
+            bloom = self.filters[period] = ScalableBloomFilter(self.capacity, self.error_rate)
+        return bloom
+
+    def _filter_for(self, period: int) -> ScalableBloomFilter:
+        bloom = self.filters.get(period)
+        if bloom is None:
+            bloom = self._generation(period)
+            if self.latest_period is None or period > self.latest_period:
+                self.latest_period = period
+                for old in [p for p in self.filters if p <= period - self.generations]:
+                    del self.filters[old]
+        return bloom
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    # --- persistence ---
+    def snapshot(self, path: Optional[str] = None):
+        """Write the full state atomically (tmp file + rename)."""
+        path = path or self.path
+        if path is None:
+            raise ValueError("no snapshot path")
+        with self._lock:
+            ids = list(self.devices)
+            blooms = [(p, bloom) for p in sorted(self.filters) for bloom in self.filters[p].filters]
+            state = {
+                "config": np.array([self.window, self.period, self.generations, self.capacity], dtype=np.int64),
+                "error_rate": np.array([self.error_rate]),
+                "device_ids": np.frombuffer(b"".join(ids), dtype=np.uint8).reshape(len(ids), -1)
+                if ids else np.empty((0, 32), dtype=np.uint8),
+                "watermarks": np.array([self.devices[d][0] for d in ids], dtype=np.int64),
+                "bitmaps": np.array([self.devices[d][1] for d in ids], dtype=np.uint64),
+                "filter_bits": np.frombuffer(b"".join(bytes(bloom.bits) for _, bloom in blooms), dtype=np.uint8),
+                "filter_meta": np.array(
+                    [(p, bloom.size, bloom.hashes, bloom.capacity, bloom.count) for p, bloom in blooms], dtype=np.int64
+                ).reshape(-1, 5),
+            }
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **state)
+        os.replace(tmp, path)
+
+    save = snapshot
+
+    @classmethod
+    def load(cls, path: str, clock=time.time) -> "ReplayGuard":
+        with np.load(path) as data:
+            window, period, generations, capacity = (int(v) for v in data["config"])
+            guard = cls(window, period, generations, capacity, float(data["error_rate"][0]), path=path, clock=clock)
+            for raw, watermark, bitmap in zip(data["device_ids"], data["watermarks"], data["bitmaps"]):
+                guard.devices[raw.tobytes()] = [int(watermark), int(bitmap)]
+            if "filter_meta" in data:
+                bits, offset = data["filter_bits"].tobytes(), 0
+                for p, size, hashes, capacity, count in data["filter_meta"].tolist():
+                    end = offset + (size + 7) // 8
+                    bloom = BloomFilter(size, hashes, bytearray(bits[offset:end]), capacity, count)
+                    guard._generation(p).filters.append(bloom)
+                    offset = end
+            else:
+                # Snapshots from before generations could grow: one filter each, treated as full
+                for p, bits, (size, hashes) in zip(data["periods"], data["filters"], data["filter_shape"]):
+                    bloom = BloomFilter(int(size), int(hashes), bytearray(bits.tobytes()), capacity, capacity)
+                    guard._generation(int(p)).filters.append(bloom)
+        # A generation dated past the server clock (written before future packets were rejected) is dropped
+        newest = guard.horizon() // period
+        for p in [p for p in guard.filters if p > newest]:
+            del guard.filters[p]
+        if guard.filters:
+            guard.latest_period = max(guard.filters)
+        return guard
@@ -0,0 +1,212 @@
+# src/carbon_smart_meter/core/engine.py
+"""
+Sharded Multi-Process Ingestion (Scales EnergyProcessor Across Cores)
+
+- Packets are hash-partitioned by device_id onto N worker processes
+- Each worker owns its own EnergyProcessor, so a device's cap state lives in
+  exactly one process and needs no locks
+- Frames travel in the binary wire format (core.wire), batched per shard
+- Bounded inboxes: submit() blocks when a worker falls behind (backpressure)
+- Results come back in submission order for every device
+- A batch that raises in a worker comes back rejected; a worker process that
+  dies makes results() / close() raise ShardDiedError instead of blocking
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import zlib
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+from .metrics import QUEUE_DEPTH
+from .mining import EnergyProcessor, VIRPacket
+from .wire import FRAME_SIZE, encode_packet
+
+# === CONFIG ===
+SHARD_BATCH_FRAMES = 256        # Frames per message to a worker
+SHARD_QUEUE_DEPTH = 8           # Batches buffered per worker before submit() blocks
+LIVENESS_POLL = 1.0             # Seconds between worker liveness checks while blocked on a queue
+
+logger = logging.getLogger(__name__)
+
+_STOP = None
+
+
+class ShardDiedError(RuntimeError):
+    pass
+
+
+class IngestResult(NamedTuple):
+    device_id: bytes
+    timestamp: int
+    kwh: Optional[float]        # None = rejected (bad signature, unknown device, cap reached)
+
+    @property
+    def accepted(self) -> bool:
+        return self.kwh is not None
+
+
+def shard_for(device_id: bytes, shards: int) -> int:
+    return zlib.crc32(device_id) % shards
+
+
+# === WORKER ===
+def _worker(
+    inbox,
+    outbox,
+    processor_factory: Callable[[], EnergyProcessor],
+    key_lookup: Callable[[bytes], Optional[bytes]],
+    cable_type: str,
+):
+    processor = processor_factory()
+    while True:
+        batch = inbox.get()
+        if batch is _STOP:
+            break
+        try:
+            readings = processor.process_frames(batch, key_lookup, cable_type, records=True)
+        except Exception:
+            logger.exception("shard worker failed on a batch of %d frames; rejecting it", len(batch) // FRAME_SIZE)
+            readings = [None] * (len(batch) // FRAME_SIZE)
+        results = []
+        for i, reading in enumerate(readings):
+            offset = i * FRAME_SIZE
+            device_id = batch[offset:offset + 32]
+            timestamp = int.from_bytes(batch[offset + 44:offset + 52], "little", signed=True)
+            results.append((device_id, timestamp, reading.kwh if reading is not None else None))
+        outbox.put(results)
+
+    processor.flush_aggregates()
+    processor.snapshot_replay_guard()
+    if hasattr(processor.db, "close"):
+        processor.db.close()
+    outbox.put(_STOP)
+
+
+# === ENGINE ===
+class ShardedIngestEngine:
+    """
+    processor_factory and key_lookup run inside the worker processes, so they
+    must be importable callables (or picklable) when using the spawn start method.
+    """
+
+    def __init__(
+        self,
+        key_lookup: Callable[[bytes], Optional[bytes]],
+        workers: Optional[int] = None,
+        processor_factory: Callable[[], EnergyProcessor] = EnergyProcessor,
+        cable_type: str = "type-c",
+        batch_frames: int = SHARD_BATCH_FRAMES,
+        queue_depth: int = SHARD_QUEUE_DEPTH,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_frames = batch_frames
+        self.outbox = multiprocessing.Queue()
+        self.inboxes = [multiprocessing.Queue(maxsize=queue_depth) for _ in range(self.workers)]
+        self.buffers: List[List[bytes]] = [[] for _ in range(self.workers)]
+        self.pending = 0
+        QUEUE_DEPTH.labels(queue="shard-pending").track(self, lambda engine: engine.pending)
+        self.processes = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(inbox, self.outbox, processor_factory, key_lookup, cable_type),
+                daemon=True,
+            )
+            for inbox in self.inboxes
+        ]
+        for process in self.processes:
+            process.start()
+
+    def submit(self, frame: bytes):
+        """Queue one 116-byte frame. Blocks when the owning worker's inbox is full."""
+        if len(frame) != FRAME_SIZE:
+            raise ValueError(f"frame must be {FRAME_SIZE} bytes, got {len(frame)}")
+        shard = shard_for(frame[:32], self.workers)
+        buffer = self.buffers[shard]
+        buffer.append(frame)
+        self.pending += 1
+        if len(buffer) >= self.batch_frames:
+            self._send(shard)
+
+    def submit_packet(self, packet: VIRPacket):
+        self.submit(encode_packet(packet))
+
+    def flush(self):
+        """Send partially filled batches."""
+        for shard in range(self.workers):
+            if self.buffers[shard]:
+                self._send(shard)
+
+    def poll(self) -> List[IngestResult]:
+        """Results that are ready now, without blocking."""
+        results = []
+        while True:
+            try:
+                batch = self.outbox.get_nowait()
+            except queue.Empty:
+                return results
+            results.extend(self._unpack(batch))
+
+    def results(self) -> Iterator[IngestResult]:
+        """Flush and yield results until everything submitted so far is acknowledged."""
+        self.flush()
+        while self.pending:
+            yield from self._unpack(self._get())
+
+    def close(self):
+        """Stop the workers (each flushes its processor); raises ShardDiedError if one died."""
+        try:
+            self.flush()
+            for shard in range(self.workers):
+                self._put(shard, _STOP)
+            stopped = 0
+            while stopped < self.workers:
+                if self._get(stopping=True) is _STOP:
+                    stopped += 1
+        except ShardDiedError:
+            for process in self.processes:
+                if process.is_alive():
+                    process.terminate()
+            raise
+        finally:
+            for process in self.processes:
+                process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, shard: int):
+        frames, self.buffers[shard] = self.buffers[shard], []
+        self._put(shard, b"".join(frames))
+
+    def _put(self, shard: int, item):
+        while True:
+            try:
+                self.inboxes[shard].put(item, timeout=LIVENESS_POLL)
+                return
+            except queue.Full:
+                self._check_workers()
+
+    def _get(self, stopping: bool = False):
+        while True:
+            try:
+                return self.outbox.get(timeout=LIVENESS_POLL)
+            except queue.Empty:
+                self._check_workers(stopping)
+
+    def _check_workers(self, stopping: bool = False):
+        """Workers only exit after _STOP; a clean exit is expected only while stopping."""
+        for shard, process in enumerate(self.processes):
+            if process.is_alive() or (stopping and process.exitcode == 0):
+                continue
+            raise ShardDiedError(f"shard worker {shard} exited with code {process.exitcode}")
+
+    def _unpack(self, batch) -> List[IngestResult]:
+        if batch is _STOP:
+            return []
+        self.pending -= len(batch)
+        return [IngestResult(*row) for row in batch]
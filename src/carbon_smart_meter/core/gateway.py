@@ -0,0 +1,256 @@
+# src/carbon_smart_meter/core/gateway.py
+"""
+Gateway Batch Attestation (One Ed25519 Signature over a Merkle Root of Samples)
+
+A solar-farm gateway aggregates 100+ panels and signs the batch, not each sample:
+
+    header:  b"GWB1" | gateway_id(32) | seq <u64> | count <u32> | root(32)
+    then:    signature(64) over the 80 header bytes
+    then:    count × 52-byte samples, each [device_id(32)][V f32][I f32][R f32][ts i64]
+
+- Samples use the same byte layout the meters sign (see wire.SIGNED_SIZE); the
+  root is the RFC 6962 Merkle root (core.merkle) over them in batch order
+- Intake: recompute the root (SHA-256 per sample), check it matches the header,
+  check one signature, check each panel is bound to that gateway
+- With a GatewayRegistry as the lookup, seq must also rise per gateway: a
+  correctly signed batch whose seq is not above the last accepted one is
+  rejected (recorded only after the signature checks out, like the replay guard)
+- Any sample can later be proven to an auditor with proof(i): the header fields,
+  the gateway signature and an O(log n) audit path
+"""
+
+import json
+import struct
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from nacl.exceptions import BadSignatureError
+from nacl.signing import SigningKey, VerifyKey
+
+from .merkle import audit_path, leaf_hash, root_of_hashes, verify_inclusion
+from .metrics import SIGNATURES, VERIFY_SECONDS, clock, metrics
+from .mining import VerifyKeyCache
+
+# === LAYOUT ===
+BATCH_MAGIC = b"GWB1"
+HEADER = struct.Struct("<4s32sQI32s")
+HEADER_SIZE = HEADER.size           # 80
+SIGNATURE_SIZE = 64
+SAMPLE = struct.Struct("<32sfffq")
+SAMPLE_SIZE = SAMPLE.size           # 52
+MAX_SAMPLES_PER_BATCH = 65_536
+
+
+class GatewaySample(NamedTuple):
+    device_id: bytes
+    voltage: float
+    current: float
+    resistance: float
+    timestamp: int
+
+
+class GatewayBinding(NamedTuple):
+    gateway_id: bytes
+    public_key: bytes
+    panels: frozenset               # device_ids this gateway may report for
+
+
+class InclusionProof(NamedTuple):
+    """Everything an auditor needs to check one sample against the gateway's key."""
+    gateway_id: bytes
+    seq: int
+    tree_size: int
+    index: int
+    sample: bytes
+    path: Tuple[bytes, ...]
+    root: bytes
+    signature: bytes
+
+
+def pack_sample(device_id: bytes, voltage: float, current: float, resistance: float, timestamp: int) -> bytes:
+    return SAMPLE.pack(device_id, voltage, current, resistance, timestamp)
+
+
+def batch_header(gateway_id: bytes, seq: int, count: int, root: bytes) -> bytes:
+    return HEADER.pack(BATCH_MAGIC, gateway_id, seq, count, root)
+
+
+def build_gateway_batch(signing_key: SigningKey, gateway_id: bytes, seq: int, samples: Sequence[bytes]) -> bytes:
+    """Gateway side: packed samples → signed batch."""
+    root = root_of_hashes(leaf_hash(sample) for sample in samples)
+    header = batch_header(gateway_id, seq, len(samples), root)
+    return header + signing_key.sign(header).signature + b"".join(samples)
+
+
+# === BATCH VIEW ===
+class GatewayBatch:
+    """Read-only view over one received batch."""
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer).cast("B")
+        if len(self.view) < HEADER_SIZE + SIGNATURE_SIZE:
+            raise ValueError("gateway batch shorter than its header")
+        magic, self.gateway_id, self.seq, self.count, self.root = HEADER.unpack_from(self.view)
+        if magic != BATCH_MAGIC:
+            raise ValueError(f"bad gateway batch magic {magic!r}")
+        if self.count > MAX_SAMPLES_PER_BATCH:
+            raise ValueError(f"gateway batch of {self.count} samples exceeds {MAX_SAMPLES_PER_BATCH}")
+        if len(self.view) != HEADER_SIZE + SIGNATURE_SIZE + self.count * SAMPLE_SIZE:
+            raise ValueError(f"gateway batch length {len(self.view)} does not match {self.count} samples")
+        self._leaves: Optional[List[bytes]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[GatewaySample]:
+        for fields in SAMPLE.iter_unpack(self.view[HEADER_SIZE + SIGNATURE_SIZE:]):
+            yield GatewaySample(*fields)
+
+    @property
+    def header(self) -> bytes:
+        return self.view[:HEADER_SIZE].tobytes()
+
+    @property
+    def signature(self) -> bytes:
+        return self.view[HEADER_SIZE:HEADER_SIZE + SIGNATURE_SIZE].tobytes()
+
+    def sample_bytes(self, index: int) -> bytes:
+        offset = HEADER_SIZE + SIGNATURE_SIZE + index * SAMPLE_SIZE
+        return self.view[offset:offset + SAMPLE_SIZE].tobytes()
+
+    def leaf_hashes(self) -> List[bytes]:
+        if self._leaves is None:
+            self._leaves = [leaf_hash(self.sample_bytes(i)) for i in range(self.count)]
+        return self._leaves
+
+    def computed_root(self) -> bytes:
+        return root_of_hashes(self.leaf_hashes())
+
+    def proof(self, index: int) -> InclusionProof:
+        return InclusionProof(
+            gateway_id=self.gateway_id,
+            seq=self.seq,
+            tree_size=self.count,
+            index=index,
+            sample=self.sample_bytes(index),
+            path=tuple(audit_path(self.leaf_hashes(), index)),
+            root=self.root,
+            signature=self.signature,
+        )
+
+
+def gateway_batch_to_json(batch: GatewayBatch) -> bytes:
+    """Stored as received (hex), so proofs can be rebuilt for an audit."""
+    record = {
+        "gateway_id": batch.gateway_id.hex(),
+        "seq": batch.seq,
+        "count": batch.count,
+        "root": batch.root.hex(),
+        "batch": batch.view.hex(),
+    }
+    return json.dumps(record, separators=(",", ":")).encode()
+
+
+def gateway_batch_from_record(record: dict) -> GatewayBatch:
+    return GatewayBatch(bytes.fromhex(record["batch"]))
+
+
+# === VERIFICATION ===
+def verify_gateway_batch(
+    batch: GatewayBatch,
+    binding_lookup: Callable[[bytes], Optional[GatewayBinding]],
+    key_cache: Optional[VerifyKeyCache] = None,
+) -> List[bool]:
+    """
+    One result per sample: True if the root matches, the gateway signature is good
+    and the sample's device is one of the gateway's panels. A bad root or signature,
+    or a non-increasing seq when binding_lookup is a GatewayRegistry, rejects the
+    whole batch.
+    """
+    started = clock() if metrics.enabled else None
+    binding = binding_lookup(batch.gateway_id)
+    ok = binding is not None and batch.computed_root() == batch.root
+    if ok:
+        verify_key = key_cache.get(binding.public_key) if key_cache is not None else VerifyKey(binding.public_key)
+        try:
+            verify_key.verify(batch.header, batch.signature)
+        except BadSignatureError:
+            ok = False
+    if started is not None:
+        _VERIFY_GATEWAY.observe(clock() - started)
+        (_SIGNATURES_VALID if ok else _SIGNATURES_REJECTED).inc()
+    if ok and isinstance(binding_lookup, GatewayRegistry) and not binding_lookup.accept_seq(batch.gateway_id, batch.seq):
+        ok = False
+
+    if not ok:
+        return [False] * batch.count
+    panels = binding.panels
+    return [sample.device_id in panels for sample in batch]
+
+
+def verify_inclusion_proof(proof: InclusionProof, public_key: bytes) -> bool:
+    """Auditor side: the sample is in a batch the gateway with public_key signed."""
+    header = batch_header(proof.gateway_id, proof.seq, proof.tree_size, proof.root)
+    try:
+        VerifyKey(public_key).verify(header, proof.signature)
+    except BadSignatureError:
+        return False
+    return verify_inclusion(leaf_hash(proof.sample), proof.index, proof.tree_size, proof.path, proof.root)
+
+
+_VERIFY_GATEWAY = VERIFY_SECONDS.labels(path="gateway")
+_SIGNATURES_VALID = SIGNATURES.labels(result="valid")
+_SIGNATURES_REJECTED = SIGNATURES.labels(result="rejected")
+
+
+# === GATEWAY BINDINGS ===
+class GatewayRegistry:
+    """
+    gateway_id → GatewayBinding; callable as the binding_lookup of verify_gateway_batch.
+    Also tracks the last accepted seq per gateway (in memory: after a restart the
+    storage key's root prefix still keeps a reused seq from overwriting a batch).
+    """
+
+    def __init__(self, bindings: Iterable[GatewayBinding] = ()):
+        self._bindings: Dict[bytes, GatewayBinding] = {b.gateway_id: b for b in bindings}
+        self._last_seq: Dict[bytes, int] = {}
+        self.stats = {"stale_seq": 0}
+        self._lock = threading.Lock()
+
+    def register(self, gateway_id: bytes, public_key: bytes, panels: Iterable[bytes] = ()) -> GatewayBinding:
+        binding = GatewayBinding(gateway_id, public_key, frozenset(panels))
+        with self._lock:
+            self._bindings[gateway_id] = binding
+        return binding
+
+    def add_panels(self, gateway_id: bytes, panels: Iterable[bytes]) -> GatewayBinding:
+        with self._lock:
+            binding = self._bindings[gateway_id]
+            binding = self._bindings[gateway_id] = binding._replace(panels=binding.panels | frozenset(panels))
+        return binding
+
+    def remove(self, gateway_id: bytes):
+        with self._lock:
+            self._bindings.pop(gateway_id, None)
+            self._last_seq.pop(gateway_id, None)
+
+    def accept_seq(self, gateway_id: bytes, seq: int) -> bool:
+        """Atomically check and record; False unless seq is above the gateway's last accepted one."""
+        with self._lock:
+            last = self._last_seq.get(gateway_id)
+            if last is not None and seq <= last:
+                self.stats["stale_seq"] += 1
+                return False
+            self._last_seq[gateway_id] = seq
+            return True
+
+    def last_seq(self, gateway_id: bytes) -> Optional[int]:
+        return self._last_seq.get(gateway_id)
+
+    def get(self, gateway_id: bytes) -> Optional[GatewayBinding]:
+        return self._bindings.get(gateway_id)
+
+    __call__ = get
+
+    def __len__(self) -> int:
+        return len(self._bindings)
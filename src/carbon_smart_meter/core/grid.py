@@ -0,0 +1,162 @@
+# src/carbon_smart_meter/core/grid.py
+"""
+Time-Varying Grid Intensity (Hourly / Monthly Series, Static Fallback)
+
+Loads per-region intensity series (kg CO₂/kWh) from a local CSV:
+
+    region,start,intensity
+    EU,1704067200,0.281          # start = unix seconds; value holds until the next row
+
+- Parsed once into a columnar .npy cache next to the CSV, then memory-mapped
+- Each region's rows are a contiguous slice; uniform (e.g. hourly) series are
+  indexed by arithmetic, irregular (e.g. monthly) ones by binary search
+- Timestamps outside a region's series, and regions without one, use the static
+  annual table (offset.GRID_INTENSITY, then GLOBAL_AVG_CO2_PER_KWH)
+- intensities() / co2_avoided() are the vectorised forms for arrays of readings
+"""
+
+import csv
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# === CONFIG ===
+CACHE_SUFFIX = ".npycache"
+
+
+class _Series:
+    __slots__ = ("lo", "hi", "first", "end", "step")
+
+    def __init__(self, lo: int, hi: int, first: int, end: int, step: int):
+        self.lo = lo            # Row slice [lo, hi) in the shared columns
+        self.hi = hi
+        self.first = first      # Covered time range [first, end)
+        self.end = end
+        self.step = step        # > 0 for uniform series, 0 otherwise
+
+
+# === TABLE ===
+class GridIntensityTable:
+    def __init__(
+        self,
+        starts: Optional[np.ndarray] = None,
+        values: Optional[np.ndarray] = None,
+        regions: Optional[Dict[str, Tuple[int, int]]] = None,
+        fallback: Optional[Dict[str, float]] = None,
+        default: Optional[float] = None,
+    ):
+        if fallback is None or default is None:
+            from .offset import GLOBAL_AVG_CO2_PER_KWH, GRID_INTENSITY
+            fallback = GRID_INTENSITY if fallback is None else fallback
+            default = GLOBAL_AVG_CO2_PER_KWH if default is None else default
+
+        self.starts = starts if starts is not None else np.empty(0, dtype=np.int64)
+        self.values = values if values is not None else np.empty(0, dtype=np.float64)
+        self.fallback = {region.upper(): value for region, value in fallback.items()}
+        self.default = default
+        self.series: Dict[str, _Series] = {
+            region: self._index(lo, hi) for region, (lo, hi) in (regions or {}).items()
+        }
+        self._names: Dict[str, str] = {}     # any spelling seen → canonical region
+
+    # --- loading ---
+    @classmethod
+    def from_csv(cls, path: str, cache_dir: Optional[str] = None, **kwargs) -> "GridIntensityTable":
+        """Load a CSV series file, (re)building the memory-mapped cache when the CSV changed."""
+        cache = os.path.join(cache_dir, os.path.basename(path) + CACHE_SUFFIX) if cache_dir else path + CACHE_SUFFIX
+        stat = os.stat(path)
+        source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        meta_path = os.path.join(cache, "meta.json")
+
+        meta = None
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        if meta is None or meta.get("source") != source:
+            meta = cls._build_cache(path, cache, source)
+
+        starts = np.load(os.path.join(cache, "starts.npy"), mmap_mode="r")
+        values = np.load(os.path.join(cache, "values.npy"), mmap_mode="r")
+        regions = {region: tuple(span) for region, span in meta["regions"].items()}
+        return cls(starts, values, regions, **kwargs)
+
+    @staticmethod
+    def _build_cache(path: str, cache: str, source: dict) -> dict:
+        rows: Dict[str, list] = {}
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                rows.setdefault(row["region"].strip().upper(), []).append(
+                    (int(row["start"]), float(row["intensity"]))
+                )
+
+        starts, values, regions, offset = [], [], {}, 0
+        for region in sorted(rows):
+            series = sorted(rows[region])
+            starts += [s for s, _ in series]
+            values += [v for _, v in series]
+            regions[region] = [offset, offset + len(series)]
+            offset += len(series)
+
+        os.makedirs(cache, exist_ok=True)
+        np.save(os.path.join(cache, "starts.npy"), np.asarray(starts, dtype=np.int64))
+        np.save(os.path.join(cache, "values.npy"), np.asarray(values, dtype=np.float64))
+        meta = {"source": source, "regions": regions}
+        tmp = os.path.join(cache, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(cache, "meta.json"))
+        return meta
+
+    def _index(self, lo: int, hi: int) -> _Series:
+        starts = np.asarray(self.starts[lo:hi])
+        if len(starts) == 1:
+            return _Series(lo, hi, int(starts[0]), np.iinfo(np.int64).max, 0)
+        steps = np.diff(starts)
+        last_step = int(steps[-1])
+        uniform = bool((steps == steps[0]).all())
+        return _Series(lo, hi, int(starts[0]), int(starts[-1]) + last_step, int(steps[0]) if uniform else 0)
+
+    # --- lookups ---
+    def canonical(self, region: str) -> str:
+        name = self._names.get(region)
+        if name is None:
+            name = self._names[region] = region.upper()
+        return name
+
+    def static(self, region: str) -> float:
+        return self.fallback.get(self.canonical(region), self.default)
+
+    def intensity(self, region: str, timestamp: Optional[int] = None) -> float:
+        name = self.canonical(region)
+        series = self.series.get(name)
+        if series is None or timestamp is None or not series.first <= timestamp < series.end:
+            return self.fallback.get(name, self.default)
+        if series.step:
+            row = series.lo + (timestamp - series.first) // series.step
+        else:
+            row = series.lo + int(np.searchsorted(self.starts[series.lo:series.hi], timestamp, side="right")) - 1
+        return float(self.values[row])
+
+    def intensities(self, region: str, timestamps) -> np.ndarray:
+        """Vectorised intensity() for one region and an array of timestamps."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        name = self.canonical(region)
+        out = np.full(timestamps.shape, self.fallback.get(name, self.default), dtype=np.float64)
+        series = self.series.get(name)
+        if series is None:
+            return out
+
+        covered = (timestamps >= series.first) & (timestamps < series.end)
+        ts = timestamps[covered]
+        if series.step:
+            rows = series.lo + (ts - series.first) // series.step
+        else:
+            rows = series.lo + np.searchsorted(self.starts[series.lo:series.hi], ts, side="right") - 1
+        out[covered] = self.values[rows]
+        return out
+
+    def co2_avoided(self, kwh, timestamps, region: str) -> np.ndarray:
+        """kg CO₂ for arrays of kWh + timestamps, rounded to 6 places like calculate_co2_avoided."""
+        return np.round(np.asarray(kwh, dtype=np.float64) * self.intensities(region, timestamps), 6)
@@ -0,0 +1,134 @@
+# src/carbon_smart_meter/core/keys.py
+"""
+Device Key Resolver (One Lookup per Device, Shared Across the Pipeline)
+
+Maps device_id → (public key, ready-built VerifyKey, wallet binding), backed by
+the registration store (anything with get(device_id) -> DeviceBinding).
+- LRU bounded; entries expire after a TTL so re-bindings are picked up
+- Unknown devices are cached briefly too, so a flood of bad ids can't hammer the store
+- Callable as a key_lookup (device_id → public key) for verify_batch / verify_frames,
+  which then skip building VerifyKey objects altogether
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+
+from nacl.signing import VerifyKey
+
+# === CONFIG ===
+KEY_RESOLVER_SIZE = 100_000
+KEY_TTL = 300.0                 # Seconds before a binding is re-read from the store
+NEGATIVE_TTL = 5.0              # Seconds an unknown device stays unknown
+
+
+class DeviceKey(NamedTuple):
+    device_id: bytes
+    public_key: bytes
+    verify_key: VerifyKey
+    wallet_address: str
+    binding: Any
+
+
+# === RESOLVER ===
+class DeviceKeyResolver:
+    def __init__(
+        self,
+        db,
+        maxsize: int = KEY_RESOLVER_SIZE,
+        ttl: float = KEY_TTL,
+        negative_ttl: float = NEGATIVE_TTL,
+        clock=time.monotonic,
+    ):
+        self.db = db
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()     # device_id → (expires_at, DeviceKey | None)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def resolve(self, device_id: bytes) -> Optional[DeviceKey]:
+        now = self.clock()
+        with self._lock:
+            cached = self._entries.get(device_id)
+            if cached is not None:
+                if cached[0] > now:
+                    self._entries.move_to_end(device_id)
+                    self.stats["hits"] += 1
+                    return cached[1]
+                self.stats["expired"] += 1
+            self.stats["misses"] += 1
+
+        # Store read + key construction happen outside the lock
+        binding = self.db.get(device_id)
+        entry = None
+        if binding is not None:
+            entry = DeviceKey(
+                device_id=device_id,
+                public_key=binding.public_key,
+                verify_key=VerifyKey(binding.public_key),
+                wallet_address=binding.wallet_address,
+                binding=binding,
+            )
+        expires_at = now + (self.ttl if entry is not None else self.negative_ttl)
+
+        with self._lock:
+            self._entries[device_id] = (expires_at, entry)
+            self._entries.move_to_end(device_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+        return entry
+
+    def public_key(self, device_id: bytes) -> Optional[bytes]:
+        entry = self.resolve(device_id)
+        return entry.public_key if entry is not None else None
+
+    __call__ = public_key
+
+    def verify_key(self, device_id: bytes) -> Optional[VerifyKey]:
+        entry = self.resolve(device_id)
+        return entry.verify_key if entry is not None else None
+
+    def verify_key_for(self, device_id: bytes, public_key: bytes) -> Optional[VerifyKey]:
+        """The cached VerifyKey, but only if public_key is the one bound to device_id."""
+        entry = self.resolve(device_id)
+        return entry.verify_key if entry is not None and entry.public_key == public_key else None
+
+    def wallet(self, device_id: bytes) -> Optional[str]:
+        entry = self.resolve(device_id)
+        return entry.wallet_address if entry is not None else None
+
+    def invalidate(self, device_id: Optional[bytes] = None):
+        """Drop one device (e.g. just registered or re-bound), or everything."""
+        with self._lock:
+            if device_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(device_id, None)
+
+    def metrics(self) -> Dict[str, float]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def verify_key_source(key_lookup, key_cache):
+    """device_id → VerifyKey: straight from a resolver, else key_lookup + VerifyKeyCache."""
+    if isinstance(key_lookup, DeviceKeyResolver):
+        return key_lookup.verify_key
+
+    def lookup(device_id: bytes) -> Optional[VerifyKey]:
+        public_key = key_lookup(device_id)
+        return key_cache.get(public_key) if public_key is not None else None
+
+    return lookup
@@ -0,0 +1,278 @@
+# src/carbon_smart_meter/core/local.py
+"""
+Local Stand-ins for AWS S3, Azure Blob and Solana RPC (Offline / Testing)
+
+Implements the subset of the boto3 S3 client, azure-storage-blob
+BlobServiceClient and solana-py Client APIs used by this package.
+- In memory by default
+- Pass a root directory to keep objects on disk (root/bucket/key)
+- LocalRpcServer serves the same Solana stand-in as JSON-RPC over HTTP, with
+  optional latency and error rate, for the async adapters (core.blockchain)
+"""
+
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+
+# === S3 ===
+class LocalS3:
+    def __init__(self, root: Optional[str] = None):
+        self.root = root
+        self.objects: Dict[str, Dict[str, bytes]] = {}
+        self.modified: Dict[Tuple[str, str], datetime] = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs):
+        if self.root:
+            path = os.path.join(self.root, Bucket, Key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(Body)
+        else:
+            with self._lock:
+                self.objects.setdefault(Bucket, {})[Key] = bytes(Body)
+                self.modified[(Bucket, Key)] = datetime.now(timezone.utc)
+        return {"ETag": str(hash(Body))}
+
+    def get_object(self, Bucket: str, Key: str, **kwargs):
+        if self.root:
+            with open(os.path.join(self.root, Bucket, Key), "rb") as f:
+                body = f.read()
+        else:
+            body = self.objects[Bucket][Key]
+        return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+
+    def list_objects_v2(
+        self,
+        Bucket: str,
+        Prefix: str = "",
+        MaxKeys: int = 1000,
+        ContinuationToken: str = "",
+        StartAfter: str = "",
+        **kwargs
+    ):
+        after = max(ContinuationToken, StartAfter)
+        keys = sorted(k for k in self._keys(Bucket) if k.startswith(Prefix) and k > after)
+        page = keys[:MaxKeys]
+        resp = {
+            "Contents": [{"Key": k, "LastModified": self._modified(Bucket, k)} for k in page],
+            "KeyCount": len(page),
+            "IsTruncated": len(keys) > MaxKeys,
+        }
+        if resp["IsTruncated"]:
+            resp["NextContinuationToken"] = page[-1]
+        return resp
+
+    def get_paginator(self, operation: str):
+        if operation != "list_objects_v2":
+            raise NotImplementedError(operation)
+        return _ListPaginator(self)
+
+    def _modified(self, bucket: str, key: str) -> datetime:
+        if self.root:
+            mtime = os.path.getmtime(os.path.join(self.root, bucket, key))
+            return datetime.fromtimestamp(mtime, timezone.utc)
+        return self.modified[(bucket, key)]
+
+    def _keys(self, bucket: str):
+        if not self.root:
+            with self._lock:
+                return list(self.objects.get(bucket, {}))
+        base = os.path.join(self.root, bucket)
+        keys = []
+        for dirpath, _, files in os.walk(base):
+            for name in files:
+                keys.append(os.path.relpath(os.path.join(dirpath, name), base).replace(os.sep, "/"))
+        return keys
+
+
+class _ListPaginator:
+    def __init__(self, s3: LocalS3):
+        self.s3 = s3
+
+    def paginate(
+        self,
+        Bucket: str,
+        Prefix: str = "",
+        StartAfter: str = "",
+        PaginationConfig: Optional[dict] = None,
+        **kwargs
+    ):
+        page_size = (PaginationConfig or {}).get("PageSize", 1000)
+        token = (PaginationConfig or {}).get("StartingToken") or ""
+        while True:
+            resp = self.s3.list_objects_v2(
+                Bucket=Bucket, Prefix=Prefix, MaxKeys=page_size, ContinuationToken=token, StartAfter=StartAfter
+            )
+            yield resp
+            if not resp["IsTruncated"]:
+                return
+            token = resp["NextContinuationToken"]
+
+
+# === AZURE BLOB ===
+class LocalBlobServiceClient:
+    def __init__(self, root: Optional[str] = None):
+        self.root = root
+        self.blobs: Dict[str, Dict[str, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get_blob_client(self, container: str, blob: str) -> "LocalBlobClient":
+        return LocalBlobClient(self, container, blob)
+
+
+class LocalBlobClient:
+    def __init__(self, service: LocalBlobServiceClient, container: str, blob: str):
+        self.service = service
+        self.container = container
+        self.blob_name = blob
+
+    def upload_blob(self, data: bytes, overwrite: bool = False, **kwargs):
+        if self.service.root:
+            path = os.path.join(self.service.root, self.container, self.blob_name)
+            if os.path.exists(path) and not overwrite:
+                raise FileExistsError(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+            return
+        with self.service._lock:
+            container = self.service.blobs.setdefault(self.container, {})
+            if self.blob_name in container and not overwrite:
+                raise FileExistsError(self.blob_name)
+            container[self.blob_name] = bytes(data)
+
+    def download_blob(self):
+        if self.service.root:
+            with open(os.path.join(self.service.root, self.container, self.blob_name), "rb") as f:
+                return _Downloader(f.read())
+        return _Downloader(self.service.blobs[self.container][self.blob_name])
+
+
+class _Downloader:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def readall(self) -> bytes:
+        return self.data
+
+
+# === SOLANA RPC ===
+class LocalSolanaClient:
+    """
+    In-process stand-in for solana.rpc.api.Client: accepts every transaction,
+    hands out a fixed recent blockhash and reports sent signatures as confirmed.
+    """
+
+    def __init__(self, blockhash: str = "11111111111111111111111111111111"):
+        self.blockhash = blockhash
+        self.transactions = []
+        self.statuses: Dict[str, dict] = {}
+        self.blockhash_requests = 0
+        self._lock = threading.Lock()
+
+    def get_latest_blockhash(self, *args, **kwargs):
+        with self._lock:
+            self.blockhash_requests += 1
+        return {"result": {"value": {"blockhash": self.blockhash, "lastValidBlockHeight": 0}}}
+
+    def send_transaction(self, tx, *signers, opts=None, recent_blockhash=None, **kwargs):
+        with self._lock:
+            signature = f"local-{len(self.transactions):08d}"
+            self.transactions.append(tx)
+            self.statuses[signature] = {"confirmationStatus": "confirmed", "err": None}
+        return {"result": signature}
+
+    def get_signature_statuses(self, signatures, *args, **kwargs):
+        with self._lock:
+            return {"result": {"value": [self.statuses.get(str(s)) for s in signatures]}}
+
+
+class LocalRpcServer:
+    """
+    Minimal HTTP/1.1 (keep-alive) JSON-RPC endpoint for getLatestBlockhash,
+    sendTransaction and getSignatureStatuses, backed by a LocalSolanaClient.
+    Each request waits `latency` seconds; a `failure_rate` share of sends fail.
+    """
+
+    def __init__(
+        self,
+        client: Optional[LocalSolanaClient] = None,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.client = client if client is not None else LocalSolanaClient()
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.connections = 0
+        self.accepted = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> "LocalRpcServer":
+        self.server = await asyncio.start_server(self._handle, host, port, backlog=1024)
+        return self
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def dispatch(self, request: dict) -> dict:
+        method, params = request.get("method"), request.get("params") or []
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        if method == "getLatestBlockhash":
+            value = self.client.get_latest_blockhash()["result"]["value"]
+            reply["result"] = {"context": {"slot": 0}, "value": value}
+        elif method == "sendTransaction":
+            if self.failure_rate and self.rng.random() < self.failure_rate:
+                reply["error"] = {"code": -32005, "message": "Node is behind"}
+            else:
+                reply["result"] = self.client.send_transaction(base64.b64decode(params[0]))["result"]
+        elif method == "getSignatureStatuses":
+            value = self.client.get_signature_statuses(params[0])["result"]["value"]
+            reply["result"] = {"context": {"slot": 0}, "value": value}
+        else:
+            reply["error"] = {"code": -32601, "message": f"Method not found: {method}"}
+        return reply
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self.accepted += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n")[1:]:
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                body = json.loads(await reader.readexactly(length))
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                self.requests += 1
+                payload = json.dumps(self.dispatch(body)).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\nConnection: keep-alive\r\n\r\n" % len(payload) + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
@@ -0,0 +1,104 @@
+# src/carbon_smart_meter/core/merkle.py
+"""
+Merkle Trees over Signed Packets (RFC 6962 Layout, SHA-256)
+
+- Leaves and inner nodes are domain-separated (0x00 / 0x01 prefix)
+- Uneven trees split at the largest power of two, as in Certificate Transparency
+- MerkleAccumulator builds the same root incrementally in O(log n) memory
+- audit_path() / verify_inclusion() give and check RFC 6962 inclusion proofs
+"""
+
+import hashlib
+from typing import Iterable, List, Sequence
+
+EMPTY_ROOT = hashlib.sha256(b"").digest()
+
+
+def leaf_hash(data: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + bytes(data)).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+class MerkleAccumulator:
+    """Append-only tree: keeps one perfect-subtree root ("peak") per set bit of the leaf count."""
+
+    __slots__ = ("peaks", "count")
+
+    def __init__(self):
+        self.peaks: List[bytes] = []
+        self.count = 0
+
+    def add(self, data: bytes):
+        self.add_hash(leaf_hash(data))
+
+    def add_hash(self, digest: bytes):
+        count = self.count
+        while count & 1:
+            digest = node_hash(self.peaks.pop(), digest)
+            count >>= 1
+        self.peaks.append(digest)
+        self.count += 1
+
+    def root(self) -> bytes:
+        if not self.peaks:
+            return EMPTY_ROOT
+        digest = self.peaks[-1]
+        for peak in reversed(self.peaks[:-1]):
+            digest = node_hash(peak, digest)
+        return digest
+
+
+def merkle_root(leaves: Iterable[bytes]) -> bytes:
+    accumulator = MerkleAccumulator()
+    for data in leaves:
+        accumulator.add(data)
+    return accumulator.root()
+
+
+def root_of_hashes(hashes: Iterable[bytes]) -> bytes:
+    """Root over leaves that are already leaf_hash()ed."""
+    accumulator = MerkleAccumulator()
+    for digest in hashes:
+        accumulator.add_hash(digest)
+    return accumulator.root()
+
+
+# === INCLUSION PROOFS ===
+def audit_path(hashes: Sequence[bytes], index: int) -> List[bytes]:
+    """Sibling hashes from leaf `index` up to the root (RFC 6962 PATH), leaf hashes in."""
+    if not 0 <= index < len(hashes):
+        raise IndexError(f"leaf {index} outside a tree of {len(hashes)}")
+    lo, hi = 0, len(hashes)
+    siblings = []                                       # Sibling subtree ranges, root side first
+    while hi - lo > 1:
+        k = 1 << ((hi - lo - 1).bit_length() - 1)       # Largest power of two < n
+        if index < lo + k:
+            siblings.append((lo + k, hi))
+            hi = lo + k
+        else:
+            siblings.append((lo, lo + k))
+            lo = lo + k
+    return [root_of_hashes(hashes[start:end]) for start, end in reversed(siblings)]
+
+
+def verify_inclusion(leaf: bytes, index: int, tree_size: int, path: Sequence[bytes], root: bytes) -> bool:
+    """Check an audit path for leaf_hash `leaf` (RFC 9162, section 2.1.3.2)."""
+    if not 0 <= index < tree_size:
+        return False
+    fn, sn, digest = index, tree_size - 1, leaf
+    for sibling in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            digest = node_hash(sibling, digest)
+            while not fn & 1 and fn:
+                fn >>= 1
+                sn >>= 1
+        else:
+            digest = node_hash(digest, sibling)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and digest == root
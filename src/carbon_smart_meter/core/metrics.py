@@ -0,0 +1,276 @@
+# src/carbon_smart_meter/core/metrics.py
+"""
+Pipeline Instrumentation (Latency Histograms, Counters, Queue Depths)
+
+One process-wide registry, exported in the Prometheus text format (render()).
+- Off by default: instrumented code checks `metrics.enabled` once per call and
+  skips the clock reads entirely, so a disabled registry costs one attribute load
+- Turn on with CSM_METRICS=1 or metrics.enable()
+- Histograms use fixed cumulative buckets (seconds); counters and gauges can
+  carry labels, e.g. the AWS and Azure legs of a storage write
+- Queue depths are read when exported (track()), not on every put
+"""
+
+import bisect
+import os
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# === CONFIG ===
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+clock = time.perf_counter
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+# === METRIC TYPES ===
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def labels(self, *values: str, **kwargs: str):
+        """Child for one label combination (created on first use; cache it on hot paths)."""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels; use .labels(...)")
+        return self._children[()]
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines += child.samples(self.name, self.labelnames, values)
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labelnames, values) -> List[str]:
+        return [f"{name}_total{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    @property
+    def value(self) -> float:
+        return self._default().value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)      # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self, name, labelnames, values) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            labels = _format_labels(labelnames, values, f'le="{_format_value(bound)}"')
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        plain = _format_labels(labelnames, values)
+        lines.append(f"{name}_sum{plain} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{plain} {self.count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    @property
+    def count(self) -> int:
+        return self._default().count
+
+
+class _GaugeChild:
+    __slots__ = ("value", "sources")
+
+    def __init__(self):
+        self.value = 0.0
+        self.sources: List[Tuple[weakref.ref, Callable]] = []
+
+    def set(self, value: float):
+        self.value = value
+
+    def track(self, owner, read: Callable[[object], float]):
+        """Report read(owner) at export time, summed over live owners; dropped once owner is gone."""
+        self.sources.append((weakref.ref(owner), read))
+
+    def get(self) -> float:
+        if not self.sources:
+            return self.value
+        total, live = 0.0, []
+        for ref, read in self.sources:
+            owner = ref()
+            if owner is not None:
+                total += read(owner)
+                live.append((ref, read))
+        self.sources = live
+        return total
+
+    def samples(self, name, labelnames, values) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.get())}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def get(self) -> float:
+        return self._default().get()
+
+
+# === REGISTRY ===
+class MetricsRegistry:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help, labelnames)
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, help, labelnames, buckets=buckets)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help, labelnames)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self.metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for name in sorted(self.metrics):
+            lines += self.metrics[name].collect()
+        return "\n".join(lines) + "\n"
+
+    def _register(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} already registered with a different type or labels")
+            return metric
+
+
+metrics = MetricsRegistry(enabled=os.environ.get("CSM_METRICS", "") not in ("", "0"))
+
+
+# === PIPELINE METRICS ===
+VERIFY_SECONDS = metrics.histogram(
+    "csm_verify_seconds", "Ed25519 verification latency (path=packet: one call, path=batch: one batch)", ["path"]
+)
+SIGNATURES = metrics.counter("csm_signatures", "Device signatures checked", ["result"])
+KWH_CONVERT_SECONDS = metrics.histogram("csm_vir_to_kwh_seconds", "VIR to kWh conversion latency")
+CAP_SECONDS = metrics.histogram("csm_cap_check_seconds", "Daily cap check-and-add latency")
+CAP_CLIPS = metrics.counter("csm_cap_clips", "Samples reduced to fit the daily kWh cap")
+CAP_REJECTIONS = metrics.counter("csm_cap_rejections", "Samples rejected because the daily cap was reached")
+STORE_SECONDS = metrics.histogram("csm_store_put_seconds", "Storage upload latency per leg", ["store", "leg"])
+STORE_FAILURES = metrics.counter("csm_store_put_failures", "Failed storage uploads per leg", ["store", "leg"])
+OFFSET_SECONDS = metrics.histogram("csm_offset_process_seconds", "OffsetEngine.process_verified_reading latency")
+OFFSET_SKIPPED = metrics.counter("csm_offset_skipped", "Readings without a known wallet or outside the index horizon")
+SUBMIT_SECONDS = metrics.histogram("csm_submit_seconds", "kWh submission latency (one transaction)", ["mode"])
+SUBMIT_FAILURES = metrics.counter("csm_submit_failures", "Failed kWh submissions", ["reason"])
+QUEUE_DEPTH = metrics.gauge("csm_queue_depth", "Items waiting in a pipeline queue", ["queue"])
+REPLAY_REJECTIONS = metrics.counter("csm_replay_rejections", "Packets rejected by the replay guard", ["reason"])
+REPLAY_BLOOM_FILL = metrics.gauge(
+    "csm_replay_bloom_fill", "Fill ratio of the replay guard's writable Bloom filter (grows a new one near 0.5)"
+)
+SCREENED = metrics.counter("csm_screened_samples", "Samples hit by a plausibility screen reason", ["reason"])
@@ -9,24 +9,33 @@ Receives real-time VIR from microcontroller via cable → converts to kWh → ve
 
 import time
 import struct
-from typing import Optional
+import threading
+from itertools import count
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence
+import numpy as np
 from pydantic import BaseModel, Field
 from nacl.signing import VerifyKey
 from nacl.exceptions import BadSignatureError
-import boto3
-import azure.identity
-import azure.storage.blob as azure_blob
+
+from .aggregation import EnergyAggregate, WindowAggregator, aggregate_leaves_to_json, aggregate_to_json
+from .clients import ClientRegistry
+from .dedup import ReplayGuard
+from .keys import DeviceKeyResolver, verify_key_source
+from .metrics import (
+    CAP_CLIPS, CAP_REJECTIONS, CAP_SECONDS, KWH_CONVERT_SECONDS, SIGNATURES, VERIFY_SECONDS, clock, metrics
+)
+from .records import Reading, intern_device_id, reading_to_json, to_models
+from .screening import QUARANTINE, PlausibilityScreen, QuarantinedSample, quarantined_to_json
+from .storage import SecureStore
 
 # === CONFIG ===
 DAILY_KWH_CAP = 1.5
 POWER_SAMPLE_INTERVAL = 1.0
-
-# === AZURE (GLOBAL BACKUP) ===
-azure_cred = azure.identity.DefaultAzureCredential()
-azure_blob_client = azure_blob.BlobServiceClient(
-    account_url="https://backupstorage.blob.core.windows.net",
-    credential=azure_cred
-)
+VERIFY_KEY_CACHE_SIZE = 100_000
+VERIFY_CHUNK_SIZE = 256
+CONVERT_SAMPLE_EVERY = 64       # vir_to_kwh is sub-microsecond: time 1 call in N when metrics are on
 
 # === MODELS ===
 from pydantic import ConfigDict
@@ -51,87 +60,478 @@ class EnergyReading(BaseModel):
 
 
 # === ED25519 VERIFICATION ===
-def verify_packet(packet: VIRPacket, public_key: bytes) -> bool:
-    verify_key = VerifyKey(public_key)
-    signed_data = (
+def signed_message(packet: VIRPacket) -> bytes:
+    return (
         packet.device_id +
         struct.pack("<fffq", packet.voltage, packet.current, packet.resistance, packet.timestamp)
     )
+
+
+def verify_packet(packet: VIRPacket, public_key: bytes) -> bool:
+    started = clock() if metrics.enabled else None
+    verify_key = VerifyKey(public_key)
+    signed_data = signed_message(packet)
     try:
         verify_key.verify(signed_data, packet.signature)
-        return True
+        ok = True
     except BadSignatureError:
-        return False
+        ok = False
+    if started is not None:
+        _VERIFY_PACKET.observe(clock() - started)
+        (_SIGNATURES_VALID if ok else _SIGNATURES_REJECTED).inc()
+    return ok
+
+
+class VerifyKeyCache:
+    """
+    LRU of constructed VerifyKey objects, keyed by the device's public key.
+
+    Registration enforces 1 device = 1 public key, so this is a per-device cache.
+    """
+
+    def __init__(self, maxsize: int = VERIFY_KEY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._keys: "OrderedDict[bytes, VerifyKey]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, public_key: bytes) -> VerifyKey:
+        with self._lock:
+            verify_key = self._keys.get(public_key)
+            if verify_key is not None:
+                self._keys.move_to_end(public_key)
+                return verify_key
+
+            verify_key = VerifyKey(public_key)
+            self._keys[public_key] = verify_key
+            if len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+            return verify_key
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def _verify_chunk(jobs: Sequence[tuple]) -> List[bool]:
+    results = []
+    for verify_key, message, signature in jobs:
+        if verify_key is None:
+            results.append(False)
+            continue
+        try:
+            verify_key.verify(message, signature)
+            results.append(True)
+        except BadSignatureError:
+            results.append(False)
+    return results
+
+
+def verify_jobs(jobs: Sequence[tuple], executor: Optional[Executor] = None) -> List[bool]:
+    """Check (verify_key, message, signature) jobs, chunked across the executor if given."""
+    started = clock() if metrics.enabled else None
+    if executor is None or len(jobs) <= VERIFY_CHUNK_SIZE:
+        results = _verify_chunk(jobs)
+    else:
+        chunks = [jobs[i:i + VERIFY_CHUNK_SIZE] for i in range(0, len(jobs), VERIFY_CHUNK_SIZE)]
+        results: List[bool] = []
+        for chunk_result in executor.map(_verify_chunk, chunks):
+            results.extend(chunk_result)
+
+    if started is not None:
+        _VERIFY_BATCH.observe(clock() - started)
+        valid = results.count(True)
+        _SIGNATURES_VALID.inc(valid)
+        _SIGNATURES_REJECTED.inc(len(results) - valid)
+    return results
+
+
+def verify_batch(
+    packets: Sequence[VIRPacket],
+    key_lookup: Callable[[bytes], Optional[bytes]],
+    key_cache: Optional[VerifyKeyCache] = None,
+    executor: Optional[Executor] = None,
+    mask: Optional[Sequence[bool]] = None,
+) -> List[bool]:
+    """
+    Verify many packets at once. Same answers as verify_packet, packet by packet.
+
+    key_lookup maps device_id → public key (None for unknown devices, which are rejected);
+    a DeviceKeyResolver hands over its ready-built VerifyKeys directly.
+    With an executor the signature checks are spread across its workers; libsodium
+    releases the GIL, so a thread pool is enough. Packets whose mask entry is False
+    (e.g. replays) are reported False without being checked.
+    """
+    if key_cache is None:
+        key_cache = VerifyKeyCache()
+
+    verify_key_for = verify_key_source(key_lookup, key_cache)
+    jobs = [
+        (verify_key_for(p.device_id) if mask is None or mask[i] else None, signed_message(p), p.signature)
+        for i, p in enumerate(packets)
+    ]
+
+    return verify_jobs(jobs, executor)
+
+
+_VERIFY_PACKET = VERIFY_SECONDS.labels(path="packet")
+_VERIFY_BATCH = VERIFY_SECONDS.labels(path="batch")
+_SIGNATURES_VALID = SIGNATURES.labels(result="valid")
+_SIGNATURES_REJECTED = SIGNATURES.labels(result="rejected")
 
 
 # === kWh CONVERSION ===
+_convert_calls = count()
+
+
 def vir_to_kwh(voltage: float, current: float, duration_sec: float) -> float:
+    started = clock() if metrics.enabled and not next(_convert_calls) % CONVERT_SAMPLE_EVERY else None
     power_watts = voltage * current
     energy_wh = power_watts * (duration_sec / 3600)
+    if started is not None:
+        KWH_CONVERT_SECONDS.observe(clock() - started)
     return energy_wh / 1000
 
 
 # === SECURE, REGION-AWARE STORAGE ===
-class SecureEnergyDB:
-    def __init__(self, user_region: str, azure_container: str = "energy-backup"):
-        self.azure_container = azure_container
-        self.aws_bucket = "ccm-energy-eu" if user_region == "EU" else "ccm-energy-sg"
-        self.s3 = boto3.client("s3")
+class SecureEnergyDB(SecureStore):
+    def __init__(
+        self,
+        user_region: str,
+        azure_container: str = "energy-backup",
+        clients: Optional[ClientRegistry] = None,
+        write_behind: bool = False,
+        spill_dir: Optional[str] = None,
+    ):
+        super().__init__(
+            user_region=user_region,
+            aws_bucket="ccm-energy-eu" if user_region == "EU" else "ccm-energy-sg",
+            azure_container=azure_container,
+            clients=clients,
+            write_behind=write_behind,
+            spill_dir=spill_dir,
+        )
 
-    def insert(self, reading: EnergyReading):
+    def insert(self, reading):
+        """EnergyReading or its interior form, records.Reading."""
         key = f"energy/{reading.device_id.hex()}/{reading.timestamp}.json"
-        data = reading.json().encode()
+        data = reading_to_json(reading)
+        self.write(key, "energy", reading.device_id.hex(), reading.timestamp, data)
 
-        self.s3.put_object(
-            Bucket=self.aws_bucket,
-            Key=key,
-            Body=data,
-            ServerSideEncryption="AES256"
-        )
+    def insert_aggregate(self, aggregate: EnergyAggregate):
+        """
+        The aggregate, plus its frames under energy-agg-leaves/ (same name) so
+        inclusion proofs can be rebuilt from storage (aggregation.aggregate_proof).
+        Amendments carry their sequence and root, so two never share a key.
+        """
+        device_hex = aggregate.device_id.hex()
+        name = f"{aggregate.window_start}-{aggregate.first_ts}-{aggregate.last_ts}"
+        if aggregate.amendment:
+            name += f"-amend{aggregate.sequence}-{aggregate.merkle_root[:16]}"
+        self.write(f"energy-agg/{device_hex}/{name}.json", "energy-agg", device_hex, aggregate.window_start,
+                   aggregate_to_json(aggregate))
+        if aggregate.leaves:
+            self.write(f"energy-agg-leaves/{device_hex}/{name}.json", "energy-agg-leaves", device_hex,
+                       aggregate.window_start, aggregate_leaves_to_json(aggregate))
+
+    def insert_quarantined(self, sample: QuarantinedSample):
+        """Sample the plausibility screen held back: kept for review, never credited."""
+        key = f"quarantine/{sample.device_id.hex()}/{sample.timestamp}.json"
+        self.write(key, "quarantine", sample.device_id.hex(), sample.timestamp, quarantined_to_json(sample))
+
+    def insert_gateway_batch(self, batch):
+        """
+        Raw gateway batch (core.gateway), kept for inclusion proofs. Keyed by seq
+        and a root prefix, so a reused seq can never overwrite a stored batch.
+        """
+        from .gateway import gateway_batch_to_json
 
-        blob_client = azure_blob_client.get_blob_client(container=self.azure_container, blob=key)
-        blob_client.upload_blob(data, overwrite=True, encryption_scope="gdpr-scope")
+        gateway_hex = batch.gateway_id.hex()
+        first_ts = min(sample.timestamp for sample in batch)
+        key = f"gateway-batch/{gateway_hex}/{batch.seq}-{batch.root[:8].hex()}.json"
+        self.write(key, "gateway-batch", gateway_hex, first_ts, gateway_batch_to_json(batch))
 
 
 # === MAIN PROCESSOR ===
 class EnergyProcessor:
-    def __init__(self, user_region: str = "EU"):
+    def __init__(
+        self,
+        user_region: str = "EU",
+        verify_workers: int = 0,
+        clients: Optional[ClientRegistry] = None,
+        cap_store=None,
+        resolver: Optional[DeviceKeyResolver] = None,
+        aggregator: Optional[WindowAggregator] = None,
+        replay_guard: Optional[ReplayGuard] = None,
+        screen: Optional[PlausibilityScreen] = None,
+    ):
         self.user_region = user_region
-        self.db = SecureEnergyDB(user_region=user_region)
-        self.daily_usage = {}
+        self.resolver = resolver
+        self.aggregator = aggregator
+        self.replay_guard = replay_guard
+        self.screen = screen
+        self.aggregate_sinks: List[Callable[[EnergyAggregate], None]] = []
+        self.quarantine_sinks: List[Callable[[QuarantinedSample], None]] = []
+        from .capstore import MemoryCapStore
+
+        self.db = SecureEnergyDB(user_region=user_region, clients=clients)
+        self.daily_usage = cap_store if cap_store is not None else MemoryCapStore()
+        self.key_cache = VerifyKeyCache()
+        self.verify_pool = ThreadPoolExecutor(max_workers=verify_workers) if verify_workers else None
 
     def process_packet(
         self,
         packet: VIRPacket,
-        public_key: bytes,
-        cable_type: str = "type-c"
+        public_key: Optional[bytes] = None,
+        cable_type: str = "type-c",
+        records: bool = False,
     ) -> Optional[EnergyReading]:
+        """
+        public_key may be omitted when the processor has a resolver. Accepted samples
+        come back as EnergyReading; records=True returns the interior records.Reading.
+        """
         if cable_type not in {"type-c", "12v"}:
             return None
+        if self.replay_guard is not None and not self.replay_guard.check(packet.device_id, packet.timestamp):
+            return None
 
-        if not verify_packet(packet, public_key):
+        if public_key is None:
+            verify_key = self.resolver.verify_key(packet.device_id) if self.resolver is not None else None
+        else:
+            verify_key = self.key_cache.get(public_key)
+        message = signed_message(packet)
+        if verify_key is None or not verify_jobs([(verify_key, message, packet.signature)])[0]:
             return None
 
-        kwh = vir_to_kwh(packet.voltage, packet.current, POWER_SAMPLE_INTERVAL)
+        reasons = 0
+        if self.screen is not None:
+            reasons = self.screen.screen_one(
+                packet.device_id, packet.voltage, packet.current, packet.resistance, packet.timestamp
+            )
+        reading = self._accept(
+            packet.device_id, packet.voltage, packet.current, packet.timestamp, cable_type,
+            message + packet.signature, reasons
+        )
+        return reading if records or reading is None else reading.to_model()
+
+    def process_batch(
+        self,
+        packets: Sequence[VIRPacket],
+        key_lookup: Optional[Callable[[bytes], Optional[bytes]]] = None,
+        cable_type: str = "type-c",
+        records: bool = False,
+    ) -> List[Optional[EnergyReading]]:
+        """
+        Batch form of process_packet: one result per packet, None where rejected.
+
+        Signatures are verified up front (cached keys, optional worker pool);
+        cap accounting and storage then run in packet order, exactly as the
+        equivalent sequence of process_packet calls would.
+        """
+        if cable_type not in {"type-c", "12v"}:
+            return [None] * len(packets)
+
+        mask = self.replay_mask([p.device_id for p in packets], [p.timestamp for p in packets])
+        verified = verify_batch(packets, self._key_lookup(key_lookup), self.key_cache, self.verify_pool, mask)
+        screened = self.screen_mask(
+            verified, [p.device_id for p in packets], [p.voltage for p in packets],
+            [p.current for p in packets], [p.resistance for p in packets], [p.timestamp for p in packets],
+        )
+        aggregating = self.aggregator is not None
+        readings = [
+            self._accept(
+                p.device_id, p.voltage, p.current, p.timestamp, cable_type,
+                signed_message(p) + p.signature if aggregating else None, reasons
+            ) if ok else None
+            for p, ok, reasons in zip(packets, verified, screened)
+        ]
+        return readings if records else to_models(readings)
 
-        today = packet.timestamp // 86400
-        key = (packet.device_id, today)
-        current_day_kwh = self.daily_usage.get(key, 0.0) + kwh
+    def process_frames(
+        self,
+        buffer,
+        key_lookup: Optional[Callable[[bytes], Optional[bytes]]] = None,
+        cable_type: str = "type-c",
+        records: bool = False,
+    ) -> List[Optional[EnergyReading]]:
+        """
+        process_batch for binary VIR frames (see core.wire): signatures are checked
+        on the received bytes and no VIRPacket is built.
+        """
+        from .wire import FrameBatch, verify_frames
 
-        if current_day_kwh > DAILY_KWH_CAP:
-            kwh = max(0.0, DAILY_KWH_CAP - self.daily_usage.get(key, 0.0))
-            if kwh <= 0:
-                return None
+        batch = buffer if isinstance(buffer, FrameBatch) else FrameBatch(buffer)
+        if cable_type not in {"type-c", "12v"}:
+            return [None] * len(batch)
+
+        verified = verify_frames(
+            batch, self._key_lookup(key_lookup), self.key_cache, self.verify_pool, self.frame_replay_mask(batch)
+        )
+        return self.accept_frames(batch, verified, cable_type, records)
+
+    def process_gateway_batch(
+        self,
+        buffer,
+        binding_lookup: Callable[[bytes], Optional[object]],
+        cable_type: str = "type-c",
+        records: bool = False,
+    ) -> List[Optional[EnergyReading]]:
+        """
+        One result per sample of a signed gateway batch (see core.gateway): one
+        signature check plus a Merkle root recomputation for the whole batch.
+        binding_lookup maps gateway_id → GatewayBinding (e.g. a GatewayRegistry).
+        """
+        from .gateway import GatewayBatch, verify_gateway_batch
+
+        batch = buffer if isinstance(buffer, GatewayBatch) else GatewayBatch(buffer)
+        if cable_type not in {"type-c", "12v"}:
+            return [None] * len(batch)
+        verified = verify_gateway_batch(batch, binding_lookup, self.key_cache)
+        return self.accept_gateway_batch(batch, verified, cable_type, records)
 
-        reading = EnergyReading(
-            device_id=packet.device_id,
-            kwh=kwh,
-            timestamp=packet.timestamp,
-            verified=True,
-            cable_type=cable_type,
-            user_region=self.user_region
+    def accept_gateway_batch(
+        self, batch, verified: Sequence[bool], cable_type: str = "type-c", records: bool = False
+    ) -> List[Optional[EnergyReading]]:
+        """
+        Cap accounting + storage for a gateway batch whose attestation was checked.
+        Replays are still caught per sample by the replay guard. The batch itself is
+        stored once if any sample is accepted; aggregates built from gateway samples
+        hash the 52-byte samples (there is no per-sample signature).
+        """
+        samples = list(batch)
+        screened = self.screen_mask(
+            verified, [s.device_id for s in samples], [s.voltage for s in samples],
+            [s.current for s in samples], [s.resistance for s in samples], [s.timestamp for s in samples],
         )
-        self.db.insert(reading)
-        self.daily_usage[key] = current_day_kwh
+        aggregating = self.aggregator is not None
+        readings = [
+            self._accept(
+                sample.device_id, sample.voltage, sample.current, sample.timestamp, cable_type,
+                batch.sample_bytes(i) if aggregating else None, reasons
+            ) if ok else None
+            for i, (sample, ok, reasons) in enumerate(zip(samples, verified, screened))
+        ]
+        if any(reading is not None for reading in readings):
+            self.db.insert_gateway_batch(batch)
+        return readings if records else to_models(readings)
+
+    def replay_mask(self, device_ids: Sequence[bytes], timestamps: Sequence[int]) -> Optional[List[bool]]:
+        """Pre-verify replay filter: False where (device_id, timestamp) was already accepted."""
+        if self.replay_guard is None:
+            return None
+        return self.replay_guard.check_many(device_ids, timestamps)
+
+    def frame_replay_mask(self, batch) -> Optional[List[bool]]:
+        if self.replay_guard is None:
+            return None
+        frames = list(batch)
+        return self.replay_guard.check_many([f.device_id for f in frames], [f.timestamp for f in frames])
+
+    def accept_frames(
+        self, batch, verified: Sequence[bool], cable_type: str = "type-c", records: bool = False
+    ) -> List[Optional[EnergyReading]]:
+        """Cap accounting + storage for frames whose signatures were already checked."""
+        screened = [0] * len(verified)
+        if self.screen is not None:
+            cols = batch.columns()
+            screened = self.screen_mask(
+                verified, cols["device_id"], cols["voltage"], cols["current"], cols["resistance"], cols["timestamp"]
+            )
+        aggregating = self.aggregator is not None
+        readings = [
+            self._accept(
+                frame.device_id, frame.voltage, frame.current, frame.timestamp, cable_type,
+                batch.frame_bytes(i) if aggregating else None, reasons
+            ) if ok else None
+            for i, (frame, ok, reasons) in enumerate(zip(batch, verified, screened))
+        ]
+        return readings if records else to_models(readings)
+
+    def screen_mask(self, verified: Sequence[bool], device_ids, voltage, current, resistance, timestamps) -> List[int]:
+        """Screen reasons per sample (0 where unverified or without a screen); only verified samples are screened."""
+        if self.screen is None:
+            return [0] * len(verified)
+        ok = np.flatnonzero(np.asarray(verified, dtype=bool))
+        reasons = np.zeros(len(verified), dtype=np.uint8)
+        if len(ok):
+            ids = device_ids[ok] if isinstance(device_ids, np.ndarray) else [device_ids[i] for i in ok.tolist()]
+            reasons[ok] = self.screen.screen(
+                ids,
+                np.asarray(voltage)[ok], np.asarray(current)[ok], np.asarray(resistance)[ok], np.asarray(timestamps)[ok],
+            )
+        return reasons.tolist()
+
+    def snapshot_replay_guard(self):
+        """Persist the replay guard, if it has a snapshot path (called on shutdown)."""
+        if self.replay_guard is not None and self.replay_guard.path:
+            self.replay_guard.snapshot()
+
+    def flush_aggregates(self, now: Optional[int] = None) -> List[EnergyAggregate]:
+        """Emit windows closed by wall-clock time now (or all open windows if now is None)."""
+        if self.aggregator is None:
+            return []
+        aggregates = self.aggregator.flush() if now is None else self.aggregator.advance(now)
+        self._emit(aggregates)
+        return aggregates
+
+    def _key_lookup(self, key_lookup):
+        if key_lookup is not None:
+            return key_lookup
+        if self.resolver is None:
+            raise ValueError("key_lookup is required when the processor has no resolver")
+        return self.resolver
+
+    def _accept(
+        self,
+        device_id: bytes,
+        voltage: float,
+        current: float,
+        timestamp: int,
+        cable_type: str,
+        raw: Optional[bytes] = None,
+        screen: int = 0,
+    ) -> Optional[Reading]:
+        device_id = intern_device_id(device_id)
+        # Implausible samples stop here: no replay-guard entry, no cap usage, no storage, no offset
+        if screen & QUARANTINE:
+            quarantined = QuarantinedSample(device_id, voltage, current, timestamp, screen, cable_type, self.user_region)
+            self.db.insert_quarantined(quarantined)
+            for sink in self.quarantine_sinks:
+                sink(quarantined)
+            return None
+        # Recorded only now that the signature is known good and the sample plausible
+        if self.replay_guard is not None and not self.replay_guard.mark(device_id, timestamp):
+            return None
+        wanted = vir_to_kwh(voltage, current, POWER_SAMPLE_INTERVAL)
+        day = timestamp // 86400
+
+        # Atomic check-and-add against the shared cap state
+        if metrics.enabled:
+            started = clock()
+            kwh = self.daily_usage.check_and_add(device_id, day, wanted)
+            CAP_SECONDS.observe(clock() - started)
+            if kwh is None:
+                CAP_REJECTIONS.inc()
+            elif kwh < wanted:
+                CAP_CLIPS.inc()
+        else:
+            kwh = self.daily_usage.check_and_add(device_id, day, wanted)
+        if kwh is None:
+            return None
+
+        reading = Reading(device_id, kwh, timestamp, True, cable_type, self.user_region)
+        if self.aggregator is not None:
+            self._emit(self.aggregator.add(reading, raw))
+        else:
+            try:
+                self.db.insert(reading)
+            except BaseException:
+                # Not stored, so not mined: give the day's cap back
+                self.daily_usage.release(device_id, day, wanted)
+                raise
 
         return reading
+
+    def _emit(self, aggregates: List[EnergyAggregate]):
+        for aggregate in aggregates:
+            self.db.insert_aggregate(aggregate)
+            for sink in self.aggregate_sinks:
+                sink(aggregate)
@@ -10,11 +10,18 @@ Estimates CO₂ avoided using verified kWh + region specific grid intensity.
 - Covers 90%+ of world population
 """
 
-from typing import Dict, Optional
+from typing import List, Optional, Sequence
 from pydantic import BaseModel
-import boto3
-import azure.identity
-import azure.storage.blob as azure_blob
+import json
+import time
+
+from .clients import ClientRegistry
+from .grid import GridIntensityTable
+from .keys import DeviceKeyResolver
+from .metrics import OFFSET_SECONDS, OFFSET_SKIPPED, clock, metrics
+from .offset_index import OffsetIndex, in_horizon
+from .records import Offset, device_id_from_json, intern_device_id, to_models
+from .storage import SecureStore
 
 # === GLOBAL GRID INTENSITY (kg CO₂/kWh) - 2024-2025 Estimates ===
 GLOBAL_AVG_CO2_PER_KWH = 0.45  # Conservative fallback
@@ -33,13 +40,6 @@ GRID_INTENSITY = {
     "IN": 0.710,        # India
 }
 
-# === AZURE BACKUP ===
-azure_cred = azure.identity.DefaultAzureCredential()
-azure_blob_client = azure_blob.BlobServiceClient(
-    account_url="https://backupstorage.blob.core.windows.net",
-    credential=azure_cred
-)
-
 # === MODELS ===
 class OffsetRecord(BaseModel):
     device_id: bytes
@@ -54,70 +54,169 @@ class OffsetTotals(BaseModel):
     wallet_co2_kg: float = 0.0
 
 
+def offset_to_json(record) -> bytes:
+    """OffsetRecord or its interior form, records.Offset."""
+    return json.dumps({
+        "device_id": record.device_id.hex(),
+        "wallet_address": record.wallet_address,
+        "kwh": record.kwh,
+        "co2_kg": record.co2_kg,
+        "region": record.region,
+        "timestamp": record.timestamp,
+    }, separators=(",", ":")).encode()
+
+
+def offset_from_record(data: dict) -> Offset:
+    return Offset(
+        intern_device_id(device_id_from_json(data["device_id"])), data["wallet_address"], data["kwh"],
+        data["co2_kg"], data["region"], data["timestamp"]
+    )
+
+
 # === SECURE, REGION-AWARE STORAGE ===
-class SecureOffsetDB:
-    def __init__(self, user_region: str):
-        self.user_region = user_region
-        self.aws_bucket = "ccm-offsets-eu" if user_region == "EU" else "ccm-offsets-sg"
-        self.s3 = boto3.client("s3")
+class SecureOffsetDB(SecureStore):
+    def __init__(self, user_region: str, clients: Optional[ClientRegistry] = None, write_behind: bool = False):
+        super().__init__(
+            user_region=user_region,
+            aws_bucket="ccm-offsets-eu" if user_region == "EU" else "ccm-offsets-sg",
+            azure_container="offset-backup",
+            clients=clients,
+            write_behind=write_behind,
+        )
 
-    def insert(self, record: OffsetRecord):
+    def insert(self, record):
         key = f"offsets/{record.device_id.hex()}/{record.timestamp}.json"
-        data = record.json().encode()
-
-        # Primary: AWS
-        self.s3.put_object(
-            Bucket=self.aws_bucket,
-            Key=key,
-            Body=data,
-            ServerSideEncryption="AES256"
-        )
+        data = offset_to_json(record)
 
-        # Backup: Azure
-        blob_client = azure_blob_client.get_blob_client(
-            container="offset-backup", blob=key
-        )
-        blob_client.upload_blob(data, overwrite=True, encryption_scope="gdpr-scope")
+        # Primary: AWS, Backup: Azure
+        self.write(key, "offsets", record.device_id.hex(), record.timestamp, data)
 
 
 # === OFFSET ENGINE ===
 class OffsetEngine:
-    def __init__(self, db: SecureOffsetDB):
+    def __init__(
+        self,
+        db: SecureOffsetDB,
+        resolver: Optional[DeviceKeyResolver] = None,
+        index: Optional[OffsetIndex] = None,
+        grid: Optional[GridIntensityTable] = None,
+    ):
         self.db = db
-        self.totals: Dict[str, OffsetTotals] = {}
+        self.resolver = resolver
+        self.index = index if index is not None else OffsetIndex()
+        self.grid = grid if grid is not None else GridIntensityTable(fallback=GRID_INTENSITY, default=GLOBAL_AVG_CO2_PER_KWH)
 
-    def calculate_co2_avoided(self, kwh: float, region: str) -> float:
-        intensity = GRID_INTENSITY.get(region.upper(), GLOBAL_AVG_CO2_PER_KWH)
-        return round(kwh * intensity, 6)
+    def calculate_co2_avoided(self, kwh: float, region: str, timestamp: Optional[int] = None) -> float:
+        """Hour/month-specific intensity when the grid table has a series, else the annual average."""
+        return round(kwh * self.grid.intensity(region, timestamp), 6)
 
     def process_verified_reading(
         self,
         device_id: bytes,
-        wallet_address: str,
+        wallet_address: Optional[str],
         kwh: float,
         timestamp: int,
-        region: str
+        region: str,
+        records: bool = False,
     ) -> Optional[OffsetRecord]:
-        co2_kg = self.calculate_co2_avoided(kwh, region)
-
-        record = OffsetRecord(
-            device_id=device_id,
-            wallet_address=wallet_address,
-            kwh=kwh,
-            co2_kg=co2_kg,
-            region=region.upper(),
-            timestamp=timestamp
-        )
+        """
+        wallet_address may be None when the engine has a resolver (unknown devices → None).
+        Returns an OffsetRecord; records=True returns the interior records.Offset.
+        Raises ValueError, before anything is stored, for a timestamp the index cannot hold.
+        """
+        if not in_horizon(timestamp):
+            raise ValueError(f"timestamp {timestamp} outside the offset index horizon")
+        started = clock() if metrics.enabled else None
+        if wallet_address is None:
+            wallet_address = self.resolver.wallet(device_id) if self.resolver is not None else None
+            if wallet_address is None:
+                if started is not None:
+                    OFFSET_SKIPPED.inc()
+                return None
+
+        co2_kg = self.calculate_co2_avoided(kwh, region, timestamp)
+
+        record = Offset(intern_device_id(device_id), wallet_address, kwh, co2_kg, self.grid.canonical(region), timestamp)
 
         self.db.insert(record)
+        self.index.add(record)
+
+        if started is not None:
+            OFFSET_SECONDS.observe(clock() - started)
+        return record if records else record.to_model()
 
-        dev_key = device_id.hex()
-        if dev_key not in self.totals:
-            self.totals[dev_key] = OffsetTotals()
-        self.totals[dev_key].device_co2_kg += co2_kg
-        self.totals[dev_key].wallet_co2_kg += co2_kg
+    def process_batch(
+        self,
+        device_ids: Sequence[bytes],
+        kwh: Sequence[float],
+        timestamps: Sequence[int],
+        region: str,
+        wallets: Optional[Sequence[Optional[str]]] = None,
+        index: Optional[OffsetIndex] = None,
+        records: bool = False,
+        store: bool = True,
+    ) -> List[Optional[OffsetRecord]]:
+        """
+        process_verified_reading for many readings in one grid region: same records,
+        with intensities looked up in one vectorised call.
+        Totals go to `index` when given (e.g. a replay's fresh index), else self.index.
+        store=False only updates the index (a replay rebuilding totals from readings
+        already stored must not write its offsets again).
+        Readings the index cannot hold (timestamp outside its horizon) are skipped
+        like unknown wallets, before anything is stored.
+        """
+        index = index if index is not None else self.index
+        intensities = self.grid.intensities(region, timestamps).tolist()
+        canonical = self.grid.canonical(region)
+        offsets: List[Optional[Offset]] = []
+        for i, device_id in enumerate(device_ids):
+            wallet_address = wallets[i] if wallets is not None else None
+            if not in_horizon(timestamps[i]):
+                wallet_address = None
+            elif wallet_address is None and self.resolver is not None:
+                wallet_address = self.resolver.wallet(device_id)
+            if wallet_address is None:
+                if metrics.enabled:
+                    OFFSET_SKIPPED.inc()
+                offsets.append(None)
+                continue
+
+            record = Offset(
+                intern_device_id(device_id), wallet_address, kwh[i],
+                round(kwh[i] * intensities[i], 6), canonical, timestamps[i]
+            )
+            if store:
+                self.db.insert(record)
+            index.add(record)
+            offsets.append(record)
+        return offsets if records else to_models(offsets)
+
+    def process_aggregate(
+        self,
+        aggregate,
+        region: str,
+        wallet_address: Optional[str] = None,
+        records: bool = False,
+    ) -> Optional[OffsetRecord]:
+        """One OffsetRecord per EnergyAggregate window instead of one per sample."""
+        return self.process_verified_reading(
+            aggregate.device_id, wallet_address, aggregate.kwh, aggregate.window_start, region, records
+        )
+
+    def get_totals(self, device_id: bytes, wallet_address: Optional[str] = None) -> OffsetTotals:
+        wallet_address = wallet_address or self.index.wallet_of(device_id)
+        return OffsetTotals(
+            device_co2_kg=self.index.total("device", device_id.hex()).co2_kg,
+            wallet_co2_kg=self.index.total("wallet", wallet_address).co2_kg if wallet_address else 0.0,
+        )
 
-        return record
+    def checkpoint(self, path: str):
+        """Flush storage, then persist the totals index with 'now' as its replay watermark."""
+        self.db.flush()
+        self.index.mark_replayed(time.time())
+        self.index.checkpoint(path)
 
-    def get_totals(self, device_id: bytes) -> OffsetTotals:
-        return self.totals.get(device_id.hex(), OffsetTotals())
\ No newline at end of file
+    def restore(self, path: str) -> int:
+        """Load the last checkpoint and replay records stored since; returns records replayed."""
+        self.index = OffsetIndex.load(path)
+        return self.index.replay(self.db)
\ No newline at end of file
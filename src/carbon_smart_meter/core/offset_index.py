@@ -0,0 +1,239 @@
+# src/carbon_smart_meter/core/offset_index.py
+"""
+Incremental Offset Totals (Per Device / Wallet / Region / Day, Range-Queryable)
+
+Running CO₂ + kWh totals kept as records flow through OffsetEngine.
+- One sparse Fenwick tree over day numbers per device, wallet and region:
+  O(log days) per update and per "last N days" query
+- Lifetime totals in O(1); leaderboards without scanning S3
+- Survives restarts: checkpoint() to a local JSON file, then replay() only the
+  stored OffsetRecords written since (S3 LastModified watermark)
+
+A checkpoint's watermark is the time it was taken, so take it at a quiet point
+(OffsetEngine.checkpoint flushes storage first): S3 stamps LastModified to the
+second, and records stored later in that same second would not be replayed.
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .storage import decode_records
+
+# === CONFIG ===
+DAY_BITS = 16                   # Fenwick horizon: days 0 .. 2^16 since 1970 (year 2149)
+DAY_LIMIT = 1 << DAY_BITS
+OFFSETS_PREFIX = "offsets/"
+
+Key = Tuple[str, str]           # (kind, id): ("device", hex) | ("wallet", address) | ("region", code)
+
+
+class OffsetSum(NamedTuple):
+    co2_kg: float = 0.0
+    kwh: float = 0.0
+
+
+def day_of(timestamp: int) -> int:
+    return timestamp // 86400
+
+
+def in_horizon(timestamp: int) -> bool:
+    """Whether the index can hold a record at this timestamp (day 0 .. DAY_LIMIT - 1)."""
+    return 0 <= day_of(timestamp) < DAY_LIMIT
+
+
+# === SPARSE FENWICK TREE ===
+class SparseFenwick:
+    """Fenwick (binary indexed) tree over day numbers, storing only touched nodes."""
+
+    __slots__ = ("nodes",)
+
+    def __init__(self, nodes: Optional[Dict[int, List[float]]] = None):
+        self.nodes: Dict[int, List[float]] = nodes or {}
+
+    def add(self, day: int, co2_kg: float, kwh: float):
+        if not 0 <= day < DAY_LIMIT:
+            raise ValueError(f"day {day} outside the index horizon")
+        i = day + 1
+        while i <= DAY_LIMIT:
+            node = self.nodes.get(i)
+            if node is None:
+                self.nodes[i] = [co2_kg, kwh]
+            else:
+                node[0] += co2_kg
+                node[1] += kwh
+            i += i & -i
+
+    def prefix(self, day: int) -> OffsetSum:
+        """Totals for days <= day."""
+        i = min(day + 1, DAY_LIMIT)
+        co2 = kwh = 0.0
+        while i > 0:
+            node = self.nodes.get(i)
+            if node is not None:
+                co2 += node[0]
+                kwh += node[1]
+            i -= i & -i
+        return OffsetSum(co2, kwh)
+
+    def range(self, first_day: int, last_day: int) -> OffsetSum:
+        if last_day < first_day:
+            return OffsetSum()
+        high = self.prefix(last_day)
+        if first_day <= 0:
+            return high
+        low = self.prefix(first_day - 1)
+        return OffsetSum(high.co2_kg - low.co2_kg, high.kwh - low.kwh)
+
+
+# === INDEX ===
+class OffsetIndex:
+    def __init__(self):
+        self.trees: Dict[Key, SparseFenwick] = {}
+        self.totals: Dict[Key, List[float]] = {}
+        self.wallets: Dict[str, str] = {}                # device hex → wallet last seen
+        self.records = 0
+        self.replay_state = {"modified": 0.0, "boundary": []}
+        self._lock = threading.Lock()
+
+    # --- updates ---
+    def add(self, record):
+        """Fold in one OffsetRecord (or anything with the same fields)."""
+        device = record.device_id.hex()
+        day = day_of(record.timestamp)
+        with self._lock:
+            for key in (("device", device), ("wallet", record.wallet_address), ("region", record.region)):
+                tree = self.trees.get(key)
+                if tree is None:
+                    tree = self.trees[key] = SparseFenwick()
+                    self.totals[key] = [0.0, 0.0]
+                tree.add(day, record.co2_kg, record.kwh)
+                total = self.totals[key]
+                total[0] += record.co2_kg
+                total[1] += record.kwh
+            self.wallets[device] = record.wallet_address
+            self.records += 1
+
+    def add_many(self, records: Iterable) -> int:
+        count = 0
+        for record in records:
+            self.add(record)
+            count += 1
+        return count
+
+    # --- queries ---
+    def total(self, kind: str, key: str) -> OffsetSum:
+        total = self.totals.get((kind, key))
+        return OffsetSum(*total) if total is not None else OffsetSum()
+
+    def range(self, kind: str, key: str, first_day: int, last_day: int) -> OffsetSum:
+        tree = self.trees.get((kind, key))
+        if tree is None:
+            return OffsetSum()
+        with self._lock:
+            return tree.range(first_day, last_day)
+
+    def last_days(self, kind: str, key: str, days: int, now: Optional[int] = None) -> OffsetSum:
+        """e.g. last_days("wallet", address, 30): today and the 29 days before it."""
+        today = day_of(int(time.time()) if now is None else now)
+        return self.range(kind, key, today - days + 1, today)
+
+    def top(
+        self,
+        kind: str,
+        n: int = 10,
+        first_day: Optional[int] = None,
+        last_day: Optional[int] = None,
+    ) -> List[Tuple[str, OffsetSum]]:
+        """Leaderboard by CO₂ for one kind, lifetime or over a day range."""
+        if first_day is None and last_day is None:
+            entries = ((key, OffsetSum(*total)) for (k, key), total in self.totals.items() if k == kind)
+        else:
+            first = first_day if first_day is not None else 0
+            last = last_day if last_day is not None else DAY_LIMIT - 1
+            entries = ((key, self.range(kind, key, first, last)) for (k, key) in list(self.trees) if k == kind)
+        return heapq.nlargest(n, entries, key=lambda entry: entry[1].co2_kg)
+
+    def wallet_of(self, device_id: bytes) -> Optional[str]:
+        return self.wallets.get(device_id.hex())
+
+    # --- persistence ---
+    def mark_replayed(self, modified: float):
+        """Everything stored before `modified` is already folded in."""
+        self.replay_state = {"modified": modified, "boundary": []}
+
+    def checkpoint(self, path: str):
+        """Write the whole index atomically (tmp file + rename)."""
+        state = self.state()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "OffsetIndex":
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls.from_state(json.load(f))
+
+    def state(self) -> dict:
+        """The whole index as JSON-ready data (what checkpoint() writes)."""
+        with self._lock:
+            return {
+                "version": 1,
+                "records": self.records,
+                "replay": self.replay_state,
+                "wallets": dict(self.wallets),
+                "keys": [
+                    [kind, key, list(self.totals[(kind, key)]), {str(i): v for i, v in tree.nodes.items()}]
+                    for (kind, key), tree in self.trees.items()
+                ],
+            }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "OffsetIndex":
+        index = cls()
+        index.records = state["records"]
+        index.replay_state = state["replay"]
+        index.wallets = state["wallets"]
+        for kind, key, total, nodes in state["keys"]:
+            index.trees[(kind, key)] = SparseFenwick({int(i): v for i, v in nodes.items()})
+            index.totals[(kind, key)] = total
+        return index
+
+    def replay(self, db, page_size: int = 1000) -> int:
+        """
+        Fold in stored OffsetRecords written since the last replay (by S3 LastModified).
+
+        Objects stamped exactly at the previous watermark are de-duplicated by key,
+        so writes landing in the same second as a checkpoint are neither lost nor
+        counted twice. Returns the number of records applied.
+        """
+        from .offset import offset_from_record
+
+        since = self.replay_state["modified"]
+        seen = set(self.replay_state["boundary"])
+        newest, boundary = since, list(seen)
+        applied = 0
+
+        pages = db.s3.get_paginator("list_objects_v2").paginate(
+            Bucket=db.aws_bucket, Prefix=OFFSETS_PREFIX, PaginationConfig={"PageSize": page_size}
+        )
+        for page in pages:
+            for obj in page.get("Contents", []):
+                modified = obj["LastModified"].timestamp()
+                if modified < since or (modified == since and obj["Key"] in seen):
+                    continue
+                body = db.s3.get_object(Bucket=db.aws_bucket, Key=obj["Key"])["Body"].read()
+                applied += self.add_many(offset_from_record(r) for r in decode_records(obj["Key"], body))
+                if modified > newest:
+                    newest, boundary = modified, []
+                if modified == newest:
+                    boundary.append(obj["Key"])
+
+        self.replay_state = {"modified": newest, "boundary": boundary}
+        return applied
@@ -0,0 +1,107 @@
+# src/carbon_smart_meter/core/records.py
+"""
+Lightweight Pipeline Records (Tuples, Interned Device IDs)
+
+The pydantic models (VIRPacket, EnergyReading, OffsetRecord, ...) validate data
+at the API boundary. Inside the pipeline a sample is already verified, so it
+travels as a NamedTuple with the same field names instead:
+- No per-instance __dict__, no validation, no copies of the field values
+- device_id is interned: every record for a device shares one bytes object
+- to_model() converts back where a pydantic model is needed; the public
+  EnergyProcessor / OffsetEngine methods still return models unless called
+  with records=True (the pipeline's own hot paths)
+- Stored JSON has the same fields as model.json(); device ids are always
+  written as hex (readings, offsets, aggregates, quarantine alike)
+"""
+
+import json
+from typing import NamedTuple
+
+# === CONFIG ===
+INTERN_POOL_SIZE = 1_000_000
+DEVICE_ID_BYTES = 32
+
+
+# === DEVICE ID INTERNING ===
+class DeviceIdPool:
+    """One canonical bytes object per device id; reset wholesale once maxsize is reached."""
+
+    def __init__(self, maxsize: int = INTERN_POOL_SIZE):
+        self.maxsize = maxsize
+        self._ids = {}
+
+    def intern(self, device_id: bytes) -> bytes:
+        canonical = self._ids.get(device_id)
+        if canonical is None:
+            if len(self._ids) >= self.maxsize:
+                self._ids.clear()
+            canonical = self._ids.setdefault(device_id, bytes(device_id))
+        return canonical
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+device_ids = DeviceIdPool()
+intern_device_id = device_ids.intern
+
+
+# === STORED DEVICE IDS ===
+def device_id_from_json(value: str) -> bytes:
+    """
+    Device id of a stored record: hex when it is exactly 2 * DEVICE_ID_BYTES
+    characters, else utf-8 text (energy readings written before ids were hex).
+    A 32-byte utf-8 id is at most 32 characters, so the two never collide.
+    """
+    if len(value) == 2 * DEVICE_ID_BYTES:
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            pass
+    return value.encode()
+
+
+# === RECORDS ===
+class Reading(NamedTuple):
+    """Interior form of mining.EnergyReading."""
+    device_id: bytes
+    kwh: float
+    timestamp: int
+    verified: bool
+    cable_type: str
+    user_region: str
+
+    def to_model(self):
+        from .mining import EnergyReading
+        return EnergyReading.model_construct(**self._asdict())
+
+
+class Offset(NamedTuple):
+    """Interior form of offset.OffsetRecord."""
+    device_id: bytes
+    wallet_address: str
+    kwh: float
+    co2_kg: float
+    region: str
+    timestamp: int
+
+    def to_model(self):
+        from .offset import OffsetRecord
+        return OffsetRecord.model_construct(**self._asdict())
+
+
+def to_models(records: list) -> list:
+    """The public form of a list of interior records (None stays None)."""
+    return [record.to_model() if record is not None else None for record in records]
+
+
+def reading_to_json(reading) -> bytes:
+    """EnergyReading or Reading → the fields EnergyReading.json() writes, device_id as hex."""
+    return json.dumps({
+        "device_id": reading.device_id.hex(),
+        "kwh": reading.kwh,
+        "timestamp": reading.timestamp,
+        "verified": reading.verified,
+        "cable_type": reading.cable_type,
+        "user_region": reading.user_region,
+    }, separators=(",", ":")).encode()
@@ -9,23 +9,25 @@ GDPR & MiCA-compliant: Primary storage in AWS (EU or SG), encrypted Azure backup
 - Backend binds public key → wallet address
 - Enforces 1 device = 1 wallet
 - Prevents spoofing, duplicates, and wallet swaps
+- Unique in-memory indexes on device_id, public_key and wallet_address make
+  every check O(1); check-and-insert is atomic under one lock
 """
 
 from typing import Optional, Dict
 from pydantic import BaseModel, Field
 from nacl.signing import SigningKey, VerifyKey
 from nacl.exceptions import BadSignatureError
-import boto3
-import azure.identity
-import azure.storage.blob as azure_blob
+import json
+import threading
 import time
 
-# === AZURE BACKUP ===
-azure_cred = azure.identity.DefaultAzureCredential()
-azure_blob_client = azure_blob.BlobServiceClient(
-    account_url="https://backupstorage.blob.core.windows.net",
-    credential=azure_cred
-)
+from .clients import ClientRegistry
+from .keys import DeviceKeyResolver
+from .storage import SecureStore, decode_records
+
+# === CONFIG ===
+BINDINGS_PREFIX = "bindings/"
+WARM_LOAD_PAGE_SIZE = 1000
 
 # === MODELS ===
 class DeviceRegistrationRequest(BaseModel):
@@ -42,47 +44,151 @@ class DeviceBinding(BaseModel):
     verified: bool = True
 
 
+def binding_to_json(binding: DeviceBinding) -> bytes:
+    """Keys are raw bytes, so they are stored hex-encoded."""
+    record = binding.model_dump()
+    record["device_id"] = binding.device_id.hex()
+    record["public_key"] = binding.public_key.hex()
+    return json.dumps(record, separators=(",", ":")).encode()
+
+
+def binding_from_record(record: dict) -> DeviceBinding:
+    return DeviceBinding(
+        device_id=bytes.fromhex(record["device_id"]),
+        public_key=bytes.fromhex(record["public_key"]),
+        wallet_address=record["wallet_address"],
+        registered_at=record["registered_at"],
+        verified=record.get("verified", True),
+    )
+
+
+# === UNIQUE INDEXES ===
+class BindingIndex:
+    def __init__(self):
+        self.by_device: Dict[bytes, DeviceBinding] = {}
+        self.by_public_key: Dict[bytes, bytes] = {}
+        self.by_wallet: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def exists(self, device_id: Optional[bytes] = None, public_key: Optional[bytes] = None) -> bool:
+        if device_id:
+            return device_id in self.by_device
+        if public_key:
+            return public_key in self.by_public_key
+        return False
+
+    def wallet_in_use(self, wallet: str) -> bool:
+        return wallet in self.by_wallet
+
+    def get(self, device_id: bytes) -> Optional[DeviceBinding]:
+        return self.by_device.get(device_id)
+
+    def get_by_public_key(self, public_key: bytes) -> Optional[DeviceBinding]:
+        device_id = self.by_public_key.get(public_key)
+        return self.by_device.get(device_id) if device_id is not None else None
+
+    def add_if_absent(self, binding: DeviceBinding) -> bool:
+        """Index the binding unless its device, key or wallet is already bound."""
+        with self._lock:
+            if (
+                binding.device_id in self.by_device
+                or binding.public_key in self.by_public_key
+                or binding.wallet_address in self.by_wallet
+            ):
+                return False
+            self._put(binding)
+            return True
+
+    def put(self, binding: DeviceBinding):
+        with self._lock:
+            previous = self.by_device.get(binding.device_id)
+            if previous is not None:
+                self.by_public_key.pop(previous.public_key, None)
+                self.by_wallet.pop(previous.wallet_address, None)
+            self._put(binding)
+
+    def remove(self, device_id: bytes):
+        with self._lock:
+            binding = self.by_device.pop(device_id, None)
+            if binding is not None:
+                self.by_public_key.pop(binding.public_key, None)
+                self.by_wallet.pop(binding.wallet_address, None)
+
+    def __len__(self) -> int:
+        return len(self.by_device)
+
+    def _put(self, binding: DeviceBinding):
+        self.by_device[binding.device_id] = binding
+        self.by_public_key[binding.public_key] = binding.device_id
+        self.by_wallet[binding.wallet_address] = binding.device_id
+
+
 # === SECURE, REGION-AWARE STORAGE ===
-class SecureRegistrationDB:
-    def __init__(self, user_region: str):
-        self.user_region = user_region
-        self.aws_bucket = "ccm-bindings-eu" if user_region == "EU" else "ccm-bindings-sg"
-        self.s3 = boto3.client("s3")
+class SecureRegistrationDB(SecureStore):
+    def __init__(self, user_region: str, clients: Optional[ClientRegistry] = None, write_behind: bool = False):
+        super().__init__(
+            user_region=user_region,
+            aws_bucket="ccm-bindings-eu" if user_region == "EU" else "ccm-bindings-sg",
+            azure_container="registration-backup",
+            clients=clients,
+            write_behind=write_behind,
+        )
+        self.index = BindingIndex()
+
+    def exists(self, device_id: Optional[bytes] = None, public_key: Optional[bytes] = None) -> bool:
+        return self.index.exists(device_id=device_id, public_key=public_key)
+
+    def wallet_in_use(self, wallet: str) -> bool:
+        return self.index.wallet_in_use(wallet)
+
+    def get(self, device_id: bytes) -> Optional[DeviceBinding]:
+        return self.index.get(device_id)
 
     def insert(self, binding: DeviceBinding):
-        key = f"bindings/{binding.device_id.hex()}.json"
-        data = binding.json().encode()
-
-        self.s3.put_object(
-            Bucket=self.aws_bucket,
-            Key=key,
-            Body=data,
-            ServerSideEncryption="AES256"
-        )
+        self.index.put(binding)
+        self._persist(binding)
 
-        blob_client = azure_blob_client.get_blob_client(
-            container="registration-backup", blob=key
+    def insert_if_absent(self, binding: DeviceBinding) -> bool:
+        """Atomically claim device, key and wallet, then persist. False if any is taken."""
+        if not self.index.add_if_absent(binding):
+            return False
+        try:
+            self._persist(binding)
+        except Exception:
+            self.index.remove(binding.device_id)
+            raise
+        return True
+
+    def warm_load(self, page_size: int = WARM_LOAD_PAGE_SIZE) -> int:
+        """Rebuild the index from the bindings prefix in S3; returns bindings loaded."""
+        paginator = self.s3.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=self.aws_bucket, Prefix=BINDINGS_PREFIX, PaginationConfig={"PageSize": page_size}
         )
-        blob_client.upload_blob(data, overwrite=True, encryption_scope="gdpr-scope")
+        loaded = 0
+        for page in pages:
+            for obj in page.get("Contents", []):
+                body = self.s3.get_object(Bucket=self.aws_bucket, Key=obj["Key"])["Body"].read()
+                for record in decode_records(obj["Key"], body):
+                    self.index.put(binding_from_record(record))
+                    loaded += 1
+        return loaded
+
+    def _persist(self, binding: DeviceBinding):
+        key = f"{BINDINGS_PREFIX}{binding.device_id.hex()}.json"
+        self.write(key, "bindings", binding.device_id.hex(), binding.registered_at, binding_to_json(binding))
 
 
 # === REGISTRATION MANAGER ===
 class RegistrationManager:
-    def __init__(self, db):
+    def __init__(self, db, resolver: Optional[DeviceKeyResolver] = None):
         self.db = db
-        self.active_devices: Dict[bytes, DeviceBinding] = {}
+        self.resolver = resolver if resolver is not None else DeviceKeyResolver(db)
 
     def register_device(self, request: DeviceRegistrationRequest) -> Optional[DeviceBinding]:
         if not self._verify_device_signature(request.device_id, request.public_key, request.signature):
             return None
 
-        if self.db.exists(device_id=request.device_id):
-            return None
-        if self.db.exists(public_key=request.public_key):
-            return None
-        if self.db.wallet_in_use(request.wallet_address):
-            return None
-
         binding = DeviceBinding(
             device_id=request.device_id,
             public_key=request.public_key,
@@ -90,8 +196,10 @@ class RegistrationManager:
             registered_at=int(time.time())
         )
 
-        self.db.insert(binding)
-        self.active_devices[request.device_id] = binding
+        # Single atomic check-and-insert: concurrent requests can't both bind
+        if not self.db.insert_if_absent(binding):
+            return None
+        self.resolver.invalidate(request.device_id)   # forget a cached "unknown device"
         return binding
 
     def _verify_device_signature(self, device_id: bytes, public_key: bytes, signature: bytes) -> bool:
@@ -103,7 +211,8 @@ class RegistrationManager:
             return False
 
     def get_binding(self, device_id: bytes) -> Optional[DeviceBinding]:
-        return self.active_devices.get(device_id)
+        entry = self.resolver.resolve(device_id)
+        return entry.binding if entry is not None else None
 
     def is_wallet_bound(self, wallet: str) -> bool:
         return self.db.wallet_in_use(wallet)
@@ -112,25 +221,23 @@ class RegistrationManager:
 # === MOCK DB (for testing) ===
 class MockRegistrationDB:
     def __init__(self):
-        self.bindings = {}
-        self.wallet_set = set()
+        self.index = BindingIndex()
+        self.bindings = self.index.by_device
 
     def exists(self, device_id: Optional[bytes] = None, public_key: Optional[bytes] = None) -> bool:
-        if device_id:
-            return device_id in self.bindings
-        if public_key:
-            return any(b.public_key == public_key for b in self.bindings.values())
-        return False
+        return self.index.exists(device_id=device_id, public_key=public_key)
 
     def wallet_in_use(self, wallet: str) -> bool:
-        return wallet in self.wallet_set
+        return self.index.wallet_in_use(wallet)
 
     def insert(self, binding: DeviceBinding):
-        self.bindings[binding.device_id] = binding
-        self.wallet_set.add(binding.wallet_address)
+        self.index.put(binding)
+
+    def insert_if_absent(self, binding: DeviceBinding) -> bool:
+        return self.index.add_if_absent(binding)
 
     def get(self, device_id: bytes) -> Optional[DeviceBinding]:
-        return self.bindings.get(device_id)
+        return self.index.get(device_id)
 
 
 # === DEVICE-SIDE: Generate Keypair & Register ===
@@ -0,0 +1,371 @@
+# src/carbon_smart_meter/core/screening.py
+"""
+Plausibility Screening of Verified Samples (Per-Device Rolling Statistics)
+
+A valid signature only proves which device sent a sample, not that a 20–100 W
+panel produced it. Screening runs after verification and before cap accounting,
+storage and offsets, and returns a reason bitmask per sample:
+
+- Quarantined (not credited): INVALID (non-finite, negative, or R ≠ V/I),
+  OVER_RATED (power above the panel class), FUTURE (timestamp ahead of the
+  clock, i.e. quota minted in advance), NIGHT (far from the device's learned
+  solar noon), FLAT (no day/night cycle at all, once a day of history exists)
+- Flagged (credited, counted): RAMP (power step faster than MAX_RAMP_WATTS_PER_S),
+  OUTLIER (upward spike beyond OUTLIER_SIGMAS of the EWMA)
+
+Per device, constant memory: EWMA mean/variance of power, last sample, max ramp
+seen, and the power-weighted mean time of day as one decaying 2-D vector (its
+angle is solar noon, its length how concentrated production is: ~0.8 for a
+real panel, ~0 for a source that produces around the clock). At most
+max_devices are tracked: once full, the devices with the oldest last accepted
+sample are evicted in chunks, and one that returns starts its warm-up again.
+
+Batches are screened as arrays; a device's samples within one batch are applied
+in order, so the result equals screening the samples one by one (screen_one()
+is the plain-float form of the same checks, for the per-packet path).
+"""
+
+import json
+import math
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .metrics import SCREENED, metrics
+
+# === CONFIG ===
+PANEL_MAX_WATTS = 100.0         # Largest supported panel class (20–100 W)
+POWER_TOLERANCE = 0.10          # Headroom over the rated power (cold, bright days)
+RESISTANCE_TOLERANCE = 0.05     # Relative R vs V/I mismatch allowed (f32 wire values)
+MAX_CLOCK_SKEW = 300            # Seconds a timestamp may run ahead of the server clock
+MAX_RAMP_WATTS_PER_S = 60.0
+OUTLIER_SIGMAS = 6.0
+MIN_SIGMA_WATTS = 2.0           # Floor for the EWMA standard deviation
+EWMA_ALPHA = 0.05               # ≈ 20-sample memory for mean / variance
+OUTLIER_WARMUP = 20             # Samples before the outlier check applies
+DIURNAL_TAU = 3 * 86400         # Seconds: decay of the time-of-day vector
+DIURNAL_WARMUP = 86400          # History (seconds since first sample) before NIGHT / FLAT apply
+NIGHT_HALF_WIDTH = 10.0         # Hours either side of solar noon that can still produce
+NIGHT_MIN_WATTS = 1.0           # Below this a night sample is noise, not production
+MIN_CONCENTRATION = 0.5         # Resultant length below this = no day/night cycle
+INITIAL_CAPACITY = 1024
+SCREEN_MAX_DEVICES = 1_000_000  # Devices tracked; the least recently heard from are evicted beyond this
+EVICT_FRACTION = 1 / 16         # Share of max_devices freed per eviction
+
+# Reason bits
+INVALID = 1
+OVER_RATED = 2
+FUTURE = 4
+NIGHT = 8
+FLAT = 16
+RAMP = 32
+OUTLIER = 64
+QUARANTINE = INVALID | OVER_RATED | FUTURE | NIGHT | FLAT
+
+REASONS = {
+    INVALID: "invalid", OVER_RATED: "over_rated", FUTURE: "future", NIGHT: "night",
+    FLAT: "flat", RAMP: "ramp", OUTLIER: "outlier",
+}
+
+_STATE = ("count", "first_ts", "last_ts", "last_power", "mean", "var", "max_ramp", "day_x", "day_y", "day_w")
+_TWO_PI = 2 * math.pi
+
+
+class QuarantinedSample(NamedTuple):
+    device_id: bytes
+    voltage: float
+    current: float
+    timestamp: int
+    reasons: int
+    cable_type: str
+    user_region: str
+
+
+def reason_names(reasons: int):
+    return [name for bit, name in REASONS.items() if reasons & bit]
+
+
+def quarantined_to_json(sample: QuarantinedSample) -> bytes:
+    return json.dumps({
+        "device_id": sample.device_id.hex(),
+        "voltage": sample.voltage,
+        "current": sample.current,
+        "timestamp": sample.timestamp,
+        "reasons": reason_names(sample.reasons),
+        "cable_type": sample.cable_type,
+        "user_region": sample.user_region,
+    }, separators=(",", ":")).encode()
+
+
+# === SCREEN ===
+class PlausibilityScreen:
+    def __init__(
+        self,
+        panel_watts: float = PANEL_MAX_WATTS,
+        power_tolerance: float = POWER_TOLERANCE,
+        max_ramp: float = MAX_RAMP_WATTS_PER_S,
+        clock=time.time,
+        max_devices: int = SCREEN_MAX_DEVICES,
+    ):
+        self.max_watts = panel_watts * (1 + power_tolerance)
+        self.max_ramp = max_ramp
+        self.clock = clock
+        self.max_devices = max_devices
+        self.slots: Dict[bytes, int] = {}
+        self.free: List[int] = []                   # Slots of evicted devices
+        self.allocated = 0
+        self.capacity = min(INITIAL_CAPACITY, max_devices)
+        self.state = {name: np.zeros(self.capacity, dtype=np.float64) for name in _STATE}
+        self.stats = {"screened": 0, "quarantined": 0, "flagged": 0, "evicted": 0}
+
+    def screen(
+        self,
+        device_ids,
+        voltage,
+        current,
+        resistance,
+        timestamps,
+        now: Optional[float] = None,
+    ) -> np.ndarray:
+        """Reason bitmask per sample (uint8, 0 = plausible); updates the device statistics."""
+        v = np.asarray(voltage, dtype=np.float64)
+        i = np.asarray(current, dtype=np.float64)
+        r = np.asarray(resistance, dtype=np.float64)
+        ts = np.asarray(timestamps, dtype=np.float64)
+        reasons = np.zeros(len(v), dtype=np.uint8)
+        if not len(v):
+            return reasons
+
+        # --- stateless checks ---
+        power = v * i
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            ohms = np.where(i > 0, v / i, r)
+            invalid = ~(np.isfinite(power) & np.isfinite(r)) | (v < 0) | (i < 0)
+            invalid |= np.abs(ohms - r) > RESISTANCE_TOLERANCE * np.abs(r)
+        reasons[invalid] |= INVALID
+        reasons[power > self.max_watts] |= OVER_RATED
+        reasons[ts > (self.clock() if now is None else now) + MAX_CLOCK_SKEW] |= FUTURE
+
+        # --- per-device checks, one round per occurrence of a device in the batch ---
+        slots = self._slots_for(device_ids)
+        order = np.argsort(slots, kind="stable")
+        starts = np.ones(len(order), dtype=bool)
+        starts[1:] = slots[order][1:] != slots[order][:-1]
+        first = np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - first
+
+        by_round = np.argsort(rank, kind="stable")
+        bounds = np.searchsorted(rank[by_round], np.arange(rank.max() + 2))
+        for k in range(len(bounds) - 1):
+            idx = by_round[bounds[k]:bounds[k + 1]]
+            reasons[idx] = self._round(slots[idx], power[idx], ts[idx], reasons[idx])
+
+        self.stats["screened"] += len(reasons)
+        quarantined = np.count_nonzero(reasons & QUARANTINE)
+        self.stats["quarantined"] += quarantined
+        self.stats["flagged"] += np.count_nonzero(reasons) - quarantined
+        if metrics.enabled:
+            for bit, counter in _SCREENED.items():
+                hits = np.count_nonzero(reasons & bit)
+                if hits:
+                    counter.inc(hits)
+        return reasons
+
+    def screen_one(
+        self,
+        device_id: bytes,
+        voltage: float,
+        current: float,
+        resistance: float,
+        timestamp: int,
+        now: Optional[float] = None,
+    ) -> int:
+        """
+        screen() for a single sample in plain floats: the same checks as _round(),
+        without the NumPy per-call overhead that dominates at n = 1.
+        """
+        p = voltage * current
+        reasons = 0
+        if not (math.isfinite(p) and math.isfinite(resistance)) or voltage < 0 or current < 0:
+            reasons |= INVALID
+        elif abs((voltage / current if current > 0 else resistance) - resistance) > RESISTANCE_TOLERANCE * abs(resistance):
+            reasons |= INVALID
+        if p > self.max_watts:
+            reasons |= OVER_RATED
+        if timestamp > (self.clock() if now is None else now) + MAX_CLOCK_SKEW:
+            reasons |= FUTURE
+
+        st, slot, t = self.state, self._slot(device_id), float(timestamp)
+        count = st["count"][slot]
+        seen = count > 0
+        dt = t - st["last_ts"][slot]
+        ramp = abs(p - st["last_power"][slot]) / dt if seen and dt > 0 else 0.0
+        if ramp > self.max_ramp:
+            reasons |= RAMP
+        mean, var = st["mean"][slot], st["var"][slot]
+        if count >= OUTLIER_WARMUP and p - mean > OUTLIER_SIGMAS * max(math.sqrt(var), MIN_SIGMA_WATTS):
+            reasons |= OUTLIER
+        day_x, day_y, day_w = st["day_x"][slot], st["day_y"][slot], st["day_w"][slot]
+        angle = (t % 86400) / 86400 * _TWO_PI
+        if seen and t - st["first_ts"][slot] >= DIURNAL_WARMUP and day_w > 0:
+            if math.hypot(day_x, day_y) / day_w < MIN_CONCENTRATION:
+                if p > NIGHT_MIN_WATTS:
+                    reasons |= FLAT
+            else:
+                off_noon = abs((angle - math.atan2(day_y, day_x) + math.pi) % _TWO_PI - math.pi) / _TWO_PI * 24
+                if off_noon > NIGHT_HALF_WIDTH and p > NIGHT_MIN_WATTS:
+                    reasons |= NIGHT
+
+        if not reasons & QUARANTINE:
+            if seen:
+                delta = p - mean
+                st["mean"][slot] = mean + EWMA_ALPHA * delta
+                st["var"][slot] = (1 - EWMA_ALPHA) * (var + EWMA_ALPHA * delta * delta)
+                decay = math.exp(-max(dt, 0) / DIURNAL_TAU)
+                st["last_ts"][slot] = max(st["last_ts"][slot], t)
+            else:
+                st["mean"][slot], st["var"][slot], decay = p, 0.0, 0.0
+                st["first_ts"][slot] = st["last_ts"][slot] = t
+            st["day_x"][slot] = day_x * decay + p * math.cos(angle)
+            st["day_y"][slot] = day_y * decay + p * math.sin(angle)
+            st["day_w"][slot] = day_w * decay + p
+            st["max_ramp"][slot] = max(st["max_ramp"][slot], ramp)
+            st["last_power"][slot] = p
+            st["count"][slot] = count + 1
+
+        self.stats["screened"] += 1
+        if reasons & QUARANTINE:
+            self.stats["quarantined"] += 1
+        elif reasons:
+            self.stats["flagged"] += 1
+        if metrics.enabled:
+            for bit, counter in _SCREENED.items():
+                if reasons & bit:
+                    counter.inc()
+        return reasons
+
+    def device_stats(self, device_id: bytes) -> Optional[dict]:
+        slot = self.slots.get(device_id)
+        if slot is None:
+            return None
+        row = {name: float(column[slot]) for name, column in self.state.items()}
+        row["noon_hour"] = (math.atan2(row["day_y"], row["day_x"]) / _TWO_PI * 24) % 24
+        row["concentration"] = math.hypot(row["day_x"], row["day_y"]) / row["day_w"] if row["day_w"] else 0.0
+        row["std"] = math.sqrt(row["var"])
+        return row
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    # --- internals ---
+    def _round(self, s: np.ndarray, p: np.ndarray, t: np.ndarray, reasons: np.ndarray) -> np.ndarray:
+        """Screen + update for samples of distinct devices."""
+        st = self.state
+        count, last_ts = st["count"][s], st["last_ts"][s]
+        seen = count > 0
+        dt = t - last_ts
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ramp = np.where(seen & (dt > 0), np.abs(p - st["last_power"][s]) / dt, 0.0)
+            sigma = np.maximum(np.sqrt(st["var"][s]), MIN_SIGMA_WATTS)
+            outlier = (count >= OUTLIER_WARMUP) & (p - st["mean"][s] > OUTLIER_SIGMAS * sigma)
+
+            day_x, day_y, day_w = st["day_x"][s], st["day_y"][s], st["day_w"][s]
+            mature = seen & (t - st["first_ts"][s] >= DIURNAL_WARMUP) & (day_w > 0)
+            concentration = np.hypot(day_x, day_y) / day_w
+            flat = mature & (concentration < MIN_CONCENTRATION)
+            angle = (t % 86400) / 86400 * _TWO_PI
+            off_noon = np.abs((angle - np.arctan2(day_y, day_x) + math.pi) % _TWO_PI - math.pi) / _TWO_PI * 24
+            night = mature & ~flat & (off_noon > NIGHT_HALF_WIDTH) & (p > NIGHT_MIN_WATTS)
+
+        reasons = reasons | np.where(ramp > self.max_ramp, RAMP, 0).astype(np.uint8)
+        reasons |= np.where(outlier, OUTLIER, 0).astype(np.uint8)
+        reasons |= np.where(flat & (p > NIGHT_MIN_WATTS), FLAT, 0).astype(np.uint8)
+        reasons |= np.where(night, NIGHT, 0).astype(np.uint8)
+
+        # Quarantined samples never move the statistics
+        keep = (reasons & QUARANTINE) == 0
+        s, p, t, seen, dt, ramp = s[keep], p[keep], t[keep], seen[keep], dt[keep], ramp[keep]
+        angle = angle[keep]
+
+        mean, var = st["mean"][s], st["var"][s]
+        delta = p - mean
+        st["mean"][s] = np.where(seen, mean + EWMA_ALPHA * delta, p)
+        st["var"][s] = np.where(seen, (1 - EWMA_ALPHA) * (var + EWMA_ALPHA * delta * delta), 0.0)
+        decay = np.where(seen, np.exp(-np.maximum(dt, 0) / DIURNAL_TAU), 0.0)
+        st["day_x"][s] = st["day_x"][s] * decay + p * np.cos(angle)
+        st["day_y"][s] = st["day_y"][s] * decay + p * np.sin(angle)
+        st["day_w"][s] = st["day_w"][s] * decay + p
+        st["max_ramp"][s] = np.maximum(st["max_ramp"][s], ramp)
+        st["first_ts"][s] = np.where(seen, st["first_ts"][s], t)
+        st["last_ts"][s] = np.where(seen, np.maximum(st["last_ts"][s], t), t)
+        st["last_power"][s] = p
+        st["count"][s] += 1
+        return reasons
+
+    def _slots_for(self, device_ids) -> np.ndarray:
+        if isinstance(device_ids, np.ndarray):
+            device_ids = [raw.tobytes() for raw in device_ids]
+        slots = self.slots
+        batch = set(device_ids)
+        new = len(batch) - sum(device_id in slots for device_id in batch)
+        if len(slots) + new > self.max_devices:
+            # Evict up front, never a device of this batch (its slot is about to be used)
+            self._evict(len(slots) + new - self.max_devices, keep=[slots[d] for d in batch if d in slots])
+        out = np.empty(len(device_ids), dtype=np.int64)
+        for n, device_id in enumerate(device_ids):
+            slot = slots.get(device_id)
+            out[n] = self._slot(device_id) if slot is None else slot
+        return out
+
+    def _slot(self, device_id: bytes) -> int:
+        slot = self.slots.get(device_id)
+        if slot is None:
+            if len(self.slots) >= self.max_devices:
+                self._evict(1)
+            if self.free:
+                slot = self.free.pop()
+            else:
+                slot = self.allocated
+                self.allocated += 1
+                if slot >= self.capacity:
+                    self._grow()
+            self.slots[device_id] = slot
+        return slot
+
+    def _evict(self, needed: int, keep: Iterable[int] = ()):
+        """Free at least `needed` slots (EVICT_FRACTION of max_devices at a time), oldest last_ts first."""
+        ids = list(self.slots)
+        slots = np.fromiter(self.slots.values(), dtype=np.int64, count=len(ids))
+        last_ts = self.state["last_ts"][slots]          # 0 for devices never credited: evicted first
+        kept = np.isin(slots, np.fromiter(keep, dtype=np.int64))
+        last_ts[kept] = np.inf
+        count = min(max(needed, int(self.max_devices * EVICT_FRACTION)), len(ids) - int(kept.sum()))
+        if count < needed:
+            raise ValueError(f"one batch holds more than max_devices={self.max_devices} devices")
+        for k in np.argpartition(last_ts, count - 1)[:count].tolist():
+            slot = self.slots.pop(ids[k])
+            for column in self.state.values():
+                column[slot] = 0.0
+            self.free.append(slot)
+        self.stats["evicted"] += count
+
+    def _grow(self):
+        self.capacity = min(self.capacity * 2, self.max_devices)
+        for name, column in self.state.items():
+            grown = np.zeros(self.capacity, dtype=np.float64)
+            grown[:len(column)] = column
+            self.state[name] = grown
+
+
+_SCREENED = {bit: SCREENED.labels(reason=name) for bit, name in REASONS.items()}
+
+
+def screen_packets(screen: PlausibilityScreen, packets: Sequence, now: Optional[float] = None) -> np.ndarray:
+    """screen() over anything with device_id / voltage / current / resistance / timestamp attributes."""
+    return screen.screen(
+        [p.device_id for p in packets], [p.voltage for p in packets], [p.current for p in packets],
+        [p.resistance for p in packets], [p.timestamp for p in packets], now,
+    )
@@ -0,0 +1,206 @@
+# src/carbon_smart_meter/core/server.py
+"""
+Gateway Ingestion Server (asyncio, Binary VIR Frames)
+
+Gateways stream batches of signed VIR frames (core.wire) over TCP or a Unix socket
+and get one acknowledgement byte per frame back.
+
+    request:  b"VIR1" | count <u32> | count × 116-byte frames
+          or  b"GWY1" | count <u32> | one signed gateway batch of count samples (core.gateway)
+    response: b"ACK1" | count <u32> | count × status byte
+
+- Signature checks run on a thread pool (libsodium releases the GIL)
+- Cap accounting + storage run on a single ordered worker thread; with a
+  write-behind SecureEnergyDB this never waits on a cloud round trip
+- In-flight batches are bounded; when full, new batches are answered ACK_BUSY
+  immediately so latency stays flat instead of queueing without limit
+"""
+
+import asyncio
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from .gateway import HEADER_SIZE as GATEWAY_HEADER_SIZE
+from .gateway import MAX_SAMPLES_PER_BATCH, SAMPLE_SIZE, SIGNATURE_SIZE, GatewayBatch, verify_gateway_batch
+from .metrics import QUEUE_DEPTH
+from .mining import EnergyProcessor
+from .wire import FRAME_SIZE, FrameBatch, verify_frames
+
+# === CONFIG ===
+REQUEST_MAGIC = b"VIR1"
+GATEWAY_MAGIC = b"GWY1"
+RESPONSE_MAGIC = b"ACK1"
+HEADER = struct.Struct("<4sI")
+MAX_FRAMES_PER_BATCH = 4096
+MAX_INFLIGHT_BATCHES = 1024
+VERIFY_THREADS = 4
+
+ACK_REJECTED = 0    # Bad signature, unknown device or daily cap reached
+ACK_ACCEPTED = 1
+ACK_BUSY = 2        # Server overloaded: retry later
+
+
+# === SERVER ===
+class IngestServer:
+    def __init__(
+        self,
+        processor: EnergyProcessor,
+        key_lookup: Callable[[bytes], Optional[bytes]],
+        cable_type: str = "type-c",
+        verify_threads: int = VERIFY_THREADS,
+        max_inflight: int = MAX_INFLIGHT_BATCHES,
+        gateways: Optional[Callable[[bytes], Optional[object]]] = None,
+    ):
+        self.processor = processor
+        self.key_lookup = key_lookup
+        self.gateways = gateways
+        self.cable_type = cable_type
+        self.verify_pool = ThreadPoolExecutor(max_workers=verify_threads, thread_name_prefix="verify")
+        self.accept_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="accept")
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.connections = 0
+        self.stats = {"batches": 0, "frames": 0, "accepted": 0, "busy": 0}
+        self.server: Optional[asyncio.AbstractServer] = None
+        QUEUE_DEPTH.labels(queue="ingest-inflight").track(self, lambda server: server.inflight)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, path: Optional[str] = None):
+        if path:
+            self.server = await asyncio.start_unix_server(self._handle, path=path, backlog=4096)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port, backlog=4096)
+        return self.server
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._shutdown_pools)
+
+    async def process(self, frames: bytes) -> bytes:
+        """Verify and store one batch; returns one status byte per frame."""
+        batch = FrameBatch(frames)
+        if self.inflight >= self.max_inflight:
+            self.stats["busy"] += 1
+            return bytes([ACK_BUSY]) * len(batch)
+
+        loop = asyncio.get_running_loop()
+        self.inflight += 1
+        try:
+            mask = self.processor.frame_replay_mask(batch)
+            verified = await loop.run_in_executor(
+                self.verify_pool, verify_frames, batch, self.key_lookup, self.processor.key_cache, None, mask
+            )
+            readings = await loop.run_in_executor(
+                self.accept_pool, self.processor.accept_frames, batch, verified, self.cable_type, True
+            )
+        finally:
+            self.inflight -= 1
+
+        return self._acks(readings)
+
+    async def process_gateway(self, data: bytes) -> bytes:
+        """Verify and store one gateway batch: one signature check, one status byte per sample."""
+        batch = GatewayBatch(data)
+        if self.gateways is None:
+            return bytes([ACK_REJECTED]) * len(batch)
+        if self.inflight >= self.max_inflight:
+            self.stats["busy"] += 1
+            return bytes([ACK_BUSY]) * len(batch)
+
+        loop = asyncio.get_running_loop()
+        self.inflight += 1
+        try:
+            verified = await loop.run_in_executor(
+                self.verify_pool, verify_gateway_batch, batch, self.gateways, self.processor.key_cache
+            )
+            readings = await loop.run_in_executor(
+                self.accept_pool, self.processor.accept_gateway_batch, batch, verified, self.cable_type, True
+            )
+        finally:
+            self.inflight -= 1
+        return self._acks(readings)
+
+    def _acks(self, readings) -> bytes:
+        acks = bytes(ACK_ACCEPTED if r is not None else ACK_REJECTED for r in readings)
+        self.stats["batches"] += 1
+        self.stats["frames"] += len(acks)
+        self.stats["accepted"] += acks.count(ACK_ACCEPTED)
+        return acks
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    magic, count = HEADER.unpack(await reader.readexactly(HEADER.size))
+                except asyncio.IncompleteReadError:
+                    return
+                if magic == GATEWAY_MAGIC and count <= MAX_SAMPLES_PER_BATCH:
+                    data = await reader.readexactly(GATEWAY_HEADER_SIZE + SIGNATURE_SIZE + count * SAMPLE_SIZE)
+                    try:
+                        acks = await self.process_gateway(data)
+                    except ValueError:
+                        return
+                elif magic == REQUEST_MAGIC and count <= MAX_FRAMES_PER_BATCH:
+                    frames = await reader.readexactly(count * FRAME_SIZE)
+                    acks = await self.process(frames)
+                else:
+                    return
+                writer.write(HEADER.pack(RESPONSE_MAGIC, len(acks)) + acks)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    def _shutdown_pools(self):
+        self.verify_pool.shutdown(wait=True)
+        self.accept_pool.shutdown(wait=True)
+        self.processor.flush_aggregates()
+        self.processor.snapshot_replay_guard()
+        if hasattr(self.processor.db, "flush"):
+            self.processor.db.flush()
+
+
+# === CLIENT (GATEWAY SIDE) ===
+class IngestClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 0, path: Optional[str] = None) -> "IngestClient":
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, frames: List[bytes]) -> bytes:
+        self.writer.write(HEADER.pack(REQUEST_MAGIC, len(frames)) + b"".join(frames))
+        await self.writer.drain()
+        return await self._read_acks()
+
+    async def send_gateway_batch(self, batch: bytes) -> bytes:
+        count = len(GatewayBatch(batch))
+        self.writer.write(HEADER.pack(GATEWAY_MAGIC, count) + batch)
+        await self.writer.drain()
+        return await self._read_acks()
+
+    async def _read_acks(self) -> bytes:
+        magic, count = HEADER.unpack(await self.reader.readexactly(HEADER.size))
+        if magic != RESPONSE_MAGIC:
+            raise ConnectionError("bad acknowledgement header")
+        return await self.reader.readexactly(count)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
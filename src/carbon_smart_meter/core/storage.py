@@ -0,0 +1,386 @@
+# src/carbon_smart_meter/core/storage.py
+"""
+Write-Behind Storage (Shared by SecureEnergyDB / SecureOffsetDB / SecureRegistrationDB)
+
+GDPR & MiCA-compliant: Primary storage in AWS (EU or SG), encrypted Azure backup.
+
+- insert() enqueues into a bounded queue; cloud I/O happens off the request path
+- Records are compacted into newline-delimited JSON, one object per device per hour
+- AWS primary and Azure backup uploads run concurrently on a worker pool
+- Failed uploads retry with exponential backoff, then again on every flush or,
+  when the store is idle, every max_age seconds; pending data is flushed on shutdown
+- Uploads still failing at close() are spilled to spill_dir (re-queued by the
+  next store on that directory) or raised as UnflushedWritesError, never dropped
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .clients import ClientRegistry, aws_region_for, get_clients
+from .metrics import QUEUE_DEPTH, STORE_FAILURES, STORE_SECONDS, clock, metrics
+
+# === CONFIG ===
+FLUSH_MAX_RECORDS = 500         # Flush once this many records are buffered
+FLUSH_MAX_AGE = 5.0             # ... or once the oldest buffered record is this old (seconds)
+QUEUE_SIZE = 10_000             # insert() blocks when this many records are waiting
+UPLOAD_WORKERS = 8
+UPLOAD_RETRIES = 5
+RETRY_BACKOFF = 0.2             # Seconds, doubled on every attempt
+FLUSH_POLL = 1.0                # Seconds between flusher liveness checks while flush() waits
+
+Uploader = Callable[[str, bytes], None]
+
+logger = logging.getLogger(__name__)
+
+_FLUSH = object()
+_STOP = object()
+
+
+# === OBJECT LAYOUT ===
+def compacted_key(prefix: str, device_hex: str, hour_ts: int, first_ts: int, last_ts: int, seq: str) -> str:
+    """first_ts / last_ts are the min / max timestamps held; seq keeps two flushes of one hour apart."""
+    return f"{prefix}/{device_hex}/{hour_ts}/{first_ts}-{last_ts}-{seq}.ndjson"
+
+
+def decode_records(key: str, body: bytes) -> Iterator[dict]:
+    """Yield the JSON records held by one stored object, single-record or compacted."""
+    if key.endswith(".ndjson"):
+        for line in body.splitlines():
+            if line:
+                yield json.loads(line)
+    else:
+        yield json.loads(body)
+
+
+# === WRITE-BEHIND QUEUE ===
+class UnflushedWritesError(RuntimeError):
+    def __init__(self, failed: List[Tuple[str, str, bytes]]):
+        self.failed = failed    # (leg, key, data)
+        super().__init__(f"{len(failed)} uploads still failing at close: {', '.join(key for _, key, _ in failed[:5])}")
+
+
+class WriteBehindStore:
+    def __init__(
+        self,
+        primary: Uploader,
+        backup: Uploader,
+        max_records: int = FLUSH_MAX_RECORDS,
+        max_age: float = FLUSH_MAX_AGE,
+        queue_size: int = QUEUE_SIZE,
+        workers: int = UPLOAD_WORKERS,
+        retries: int = UPLOAD_RETRIES,
+        backoff: float = RETRY_BACKOFF,
+        spill_dir: Optional[str] = None,
+    ):
+        self.primary = primary
+        self.backup = backup
+        self.max_records = max_records
+        self.max_age = max_age
+        self.retries = retries
+        self.backoff = backoff
+        self.spill_dir = spill_dir
+        self.writer_id = secrets.token_hex(4)      # Flush keys stay unique across processes and restarts
+        self._flushes = itertools.count()
+
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.buffers: Dict[Tuple[str, str, int], List[Tuple[int, bytes]]] = {}
+        self.failed: List[Tuple[Uploader, str, bytes]] = []
+        self.stats = {"records": 0, "objects": 0, "retries": 0, "failures": 0, "spilled": 0}
+        self._lock = threading.Lock()
+        if spill_dir:
+            self.failed = self._load_spilled()
+
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, prefix: str, device_hex: str, timestamp: int, data: bytes):
+        """Queue one record. Blocks (backpressure) only when the queue is full."""
+        if self._closed:
+            raise RuntimeError("WriteBehindStore is closed")
+        self.queue.put((prefix, device_hex, timestamp, data))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Upload everything queued so far; returns once both legs are stored (False on timeout)."""
+        if self._closed:
+            return True
+        self._check_alive()
+        done = threading.Event()
+        self.queue.put((_FLUSH, done))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait_for = FLUSH_POLL if deadline is None else min(FLUSH_POLL, max(0.0, deadline - time.monotonic()))
+            if done.wait(wait_for):
+                return True
+            self._check_alive()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def close(self):
+        """Flush and stop; uploads that still fail are spilled to spill_dir, else raised."""
+        if self._closed:
+            return
+        if self._thread.is_alive():
+            self.flush()
+            self._closed = True
+            self.queue.put((_STOP, None))
+            self._thread.join()
+        else:
+            # The flusher died: upload what it left behind from this thread
+            self._closed = True
+            logger.error("write-behind flusher thread is dead; draining %d queued records at close", self.depth)
+            self._take_queued()
+            self._drain()
+        self.pool.shutdown(wait=True)
+        atexit.unregister(self.close)
+
+        with self._lock:
+            failed, self.failed = self.failed, []
+        if not failed:
+            return
+        failed = [(self._leg(uploader), key, data) for uploader, key, data in failed]
+        if self.spill_dir:
+            for leg, key, data in failed:
+                self._spill(leg, key, data)
+            self.stats["spilled"] += len(failed)
+            logger.error("%d uploads still failing at close; spilled to %s", len(failed), self.spill_dir)
+            return
+        logger.error("%d uploads still failing at close and no spill_dir is set", len(failed))
+        raise UnflushedWritesError(failed)
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def _check_alive(self):
+        if not self._thread.is_alive():
+            raise RuntimeError("write-behind flusher thread has died; close() uploads what is left")
+
+    # --- background flusher ---
+    def _run(self):
+        pending = 0
+        oldest: Optional[float] = None
+        while True:
+            timeout = self.max_age if oldest is None else max(0.0, self.max_age - (time.monotonic() - oldest))
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+                if oldest is None and self.failed:
+                    # Idle, but uploads are still failing: retry them every max_age
+                    self._drain()
+                    continue
+
+            if item is not None and item[0] is _STOP:
+                self._drain()
+                return
+            if item is not None and item[0] is _FLUSH:
+                self._drain()
+                pending, oldest = 0, None
+                item[1].set()
+                continue
+
+            if item is not None:
+                prefix, device_hex, timestamp, data = item
+                bucket = (prefix, device_hex, timestamp - timestamp % 3600)
+                self.buffers.setdefault(bucket, []).append((timestamp, data))
+                pending += 1
+                if oldest is None:
+                    oldest = time.monotonic()
+
+            if pending >= self.max_records or (oldest is not None and time.monotonic() - oldest >= self.max_age):
+                self._drain()
+                pending, oldest = 0, None
+
+    def _take_queued(self):
+        """Move records still in the queue into the buffers (close() after the flusher died)."""
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item[0] is _FLUSH:
+                item[1].set()
+            elif item[0] is not _STOP:
+                prefix, device_hex, timestamp, data = item
+                self.buffers.setdefault((prefix, device_hex, timestamp - timestamp % 3600), []).append((timestamp, data))
+
+    def _drain(self):
+        buffers, self.buffers = self.buffers, {}
+        with self._lock:
+            retry, self.failed = self.failed, []
+
+        jobs = [(uploader, key, data) for uploader, key, data in retry]
+        seq = f"{self.writer_id}{next(self._flushes):06d}"
+        for (prefix, device_hex, hour_ts), rows in buffers.items():
+            timestamps = [ts for ts, _ in rows]
+            key = compacted_key(prefix, device_hex, hour_ts, min(timestamps), max(timestamps), seq)
+            data = b"\n".join(row for _, row in rows) + b"\n"
+            jobs.append((self.primary, key, data))
+            jobs.append((self.backup, key, data))
+            self.stats["records"] += len(rows)
+            self.stats["objects"] += 1
+
+        if jobs:
+            wait([self.pool.submit(self._upload, *job) for job in jobs])
+
+    def _upload(self, uploader: Uploader, key: str, data: bytes):
+        for attempt in range(self.retries + 1):
+            try:
+                uploader(key, data)
+                return
+            except Exception:
+                if attempt == self.retries:
+                    break
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(self.backoff * (2 ** attempt))
+
+        # Kept for the next flush rather than dropped
+        with self._lock:
+            self.stats["failures"] += 1
+            self.failed.append((uploader, key, data))
+
+    # --- spill to disk ---
+    def _leg(self, uploader: Uploader) -> str:
+        return "primary" if uploader is self.primary else "backup"
+
+    def _spill(self, leg: str, key: str, data: bytes):
+        path = os.path.join(self.spill_dir, leg, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _load_spilled(self) -> List[Tuple[Uploader, str, bytes]]:
+        """Objects a previous store spilled here: queued for the first flush, files removed."""
+        failed = []
+        for leg, uploader in (("primary", self.primary), ("backup", self.backup)):
+            root = os.path.join(self.spill_dir, leg)
+            for directory, _, files in os.walk(root):
+                for name in files:
+                    path = os.path.join(directory, name)
+                    if name.endswith(".tmp"):
+                        continue
+                    with open(path, "rb") as f:
+                        failed.append((uploader, os.path.relpath(path, root).replace(os.sep, "/"), f.read()))
+                    os.remove(path)
+        if failed:
+            logger.info("re-queued %d spilled uploads from %s", len(failed), self.spill_dir)
+        return failed
+
+
+# === SHARED AWS + AZURE STORE ===
+class SecureStore:
+    """
+    Base for the Secure*DB classes: AWS primary, Azure backup, optional write-behind.
+
+    Without write-behind every write is two synchronous round trips, as before.
+    Cloud clients come from the shared ClientRegistry and are resolved on first write.
+    """
+
+    def __init__(
+        self,
+        user_region: str,
+        aws_bucket: str,
+        azure_container: str,
+        clients: Optional[ClientRegistry] = None,
+        write_behind: bool = False,
+        spill_dir: Optional[str] = None,
+    ):
+        self.user_region = user_region
+        self.aws_bucket = aws_bucket
+        self.azure_container = azure_container
+        self.clients = clients or get_clients()
+        self._s3 = None
+        self._blob_service = None
+        self.writer = (
+            WriteBehindStore(self.put_primary, self.put_backup, spill_dir=spill_dir) if write_behind else None
+        )
+        if self.writer is not None:
+            QUEUE_DEPTH.labels(queue=f"write-behind:{aws_bucket}").track(self.writer, lambda writer: writer.depth)
+        self._timers = {
+            leg: (STORE_SECONDS.labels(store=aws_bucket, leg=leg), STORE_FAILURES.labels(store=aws_bucket, leg=leg))
+            for leg in ("aws", "azure")
+        }
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            self._s3 = self.clients.s3(aws_region_for(self.user_region))
+        return self._s3
+
+    @s3.setter
+    def s3(self, client):
+        self._s3 = client
+
+    @property
+    def blob_service(self):
+        if self._blob_service is None:
+            self._blob_service = self.clients.blob_service
+        return self._blob_service
+
+    @blob_service.setter
+    def blob_service(self, client):
+        self._blob_service = client
+
+    def put_primary(self, key: str, data: bytes):
+        if metrics.enabled:
+            return self._timed("aws", self._put_aws, key, data)
+        self._put_aws(key, data)
+
+    def put_backup(self, key: str, data: bytes):
+        if metrics.enabled:
+            return self._timed("azure", self._put_azure, key, data)
+        self._put_azure(key, data)
+
+    def _put_aws(self, key: str, data: bytes):
+        self.s3.put_object(
+            Bucket=self.aws_bucket,
+            Key=key,
+            Body=data,
+            ServerSideEncryption="AES256"
+        )
+
+    def _put_azure(self, key: str, data: bytes):
+        blob_client = self.blob_service.get_blob_client(container=self.azure_container, blob=key)
+        blob_client.upload_blob(data, overwrite=True, encryption_scope="gdpr-scope")
+
+    def _timed(self, leg: str, put: Uploader, key: str, data: bytes):
+        seconds, failures = self._timers[leg]
+        started = clock()
+        try:
+            put(key, data)
+        except Exception:
+            failures.inc()
+            raise
+        finally:
+            seconds.observe(clock() - started)
+
+    def write(self, key: str, prefix: str, device_hex: str, timestamp: int, data: bytes):
+        if self.writer is not None:
+            self.writer.put(prefix, device_hex, timestamp, data)
+            return
+
+        self.put_primary(key, data)
+        self.put_backup(key, data)
+
+    def flush(self):
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
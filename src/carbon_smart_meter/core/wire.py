@@ -0,0 +1,131 @@
+# src/carbon_smart_meter/core/wire.py
+"""
+VIR Binary Wire Format (Fixed-Size Frames, Zero-Copy Parsing)
+
+The microcontroller already signs device_id + struct.pack("<fffq", V, I, R, ts).
+A frame is exactly those signed bytes followed by the signature:
+
+    [device_id(32)][voltage f32][current f32][resistance f32][timestamp i64][signature(64)]
+
+- 116 bytes per frame, little-endian, no padding
+- Signatures are checked against the frame bytes as received (no repacking)
+- VIRPacket models are only built on request
+"""
+
+import struct
+from concurrent.futures import Executor
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .keys import verify_key_source
+from .mining import VIRPacket, VerifyKeyCache, verify_jobs
+
+# === LAYOUT ===
+FRAME = struct.Struct("<32sfffq64s")
+FRAME_SIZE = FRAME.size             # 116
+SIGNED_SIZE = 32 + struct.calcsize("<fffq")   # 52
+
+FRAME_DTYPE = np.dtype([
+    ("device_id", "V32"),
+    ("voltage", "<f4"),
+    ("current", "<f4"),
+    ("resistance", "<f4"),
+    ("timestamp", "<i8"),
+    ("signature", "V64"),
+])
+
+
+class Frame(NamedTuple):
+    device_id: bytes
+    voltage: float
+    current: float
+    resistance: float
+    timestamp: int
+    signature: bytes
+
+
+def pack_frame(
+    device_id: bytes,
+    voltage: float,
+    current: float,
+    resistance: float,
+    timestamp: int,
+    signature: bytes
+) -> bytes:
+    return FRAME.pack(device_id, voltage, current, resistance, timestamp, signature)
+
+
+def encode_packet(packet: VIRPacket) -> bytes:
+    return pack_frame(
+        packet.device_id, packet.voltage, packet.current,
+        packet.resistance, packet.timestamp, packet.signature
+    )
+
+
+# === FRAME BATCH ===
+class FrameBatch:
+    """Read-only view over a buffer holding back-to-back frames."""
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer).cast("B")
+        if len(self.view) % FRAME_SIZE:
+            raise ValueError(f"buffer length {len(self.view)} is not a multiple of {FRAME_SIZE}")
+
+    def __len__(self) -> int:
+        return len(self.view) // FRAME_SIZE
+
+    def __iter__(self) -> Iterator[Frame]:
+        for fields in FRAME.iter_unpack(self.view):
+            yield Frame(*fields)
+
+    def device_id(self, index: int) -> bytes:
+        offset = index * FRAME_SIZE
+        return self.view[offset:offset + 32].tobytes()
+
+    def frame_bytes(self, index: int) -> bytes:
+        offset = index * FRAME_SIZE
+        return self.view[offset:offset + FRAME_SIZE].tobytes()
+
+    def signed_bytes(self, index: int) -> memoryview:
+        offset = index * FRAME_SIZE
+        return self.view[offset:offset + SIGNED_SIZE]
+
+    def signature(self, index: int) -> bytes:
+        offset = index * FRAME_SIZE + SIGNED_SIZE
+        return self.view[offset:offset + 64].tobytes()
+
+    def columns(self) -> np.ndarray:
+        """Structured NumPy view of the frames (no copy), for the columnar path."""
+        return np.frombuffer(self.view, dtype=FRAME_DTYPE)
+
+    def packets(self) -> List[VIRPacket]:
+        return [VIRPacket(**frame._asdict()) for frame in self]
+
+
+def verify_frames(
+    batch: FrameBatch,
+    key_lookup: Callable[[bytes], Optional[bytes]],
+    key_cache: Optional[VerifyKeyCache] = None,
+    executor: Optional[Executor] = None,
+    mask: Optional[Sequence[bool]] = None,
+) -> List[bool]:
+    """verify_batch for raw frames: same answers, without building models or repacking."""
+    if key_cache is None:
+        key_cache = VerifyKeyCache()
+
+    verify_key_for = verify_key_source(key_lookup, key_cache)
+    jobs = [
+        (
+            verify_key_for(batch.device_id(i)) if mask is None or mask[i] else None,
+            batch.signed_bytes(i),
+            batch.signature(i),
+        )
+        for i in range(len(batch))
+    ]
+
+    return verify_jobs(jobs, executor)
+
+
+def frames_from_packets(packets: Sequence[VIRPacket]) -> bytes:
+    return b"".join(encode_packet(packet) for packet in packets)
@@ -0,0 +1,11 @@
+# tests/conftest.py
+import pytest
+from carbon_smart_meter.core.clients import ClientRegistry, set_clients
+
+@pytest.fixture(autouse=True)
+def local_clients():
+    """Run every test against in-process S3 / Azure Blob stand-ins."""
+    registry = ClientRegistry.local()
+    previous = set_clients(registry)
+    yield registry
+    set_clients(previous)
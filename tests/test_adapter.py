@@ -0,0 +1,118 @@
+# tests/test_adapter.py
+import asyncio
+import time
+import pytest
+from nacl.signing import SigningKey
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+from solders.transaction import Transaction
+from carbon_smart_meter.blockchain.batching import KwhRecord, decode_batch, device_message, encode_batch
+from carbon_smart_meter.blockchain.solana import BatchSolanaSubmitter
+from carbon_smart_meter.core.blockchain.adapter import RateLimiter, create_adapter
+from carbon_smart_meter.core.blockchain.solana import (
+    SolanaAdapter, batch_account_error, build_transaction, mining_account
+)
+from carbon_smart_meter.core.local import LocalRpcServer
+
+def _records(n, bad=(), owners=(bytes(Keypair().pubkey()),)):
+    records = []
+    for i in range(n):
+        key, device_id, wallet = SigningKey.generate(), bytes([i]) * 32, owners[i % len(owners)]
+        signer = SigningKey.generate() if i in bad else key
+        signature = signer.sign(device_message(device_id, wallet)).signature
+        records.append(KwhRecord(device_id, key.verify_key.encode(), 100 + i, signature, wallet))
+    return records
+
+def _run(scenario, **server_kwargs):
+    async def main():
+        server = await LocalRpcServer(**server_kwargs).start()
+        try:
+            return await scenario(server), server
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+def test_solana_adapter_batches_over_pooled_rpc():
+    wallet = Keypair()
+    records = _records(40, bad={3}, owners=[bytes(Keypair().pubkey()) for _ in range(3)])
+    owner_of = {r.device_id: r.wallet for r in records}
+
+    async def scenario(server):
+        async with create_adapter("solana", wallet=wallet, url=server.url, rate_limiter=RateLimiter(None)) as adapter:
+            assert isinstance(adapter, SolanaAdapter)
+            results = await adapter.submit_batch(records, market_cap=7)
+            return results, await adapter.statuses(sorted(set(r for r in results if r)))
+
+    (results, statuses), server = _run(scenario)
+    assert results[3] is None and all(r is not None for i, r in enumerate(results) if i != 3)
+    assert statuses == [True] * len(server.client.transactions)
+
+    sent = []
+    for raw in server.client.transactions:
+        tx = Transaction.from_bytes(raw)
+        tx.verify()
+        ix = tx.message.instructions[0]
+        batch, market_cap = decode_batch(bytes(ix.data))
+        assert market_cap == 7
+        accounts = [tx.message.account_keys[i] for i in ix.accounts]
+        assert accounts[4::2] == [mining_account(device_id) for device_id, _, _ in batch]
+        assert [bytes(key) for key in accounts[5::2]] == [owner_of[device_id] for device_id, _, _ in batch]
+        sent += [kwh for _, kwh, _ in batch]
+    assert sorted(sent) == [r.kwh for i, r in enumerate(records) if i != 3]      # sends run concurrently
+    assert server.accepted < server.requests   # pooled keep-alive connections
+
+def test_failed_sends_return_none_and_refresh_blockhash():
+    async def scenario(server):
+        adapter = SolanaAdapter(Keypair(), url=server.url, rate_limiter=RateLimiter(None))
+        results = await adapter.submit_batch(_records(5))
+        stale = adapter._blockhash
+        await adapter.close()
+        return results, stale
+
+    (results, stale), server = _run(scenario, failure_rate=1.0)
+    assert results == [None] * 5 and stale is None
+    assert server.client.transactions == []
+
+def test_rate_limiter_spaces_requests():
+    async def scenario():
+        limiter = RateLimiter(200.0, burst=1)
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.acquire() for _ in range(11)))
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.045
+    assert asyncio.run(scenario()) >= 0.045     # a shared limiter survives a new event loop
+    assert RateLimiter.for_chain("solana") is RateLimiter.for_chain("solana")
+
+def test_unknown_chain_and_blocking_submitter():
+    with pytest.raises(ValueError):
+        create_adapter("no-such-chain")
+
+    submitter = BatchSolanaSubmitter(Keypair())
+    results = submitter.submit_batch(_records(3))
+    submitter.close()
+    assert len(set(results)) == 1 and None not in results
+    Transaction.from_bytes(bytes(submitter.clients.rpc.transactions[0])).verify()
+
+def test_operator_relays_devices_of_many_owners():
+    operator, owners = Keypair(), [Keypair().pubkey() for _ in range(3)]
+    keys = [SigningKey.generate() for _ in range(6)]
+    records = []
+    for i, key in enumerate(keys):
+        device_id, wallet = bytes([i]) * 32, bytes(owners[i % 3])
+        records.append(KwhRecord(device_id, key.verify_key.encode(), 100, key.sign(device_message(device_id, wallet)).signature, wallet))
+    devices = {r.device_id: (Pubkey.from_bytes(r.wallet), r.public_key) for r in records}
+    blockhash = str(Hash.default())
+
+    def error(batch, signer=operator):
+        return batch_account_error(build_transaction(signer, batch, encode_batch(batch), blockhash), operator.pubkey(), devices)
+
+    assert error(records) is None                                           # one tx, three owners, one signer
+    assert error(records, signer=Keypair()) == "MissingRequiredSignature"   # only the registered operator
+    stolen = records[1]._replace(wallet=bytes(owners[0]))                   # pay device 1 into owner 0's wallet
+    assert error([records[0], stolen]) == "InvalidAccountData"
+    unbound = records[2]._replace(signature=keys[2].sign(records[2].device_id).signature)
+    assert error([unbound]) == "InvalidInstructionData"                     # signature must cover the wallet
+    with pytest.raises(ValueError):
+        build_transaction(operator, [records[0]._replace(wallet=None)], b"", blockhash)
@@ -0,0 +1,105 @@
+# tests/test_aggregation.py
+import hashlib
+import json
+import struct
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.aggregation import (
+    WindowAggregator, aggregate_from_record, aggregate_proof, verify_aggregate_proof,
+)
+from carbon_smart_meter.core.clients import ClientRegistry
+from carbon_smart_meter.core.merkle import MerkleAccumulator, leaf_hash, merkle_root, node_hash
+from carbon_smart_meter.core.mining import EnergyProcessor, EnergyReading, SecureEnergyDB, VIRPacket
+from carbon_smart_meter.core.offset import OffsetEngine, SecureOffsetDB
+from carbon_smart_meter.core.storage import decode_records
+from carbon_smart_meter.core.wire import frames_from_packets
+
+def _rfc6962(leaves):
+    if len(leaves) == 1:
+        return leaf_hash(leaves[0])
+    k = 1
+    while k * 2 < len(leaves):
+        k *= 2
+    return node_hash(_rfc6962(leaves[:k]), _rfc6962(leaves[k:]))
+
+def _reading(ts, kwh=0.001, device_id=b"d" * 32):
+    return EnergyReading(device_id=device_id, kwh=kwh, timestamp=ts, verified=True, cable_type="type-c", user_region="EU")
+
+def test_accumulator_matches_rfc6962():
+    leaves = [bytes([i]) * 7 for i in range(37)]
+    for n in range(1, 38):
+        assert merkle_root(leaves[:n]) == _rfc6962(leaves[:n])
+    assert MerkleAccumulator().root() == hashlib.sha256(b"").digest()
+
+def test_tumbling_windows_out_of_order_and_late():
+    agg = WindowAggregator(window_seconds=60, allowed_lateness=5)
+    emitted = []
+    for ts in [0, 2, 1, 59, 60, 64]:
+        emitted += agg.add(_reading(ts), b"%d" % ts)
+    assert emitted == []
+    emitted += agg.add(_reading(65), b"65")     # watermark 65 - 5 closes [0, 60)
+    assert len(emitted) == 1
+    first = emitted[0]
+    assert (first.window_start, first.samples, first.out_of_order) == (0, 4, 1)
+    assert first.merkle_root == merkle_root([b"0", b"2", b"1", b"59"]).hex()
+
+    assert agg.add(_reading(30), b"30") == []   # late for an emitted window
+    rest = agg.flush()
+    assert [(a.window_start, a.samples, a.amendment) for a in rest] == [(60, 3, False), (0, 1, True)]
+    assert agg.stats["late"] == 1 and agg.pending() == 0
+
+    drop = WindowAggregator(window_seconds=60, allowed_lateness=0, late_policy="drop")
+    drop.add(_reading(0), b"0")
+    drop.add(_reading(60), b"60")
+    drop.add(_reading(1), b"1")
+    assert drop.stats["dropped"] == 1
+
+def test_processor_writes_one_object_per_window():
+    signing_key = SigningKey.generate()
+    device_id = b"a" * 32
+    keys = {device_id: signing_key.verify_key.encode()}
+    packets = []
+    for ts in range(600, 600 + 180):
+        payload = device_id + struct.pack("<fffq", 12.0, 1.0, 12.0, ts)
+        packets.append(VIRPacket(
+            device_id=device_id, voltage=12.0, current=1.0, resistance=12.0,
+            timestamp=ts, signature=signing_key.sign(payload).signature
+        ))
+
+    processor = EnergyProcessor(aggregator=WindowAggregator(window_seconds=60, allowed_lateness=0))
+    offsets = OffsetEngine(SecureOffsetDB("EU"))
+    processor.aggregate_sinks.append(lambda a: offsets.process_aggregate(a, "NZ", "wallet"))
+    readings = processor.process_frames(frames_from_packets(packets), keys.get)
+    processor.flush_aggregates()
+
+    s3 = processor.db.s3
+    objects = s3.objects["ccm-energy-eu"]
+    stored = {k: v for k, v in objects.items() if k.startswith("energy-agg/")}
+    leaves = {k: v for k, v in objects.items() if k.startswith("energy-agg-leaves/")}
+    assert len(stored) == len(leaves) == 3 and len(objects) == 6
+    aggregates = [aggregate_from_record(r) for k, v in stored.items() for r in decode_records(k, v)]
+    assert sum(a.samples for a in aggregates) == 180
+    assert abs(sum(a.kwh for a in aggregates) - sum(r.kwh for r in readings)) < 1e-12
+    assert aggregates[0].merkle_root == merkle_root(frames_from_packets([p]) for p in packets[:60]).hex()
+    assert len(s3.objects["ccm-offsets-eu"]) == 3
+
+    # Any sample can be proven from storage alone
+    aggregate = aggregate_from_record(json.loads(stored[min(stored)]))
+    record = json.loads(leaves[min(leaves)])
+    proof = aggregate_proof(record, 17)
+    assert proof.frame == frames_from_packets([packets[17]])
+    assert verify_aggregate_proof(proof, aggregate)
+    assert not verify_aggregate_proof(proof._replace(frame=frames_from_packets([packets[18]])), aggregate)
+
+def test_repeated_amendments_never_overwrite():
+    agg = WindowAggregator(window_seconds=60, allowed_lateness=0)
+    db = SecureEnergyDB("EU", clients=ClientRegistry.local())
+    agg.add(_reading(0), b"0")
+    agg.add(_reading(60), b"60")
+    amendments = []
+    for raw in (b"a", b"b"):
+        agg.add(_reading(30), raw)                  # same span twice (no replay guard here)
+        amendments += agg.advance(61)
+    assert [(a.amendment, a.sequence) for a in amendments] == [(True, 1), (True, 2)]
+    for aggregate in amendments:
+        db.insert_aggregate(aggregate)
+    assert len([k for k in db.s3.objects["ccm-energy-eu"] if k.startswith("energy-agg/")]) == 2
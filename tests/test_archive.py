@@ -0,0 +1,56 @@
+# tests/test_archive.py
+import numpy as np
+from carbon_smart_meter.core.archive import ArchiveReader, ArchiveWriter, Segment
+from carbon_smart_meter.core.mining import EnergyReading
+from carbon_smart_meter.core.offset import OffsetRecord
+
+T0 = 1_700_006_400   # midnight UTC
+
+def _readings(devices=8, days=3, per_day=10):
+    return [
+        EnergyReading(
+            device_id=bytes([d]) * 32, kwh=0.001 * (d + 1), timestamp=T0 + day * 86400 + i,
+            verified=True, cable_type="12v" if d % 2 else "type-c", user_region="EU" if d < 6 else "SG"
+        )
+        for day in range(days) for d in range(devices) for i in range(per_day)
+    ]
+
+def test_energy_round_trip_and_pruning(tmp_path):
+    readings = _readings()
+    for codec in ("raw", "zlib"):
+        root = str(tmp_path / codec)
+        with ArchiveWriter(root, "energy", buckets=4, codec=codec) as writer:
+            writer.add_many(readings)
+
+        reader = ArchiveReader(root, "energy", buckets=4)
+        assert abs(reader.total() - sum(r.kwh for r in readings)) < 1e-12
+
+        device = bytes([3]) * 32
+        reader = ArchiveReader(root, "energy", buckets=4)
+        chunks = list(reader.scan(region="EU", start=T0 + 86400, end=T0 + 2 * 86400, device_id=device))
+        assert sum(len(c["timestamp"]) for c in chunks) == 10
+        assert all((c["device_id"] == np.array([device], dtype="V32")).all() for c in chunks)
+        assert set(np.concatenate([c["cable_type"] for c in chunks])) == {"12v"}
+        assert reader.stats["segments_listed"] == reader.stats["segments_scanned"] == 1
+
+def test_raw_columns_are_zero_copy(tmp_path):
+    with ArchiveWriter(str(tmp_path), "energy", codec="raw") as writer:
+        writer.add_many(_readings(devices=1, days=1))
+    path = next(ArchiveReader(str(tmp_path), "energy").segment_paths())
+    segment = Segment(path)
+    kwh = segment.column("kwh")
+    assert not kwh.flags.owndata and not kwh.flags.writeable
+    assert segment.rows == 10 and segment.max_ts - segment.min_ts == 9
+
+def test_offset_records(tmp_path):
+    records = [
+        OffsetRecord(device_id=bytes([d]) * 32, wallet_address=f"w{d % 2}", kwh=1.0,
+                     co2_kg=0.1 * d, region="NZ", timestamp=T0 + d)
+        for d in range(6)
+    ]
+    with ArchiveWriter(str(tmp_path), "offset", segment_rows=4) as writer:
+        writer.add_many(records)
+    chunks = list(ArchiveReader(str(tmp_path), "offset").scan(region="NZ"))
+    wallets = np.concatenate([c["wallet_address"] for c in chunks])
+    co2 = np.concatenate([c["co2_kg"] for c in chunks])
+    assert round(float(co2[wallets == "w1"].sum()), 6) == 0.9
@@ -0,0 +1,72 @@
+# tests/test_batching.py
+import pytest
+from nacl.signing import SigningKey
+from carbon_smart_meter.blockchain.batching import (
+    PACKET_DATA_SIZE, BatchSubmitter, KwhRecord, decode_batch, device_message, encode_batch,
+    max_records_per_tx, plan_batches, transaction_size
+)
+from carbon_smart_meter.core.clients import get_clients
+
+class _RawSubmitter(BatchSubmitter):
+    def build_transaction(self, batch, data, blockhash):
+        return (blockhash, data)
+
+def _records(count):
+    records = []
+    for i in range(count):
+        signing_key = SigningKey.generate()
+        device_id, wallet = bytes([i]) * 32, bytes([i % 3]) * 32
+        records.append(KwhRecord(
+            device_id=device_id, public_key=signing_key.verify_key.encode(), kwh=100 + i,
+            signature=signing_key.sign(device_message(device_id, wallet)).signature, wallet=wallet
+        ))
+    return records
+
+def test_encode_decode_round_trip():
+    records = _records(3)
+    decoded, market_cap = decode_batch(encode_batch(records, market_cap=5_000_000))
+    assert decoded == [(r.device_id, r.kwh, r.signature) for r in records]
+    assert market_cap == 5_000_000
+    assert decode_batch(encode_batch(records))[1] is None
+
+def test_plan_batches_fits_packet_limit():
+    per_tx = max_records_per_tx(market_cap=True)
+    assert per_tx >= 5
+    assert transaction_size(per_tx, True) <= PACKET_DATA_SIZE < transaction_size(per_tx + 1, True)
+    batches = plan_batches(_records(20), market_cap=True)
+    assert [len(b) for b in batches[:-1]] == [per_tx] * (len(batches) - 1)
+    assert sum(len(b) for b in batches) == 20
+
+def test_submit_batch_skips_bad_signatures_and_reuses_blockhash():
+    records = _records(14)
+    records[4] = records[4]._replace(signature=bytes(64))
+    submitter = _RawSubmitter()
+    try:
+        sigs = submitter.submit_batch(records, market_cap=1_000_000)
+    finally:
+        submitter.close()
+
+    rpc = get_clients().rpc
+    assert sigs[4] is None
+    assert all(sig is not None for i, sig in enumerate(sigs) if i != 4)
+    assert len(rpc.transactions) == len(plan_batches(records[:13], market_cap=True))
+    assert rpc.blockhash_requests == 1
+
+def test_wallet_bound_signature_matches_program_bytes():
+    signing_key, device_id, wallet = SigningKey.generate(), b"w" * 32, b"u" * 32
+    record = KwhRecord(device_id, signing_key.verify_key.encode(), 100,
+                       signing_key.sign(device_message(device_id, wallet)).signature, wallet)
+    submitter = _RawSubmitter()
+    try:
+        assert submitter.verify_record(record)
+        assert not submitter.verify_record(record._replace(wallet=b"x" * 32))
+        assert not submitter.verify_record(record._replace(wallet=None))
+        unbound = record._replace(signature=signing_key.sign(device_id).signature)
+        assert not submitter.verify_record(unbound._replace(wallet=None))   # the program only checks device_id || wallet
+        assert not submitter.verify_record(record._replace(public_key=b"short"))
+    finally:
+        submitter.close()
+
+def test_batch_submitter_is_abstract():
+    with pytest.raises(TypeError):
+        BatchSubmitter()
@@ -0,0 +1,116 @@
+# tests/test_capstore.py
+import multiprocessing
+import struct
+import numpy as np
+import pytest
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.capstore import CapStore, MemoryCapStore, SQLiteCapStore
+from carbon_smart_meter.core.columnar import apply_daily_cap_scalar
+from carbon_smart_meter.core.mining import EnergyProcessor, VIRPacket
+
+DAY = 1000000000 // 86400
+
+def test_memory_store_evicts_past_days():
+    store = MemoryCapStore(retention_days=2)
+    store.check_and_add(b"a" * 32, DAY, 0.5)
+    store.check_and_add(b"a" * 32, DAY + 1, 0.5)
+    assert len(store) == 2
+
+    store.check_and_add(b"a" * 32, DAY + 2, 0.5)
+    assert store.get((b"a" * 32, DAY), None) is None
+    assert len(store) == 2
+    # Too late to account for
+    assert store.check_and_add(b"a" * 32, DAY, 0.1) is None
+
+def test_check_and_add_clips_at_cap():
+    store = MemoryCapStore()
+    assert store.check_and_add(b"a" * 32, DAY, 1.0) == 1.0
+    assert store.check_and_add(b"a" * 32, DAY, 1.0) == 0.5
+    assert store.check_and_add(b"a" * 32, DAY, 1.0) is None
+
+def test_sqlite_store_survives_restart(tmp_path):
+    path = str(tmp_path / "caps.db")
+    store = SQLiteCapStore(path)
+    assert store.check_and_add(b"a" * 32, DAY, 1.25) == 1.25
+    store.close()
+
+    reopened = SQLiteCapStore(path)
+    assert reopened.get((b"a" * 32, DAY)) == 1.25
+    assert reopened.check_and_add(b"a" * 32, DAY, 1.0) == 0.25
+
+def test_apply_batch_matches_scalar(tmp_path):
+    rng = np.random.default_rng(3)
+    devices = [bytes([d]) * 32 for d in range(5)]
+    ids = [devices[i] for i in rng.integers(0, 5, 500)]
+    timestamps = 1000000000 + np.sort(rng.integers(0, 86400, 500))
+    kwh = rng.uniform(0, 0.05, 500)
+
+    expected_usage = {}
+    expected = apply_daily_cap_scalar(ids, timestamps, kwh, expected_usage)
+    for store in (MemoryCapStore(), SQLiteCapStore(str(tmp_path / "caps.db"))):
+        allowed, accepted = store.apply_batch(ids, timestamps, kwh)
+        assert accepted.tolist() == expected[1].tolist()
+        assert allowed.tolist() == expected[0].tolist()
+        assert store.snapshot() == expected_usage
+
+def _spend(path, count, results):
+    store = SQLiteCapStore(path)
+    total = 0.0
+    for _ in range(count):
+        total += store.check_and_add(b"s" * 32, DAY, 0.01) or 0.0
+    results.put(total)
+
+def test_sqlite_cap_shared_between_processes(tmp_path):
+    path = str(tmp_path / "caps.db")
+    SQLiteCapStore(path).close()
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_spend, args=(path, 100, results)) for _ in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    spent = sum(results.get() for _ in workers)
+    assert abs(spent - 1.5) < 1e-9
+
+def test_future_dated_samples_cannot_evict_other_devices(tmp_path):
+    now = lambda: DAY * 86400 + 3600
+    for store in (MemoryCapStore(clock=now), SQLiteCapStore(str(tmp_path / "caps.db"), clock=now)):
+        assert store.check_and_add(b"a" * 32, DAY, 0.5) == 0.5
+        assert store.check_and_add(b"e" * 32, DAY + 10_000, 0.1) is None
+        allowed, accepted = store.apply_batch([b"e" * 32, b"a" * 32], [(DAY + 10_000) * 86400, DAY * 86400], [0.1, 0.5])
+        assert accepted.tolist() == [False, True]
+        assert store.snapshot() == {(b"a" * 32, DAY): 1.0}
+        assert store.check_and_add(b"a" * 32, DAY, 1.0) == 0.5
+
+def test_sqlite_watermark_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "caps.db")
+    first, second = SQLiteCapStore(path), SQLiteCapStore(path)
+    assert first.check_and_add(b"a" * 32, DAY, 0.5) == 0.5
+    assert second.check_and_add(b"b" * 32, DAY + 2, 0.5) == 0.5
+    assert first.check_and_add(b"a" * 32, DAY, 0.1) is None       # second's day already retired DAY
+    assert first.get((b"a" * 32, DAY), None) is None
+
+def test_cap_store_is_abstract():
+    with pytest.raises(TypeError):
+        CapStore()
+
+def test_failed_insert_gives_the_cap_back(tmp_path):
+    signing_key = SigningKey.generate()
+    device_id = b"f" * 32
+    payload = device_id + struct.pack("<fffq", 18.0, 2.5, 7.2, DAY * 86400)
+    packet = VIRPacket(
+        device_id=device_id, voltage=18.0, current=2.5, resistance=7.2,
+        timestamp=DAY * 86400, signature=signing_key.sign(payload).signature
+    )
+    now = lambda: DAY * 86400 + 3600
+    for store in (MemoryCapStore(clock=now), SQLiteCapStore(str(tmp_path / "caps.db"), clock=now)):
+        store.check_and_add(device_id, DAY, 1.49)
+        processor = EnergyProcessor(cap_store=store)
+
+        def down(reading):
+            raise ConnectionError("S3 unavailable")
+        processor.db.insert = down
+        with pytest.raises(ConnectionError):
+            processor.process_packet(packet, signing_key.verify_key.encode())
+        assert abs(store.get((device_id, DAY)) - 1.49) < 1e-12
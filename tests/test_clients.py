@@ -0,0 +1,38 @@
+# tests/test_clients.py
+import subprocess
+import sys
+
+from carbon_smart_meter.core.clients import ClientRegistry
+from carbon_smart_meter.core.mining import SecureEnergyDB, EnergyReading
+from carbon_smart_meter.core.offset import SecureOffsetDB
+
+def test_import_builds_no_cloud_clients():
+    code = (
+        "import sys, carbon_smart_meter.core.mining, carbon_smart_meter.core.offset, "
+        "carbon_smart_meter.core.registration; "
+        "print(any(m.startswith(('azure', 'boto3')) for m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+def test_registry_shared_and_injected(local_clients):
+    energy_db = SecureEnergyDB(user_region="EU")
+    offset_db = SecureOffsetDB(user_region="EU")
+    assert energy_db.s3 is offset_db.s3
+    assert energy_db.blob_service is offset_db.blob_service is local_clients.blob_service
+
+    energy_db.insert(EnergyReading(
+        device_id=b"0" * 32, kwh=0.001, timestamp=1000000000,
+        verified=True, cable_type="type-c", user_region="EU"
+    ))
+    key = f"energy/{(b'0' * 32).hex()}/1000000000.json"
+    assert key in local_clients.s3().objects["ccm-energy-eu"]
+    assert key in local_clients.blob_service.blobs["energy-backup"]
+
+def test_registry_is_lazy():
+    built = []
+    registry = ClientRegistry(s3_factory=lambda region: built.append(region) or object())
+    db = SecureEnergyDB(user_region="EU", clients=registry)
+    assert built == []
+    assert db.s3 is registry.s3("eu-west-1")
+    assert built == ["eu-west-1"]
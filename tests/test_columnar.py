@@ -0,0 +1,60 @@
+# tests/test_columnar.py
+import struct
+import numpy as np
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.mining import EnergyProcessor, VIRPacket, vir_to_kwh
+from carbon_smart_meter.core.columnar import (
+    apply_daily_cap, apply_daily_cap_scalar, process_columns, vir_to_kwh_array
+)
+
+def test_vir_to_kwh_array_matches_scalar():
+    rng = np.random.default_rng(7)
+    voltage, current = rng.uniform(0, 40, 1000), rng.uniform(0, 6, 1000)
+    expected = [vir_to_kwh(v, c, 1.0) for v, c in zip(voltage, current)]
+    assert vir_to_kwh_array(voltage, current).tolist() == expected
+
+def test_process_columns_matches_energy_processor():
+    signing_key = SigningKey.generate()
+    keys = {}
+    device_ids, voltage, current, timestamps, packets = [], [], [], [], []
+    for n in range(3):
+        device_id = bytes([n]) + b"\x00" * 31
+        keys[device_id] = signing_key.verify_key.encode()
+        for t in range(12):
+            # ~0.25 kWh per sample at 900 kW: the cap is crossed mid-day
+            v, c, ts = 1000.0, 900.0 + n, 1000000000 + t * 3600
+            payload = device_id + struct.pack("<fffq", v, c, 1.0, ts)
+            packets.append(VIRPacket(
+                device_id=device_id, voltage=v, current=c, resistance=1.0,
+                timestamp=ts, signature=signing_key.sign(payload).signature
+            ))
+            device_ids.append(device_id); voltage.append(v); current.append(c); timestamps.append(ts)
+
+    processor = EnergyProcessor(user_region="EU")
+    readings = processor.process_batch(packets, keys.get)
+
+    usage = {}
+    allowed, accepted = process_columns(device_ids, voltage, current, timestamps, usage)
+
+    assert accepted.tolist() == [r is not None for r in readings]
+    assert allowed[accepted].tolist() == [r.kwh for r in readings if r is not None]
+    assert usage == processor.daily_usage.snapshot()
+
+def test_apply_daily_cap_edge_cases():
+    rng = np.random.default_rng(11)
+    devices = [bytes([d]) * 32 for d in range(4)]
+    for kwh in (
+        rng.choice([0.0, 0.25, 0.5, 0.75, 1e-17], 400),  # lands exactly on the cap
+        rng.uniform(-0.05, 0.2, 400),                     # negative samples: scalar fallback
+    ):
+        ids = [devices[i] for i in rng.integers(0, 4, 400)]
+        timestamps = 1000000000 + rng.integers(0, 2 * 86400, 400)
+        prior = {(devices[0], 1000000000 // 86400): 1.5}
+
+        expected_usage, usage = dict(prior), dict(prior)
+        expected = apply_daily_cap_scalar(ids, timestamps, kwh, expected_usage)
+        result = apply_daily_cap(ids, timestamps, kwh, usage)
+
+        assert result[1].tolist() == expected[1].tolist()
+        assert result[0].tolist() == expected[0].tolist()
+        assert usage == expected_usage
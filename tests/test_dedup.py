@@ -0,0 +1,128 @@
+# tests/test_dedup.py
+import struct
+import numpy as np
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.dedup import BloomFilter, ReplayGuard
+from carbon_smart_meter.core.mining import EnergyProcessor, VIRPacket
+from carbon_smart_meter.core.wire import frames_from_packets
+
+DEV = b"d" * 32
+T0 = 1_700_000_000
+
+def _packet(signing_key, timestamp, device_id=DEV):
+    payload = device_id + struct.pack("<fffq", 18.0, 2.5, 7.2, timestamp)
+    return VIRPacket(
+        device_id=device_id, voltage=18.0, current=2.5, resistance=7.2,
+        timestamp=timestamp, signature=signing_key.sign(payload).signature
+    )
+
+def test_window_out_of_order_and_duplicates():
+    guard = ReplayGuard()
+    assert guard.mark(DEV, T0 + 10)
+    assert guard.mark(DEV, T0 + 5)                  # late, inside the window
+    assert not guard.mark(DEV, T0 + 5)
+    assert not guard.mark(DEV, T0 + 10)
+    assert guard.check(DEV, T0 + 11) and guard.check(b"e" * 32, T0 + 10)
+    assert guard.stats == {"accepted": 2, "duplicates": 2, "stale": 0, "future": 0}
+
+def test_bloom_catches_replays_behind_the_window_and_old_days_are_stale():
+    guard = ReplayGuard(window=8)
+    for ts in range(T0, T0 + 100):
+        assert guard.mark(DEV, ts)
+    assert not guard.check(DEV, T0 + 3)             # far behind the window: answered by the Bloom filter
+    assert guard.check(DEV, T0 - 1)                 # never seen
+    guard.mark(DEV, T0 + 2 * 86400)                 # two days on: the first generation rotates out
+    assert not guard.mark(DEV, T0 - 1)
+    assert guard.stats["stale"] == 1
+    assert len(guard.filters) <= guard.generations
+
+def test_bloom_false_positive_rate_is_bounded():
+    bloom = BloomFilter.for_capacity(10_000, 1e-3)
+    for i in range(10_000):
+        bloom.add(i.to_bytes(8, "little"))
+    false_hits = sum(i.to_bytes(8, "little") in bloom for i in range(10_000, 30_000))
+    assert false_hits < 20_000 * 5e-3
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "guard.npz")
+    guard = ReplayGuard.open(path, window=16)
+    for ts in (T0, T0 + 1, T0 + 40):
+        guard.mark(DEV, ts)
+    guard.snapshot()
+    restored = ReplayGuard.open(path)
+    assert restored.window == 16 and restored.devices == guard.devices
+    assert not restored.check(DEV, T0) and not restored.check(DEV, T0 + 40)
+    assert restored.check(DEV, T0 + 2)
+
+def test_processor_rejects_replays_before_verify_and_forgeries_do_not_poison():
+    signing_key = SigningKey.generate()
+    public_key = signing_key.verify_key.encode()
+    processor = EnergyProcessor(user_region="EU", replay_guard=ReplayGuard())
+
+    forged = _packet(SigningKey.generate(), T0 + 500)
+    assert processor.process_packet(forged, public_key) is None
+    assert processor.replay_guard.check(DEV, T0 + 500)          # a bad signature records nothing
+
+    packet = _packet(signing_key, T0)
+    assert processor.process_packet(packet, public_key) is not None
+    used = processor.daily_usage.get((DEV, T0 // 86400))
+    assert processor.process_packet(packet, public_key) is None
+    assert processor.daily_usage.get((DEV, T0 // 86400)) == used
+
+    batch = [_packet(signing_key, T0), _packet(signing_key, T0 + 1), _packet(signing_key, T0 + 1)]
+    results = processor.process_frames(frames_from_packets(batch), {DEV: public_key}.get)
+    assert [r is not None for r in results] == [False, True, False]
+
+def test_future_dated_packets_cannot_make_other_devices_stale(tmp_path):
+    guard = ReplayGuard(clock=lambda: T0 + 60)
+    assert guard.mark(DEV, T0)
+    assert not guard.mark(b"e" * 32, T0 + 10_000 * 86400)
+    assert guard.stats["future"] == 1 and b"e" * 32 not in guard.devices
+    assert guard.check(b"f" * 32, T0 + 30) and guard.mark(b"f" * 32, T0 + 30)
+    assert guard.check_many([DEV, DEV], [T0 + 1, T0 + 400]) == [True, False]      # 400 s > MAX_CLOCK_SKEW ahead
+
+    guard.filters[T0 // 86400 + 10_000] = guard.filters[T0 // 86400]             # as an older snapshot could hold
+    guard.snapshot(str(tmp_path / "guard.npz"))
+    restored = ReplayGuard.load(str(tmp_path / "guard.npz"), clock=lambda: T0 + 60)
+    assert restored.latest_period == T0 // 86400
+    assert restored.mark(b"g" * 32, T0 + 40)
+
+def test_generation_grows_at_one_hertz_and_keeps_its_error_rate():
+    guard = ReplayGuard(window=8, capacity=1_000, error_rate=1e-3)
+    devices = [bytes([d]) * 32 for d in range(20)]
+    for ts in range(T0, T0 + 1_200, 2):                 # 20 devices at 0.5 Hz = 12,000 keys
+        for device_id in devices:
+            assert guard.mark(device_id, ts)
+    generation = guard.filters[T0 // 86400]
+    assert len(generation.filters) == 4 and generation.count == 12_000
+    assert 0 < guard.fill_ratio() <= 0.5
+
+    old_ids = [d for d in devices for _ in range(580)]
+    old_odd = [ts for _ in devices for ts in range(T0 + 1, T0 + 1_161, 2)]       # never sent, behind the window
+    fresh = guard.check_many(old_ids, old_odd)
+    assert fresh.count(False) < len(fresh) * 2e-3
+    old_even = [ts for _ in devices for ts in range(T0, T0 + 1_160, 2)]
+    assert guard.check_many(old_ids, old_even) == [False] * len(old_even)
+    sample = list(range(0, len(old_odd), 97))
+    assert [guard.check(old_ids[i], old_odd[i]) for i in sample] == [fresh[i] for i in sample]
+
+def test_grown_and_legacy_snapshots_load(tmp_path):
+    guard = ReplayGuard(window=8, capacity=100, error_rate=1e-3)
+    for ts in range(T0, T0 + 500):
+        guard.mark(DEV, ts)
+    guard.snapshot(str(tmp_path / "grown.npz"))
+    restored = ReplayGuard.load(str(tmp_path / "grown.npz"))
+    assert [b.count for b in restored.filters[T0 // 86400].filters] == [100, 200, 200]
+    assert not any(restored.check_many([DEV] * 490, list(range(T0, T0 + 490))))
+
+    legacy = BloomFilter.for_capacity(100, 1e-3)
+    legacy.add(DEV + (T0).to_bytes(8, "little", signed=True))
+    np.savez(str(tmp_path / "legacy.npz"),
+             config=np.array([8, 86400, 2, 100]), error_rate=np.array([1e-3]),
+             device_ids=np.frombuffer(DEV, dtype=np.uint8).reshape(1, -1),
+             watermarks=np.array([T0 + 100]), bitmaps=np.array([1], dtype=np.uint64),
+             periods=np.array([T0 // 86400]), filters=np.frombuffer(legacy.bits, dtype=np.uint8).reshape(1, -1),
+             filter_shape=np.array([[legacy.size, legacy.hashes]]))
+    old = ReplayGuard.load(str(tmp_path / "legacy.npz"))
+    assert not old.check(DEV, T0) and old.mark(DEV, T0 + 1)
+    assert len(old.filters[T0 // 86400].filters) == 2         # the legacy filter counts as full
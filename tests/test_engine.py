@@ -0,0 +1,72 @@
+# tests/test_engine.py
+import struct
+import pytest
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.clients import ClientRegistry
+from carbon_smart_meter.core.engine import ShardDiedError, ShardedIngestEngine
+from carbon_smart_meter.core.mining import EnergyProcessor, VIRPacket
+from carbon_smart_meter.core.wire import encode_packet
+
+SIGNING_KEY = SigningKey.generate()
+KEYS = {bytes([n]) * 32: SIGNING_KEY.verify_key.encode() for n in range(6)}
+
+def _local_processor():
+    return EnergyProcessor(user_region="EU", clients=ClientRegistry.local())
+
+def _packet(device_id, timestamp):
+    # ~0.2 kWh per sample, so every device hits the daily cap part way through
+    payload = device_id + struct.pack("<fffq", 800.0, 900.0, 1.0, timestamp)
+    return VIRPacket(
+        device_id=device_id, voltage=800.0, current=900.0, resistance=1.0,
+        timestamp=timestamp, signature=SIGNING_KEY.sign(payload).signature
+    )
+
+def test_sharded_engine_matches_single_processor():
+    packets = [_packet(device_id, 1000000000 + t) for t in range(12) for device_id in KEYS]
+
+    expected = _local_processor().process_batch(packets, KEYS.get)
+
+    with ShardedIngestEngine(KEYS.get, workers=3, processor_factory=_local_processor, batch_frames=4) as engine:
+        for packet in packets:
+            engine.submit(encode_packet(packet))
+        results = list(engine.results())
+
+    assert len(results) == len(packets)
+    for device_id in KEYS:
+        got = [(r.timestamp, r.kwh) for r in results if r.device_id == device_id]
+        want = [
+            (p.timestamp, reading.kwh if reading else None)
+            for p, reading in zip(packets, expected) if p.device_id == device_id
+        ]
+        assert got == want
+
+def _dying_processor():
+    raise SystemExit(3)
+
+def _broken(*args, **kwargs):
+    raise RuntimeError("storage down")
+
+def _failing_processor():
+    processor = _local_processor()
+    processor.process_frames = _broken
+    return processor
+
+def test_bad_frames_and_dead_workers_raise_instead_of_hanging():
+    with ShardedIngestEngine(KEYS.get, workers=2, processor_factory=_local_processor, batch_frames=2) as engine:
+        with pytest.raises(ValueError):
+            engine.submit(b"\0" * 10)
+        frame = encode_packet(_packet(bytes([1]) * 32, 1000000000))
+        engine.submit(frame[:-1] + bytes([frame[-1] ^ 1]))         # bad signature: rejected, worker lives
+        assert [r.accepted for r in engine.results()] == [False]
+
+    with ShardedIngestEngine(KEYS.get, workers=1, processor_factory=_failing_processor) as engine:
+        engine.submit(encode_packet(_packet(bytes([1]) * 32, 1000000000)))
+        engine.submit(encode_packet(_packet(bytes([2]) * 32, 1000000000)))
+        assert [r.kwh for r in engine.results()] == [None, None]     # batch rejected, worker still up
+
+    engine = ShardedIngestEngine(KEYS.get, workers=1, processor_factory=_dying_processor)
+    engine.submit(encode_packet(_packet(bytes([1]) * 32, 1000000000)))
+    with pytest.raises(ShardDiedError):
+        list(engine.results())
+    with pytest.raises(ShardDiedError):
+        engine.close()
@@ -0,0 +1,101 @@
+# tests/test_gateway.py
+import asyncio
+import pytest
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.dedup import ReplayGuard
+from carbon_smart_meter.core.gateway import (
+    GatewayBatch, GatewayRegistry, build_gateway_batch, gateway_batch_from_record, pack_sample,
+    verify_gateway_batch, verify_inclusion_proof,
+)
+from carbon_smart_meter.core.merkle import audit_path, leaf_hash, merkle_root, verify_inclusion
+from carbon_smart_meter.core.mining import EnergyProcessor
+from carbon_smart_meter.core.server import ACK_ACCEPTED, ACK_REJECTED, IngestClient, IngestServer
+from carbon_smart_meter.core.storage import decode_records
+
+GATEWAY = b"G" * 32
+PANELS = [bytes([i]) * 32 for i in range(1, 6)]
+
+def _batch(signing_key, seq=1, panels=PANELS, ts=1_000_000_000):
+    samples = [pack_sample(p, 18.0, 2.0, 9.0, ts) for p in panels]
+    return build_gateway_batch(signing_key, GATEWAY, seq, samples)
+
+def _registry(signing_key):
+    registry = GatewayRegistry()
+    registry.register(GATEWAY, signing_key.verify_key.encode(), PANELS)
+    return registry
+
+def test_audit_path_roundtrip_all_sizes():
+    for n in range(1, 34):
+        leaves = [bytes([i]) * 3 for i in range(n)]
+        hashes = [leaf_hash(leaf) for leaf in leaves]
+        root = merkle_root(leaves)
+        for i in range(n):
+            path = audit_path(hashes, i)
+            assert verify_inclusion(hashes[i], i, n, path, root)
+            assert not verify_inclusion(leaf_hash(b"other"), i, n, path, root)
+            assert not verify_inclusion(hashes[i], n, n, path, root)
+            if n > 1:
+                assert not verify_inclusion(hashes[i], (i + 1) % n, n, path, root)
+
+def test_one_signature_covers_the_batch():
+    key = SigningKey.generate()
+    batch = GatewayBatch(_batch(key, panels=PANELS + [b"x" * 32]))
+    assert verify_gateway_batch(batch, _registry(key)) == [True] * 5 + [False]     # x is not this gateway's panel
+
+    assert verify_gateway_batch(batch, _registry(SigningKey.generate())) == [False] * 6
+    tampered = bytearray(_batch(key))
+    tampered[-20] ^= 1                                                          # any sample byte breaks the root
+    assert verify_gateway_batch(GatewayBatch(tampered), _registry(key)) == [False] * 5
+    with pytest.raises(ValueError):
+        GatewayBatch(_batch(key)[:-1])
+
+def test_registry_rejects_reused_seq_and_storage_keeps_both_batches():
+    key = SigningKey.generate()
+    registry = _registry(key)
+    first, reused = _batch(key, seq=7), _batch(key, seq=7, ts=1_000_000_050)
+    assert verify_gateway_batch(GatewayBatch(_batch(SigningKey.generate(), seq=9)), registry) == [False] * 5
+    assert verify_gateway_batch(GatewayBatch(first), registry) == [True] * 5     # the forged seq 9 recorded nothing
+    assert verify_gateway_batch(GatewayBatch(reused), registry) == [False] * 5
+    assert verify_gateway_batch(GatewayBatch(_batch(key, seq=6)), registry) == [False] * 5
+    assert registry.stats["stale_seq"] == 2 and registry.last_seq(GATEWAY) == 7
+
+    processor = EnergyProcessor(user_region="EU")
+    processor.process_gateway_batch(first, registry)                # seq 7 already accepted
+    processor.process_gateway_batch(first, _registry(key))          # e.g. after a restart lost the registry
+    processor.process_gateway_batch(reused, _registry(key))
+    stored = [k for k in processor.db.s3.objects[processor.db.aws_bucket] if k.startswith("gateway-batch/")]
+    assert len(stored) == 2
+
+def test_processor_accepts_stores_and_proves():
+    key = SigningKey.generate()
+    processor = EnergyProcessor(user_region="EU", replay_guard=ReplayGuard())
+    data = _batch(key)
+    readings = processor.process_gateway_batch(data, _registry(key))
+    assert [r.device_id for r in readings] == PANELS
+    assert processor.process_gateway_batch(data, _registry(key)) == [None] * 5      # replayed batch
+
+    s3 = processor.db.s3
+    key_name = f"gateway-batch/{GATEWAY.hex()}/1-{GatewayBatch(data).root[:8].hex()}.json"
+    record = next(decode_records(key_name, s3.get_object(Bucket=processor.db.aws_bucket, Key=key_name)["Body"].read()))
+    proof = gateway_batch_from_record(record).proof(3)
+    assert proof.sample[:32] == PANELS[3]
+    assert verify_inclusion_proof(proof, key.verify_key.encode())
+    assert not verify_inclusion_proof(proof._replace(sample=pack_sample(PANELS[3], 99.0, 2.0, 9.0, 1)), key.verify_key.encode())
+    assert not verify_inclusion_proof(proof, SigningKey.generate().verify_key.encode())
+
+def test_server_gateway_batches():
+    key = SigningKey.generate()
+
+    async def scenario():
+        server = IngestServer(EnergyProcessor(user_region="EU"), {}.get, gateways=_registry(key))
+        await server.start()
+        client = await IngestClient.connect(port=server.port)
+        good = await client.send_gateway_batch(_batch(key, seq=1))
+        forged = await client.send_gateway_batch(_batch(SigningKey.generate(), seq=2, ts=1_000_000_001))
+        await client.close()
+        await server.close()
+        return good, forged
+
+    good, forged = asyncio.run(scenario())
+    assert good == bytes([ACK_ACCEPTED] * 5)
+    assert forged == bytes([ACK_REJECTED] * 5)
@@ -0,0 +1,51 @@
+# tests/test_grid.py
+import os
+import numpy as np
+from carbon_smart_meter.core.grid import GridIntensityTable
+from carbon_smart_meter.core.offset import OffsetEngine, SecureOffsetDB
+
+H = 3600
+T0 = 1_704_067_200   # 2024-01-01
+
+def _write_csv(path):
+    with open(path, "w") as f:
+        f.write("region,start,intensity\n")
+        for h in range(48):
+            f.write(f"eu,{T0 + h * H},{round(0.2 + h / 1000, 3)}\n")                     # hourly
+        for month, start in enumerate([T0, T0 + 31 * 86400, T0 + 60 * 86400]):
+            f.write(f"NZ,{start},{round(0.1 + month / 100, 2)}\n")                       # monthly
+
+def test_lookup_scalar_and_vector(tmp_path):
+    path = str(tmp_path / "grid.csv")
+    _write_csv(path)
+    table = GridIntensityTable.from_csv(path)
+    assert isinstance(table.values, np.memmap)
+
+    assert table.intensity("EU", T0 + 5 * H + 10) == 0.205
+    assert table.intensity("eu", T0 - 1) == 0.296             # before the series: static
+    assert table.intensity("EU", T0 + 48 * H) == 0.296        # after the last hour
+    assert table.intensity("NZ", T0 + 40 * 86400) == 0.11     # February
+    assert table.intensity("US", T0) == 0.385
+    assert table.intensity("Atlantis", T0) == 0.45
+
+    timestamps = np.array([T0 - 1, T0 + 3 * H, T0 + 47 * H + 1, T0 + 90 * 86400])
+    for region in ("EU", "NZ", "XX"):
+        expected = [table.intensity(region, int(t)) for t in timestamps]
+        assert table.intensities(region, timestamps).tolist() == expected
+    assert table.co2_avoided([2.0, 1.0], [T0, T0 + H], "EU").tolist() == [0.4, 0.201]
+
+def test_cache_rebuilt_when_csv_changes(tmp_path):
+    path = str(tmp_path / "grid.csv")
+    _write_csv(path)
+    GridIntensityTable.from_csv(path)
+    assert os.path.exists(path + ".npycache/values.npy")
+    with open(path, "a") as f:
+        f.write("SG,0,0.5\n")
+    assert GridIntensityTable.from_csv(path).intensity("SG", T0) == 0.5
+
+def test_offset_engine_uses_hourly_series(tmp_path):
+    path = str(tmp_path / "grid.csv")
+    _write_csv(path)
+    engine = OffsetEngine(SecureOffsetDB("EU"), grid=GridIntensityTable.from_csv(path))
+    assert engine.process_verified_reading(b"0" * 32, "w", 10.0, T0 + 10 * H, "eu").co2_kg == 2.1
+    assert engine.calculate_co2_avoided(10.0, "EU") == 2.96
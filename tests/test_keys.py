@@ -0,0 +1,66 @@
+# tests/test_keys.py
+import struct
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.keys import DeviceKeyResolver
+from carbon_smart_meter.core.mining import EnergyProcessor, VIRPacket
+from carbon_smart_meter.core.registration import (
+    DeviceRegistrationRequest, MockRegistrationDB, RegistrationManager
+)
+
+class _Clock:
+    now = 0.0
+    def __call__(self):
+        return self.now
+
+def _register(manager, device_byte, wallet):
+    signing_key = SigningKey.generate()
+    device_id = bytes([device_byte]) * 32
+    manager.register_device(DeviceRegistrationRequest(
+        device_id=device_id, public_key=signing_key.verify_key.encode(),
+        signature=signing_key.sign(device_id).signature, wallet_address=wallet
+    ))
+    return device_id, signing_key
+
+def test_resolver_caches_with_ttl_and_counts():
+    db = MockRegistrationDB()
+    clock = _Clock()
+    resolver = DeviceKeyResolver(db, ttl=10, negative_ttl=1, clock=clock)
+    manager = RegistrationManager(db, resolver)
+
+    assert resolver.resolve(b"9" * 32) is None
+    device_id, signing_key = _register(manager, 1, "wallet-1")
+    entry = resolver.resolve(device_id)
+    assert entry.wallet_address == "wallet-1"
+    assert resolver.verify_key(device_id) is entry.verify_key      # built once
+    assert resolver(device_id) == signing_key.verify_key.encode()
+    assert manager.get_binding(device_id).wallet_address == "wallet-1"
+
+    clock.now = 11
+    resolver.resolve(device_id)
+    metrics = resolver.metrics()
+    assert metrics["expired"] == 1
+    assert metrics["hits"] == 3 and metrics["misses"] == 3
+
+def test_resolver_is_bounded():
+    db = MockRegistrationDB()
+    resolver = DeviceKeyResolver(db, maxsize=2)
+    for i in range(5):
+        resolver.resolve(bytes([i]) * 32)
+    assert len(resolver) == 2 and resolver.stats["evicted"] == 3
+
+def test_processor_uses_resolver():
+    db = MockRegistrationDB()
+    resolver = DeviceKeyResolver(db)
+    device_id, signing_key = _register(RegistrationManager(db, resolver), 7, "wallet-7")
+    processor = EnergyProcessor(resolver=resolver)
+
+    packets = []
+    for t in range(3):
+        payload = device_id + struct.pack("<fffq", 12.0, 1.0, 12.0, 1_000_000_000 + t)
+        packets.append(VIRPacket(
+            device_id=device_id, voltage=12.0, current=1.0, resistance=12.0,
+            timestamp=1_000_000_000 + t, signature=signing_key.sign(payload).signature
+        ))
+    assert processor.process_packet(packets[0]) is not None
+    assert all(r is not None for r in processor.process_batch(packets[1:]))
+    assert resolver.stats["misses"] == 1
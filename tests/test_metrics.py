@@ -0,0 +1,86 @@
+# tests/test_metrics.py
+import gc
+import struct
+import pytest
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.metrics import MetricsRegistry, metrics
+from carbon_smart_meter.core.mining import EnergyProcessor, VIRPacket
+from carbon_smart_meter.core.offset import OffsetEngine, SecureOffsetDB
+
+@pytest.fixture
+def enabled():
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+
+def _packet(signing_key, device_id, timestamp, voltage=1000.0, current=2000.0):
+    payload = device_id + struct.pack("<fffq", voltage, current, 12.0, timestamp)
+    return VIRPacket(
+        device_id=device_id, voltage=voltage, current=current, resistance=12.0,
+        timestamp=timestamp, signature=signing_key.sign(payload).signature
+    )
+
+def _value(name, labels=None):
+    metric = metrics.get(name)
+    return (metric.labels(**labels) if labels else metric).value
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry(enabled=True)
+    latency = registry.histogram("demo_seconds", "Demo latency", ["leg"], buckets=(0.1, 1.0))
+    latency.labels(leg="aws").observe(0.05)
+    latency.labels(leg="aws").observe(0.5)
+    registry.counter("demo_errors", "Demo errors").inc(3)
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{leg="aws",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{leg="aws",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{leg="aws"} 2' in text
+    assert "demo_errors_total 3" in text
+    with pytest.raises(ValueError):
+        registry.gauge("demo_errors", "clash")
+
+def test_gauge_tracks_live_owners():
+    class Queue:
+        depth = 4
+    registry = MetricsRegistry()
+    gauge = registry.gauge("depth", "Queue depth", ["queue"]).labels(queue="q")
+    a, b = Queue(), Queue()
+    gauge.track(a, lambda q: q.depth)
+    gauge.track(b, lambda q: q.depth)
+    assert gauge.get() == 8
+    del b
+    gc.collect()
+    assert gauge.get() == 4
+
+def test_pipeline_counters(enabled):
+    signing_key = SigningKey.generate()
+    public_key = signing_key.verify_key.encode()
+    device_id = b"m" * 32
+    processor = EnergyProcessor(user_region="EU")
+
+    rejected = _value("csm_signatures", {"result": "rejected"})
+    clips = _value("csm_cap_clips")
+    cap_rejections = _value("csm_cap_rejections")
+
+    bad = _packet(SigningKey.generate(), device_id, 1000)
+    assert processor.process_packet(bad, public_key) is None
+    for ts in range(1000, 1004):                     # 0.556 kWh each against a 1.5 kWh cap
+        processor.process_packet(_packet(signing_key, device_id, ts), public_key)
+
+    assert _value("csm_signatures", {"result": "rejected"}) == rejected + 1
+    assert _value("csm_cap_clips") == clips + 1
+    assert _value("csm_cap_rejections") == cap_rejections + 1
+
+    engine = OffsetEngine(SecureOffsetDB("EU"))
+    engine.process_verified_reading(device_id, "wallet", 1.0, 1000, "EU")
+    text = metrics.render()
+    assert 'csm_store_put_seconds_count{store="ccm-offsets-eu",leg="aws"}' in text
+    assert 'csm_store_put_seconds_count{store="ccm-offsets-eu",leg="azure"}' in text
+    assert metrics.get("csm_offset_process_seconds").count >= 1
+
+def test_disabled_registry_records_nothing():
+    processor = EnergyProcessor(user_region="EU")
+    signing_key = SigningKey.generate()
+    before = metrics.get("csm_vir_to_kwh_seconds").count
+    processor.process_packet(_packet(signing_key, b"n" * 32, 1000), signing_key.verify_key.encode())
+    assert metrics.get("csm_vir_to_kwh_seconds").count == before
@@ -37,4 +37,51 @@ def test_daily_cap_enforced():
         )
         processor.process_packet(packet, public_key, "type-c")
 
-    assert processor.daily_usage.get((device_id, 1000000000 // 86400), 0) <= 9.0
\ No newline at end of file
+    assert processor.daily_usage.get((device_id, 1000000000 // 86400), 0) <= 9.0
+
+class _MemoryDB:
+    def __init__(self):
+        self.rows = []
+
+    def insert(self, reading):
+        self.rows.append(reading)
+
+
+def _signed_packet(signing_key, device_id, timestamp, voltage=12.0, current=1.0):
+    payload = device_id + struct.pack("<fffq", voltage, current, 12.0, timestamp)
+    return VIRPacket(
+        device_id=device_id,
+        voltage=voltage, current=current, resistance=12.0,
+        timestamp=timestamp,
+        signature=signing_key.sign(payload).signature
+    )
+
+def test_process_batch_matches_verify_packet():
+    from carbon_smart_meter.core.mining import verify_packet, verify_batch
+
+    keys = {}
+    packets = []
+    for n in range(4):
+        signing_key = SigningKey.generate()
+        device_id = bytes([n]) * 32
+        keys[device_id] = signing_key.verify_key.encode()
+        packets += [_signed_packet(signing_key, device_id, 1000000000 + t) for t in range(50)]
+
+    # Tamper with one packet, and include one from an unregistered device
+    packets[7] = packets[7].model_copy(update={"voltage": 99.0})
+    packets.append(_signed_packet(SigningKey.generate(), b"9" * 32, 1000000000))
+
+    expected = [verify_packet(p, keys[p.device_id]) if p.device_id in keys else False for p in packets]
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert verify_batch(packets, keys.get, executor=pool) == expected
+    assert verify_batch(packets, keys.get) == expected
+
+    processor = EnergyProcessor(user_region="EU")
+    processor.db = _MemoryDB()
+    results = processor.process_batch(packets, keys.get, "type-c")
+
+    assert [r is not None for r in results] == expected
+    assert len(processor.db.rows) == sum(expected)
+    assert len(processor.key_cache) == 4
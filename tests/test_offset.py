@@ -1,4 +1,5 @@
 # tests/test_offset.py
+import pytest
 from carbon_smart_meter.core.offset import OffsetEngine, SecureOffsetDB
 
 def test_offset_calculation():
@@ -21,4 +22,15 @@ def test_offset_calculation():
         timestamp=1000000001,
         region="CN"
     )
-    assert record2.co2_kg == 1.71  # 3 * 0.57
\ No newline at end of file
+    assert record2.co2_kg == 1.71  # 3 * 0.57
+
+def test_out_of_horizon_timestamps_are_not_stored():
+    db = SecureOffsetDB(user_region="EU")
+    engine = OffsetEngine(db)
+    with pytest.raises(ValueError):
+        engine.process_verified_reading(b"1" * 32, "w", 1.0, -86400, "NZ")
+    records = engine.process_batch([b"1" * 32] * 3, [1.0] * 3, [1000000000, 2**16 * 86400, -1], "NZ", ["w"] * 3)
+    db.flush()
+    assert [r is not None for r in records] == [True, False, False]
+    assert len(db.s3.objects["ccm-offsets-eu"]) == 1
+    assert engine.index.records == 1
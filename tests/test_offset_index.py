@@ -0,0 +1,52 @@
+# tests/test_offset_index.py
+import random
+from carbon_smart_meter.core.offset import OffsetEngine, OffsetRecord, SecureOffsetDB
+from carbon_smart_meter.core.offset_index import OffsetIndex, SparseFenwick
+
+DAY = 86400
+T0 = 20_000 * DAY
+
+def test_fenwick_range_matches_brute_force():
+    rng = random.Random(3)
+    tree, days = SparseFenwick(), {}
+    for _ in range(500):
+        day = rng.randrange(19_900, 20_100)
+        tree.add(day, 1.0, 2.0)
+        days[day] = days.get(day, 0) + 1
+    for _ in range(50):
+        lo = rng.randrange(19_850, 20_150)
+        hi = lo + rng.randrange(0, 100)
+        expected = sum(n for d, n in days.items() if lo <= d <= hi)
+        assert tree.range(lo, hi) == (expected, 2.0 * expected)
+
+def test_engine_totals_ranges_and_leaderboard():
+    engine = OffsetEngine(SecureOffsetDB("EU"))
+    for day in range(40):
+        engine.process_verified_reading(b"a" * 32, "alice", 1.0, T0 + day * DAY, "NZ")
+        engine.process_verified_reading(b"b" * 32, "alice", 2.0, T0 + day * DAY, "NZ")
+        engine.process_verified_reading(b"c" * 32, "bob", 1.0, T0 + day * DAY, "IN")
+
+    totals = engine.get_totals(b"a" * 32)
+    assert round(totals.device_co2_kg, 6) == round(40 * 0.11, 6)
+    assert round(totals.wallet_co2_kg, 6) == round(40 * 0.33, 6)
+    last30 = engine.index.last_days("wallet", "alice", 30, now=T0 + 39 * DAY)
+    assert round(last30.kwh, 6) == 90.0
+    assert [key for key, _ in engine.index.top("wallet")] == ["bob", "alice"]   # 0.71 vs 0.33 kg/day
+    assert engine.index.top("region", 1, T0 // DAY, T0 // DAY)[0][0] == "IN"
+
+def test_checkpoint_then_replay_only_new_records(tmp_path):
+    db = SecureOffsetDB("EU")
+    engine = OffsetEngine(db)
+    for i in range(5):
+        engine.process_verified_reading(b"a" * 32, "alice", 1.0, T0 + i, "EU")
+    path = str(tmp_path / "offsets.json")
+    engine.checkpoint(path)
+    for i in range(5, 8):   # stored after the checkpoint, then the process dies
+        engine.process_verified_reading(b"a" * 32, "alice", 1.0, T0 + i, "EU")
+
+    restarted = OffsetEngine(db)
+    assert restarted.restore(path) == 3
+    assert restarted.index.records == 8
+    assert round(restarted.index.total("wallet", "alice").kwh, 6) == 8.0
+    assert restarted.index.replay(db) == 0
+    assert OffsetIndex.load(str(tmp_path / "missing.json")).records == 0
@@ -0,0 +1,43 @@
+# tests/test_records.py
+import json
+from carbon_smart_meter.core.mining import EnergyReading
+from carbon_smart_meter.core.offset import OffsetEngine, OffsetRecord, SecureOffsetDB, offset_from_record
+from carbon_smart_meter.core.records import (
+    DeviceIdPool, Offset, Reading, device_id_from_json, intern_device_id, reading_to_json,
+)
+
+def test_interning_shares_one_object():
+    a = intern_device_id(bytes(b"z" * 32))
+    assert intern_device_id(bytes(b"z" * 32)) is a
+    pool = DeviceIdPool(maxsize=2)
+    for i in range(5):
+        pool.intern(bytes([i]) * 32)
+    assert len(pool) <= 2
+
+def test_records_match_models():
+    reading = Reading(b"0" * 32, 0.25, 1000, True, "type-c", "EU")
+    model = reading.to_model()
+    assert isinstance(model, EnergyReading) and model.kwh == 0.25
+    assert json.loads(reading_to_json(reading)) == {**json.loads(model.model_dump_json()), "device_id": "30" * 32}
+
+    engine = OffsetEngine(SecureOffsetDB("EU"))
+    offset = engine.process_verified_reading(bytes(b"1" * 32), "w", 2.0, 1000, "nz", records=True)
+    assert offset.device_id is intern_device_id(b"1" * 32)
+    assert isinstance(offset.to_model(), OffsetRecord)
+    stored = engine.db.s3.objects["ccm-offsets-eu"]
+    assert offset_from_record(json.loads(next(iter(stored.values())))) == offset
+
+def test_public_api_returns_models():
+    engine = OffsetEngine(SecureOffsetDB("EU"))
+    offset = engine.process_verified_reading(b"2" * 32, "w", 2.0, 1000, "nz")
+    assert isinstance(offset, OffsetRecord) and offset.co2_kg == 0.22
+    assert all(isinstance(r, OffsetRecord) for r in engine.process_batch([b"2" * 32], [1.0], [1000], "NZ", ["w"]))
+    assert isinstance(engine.process_batch([b"2" * 32], [1.0], [1000], "NZ", ["w"], records=True)[0], Offset)
+
+def test_stored_ids_are_hex_with_utf8_fallback():
+    assert device_id_from_json((b"0" * 32).hex()) == b"0" * 32
+    assert device_id_from_json("0" * 32) == b"0" * 32            # legacy utf-8 id made of hex digits
+    assert device_id_from_json("ab" * 32) == b"\xab" * 32
+    assert device_id_from_json("z" * 64) == b"z" * 64
+    record = {"device_id": "0" * 32, "wallet_address": "w", "kwh": 1.0, "co2_kg": 0.1, "region": "NZ", "timestamp": 1}
+    assert offset_from_record(record).device_id == b"0" * 32
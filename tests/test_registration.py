@@ -13,4 +13,58 @@ def test_device_registration():
     assert binding.wallet_address == "9vA1B2cD..."
 
     # Duplicate fails
-    assert manager.register_device(request) is None
\ No newline at end of file
+    assert manager.register_device(request) is None
+
+import threading
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.registration import (
+    DeviceRegistrationRequest, SecureRegistrationDB
+)
+
+def _request(device_byte, wallet, signing_key=None):
+    signing_key = signing_key or SigningKey.generate()
+    device_id = bytes([device_byte]) * 32
+    return DeviceRegistrationRequest(
+        device_id=device_id, public_key=signing_key.verify_key.encode(),
+        signature=signing_key.sign(device_id).signature, wallet_address=wallet
+    )
+
+def test_unique_indexes_on_key_and_wallet():
+    db = SecureRegistrationDB("EU")
+    manager = RegistrationManager(db)
+    signing_key = SigningKey.generate()
+
+    assert manager.register_device(_request(1, "wallet-a", signing_key)) is not None
+    assert manager.register_device(_request(2, "wallet-b", signing_key)) is None   # key reuse
+    assert manager.register_device(_request(3, "wallet-a")) is None                # wallet reuse
+    assert db.exists(public_key=signing_key.verify_key.encode())
+    assert manager.is_wallet_bound("wallet-a") and not manager.is_wallet_bound("wallet-b")
+
+def test_concurrent_registrations_bind_once():
+    manager = RegistrationManager(SecureRegistrationDB("EU"))
+    requests = [_request(i, "shared-wallet") for i in range(16)]
+    results = [None] * len(requests)
+
+    def register(i):
+        results[i] = manager.register_device(requests[i])
+
+    threads = [threading.Thread(target=register, args=(i,)) for i in range(len(requests))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(r is not None for r in results) == 1
+
+def test_warm_load_rebuilds_index():
+    for write_behind in (False, True):
+        db = SecureRegistrationDB("EU", write_behind=write_behind)
+        manager = RegistrationManager(db)
+        for i in range(5):
+            manager.register_device(_request(i, f"wallet-{write_behind}-{i}"))
+        db.flush()
+
+        fresh = SecureRegistrationDB("EU")
+        assert fresh.warm_load(page_size=2) >= 5
+        assert fresh.wallet_in_use(f"wallet-{write_behind}-3")
+        assert fresh.get(bytes([3]) * 32) == db.get(bytes([3]) * 32)
+        db.close()
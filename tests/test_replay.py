@@ -0,0 +1,86 @@
+# tests/test_replay.py
+from carbon_smart_meter.core.aggregation import EnergyAggregate
+from carbon_smart_meter.core.clients import ClientRegistry
+from carbon_smart_meter.core.mining import EnergyReading, SecureEnergyDB
+from carbon_smart_meter.core.offset import OffsetEngine, SecureOffsetDB
+from carbon_smart_meter.core.replay import ReplayJob
+
+T0 = 1_700_000_000
+
+def _store(clients, devices=6, samples=20):
+    db = SecureEnergyDB("EU", clients=clients)
+    compacted = SecureEnergyDB("EU", clients=clients, write_behind=True)
+    for d in range(devices):
+        device_id = (b"%02d" % d) * 16
+        target = compacted if d % 2 else db
+        for t in range(samples):
+            target.insert(EnergyReading(
+                device_id=device_id, kwh=0.001 * (t + 1), timestamp=T0 + t,
+                verified=True, cable_type="type-c", user_region="EU"
+            ))
+    compacted.close()
+    return db
+
+def test_replay_from_local_directory_is_resumable(tmp_path):
+    clients = ClientRegistry.local(root=str(tmp_path / "s3"))
+    source = _store(clients)
+    wallet = lambda device_id: "wallet-" + device_id[:2].decode()
+
+    full = OffsetEngine(SecureOffsetDB("EU", clients=clients))
+    stats = ReplayJob(source, full, "NZ", batch_size=7, workers=4, max_inflight=3, wallet_lookup=wallet).run()
+    assert stats["records"] == stats["offsets"] == 120
+    assert stats["records_per_sec"] > 0
+
+    checkpoint = str(tmp_path / "replay.json")
+    resumed = OffsetEngine(SecureOffsetDB("EU", clients=clients))
+    first = ReplayJob(source, resumed, "NZ", checkpoint_path=checkpoint, batch_size=7, wallet_lookup=wallet)
+    first.run(max_objects=25)
+    assert first.stats["checkpoints"] == 1                 # once at the end, not per batch of 7
+    second = ReplayJob(source, resumed, "NZ", checkpoint_path=checkpoint, batch_size=7, wallet_lookup=wallet)
+    second.run()
+
+    assert first.stats["records"] + second.stats["records"] == 120
+    for d in range(6):
+        device = (b"%02d" % d) * 16
+        assert resumed.get_totals(device) == full.get_totals(device)
+    assert ReplayJob(source, resumed, "NZ", checkpoint_path=checkpoint).run()["records"] == 0
+
+def test_unknown_wallets_are_skipped(tmp_path):
+    clients = ClientRegistry.local(root=str(tmp_path / "s3"))
+    source = _store(clients, devices=2, samples=3)
+    stats = ReplayJob(source, OffsetEngine(SecureOffsetDB("EU", clients=clients)), "EU").run()
+    assert stats["skipped"] == 6 and stats["offsets"] == 0
+
+def test_replay_is_idempotent_and_includes_aggregates(tmp_path):
+    clients = ClientRegistry.local(root=str(tmp_path / "s3"))
+    source = _store(clients, devices=2, samples=3)
+    source.insert_aggregate(EnergyAggregate(
+        device_id=b"a" * 32, window_start=T0, window_seconds=60, kwh=0.5, samples=2, first_ts=T0,
+        last_ts=T0 + 1, out_of_order=0, merkle_root="00" * 32, cable_type="type-c", user_region="EU",
+        leaves=[b"x", b"y"],
+    ))
+    wallet = lambda device_id: "w"
+    engine = OffsetEngine(SecureOffsetDB("EU", clients=clients))
+    once = ReplayJob(source, engine, "NZ", wallet_lookup=wallet).run()
+    assert once["records"] == 7
+    totals = engine.get_totals(b"a" * 32, "w")
+    assert totals.device_co2_kg > 0
+
+    ReplayJob(source, engine, "NZ", wallet_lookup=wallet).run()        # into the now-live engine
+    assert engine.get_totals(b"a" * 32, "w") == totals
+    assert engine.index.records == 7
+
+def test_replay_does_not_store_offsets_again(tmp_path):
+    clients = ClientRegistry.local(root=str(tmp_path / "s3"))
+    source = _store(clients, devices=2, samples=3)
+    db = SecureOffsetDB("EU", clients=clients, write_behind=True)
+    engine = OffsetEngine(db)
+    ReplayJob(source, engine, "NZ", wallet_lookup=lambda device_id: "w").run()
+    path = str(tmp_path / "index.json")
+    engine.checkpoint(path)
+    db.close()
+
+    listing = db.s3.list_objects_v2(Bucket=db.aws_bucket, Prefix="offsets/")
+    assert not listing.get("Contents")
+    restored = OffsetEngine(SecureOffsetDB("EU", clients=clients))
+    assert restored.restore(path) == 0 and restored.index.records == 6
@@ -0,0 +1,72 @@
+# tests/test_rewards.py
+import random
+import numpy as np
+from carbon_smart_meter.blockchain.batching import KwhRecord, encode_batch
+from carbon_smart_meter.blockchain.rewards import (
+    BASE_REWARD_PER_KWH, HALVING_INTERVAL, RewardEngine, base_reward_at, base_rewards_at, capped_milli,
+    project_rewards, reward_rate, reward_rates,
+)
+
+GENESIS = 1_700_000_000
+
+def test_reward_rate_hand_computed():
+    base = BASE_REWARD_PER_KWH
+    assert reward_rate(base, 0) == 50_000_000                       # no market cap → scaling 1
+    assert reward_rate(base, 1_000_000_000_000) == 50_000_000       # 1e12 / 1e12 = 1
+    assert reward_rate(base, 1_500_000_000_000) == 25_000_000       # 1e12 / 1.5e12 = 0 → floor 0.5x
+    assert reward_rate(base, 600_000_000_000) == 50_000_000         # 1e12 / 6e11 = 1
+    assert reward_rate(base, 400_000_000_000) == 100_000_000        # 2 → 1e8, ceiling 2x
+    assert reward_rate(base, 1) == 100_000_000                      # 5e19 wraps in u64, still clamped
+    assert reward_rate(390_625, 2_000_000_000_000) == 195_312        # 390625 * 50 / 100, floored
+
+def test_halving_schedule():
+    assert base_reward_at(GENESIS, GENESIS) == 50_000_000
+    assert base_reward_at(GENESIS + HALVING_INTERVAL - 1, GENESIS) == 50_000_000
+    assert base_reward_at(GENESIS + HALVING_INTERVAL, GENESIS) == 25_000_000
+    assert base_reward_at(GENESIS + 7 * HALVING_INTERVAL, GENESIS) == 390_625
+    assert base_reward_at(GENESIS - 10, GENESIS) == 50_000_000
+
+def test_process_batch_cap_and_rounding():
+    engine = RewardEngine(base_reward=390_625, market_cap=2_000_000_000_000)
+    a, b = b"a" * 32, b"b" * 32
+    day = 19_000 * 86_400
+    out = engine.apply_batch([(a, 1_000), (a, 700), (b, 3), (a, 5)], day + 10)
+    assert out.reward_rate == 195_312
+    assert out.allowed == [1_000, 500, 3, 0]                        # a hits 1.5 kWh, last record skipped
+    assert out.rewards == [195_312, 97_656, 585, 0]                 # 3 * 195312 / 1000 = 585.9 → 585
+    assert (out.total_milli, out.total_reward) == (1_503, 293_553)
+
+    assert engine.apply_batch([(a, 10)], day + 86_399).allowed == [0]   # same UTC day
+    nxt = engine.apply_batch([(a, 10)], day + 86_400)                   # new day resets the counter
+    assert nxt.allowed == [10] and engine.accounts[a].cumulative_kwh == 1_510
+
+def test_apply_instruction_uses_encoded_market_cap():
+    records = [KwhRecord(b"d" * 32, b"k" * 32, 2_000, b"s" * 64)]
+    out = RewardEngine(market_cap=0).apply_instruction(encode_batch(records, market_cap=400_000_000_000), GENESIS)
+    assert out.allowed == [1_500] and out.rewards == [150_000_000]
+
+def test_vectorised_matches_scalar():
+    rng = random.Random(7)
+    n = 2_000
+    kwh = [rng.choice([0, 1, 3, 499, 700, 1_500, 2_000, 10**18]) for _ in range(n)]
+    ts = sorted(GENESIS + rng.randrange(12) * HALVING_INTERVAL // 2 + rng.randrange(86_400) for _ in range(n))
+    caps = [rng.choice([0, 1, 7, 499_999_999_999, 5 * 10**11, 10**12, 10**12 + 1, 2**64 - 1]) for _ in range(n)]
+    devices = [bytes([rng.randrange(20)]) * 32 for _ in range(n)]
+    days = [t // 86_400 for t in ts]
+
+    bases = base_rewards_at(ts, GENESIS)
+    assert bases.tolist() == [base_reward_at(t, GENESIS) for t in ts]
+    assert reward_rates(bases, caps).tolist() == [reward_rate(b, c) for b, c in zip(bases.tolist(), caps)]
+
+    keys = np.array([d[0] for d in devices], dtype=np.int64) * 1_000_000 + np.array(days, dtype=np.int64)
+    got = project_rewards(kwh, ts, caps, GENESIS, device_days=keys)
+    engine, want = RewardEngine(genesis_timestamp=GENESIS), []
+    for d, k, t, c in zip(devices, kwh, ts, caps):
+        want.append(engine.apply_batch([(d, k)], t, c).rewards[0])
+    assert got.tolist() == want
+
+def test_capped_milli_groups_and_scenarios():
+    assert capped_milli([700, 700, 700, 5], device_days=[1, 1, 1, 2]).tolist() == [700, 700, 100, 5]
+    assert capped_milli([700, 900, 700], device_days=[1, 2, 1]).tolist() == [700, 900, 700]
+    scenarios = project_rewards([1_000, 1_000], [GENESIS, GENESIS], np.array([[0], [2 * 10**12]]), GENESIS)
+    assert scenarios.tolist() == [[50_000_000, 50_000_000], [25_000_000, 25_000_000]]
@@ -0,0 +1,136 @@
+# tests/test_screening.py
+import math
+import random
+import numpy as np
+import pytest
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.clients import ClientRegistry
+from carbon_smart_meter.core.dedup import ReplayGuard
+from carbon_smart_meter.core.mining import EnergyProcessor, VIRPacket, signed_message
+from carbon_smart_meter.core.screening import (
+    FLAT, FUTURE, INVALID, NIGHT, OUTLIER, OVER_RATED, RAMP, PlausibilityScreen, reason_names,
+)
+
+DAY = 19_000 * 86_400
+R = 12.0
+
+def _solar(t, peak=80.0):
+    hour = (t % 86_400) / 3600
+    return max(0.0, peak * math.sin(math.pi * (hour - 6) / 12))
+
+def _sample(watts):
+    """(V, I, R) for a resistive load drawing watts."""
+    v = math.sqrt(watts * R)
+    return v, (v / R if watts else 0.0), R
+
+def _feed(screen, device, times, power):
+    vir = [_sample(power(t)) for t in times]
+    return screen.screen([device] * len(times), *zip(*vir), times, now=times[-1])
+
+def test_stateless_checks():
+    screen = PlausibilityScreen()
+    d = b"d" * 32
+    reasons = screen.screen(
+        [d] * 5,
+        [12.0, 40.0, -1.0, 12.0, float("nan")],
+        [1.0, 3.0, 1.0, 2.0, 1.0],
+        [12.0, 13.3, 12.0, 12.0, 12.0],
+        [DAY, DAY + 60, DAY + 120, DAY + 10_000, DAY + 180],
+        now=DAY,
+    ).tolist()
+    assert reasons[0] == 0
+    assert reasons[1] == OVER_RATED                 # 120 W > 110 W
+    assert reasons[2] & INVALID                     # negative voltage
+    assert reasons[3] == INVALID | FUTURE           # R ≠ V/I, and hours ahead of now
+    assert reasons[4] & INVALID
+    assert reason_names(INVALID | FUTURE) == ["invalid", "future"]
+
+def test_diurnal_profile_flags_night_and_flat_sources():
+    screen = PlausibilityScreen()
+    solar, plug = b"s" * 32, b"p" * 32
+    times = list(range(DAY, DAY + 2 * 86_400, 600))
+    assert not np.any(_feed(screen, solar, times, _solar) & (NIGHT | FLAT))
+    stats = screen.device_stats(solar)
+    assert abs(stats["noon_hour"] - 12) < 0.2 and stats["concentration"] > 0.7
+
+    t = DAY + 2 * 86_400
+    night = screen.screen([solar] * 2, *zip(_sample(50), _sample(50)), [t + 1800, t + 12 * 3600], now=t + 86_400)
+    assert night.tolist() == [NIGHT, 0]
+    assert screen.device_stats(solar)["count"] == len(times) + 1       # quarantined samples don't learn
+
+    reasons = _feed(screen, plug, times, lambda t: 50.0)                # mains-powered "panel"
+    assert not np.any(reasons[:140] & FLAT) and np.all(reasons[150:] & FLAT)
+
+def test_ramp_and_outlier_only_flag():
+    screen = PlausibilityScreen()
+    d = b"r" * 32
+    times = list(range(DAY + 12 * 3600, DAY + 12 * 3600 + 30))
+    assert not _feed(screen, d, times, lambda t: 40.0).any()
+    v, i, r = _sample(100)
+    assert screen.screen_one(d, v, i, r, times[-1] + 1) == RAMP | OUTLIER
+    assert abs(screen.device_stats(d)["max_ramp"] - 60.0) < 1e-6
+    assert screen.stats == {"screened": 31, "quarantined": 0, "flagged": 1, "evicted": 0}
+
+def test_batch_matches_one_by_one():
+    rng = random.Random(3)
+    devices = [bytes([n]) * 32 for n in range(30)]
+    rows = []
+    for k in range(3_000):
+        t = DAY + k * 120 + rng.randrange(60)
+        watts = rng.choice([_solar(t), _solar(t), 0.0, 45.0, 105.0, 130.0])
+        v, i, r = _sample(watts)
+        rows.append((rng.choice(devices), v, i, r * rng.choice([1, 1, 1, 1.5]), t))
+    batch, single = PlausibilityScreen(), PlausibilityScreen()
+    got = np.concatenate([batch.screen(*zip(*rows[n:n + 500]), now=DAY * 2) for n in range(0, len(rows), 500)])
+    want = [single.screen(*zip(row), now=DAY * 2)[0] for row in rows]
+    assert got.tolist() == want and any(want)
+    for d in devices:
+        assert batch.device_stats(d) == single.device_stats(d)
+
+    scalar = PlausibilityScreen()
+    assert [scalar.screen_one(*row, now=DAY * 2) for row in rows] == want
+    for d in devices:
+        assert scalar.device_stats(d) == pytest.approx(batch.device_stats(d), rel=1e-9, abs=1e-9)
+
+def test_processor_quarantines_before_cap_and_storage():
+    clients = ClientRegistry.local()
+    processor = EnergyProcessor(
+        clients=clients, screen=PlausibilityScreen(clock=lambda: DAY + 3_600),
+        replay_guard=ReplayGuard(clock=lambda: DAY + 3_600),
+    )
+    held = []
+    processor.quarantine_sinks.append(held.append)
+    key = SigningKey.generate()
+    d = b"q" * 32
+
+    def packet(v, i, r, ts):
+        p = VIRPacket(device_id=d, voltage=v, current=i, resistance=r, timestamp=ts, signature=b"\0" * 64)
+        return p.model_copy(update={"signature": key.sign(signed_message(p)).signature})
+
+    pk = key.verify_key.encode()
+    ok, over = packet(12.0, 2.0, 6.0, DAY), packet(24.0, 10.0, 2.4, DAY + 600)
+    assert processor.process_packet(ok, pk) is not None
+    assert processor.process_batch([over], lambda _: pk) == [None]
+    assert [s.reasons for s in held] == [OVER_RATED] and held[0].timestamp == DAY + 600
+    assert processor.daily_usage.get((d, DAY // 86_400)) == 24.0 / 3_600_000      # only the 24 W sample counted
+    stored = set(processor.db.s3.objects["ccm-energy-eu"])
+    assert f"quarantine/{d.hex()}/{DAY + 600}.json" in stored
+    assert f"energy/{d.hex()}/{DAY}.json" in stored and f"energy/{d.hex()}/{DAY + 600}.json" not in stored
+    assert not processor.replay_guard.check(d, DAY)
+    assert processor.replay_guard.check(d, DAY + 600)           # quarantined: never fed to the guard
+    assert processor.replay_guard.stats["accepted"] == 1
+
+def test_device_state_is_bounded():
+    screen = PlausibilityScreen(max_devices=32)
+    for n in range(100):
+        screen.screen_one(bytes([n]) * 32, 12.0, 1.0, 12.0, DAY + n, now=DAY + n)
+    assert len(screen) <= 32 and screen.capacity == 32 and screen.stats["evicted"] >= 68
+    assert screen.device_stats(bytes([99]) * 32) is not None
+    assert screen.device_stats(bytes([0]) * 32) is None          # heard from longest ago
+
+    batch = [bytes([200 + n]) * 32 for n in range(20)]
+    screen.screen(batch, [12.0] * 20, [1.0] * 20, [12.0] * 20, [DAY + 200] * 20, now=DAY + 200)
+    assert all(screen.device_stats(d)["count"] == 1 for d in batch)
+    assert len(set(screen.slots.values())) == len(screen) <= 32
+    with pytest.raises(ValueError):
+        screen.screen([bytes([n]) * 32 for n in range(33)], [12.0] * 33, [1.0] * 33, [12.0] * 33, [DAY] * 33)
@@ -0,0 +1,46 @@
+# tests/test_server.py
+import asyncio
+import struct
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.mining import EnergyProcessor
+from carbon_smart_meter.core.server import ACK_ACCEPTED, ACK_BUSY, ACK_REJECTED, IngestClient, IngestServer
+from carbon_smart_meter.core.wire import pack_frame
+
+def _frames(signing_key, device_id, count):
+    frames = []
+    for t in range(count):
+        payload = device_id + struct.pack("<fffq", 18.0, 2.0, 9.0, 1000000000 + t)
+        frames.append(pack_frame(device_id, 18.0, 2.0, 9.0, 1000000000 + t, signing_key.sign(payload).signature))
+    return frames
+
+def test_server_acknowledges_each_frame():
+    signing_key = SigningKey.generate()
+    keys = {b"g" * 32: signing_key.verify_key.encode()}
+
+    async def scenario():
+        server = IngestServer(EnergyProcessor(user_region="EU"), keys.get)
+        await server.start()
+        clients = [await IngestClient.connect(port=server.port) for _ in range(5)]
+
+        good = _frames(signing_key, b"g" * 32, 8)
+        forged = _frames(SigningKey.generate(), b"g" * 32, 2)
+        acks = await asyncio.gather(*(c.send(good + forged) for c in clients))
+
+        for c in clients:
+            await c.close()
+        await server.close()
+        return acks, server.stats
+
+    acks, stats = asyncio.run(scenario())
+    assert all(a == bytes([ACK_ACCEPTED] * 8 + [ACK_REJECTED] * 2) for a in acks)
+    assert stats["frames"] == 50 and stats["accepted"] == 40
+
+def test_server_sheds_load_when_full():
+    signing_key = SigningKey.generate()
+    keys = {b"g" * 32: signing_key.verify_key.encode()}
+
+    async def scenario():
+        server = IngestServer(EnergyProcessor(user_region="EU"), keys.get, max_inflight=0)
+        return await server.process(b"".join(_frames(signing_key, b"g" * 32, 3)))
+
+    assert asyncio.run(scenario()) == bytes([ACK_BUSY] * 3)
@@ -1,17 +1,54 @@
 # tests/test_solana_submit.py
-from unittest.mock import patch
-from carbon_smart_meter.blockchain.solana import SolanaSubmitter
-from solana.keypair import Keypair
-
-# def test_invalid_signature():
-    wallet = Keypair()
-    submitter = SolanaSubmitter(wallet)
-
-    with patch.object(submitter, '_verify_device_sig', return_value=False):
-        result = submitter.submit_kwh(
-            device_id=b"0"*32,
-            public_key=b"a"*32,
-            kwh=1000,
-            signature=b"bad"*64
-        )
-        assert result is None
\ No newline at end of file
+import asyncio
+from nacl.signing import SigningKey
+from solders.keypair import Keypair
+from carbon_smart_meter.blockchain.batching import KwhRecord, device_message
+from carbon_smart_meter.core.blockchain.adapter import RateLimiter
+from carbon_smart_meter.core.blockchain.solana import SolanaAdapter
+from carbon_smart_meter.core.local import LocalRpcServer
+
+class CountingLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__(None)
+        self.acquired = 0
+
+    async def acquire(self, tokens: float = 1.0):
+        self.acquired += 1
+
+def _run(scenario):
+    async def main():
+        server = await LocalRpcServer().start()
+        try:
+            return await scenario(server), server
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+def test_invalid_signature():
+    key = SigningKey.generate()
+    record = KwhRecord(b"0" * 32, key.verify_key.encode(), 1000, b"bad" * 21 + b"!", bytes(Keypair().pubkey()))
+
+    async def scenario(server):
+        async with SolanaAdapter(Keypair(), url=server.url, rate_limiter=RateLimiter(None)) as adapter:
+            return await adapter.submit_batch([record])
+
+    result, server = _run(scenario)
+    assert result == [None]
+    assert server.client.transactions == []
+
+def test_status_polls_are_rate_limited():
+    key = SigningKey.generate()
+    wallet = bytes(Keypair().pubkey())
+    record = KwhRecord(b"1" * 32, key.verify_key.encode(), 1000, key.sign(device_message(b"1" * 32, wallet)).signature, wallet)
+    limiter = CountingLimiter()
+
+    async def scenario(server):
+        async with SolanaAdapter(Keypair(), url=server.url, rate_limiter=limiter) as adapter:
+            tx_ids = await adapter.submit_batch([record])
+            before = limiter.acquired
+            statuses = await adapter.statuses(tx_ids * 300)
+            return statuses, limiter.acquired - before
+
+    (statuses, polls), server = _run(scenario)
+    assert statuses == [True] * 300
+    assert polls == 2                                   # 300 ids = two getSignatureStatuses calls
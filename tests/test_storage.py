@@ -0,0 +1,115 @@
+# tests/test_storage.py
+import os
+import time
+import pytest
+from carbon_smart_meter.core.mining import SecureEnergyDB, EnergyReading
+from carbon_smart_meter.core.storage import UnflushedWritesError, WriteBehindStore, decode_records
+from carbon_smart_meter.core.local import LocalS3, LocalBlobServiceClient
+
+def _reading(device_id, timestamp):
+    return EnergyReading(
+        device_id=device_id, kwh=0.001, timestamp=timestamp,
+        verified=True, cable_type="type-c", user_region="EU"
+    )
+
+def test_write_behind_compacts_per_device_hour():
+    db = SecureEnergyDB(user_region="EU", write_behind=True)
+    db.s3 = LocalS3()
+    db.blob_service = LocalBlobServiceClient()
+
+    for t in range(10):
+        db.insert(_reading(b"0" * 32, 1000000000 + t))
+        db.insert(_reading(b"1" * 32, 1000000000 + t))
+    db.close()
+
+    aws = db.s3.objects["ccm-energy-eu"]
+    azure = db.blob_service.blobs["energy-backup"]
+    assert len(aws) == 2
+    assert aws == azure
+
+    key = next(k for k in aws if k.startswith("energy/" + (b"0" * 32).hex()))
+    rows = list(decode_records(key, aws[key]))
+    assert [r["timestamp"] for r in rows] == list(range(1000000000, 1000000010))
+
+def test_write_behind_retries_failed_uploads():
+    calls = []
+    stored = {}
+
+    def flaky(key, data):
+        calls.append(key)
+        if len(calls) < 3:
+            raise ConnectionError("S3 unavailable")
+        stored[key] = data
+
+    store = WriteBehindStore(flaky, lambda key, data: None, backoff=0.001)
+    store.put("energy", "ab", 1000000000, b"{}")
+    store.close()
+
+    assert len(calls) == 3
+    assert store.stats["retries"] == 2
+    assert store.stats["failures"] == 0
+    assert len(stored) == 1
+
+def test_compacted_keys_span_min_max_and_never_collide():
+    stored = {}
+    store = WriteBehindStore(stored.__setitem__, lambda key, data: None)
+    for ts in (1000000005, 1000000001, 1000000009):
+        store.put("energy", "ab", ts, b"{}")
+    store.flush()
+    store.put("energy", "ab", 1000000005, b"{}")
+    store.put("energy", "ab", 1000000001, b"{}")
+    store.put("energy", "ab", 1000000009, b"{}")
+    store.close()
+    assert len(stored) == 2
+    assert all(key.split("/")[-1].startswith("1000000001-1000000009-") for key in stored)
+
+def test_close_spills_or_raises_unstored_uploads(tmp_path):
+    def down(key, data):
+        raise ConnectionError("S3 unavailable")
+
+    store = WriteBehindStore(down, lambda key, data: None, retries=0)
+    store.put("energy", "ab", 1000000000, b"{}")
+    with pytest.raises(UnflushedWritesError) as failed:
+        store.close()
+    assert [leg for leg, _, _ in failed.value.failed] == ["primary"]
+
+    spill = str(tmp_path / "spill")
+    store = WriteBehindStore(down, lambda key, data: None, retries=0, spill_dir=spill)
+    store.put("energy", "ab", 1000000000, b"{}")
+    store.close()
+    assert store.stats["spilled"] == 1
+
+    stored = {}
+    WriteBehindStore(stored.__setitem__, lambda key, data: None, spill_dir=spill).close()
+    assert list(stored.values()) == [b"{}\n"] and not any(files for _, _, files in os.walk(spill))
+
+def test_idle_store_retries_failed_uploads():
+    stored = {}
+    state = {"up": False}
+
+    def recovering(key, data):
+        if not state["up"]:
+            raise ConnectionError("S3 unavailable")
+        stored[key] = data
+
+    store = WriteBehindStore(recovering, lambda key, data: None, retries=0, max_age=0.05)
+    store.put("energy", "ab", 1000000000, b"{}")
+    store.flush()
+    assert stored == {} and store.failed
+    state["up"] = True
+    deadline = time.monotonic() + 5
+    while not stored and time.monotonic() < deadline:      # nothing new arrives: the idle loop retries
+        time.sleep(0.01)
+    assert len(stored) == 1
+    store.close()
+
+def test_flush_raises_when_the_flusher_died():
+    stored = {}
+    store = WriteBehindStore(stored.__setitem__, lambda key, data: None)
+    store.put("energy", "ab", 1000000000, b"{}")
+    store.queue.put(("malformed",))                         # kills the flusher thread
+    store._thread.join(5)
+    with pytest.raises(RuntimeError):
+        store.flush(timeout=5)
+    store.close()                                           # uploads what the dead flusher left
+    assert len(stored) == 1
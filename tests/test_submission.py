@@ -0,0 +1,137 @@
+# tests/test_submission.py
+from nacl.signing import SigningKey
+from carbon_smart_meter.blockchain.batching import BatchSubmitter, device_message
+from carbon_smart_meter.blockchain.submission import SubmissionQueue
+from carbon_smart_meter.core.clients import get_clients
+
+DAY = 19_800
+
+class _RawSubmitter(BatchSubmitter):
+    def build_transaction(self, batch, data, blockhash):
+        return (blockhash, data)
+
+class _Clock:
+    now = DAY * 86400 + 3600.0
+    def __call__(self):
+        return self.now
+
+class _Brownout:
+    """Wraps the local RPC stand-in; fails the next `failures` sends."""
+    def __init__(self, rpc, failures=0):
+        self.rpc, self.failures = rpc, failures
+    def send_transaction(self, tx, *signers, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("rpc unavailable")
+        return self.rpc.send_transaction(tx, *signers, **kwargs)
+    def __getattr__(self, name):
+        return getattr(self.rpc, name)
+
+def _device(n):
+    signing_key = SigningKey.generate()
+    device_id, wallet = bytes([n]) * 32, bytes([n + 100]) * 32
+    signature = signing_key.sign(device_message(device_id, wallet)).signature
+    return device_id, signing_key.verify_key.encode(), signature, wallet
+
+def _sent_milli(rpc):
+    from carbon_smart_meter.blockchain.batching import decode_batch
+    return sum(kwh for _, data in rpc.transactions for _, kwh, _ in decode_batch(data)[0])
+
+def test_idempotent_per_device_day_and_capped(tmp_path):
+    rpc = get_clients().rpc
+    queue = SubmissionQueue(str(tmp_path / "q.log"), _RawSubmitter(), clock=_Clock(), fsync=False)
+    device_id, public_key, signature, wallet = _device(1)
+
+    queue.enqueue(device_id, public_key, signature, DAY, 400, wallet)
+    queue.enqueue(device_id, public_key, signature, DAY, 400, wallet)     # same total again: no-op
+    queue.pump()                                                   # send
+    queue.pump()                                                   # confirm
+    assert queue.confirmed(device_id, DAY) == 400
+
+    queue.enqueue(device_id, public_key, signature, DAY, 2_000, wallet)    # over the 1.5 kWh cap
+    queue.pump(); queue.pump(); queue.pump()
+    assert queue.confirmed(device_id, DAY) == 1_500
+    assert _sent_milli(rpc) == 1_500
+    queue.close()
+
+def test_brownout_retries_with_backoff_without_double_counting(tmp_path):
+    from carbon_smart_meter.core.clients import ClientRegistry
+    local_rpc = get_clients().rpc
+    clients = ClientRegistry(credential=object(), rpc=_Brownout(local_rpc, failures=3))
+    clock = _Clock()
+    queue = SubmissionQueue(str(tmp_path / "q.log"), _RawSubmitter(clients=clients), clock=clock, fsync=False)
+    devices = [_device(n) for n in range(5)]
+    queue.enqueue_many([(d, pk, sig, DAY, 300, w) for d, pk, sig, w in devices])
+
+    queue.pump()
+    assert queue.stats["failed_sends"] == 5 and not local_rpc.transactions
+    queue.pump()                                   # still backing off: nothing sent
+    assert queue.stats["failed_sends"] == 5
+    for _ in range(6):
+        clock.now += 10
+        queue.pump()
+    assert all(queue.confirmed(d, DAY) == 300 for d, _, _, _ in devices)
+    assert _sent_milli(local_rpc) == 5 * 300
+    queue.close()
+
+def test_restart_resumes_in_flight_without_resending(tmp_path):
+    rpc = get_clients().rpc
+    path = str(tmp_path / "q.log")
+    clock = _Clock()
+    device_id, public_key, signature, wallet = _device(7)
+
+    queue = SubmissionQueue(path, _RawSubmitter(), clock=clock, fsync=False)
+    queue.enqueue(device_id, public_key, signature, DAY, 900, wallet)
+    queue.pump()                                   # sent, not yet confirmed
+    queue.close()
+
+    restarted = SubmissionQueue(path, _RawSubmitter(), clock=clock, fsync=False)
+    restarted.pump()
+    assert restarted.confirmed(device_id, DAY) == 900
+    assert len(rpc.transactions) == 1
+    restarted.compact()
+    restarted.close()
+    assert SubmissionQueue(path, _RawSubmitter(), clock=clock, fsync=False).confirmed(device_id, DAY) == 900
+
+def test_unconfirmed_transaction_is_resent_and_past_days_expire(tmp_path):
+    rpc = get_clients().rpc
+    clock = _Clock()
+    queue = SubmissionQueue(str(tmp_path / "q.log"), _RawSubmitter(), clock=clock, fsync=False, confirm_timeout=60)
+    device_id, public_key, signature, wallet = _device(3)
+    queue.enqueue(device_id, public_key, signature, DAY, 200, wallet)
+    queue.pump()
+    rpc.statuses.clear()                           # dropped by the cluster
+    clock.now += 61
+    queue.pump()                                   # timed out → retried with a fresh send
+    queue.pump()
+    assert queue.stats["retried"] == 1
+    assert queue.confirmed(device_id, DAY) == 200
+
+    queue.enqueue(device_id, public_key, signature, DAY, 500, wallet)
+    clock.now += 86400
+    queue.pump()
+    assert queue.stats["expired"] == 1 and not queue.entries
+    queue.close()
+
+def test_wallet_bound_signatures_are_sent_and_unbound_ones_rejected(tmp_path):
+    rpc = get_clients().rpc
+    path = str(tmp_path / "q.log")
+    clock = _Clock()
+    device_id, public_key, signature, wallet = _device(9)
+    other_id, other_key, _, other_wallet = _device(10)
+    unbound = SigningKey.generate()
+
+    queue = SubmissionQueue(path, _RawSubmitter(), clock=clock, fsync=False)
+    queue.enqueue(device_id, public_key, signature, DAY, 300, wallet)
+    queue.enqueue(other_id, unbound.verify_key.encode(), unbound.sign(other_id).signature, DAY, 300, other_wallet)
+    queue.close()
+
+    restarted = SubmissionQueue(path, _RawSubmitter(), clock=clock, fsync=False)      # wallet survives the log
+    assert restarted.entries[(device_id, DAY)].wallet == wallet
+    restarted.pump(); restarted.pump()
+    assert restarted.confirmed(device_id, DAY) == 300
+    assert restarted.confirmed(other_id, DAY) == 0 and restarted.stats["rejected"] == 1
+    assert _sent_milli(rpc) == 300
+    restarted.pump()
+    assert restarted.stats["rejected"] == 1                                        # parked, not re-counted
+    restarted.close()
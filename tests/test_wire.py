@@ -0,0 +1,47 @@
+# tests/test_wire.py
+import struct
+from nacl.signing import SigningKey
+from carbon_smart_meter.core.mining import EnergyProcessor, EnergyReading, VIRPacket, verify_packet
+from carbon_smart_meter.core.wire import FRAME_SIZE, FrameBatch, frames_from_packets, verify_frames
+
+def _packets(signing_key, device_id, count):
+    packets = []
+    for t in range(count):
+        payload = device_id + struct.pack("<fffq", 18.5, 2.25, 8.0, 1000000000 + t)
+        packets.append(VIRPacket(
+            device_id=device_id, voltage=18.5, current=2.25, resistance=8.0,
+            timestamp=1000000000 + t, signature=signing_key.sign(payload).signature
+        ))
+    return packets
+
+def test_frames_round_trip_and_verify():
+    signing_key = SigningKey.generate()
+    device_id = b"7" * 32
+    packets = _packets(signing_key, device_id, 20)
+    keys = {device_id: signing_key.verify_key.encode()}
+
+    buffer = bytearray(frames_from_packets(packets))
+    assert len(buffer) == 20 * FRAME_SIZE
+    buffer[5 * FRAME_SIZE + 40] ^= 0xFF   # corrupt a signed byte of frame 5
+
+    batch = FrameBatch(buffer)
+    expected = [verify_packet(p, keys[device_id]) for p in FrameBatch(buffer).packets()]
+    assert verify_frames(batch, keys.get) == expected
+    assert expected.count(False) == 1
+
+    assert FrameBatch(frames_from_packets(packets)).packets() == packets
+    columns = batch.columns()
+    assert columns["timestamp"].tolist() == [p.timestamp for p in packets]
+
+def test_process_frames_matches_process_batch():
+    signing_key = SigningKey.generate()
+    device_id = b"3" * 32
+    packets = _packets(signing_key, device_id, 10)
+    keys = {device_id: signing_key.verify_key.encode()}
+
+    by_packet = EnergyProcessor(user_region="EU").process_batch(packets, keys.get)
+    by_frame = EnergyProcessor(user_region="EU").process_frames(frames_from_packets(packets), keys.get)
+    assert by_frame == by_packet
+    assert all(isinstance(r, EnergyReading) for r in by_frame)
+    raw = EnergyProcessor(user_region="EU").process_frames(frames_from_packets(packets), keys.get, records=True)
+    assert [r.to_model() for r in raw] == by_frame